@@ -0,0 +1,37 @@
+"""
+API Middleware
+
+This module provides:
+- Resource accounting of every HTTP request, including streamed bodies and background tasks
+"""
+
+from dpq.resource_accounting import track
+
+
+class ResourceAccountingMiddleware:
+    """
+    Pure ASGI middleware that accounts each HTTP request to its endpoint
+
+    The endpoint is the method and route template (so /assessments/{assessment_id}
+    aggregates every assessment). The user comes from the X-User-ID header unless
+    a handler sets it with dpq.resource_accounting.set_user(). Accounting ends
+    after the last body chunk and any background tasks.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        user_id = headers.get(b"x-user-id", b"").decode("latin-1") or None
+        with track("unmatched", user_id) as usage:
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                route = scope.get("route")
+                if route is not None:
+                    usage.endpoint = f"{scope['method']} {route.path}"
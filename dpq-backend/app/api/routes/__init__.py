@@ -6,9 +6,17 @@ This package contains all the API route modules for the DPQ backend.
 
 from .assessments import router as assessments_router
 from .videos import router as videos_router
+from .admin import router as admin_router
+from .charts import router as charts_router
+from .sessions import router as sessions_router
+from .recommendations import router as recommendations_router
 
 # Export all routers
 __all__ = [
     "assessments_router",
-    "videos_router"
+    "videos_router",
+    "admin_router",
+    "charts_router",
+    "sessions_router",
+    "recommendations_router"
 ]
@@ -0,0 +1,237 @@
+"""
+Admin API Routes
+
+This module provides operational endpoints for:
+- Instrument reliability (Cronbach's alpha per facet and factor)
+- Recommendation cache metrics
+- LLM request coalescing metrics
+- Database pool metrics
+- Assessment write buffer metrics
+- Dog profile cache metrics
+- Resource usage per endpoint and per user
+"""
+
+from fastapi import APIRouter, HTTPException
+from typing import Dict, Any
+import logging
+from datetime import datetime
+
+from app.models.api_models import APIResponse, APIStatus, HTTPStatusCodes
+from dpq.reliability import get_reliability_tracker
+from dpq.claude_recommender import PROMPT_VERSION
+from dpq.recommendation_cache import get_recommendation_cache
+from dpq.single_flight import single_flight_stats
+from dpq.resource_accounting import TOTAL_FIELDS, get_resource_ledger
+from dpq.db_pool import get_db_pool
+from dpq.write_behind import get_write_buffer
+from dpq.profile_cache import get_dog_profile_cache
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# Create router
+router = APIRouter(prefix="/admin", tags=["admin"])
+
+
+@router.get("/reliability", response_model=APIResponse[Dict[str, Any]])
+async def get_reliability():
+    """
+    Current internal-consistency reliability
+
+    Returns Cronbach's alpha for every facet and factor, computed from the
+    running item covariances of all assessments scored so far.
+    """
+    try:
+        tracker = get_reliability_tracker()
+        alphas = tracker.alphas()
+        
+        return APIResponse(
+            status=APIStatus.SUCCESS,
+            message="Reliability retrieved successfully",
+            data={
+                "reliability_score": tracker.overall_reliability(),
+                **alphas
+            },
+            timestamp=datetime.utcnow()
+        )
+        
+    except Exception as e:
+        logger.error(f"Error retrieving reliability: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=HTTPStatusCodes.INTERNAL_SERVER_ERROR,
+            detail=f"Failed to retrieve reliability: {str(e)}"
+        )
+
+
+@router.get("/recommendation-cache", response_model=APIResponse[Dict[str, Any]])
+async def get_recommendation_cache_stats():
+    """
+    Recommendation cache metrics
+
+    Returns entry counts and hit/miss counters of this worker's recommendation
+    cache for the current prompt version.
+    """
+    try:
+        stats = get_recommendation_cache(PROMPT_VERSION).stats()
+        
+        return APIResponse(
+            status=APIStatus.SUCCESS,
+            message="Recommendation cache statistics retrieved successfully",
+            data=stats,
+            timestamp=datetime.utcnow()
+        )
+        
+    except Exception as e:
+        logger.error(f"Error retrieving recommendation cache statistics: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=HTTPStatusCodes.INTERNAL_SERVER_ERROR,
+            detail=f"Failed to retrieve recommendation cache statistics: {str(e)}"
+        )
+
+
+@router.get("/coalescing", response_model=APIResponse[Dict[str, Any]])
+async def get_coalescing_stats():
+    """
+    LLM request coalescing metrics
+
+    Returns, per kind of Claude call, how many calls were made and how many
+    were served by an identical call already in flight in this worker.
+    """
+    try:
+        stats = single_flight_stats()
+        
+        return APIResponse(
+            status=APIStatus.SUCCESS,
+            message="Coalescing statistics retrieved successfully",
+            data=stats,
+            timestamp=datetime.utcnow()
+        )
+        
+    except Exception as e:
+        logger.error(f"Error retrieving coalescing statistics: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=HTTPStatusCodes.INTERNAL_SERVER_ERROR,
+            detail=f"Failed to retrieve coalescing statistics: {str(e)}"
+        )
+
+
+@router.get("/db-pool", response_model=APIResponse[Dict[str, Any]])
+async def get_db_pool_stats():
+    """
+    Database pool metrics
+
+    Returns this worker's pool size, idle connections, acquire wait
+    histogram, acquire timeouts and connection health checks.
+    """
+    try:
+        pool = get_db_pool()
+        stats = pool.stats() if pool is not None else {"started": False}
+        
+        return APIResponse(
+            status=APIStatus.SUCCESS,
+            message="Database pool statistics retrieved successfully",
+            data=stats,
+            timestamp=datetime.utcnow()
+        )
+        
+    except Exception as e:
+        logger.error(f"Error retrieving database pool statistics: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=HTTPStatusCodes.INTERNAL_SERVER_ERROR,
+            detail=f"Failed to retrieve database pool statistics: {str(e)}"
+        )
+
+
+@router.get("/write-buffer", response_model=APIResponse[Dict[str, Any]])
+async def get_write_buffer_stats():
+    """
+    Assessment write buffer metrics
+
+    Returns this worker's logged assessments not yet written to the
+    database (and the age of the oldest), dead assessments, and flush
+    counters with the last flush error.
+    """
+    try:
+        buffer = get_write_buffer()
+        stats = buffer.stats() if buffer is not None else {"running": False}
+        
+        return APIResponse(
+            status=APIStatus.SUCCESS,
+            message="Write buffer statistics retrieved successfully",
+            data=stats,
+            timestamp=datetime.utcnow()
+        )
+        
+    except Exception as e:
+        logger.error(f"Error retrieving write buffer statistics: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=HTTPStatusCodes.INTERNAL_SERVER_ERROR,
+            detail=f"Failed to retrieve write buffer statistics: {str(e)}"
+        )
+
+
+@router.get("/profile-cache", response_model=APIResponse[Dict[str, Any]])
+async def get_profile_cache_stats():
+    """
+    Dog profile cache metrics
+
+    Returns this worker's cached profiles and their size, hits (including
+    cached unknown dogs), misses, database loads and invalidations.
+    """
+    try:
+        return APIResponse(
+            status=APIStatus.SUCCESS,
+            message="Profile cache statistics retrieved successfully",
+            data=get_dog_profile_cache().stats(),
+            timestamp=datetime.utcnow()
+        )
+        
+    except Exception as e:
+        logger.error(f"Error retrieving profile cache statistics: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=HTTPStatusCodes.INTERNAL_SERVER_ERROR,
+            detail=f"Failed to retrieve profile cache statistics: {str(e)}"
+        )
+
+
+@router.get("/resources", response_model=APIResponse[Dict[str, Any]])
+async def get_resource_usage(by: str = "endpoint", sort: str = "input_tokens", limit: int = 20):
+    """
+    Most expensive traffic
+
+    Returns this worker's request and background-job totals (tokens, prompt
+    cache hit ratio, ffmpeg/ffprobe CPU seconds, database round trips,
+    time and pool waits, wall time) grouped by endpoint or user, ordered by one total.
+    """
+    try:
+        if by not in ("endpoint", "user"):
+            raise HTTPException(
+                status_code=HTTPStatusCodes.BAD_REQUEST,
+                detail=f"Unknown grouping '{by}'"
+            )
+        if sort not in TOTAL_FIELDS:
+            raise HTTPException(
+                status_code=HTTPStatusCodes.BAD_REQUEST,
+                detail=f"Unknown total '{sort}'"
+            )
+        if not 1 <= limit <= 1000:
+            raise HTTPException(
+                status_code=HTTPStatusCodes.BAD_REQUEST,
+                detail="limit must be between 1 and 1000"
+            )
+        
+        return APIResponse(
+            status=APIStatus.SUCCESS,
+            message="Resource usage retrieved successfully",
+            data={"by": by, "sort": sort, "rows": get_resource_ledger().top(by, sort, limit)},
+            timestamp=datetime.utcnow()
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error retrieving resource usage: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=HTTPStatusCodes.INTERNAL_SERVER_ERROR,
+            detail=f"Failed to retrieve resource usage: {str(e)}"
+        )
@@ -5,6 +5,9 @@ This module provides the core API endpoints for:
 - Assessment submission
 - Assessment retrieval
 - Assessment management
+- Longitudinal personality trends
+- Similar-personality lookups
+- Dog profiles and AI translator configuration
 - Video upload and analysis
 """
 
@@ -27,6 +30,9 @@ from app.services.service_manager import ServiceManager
 from app.services.dpq_service import DPQService
 from app.services.claude_service import ClaudeService
 from app.services.video_service import VideoService
+from dpq.trends import get_trend_index
+from dpq.similarity import SPACES, get_similarity_index
+from dpq.api_handler import get_api_handler
 
 # Setup logging
 logger = logging.getLogger(__name__)
@@ -38,6 +44,13 @@ router = APIRouter(prefix="/assessments", tags=["assessments"])
 service_manager = ServiceManager()
 
 
+def _profile_error_status(result: Dict[str, Any]) -> int:
+    """HTTP status of a DPQAPIHandler profile error: database failures are 500, the rest 404"""
+    if result["message"].startswith("Database read error"):
+        return HTTPStatusCodes.INTERNAL_SERVER_ERROR
+    return HTTPStatusCodes.NOT_FOUND
+
+
 @router.post("/assess", response_model=APIResponse[AssessmentData])
 async def create_assessment(
     assessment_request: AssessmentRequest,
@@ -97,6 +110,158 @@ async def create_assessment(
         )
 
 
+@router.get("/trends/{dog_id}", response_model=APIResponse[Dict[str, Any]])
+async def get_dog_trends(dog_id: str):
+    """
+    Retrieve longitudinal personality trends for a dog
+    
+    Served from the per-dog trend summary that is updated whenever an
+    assessment is saved: per-factor slope (points per year), its p-value,
+    the rolling mean and whether the latest assessment is a change point.
+    """
+    try:
+        summary = get_trend_index().summary(dog_id)
+        
+        if summary is None:
+            raise HTTPException(
+                status_code=HTTPStatusCodes.NOT_FOUND,
+                detail=f"No assessments found for dog {dog_id}"
+            )
+        
+        return APIResponse(
+            status=APIStatus.SUCCESS,
+            message="Trends retrieved successfully",
+            data=summary,
+            timestamp=datetime.utcnow()
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error retrieving trends for dog {dog_id}: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=HTTPStatusCodes.INTERNAL_SERVER_ERROR,
+            detail=f"Failed to retrieve trends: {str(e)}"
+        )
+
+
+@router.get("/similar/{dog_id}", response_model=APIResponse[Dict[str, Any]])
+async def get_similar_dogs(dog_id: str, space: str = "facets", k: int = 10):
+    """
+    Find dogs with a personality like this dog's
+    
+    Nearest neighbours of the dog's latest assessment over its 15 facet
+    scores (space=facets) or 14 AI bias indicators (space=biases).
+    """
+    try:
+        if space not in SPACES:
+            raise HTTPException(
+                status_code=HTTPStatusCodes.BAD_REQUEST,
+                detail=f"Unknown similarity space '{space}'"
+            )
+        if not 1 <= k <= 100:
+            raise HTTPException(
+                status_code=HTTPStatusCodes.BAD_REQUEST,
+                detail="k must be between 1 and 100"
+            )
+        
+        neighbours = get_similarity_index(space).query_dog(dog_id, k)
+        
+        if neighbours is None:
+            raise HTTPException(
+                status_code=HTTPStatusCodes.NOT_FOUND,
+                detail=f"No assessments found for dog {dog_id}"
+            )
+        
+        return APIResponse(
+            status=APIStatus.SUCCESS,
+            message="Similar dogs retrieved successfully",
+            data={"dog_id": dog_id, "space": space, "similar_dogs": neighbours},
+            timestamp=datetime.utcnow()
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error finding dogs similar to {dog_id}: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=HTTPStatusCodes.INTERNAL_SERVER_ERROR,
+            detail=f"Failed to find similar dogs: {str(e)}"
+        )
+
+
+@router.get("/profile/{dog_id}", response_model=APIResponse[Dict[str, Any]])
+async def get_dog_profile(dog_id: str):
+    """
+    Retrieve a dog's profile and current assessment
+    
+    Served from this worker's profile cache, which reads through to the
+    database on a miss and is refreshed whenever the dog gets a new
+    current assessment.
+    """
+    try:
+        profile = await get_api_handler().get_dog_profile(dog_id)
+        
+        if profile["status"] != "success":
+            raise HTTPException(
+                status_code=_profile_error_status(profile),
+                detail=f"{profile['message']}: {dog_id}"
+            )
+        
+        return APIResponse(
+            status=APIStatus.SUCCESS,
+            message="Dog profile retrieved successfully",
+            data={key: value for key, value in profile.items() if key != "status"},
+            timestamp=datetime.utcnow()
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error retrieving profile for dog {dog_id}: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=HTTPStatusCodes.INTERNAL_SERVER_ERROR,
+            detail=f"Failed to retrieve dog profile: {str(e)}"
+        )
+
+
+@router.get("/translator-config/{dog_id}", response_model=APIResponse[Dict[str, Any]])
+async def get_ai_translator_config(dog_id: str):
+    """
+    Retrieve the AI translator configuration of a dog's current assessment
+    
+    Needed by every translation, so it is served from the profile cache.
+    """
+    try:
+        config = await get_api_handler().get_ai_translator_config(dog_id)
+        
+        if config["status"] != "success":
+            raise HTTPException(
+                status_code=_profile_error_status(config),
+                detail=f"{config['message']}: {dog_id}"
+            )
+        
+        return APIResponse(
+            status=APIStatus.SUCCESS,
+            message="AI translator configuration retrieved successfully",
+            data={
+                "dog_id": dog_id,
+                "assessment_id": config["assessment_id"],
+                "ai_translator_config": config["ai_translator_config"]
+            },
+            timestamp=datetime.utcnow()
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error retrieving translator configuration for dog {dog_id}: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=HTTPStatusCodes.INTERNAL_SERVER_ERROR,
+            detail=f"Failed to retrieve AI translator configuration: {str(e)}"
+        )
+
+
 @router.get("/{assessment_id}", response_model=APIResponse[AssessmentData])
 async def get_assessment(assessment_id: str):
     """
@@ -0,0 +1,110 @@
+"""
+Chart API Routes
+
+This module provides endpoints for:
+- Radar and bar charts of factor, facet and bias scores
+- Trend charts of a dog's assessment history
+"""
+
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import Response
+import logging
+
+from app.models.api_models import HTTPStatusCodes
+from app.models.assessment_models import (
+    ChartFormat, ResultChartType, ChartRequest, TrendChartRequest
+)
+from app.services.chart_service import get_chart_service
+from dpq.dpq import DPQResults
+from dpq.visualization import MIMETYPES
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# Create router
+router = APIRouter(prefix="/charts", tags=["charts"])
+
+REQUIRED_SCORES = {
+    ResultChartType.FACET_BARS: "facet_scores",
+    ResultChartType.BIAS_BARS: "bias_indicators",
+}
+
+
+def _chart_response(request: Request, data: bytes, key: str, fmt: ChartFormat) -> Response:
+    """Image response with a content-hash ETag; unchanged charts answer 304"""
+    etag = f'"{key}"'
+    headers = {"ETag": etag, "Cache-Control": "public, max-age=31536000, immutable"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=data, media_type=MIMETYPES[fmt.value], headers=headers)
+
+
+@router.post("/results/{chart}")
+async def render_results_chart(chart: ResultChartType, chart_request: ChartRequest, request: Request,
+                               format: ChartFormat = ChartFormat.PNG):
+    """
+    Render a chart of one assessment's scores
+    
+    Charts are cached by a content hash of the scores, so repeat views of the
+    same result are served without re-rendering.
+    """
+    try:
+        required = REQUIRED_SCORES.get(chart)
+        if required and not getattr(chart_request, required):
+            raise HTTPException(
+                status_code=HTTPStatusCodes.BAD_REQUEST,
+                detail=f"{required} is required for {chart.value}"
+            )
+        
+        data, key = await get_chart_service().results_chart(chart_request.model_dump(), chart.value, format.value)
+        return _chart_response(request, data, key, format)
+        
+    except HTTPException:
+        raise
+    except (KeyError, ValueError) as e:
+        raise HTTPException(
+            status_code=HTTPStatusCodes.BAD_REQUEST,
+            detail=f"Invalid chart request: {str(e)}"
+        )
+    except Exception as e:
+        logger.error(f"Error rendering {chart.value} chart: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=HTTPStatusCodes.INTERNAL_SERVER_ERROR,
+            detail=f"Failed to render chart: {str(e)}"
+        )
+
+
+@router.post("/trend")
+async def render_trend_chart(trend_request: TrendChartRequest, request: Request,
+                             format: ChartFormat = ChartFormat.PNG):
+    """
+    Render a chart of factor scores over a dog's assessment history
+    """
+    try:
+        results_list = [
+            DPQResults(
+                dog_id="",
+                assessment_date=point.assessment_date,
+                raw_scores={},
+                factor_scores=point.factor_scores,
+                facet_scores={},
+                personality_profile={},
+                bias_indicators={}
+            )
+            for point in trend_request.assessments
+        ]
+        
+        data, key = await get_chart_service().trend_chart(results_list, format.value)
+        return _chart_response(request, data, key, format)
+        
+    except (KeyError, ValueError) as e:
+        raise HTTPException(
+            status_code=HTTPStatusCodes.BAD_REQUEST,
+            detail=f"Invalid chart request: {str(e)}"
+        )
+    except Exception as e:
+        logger.error(f"Error rendering trend chart: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=HTTPStatusCodes.INTERNAL_SERVER_ERROR,
+            detail=f"Failed to render chart: {str(e)}"
+        )
@@ -0,0 +1,141 @@
+"""
+Recommendation API Routes
+
+This module provides endpoints for:
+- Streaming AI recommendations as server-sent events
+- Polling an assessment's stored recommendations and their version
+"""
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+from typing import Any, AsyncIterator, Dict, Optional
+from datetime import datetime
+import json
+import logging
+
+from app.models.api_models import APIResponse, APIStatus, HTTPStatusCodes
+from app.models.assessment_models import RecommendationStreamRequest
+from app.services.claude_service import ClaudeService
+from dpq.recommendation_rules import BASELINE_VERSION
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# Create router
+router = APIRouter(prefix="/recommendations", tags=["recommendations"])
+
+_claude_service: Optional[ClaudeService] = None
+
+
+def get_claude_service() -> ClaudeService:
+    """Claude service shared by streaming requests"""
+    global _claude_service
+    if _claude_service is None:
+        _claude_service = ClaudeService()
+    return _claude_service
+
+
+def get_db_handler():
+    """Database handler of the shared Claude service, created on first use"""
+    return get_claude_service().get_db_handler()
+
+
+def format_sse(event: Dict[str, Any]) -> str:
+    """One server-sent event; the event name is the event's "event" field"""
+    data = {key: value for key, value in event.items() if key != "event"}
+    return f"event: {event['event']}\ndata: {json.dumps(data)}\n\n"
+
+
+@router.post("/stream")
+async def stream_recommendations(stream_request: RecommendationStreamRequest):
+    """
+    Stream recommendations as server-sent events
+
+    Emits a category event when a category starts, a tip event for each tip
+    as soon as it is complete, and a category_end event per category. The
+    final done event carries the complete recommendations; they are cached
+    and, given an assessment_id, saved to the assessment once the stream ends.
+    An error event replaces done if generation fails mid-stream.
+
+    Given an assessment_id, the recommendations are generated from the
+    assessment's stored scores and the request's scores are ignored.
+    """
+    try:
+        service = get_claude_service()
+    except Exception as e:
+        logger.error(f"Claude service unavailable: {str(e)}")
+        raise HTTPException(
+            status_code=HTTPStatusCodes.SERVICE_UNAVAILABLE,
+            detail=f"Recommendations unavailable: {str(e)}"
+        )
+
+    personality_data = None
+    if not stream_request.assessment_id:
+        if not stream_request.factor_scores:
+            raise HTTPException(
+                status_code=HTTPStatusCodes.BAD_REQUEST,
+                detail="factor_scores or assessment_id is required"
+            )
+        personality_data = {
+            "dog_info": {"breed": stream_request.breed},
+            "factor_scores": stream_request.factor_scores,
+            "bias_indicators": stream_request.bias_indicators,
+        }
+
+    async def events() -> AsyncIterator[str]:
+        try:
+            async for event in service.stream_recommendations(personality_data, stream_request.assessment_id):
+                yield format_sse(event)
+        except Exception as e:
+            logger.error(f"Error streaming recommendations: {str(e)}", exc_info=True)
+            yield format_sse({"event": "error", "message": str(e)})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.get("/{assessment_id}", response_model=APIResponse[Dict[str, Any]])
+async def get_recommendations(assessment_id: str):
+    """
+    Retrieve an assessment's current recommendations
+
+    Assessments are answered with rule-based recommendations (version 1) that
+    are replaced in the background by Claude's (version 2). Clients showing a
+    baseline poll this endpoint until pending is false. A failed upgrade keeps
+    the baseline, so clients should give up after a while.
+    """
+    try:
+        recommendations = await get_db_handler().get_recommendations_from_db(assessment_id)
+        
+        if recommendations is None:
+            raise HTTPException(
+                status_code=HTTPStatusCodes.NOT_FOUND,
+                detail=f"Assessment {assessment_id} not found"
+            )
+        
+        version = recommendations.get("version", 0)
+        return APIResponse(
+            status=APIStatus.SUCCESS,
+            message="Recommendations retrieved successfully",
+            data={
+                "assessment_id": assessment_id,
+                "recommendations": recommendations,
+                "version": version,
+                "source": recommendations.get("source"),
+                "pending": version == BASELINE_VERSION
+            },
+            timestamp=datetime.utcnow(),
+            request_id=assessment_id
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error retrieving recommendations for assessment {assessment_id}: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=HTTPStatusCodes.INTERNAL_SERVER_ERROR,
+            detail=f"Failed to retrieve recommendations: {str(e)}"
+        )
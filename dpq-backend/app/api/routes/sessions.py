@@ -0,0 +1,179 @@
+"""
+Questionnaire Session API Routes
+
+This module provides endpoints for:
+- Starting an in-progress questionnaire session
+- Recording answers one at a time (HTTP or WebSocket)
+- Provisional facet and factor scores while answering
+- Final scoring when the questionnaire is complete
+"""
+
+from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect
+from typing import Dict, Any
+import logging
+from datetime import datetime
+
+from app.models.api_models import APIResponse, APIStatus, HTTPStatusCodes
+from app.models.assessment_models import SessionAnswer, SessionAnswers
+from dpq.sessions import get_session_store
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# Create router
+router = APIRouter(prefix="/sessions", tags=["sessions"])
+
+
+def _session_response(message: str, data: Dict[str, Any]) -> APIResponse:
+    return APIResponse(
+        status=APIStatus.SUCCESS,
+        message=message,
+        data=data,
+        timestamp=datetime.utcnow(),
+        request_id=data.get("session_id")
+    )
+
+
+@router.post("", response_model=APIResponse[Dict[str, Any]])
+async def create_session():
+    """
+    Start a questionnaire session
+    
+    Returns the session ID and empty provisional scores.
+    """
+    store = get_session_store()
+    session_id = store.create()
+    return _session_response("Session created successfully", store.scores(session_id))
+
+
+@router.get("/{session_id}", response_model=APIResponse[Dict[str, Any]])
+async def get_session(session_id: str):
+    """
+    Retrieve provisional scores and progress for a session
+    """
+    try:
+        return _session_response("Session retrieved successfully", get_session_store().scores(session_id))
+    except KeyError:
+        raise HTTPException(
+            status_code=HTTPStatusCodes.NOT_FOUND,
+            detail=f"Session {session_id} not found"
+        )
+
+
+@router.put("/{session_id}/answers/{item}", response_model=APIResponse[Dict[str, Any]])
+async def record_answer(session_id: str, item: int, answer: SessionAnswer):
+    """
+    Record or change one answer
+    
+    Returns provisional facet and factor scores with the fraction answered.
+    """
+    try:
+        scores = get_session_store().answer(session_id, item, answer.value)
+        return _session_response("Answer recorded successfully", scores)
+    except KeyError:
+        raise HTTPException(
+            status_code=HTTPStatusCodes.NOT_FOUND,
+            detail=f"Session {session_id} not found"
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=HTTPStatusCodes.BAD_REQUEST,
+            detail=str(e)
+        )
+
+
+@router.post("/{session_id}/answers", response_model=APIResponse[Dict[str, Any]])
+async def record_answers(session_id: str, answers: SessionAnswers):
+    """
+    Record several answers at once (e.g. after reconnecting)
+    """
+    try:
+        scores = get_session_store().answer_many(session_id, answers.responses)
+        return _session_response("Answers recorded successfully", scores)
+    except KeyError:
+        raise HTTPException(
+            status_code=HTTPStatusCodes.NOT_FOUND,
+            detail=f"Session {session_id} not found"
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=HTTPStatusCodes.BAD_REQUEST,
+            detail=str(e)
+        )
+
+
+@router.post("/{session_id}/complete", response_model=APIResponse[Dict[str, Any]])
+async def complete_session(session_id: str):
+    """
+    Score a finished session and close it
+    
+    Returns the full scoring result (factors, facets, bias indicators and
+    profile) together with the answered responses for submission.
+    """
+    store = get_session_store()
+    try:
+        progress = store.scores(session_id)
+        if not progress["complete"]:
+            raise HTTPException(
+                status_code=HTTPStatusCodes.BAD_REQUEST,
+                detail=f"{progress['total'] - progress['answered']} questions are still unanswered"
+            )
+        responses = store.responses(session_id)
+        results = store.questionnaire.score_assessment(responses)
+        store.discard(session_id)
+        
+        return _session_response("Session completed successfully", {
+            "session_id": session_id,
+            "responses": {str(item): value for item, value in responses.items()},
+            "factor_scores": results.factor_scores,
+            "facet_scores": results.facet_scores,
+            "bias_indicators": results.bias_indicators,
+            "personality_profile": results.personality_profile
+        })
+        
+    except HTTPException:
+        raise
+    except KeyError:
+        raise HTTPException(
+            status_code=HTTPStatusCodes.NOT_FOUND,
+            detail=f"Session {session_id} not found"
+        )
+
+
+@router.delete("/{session_id}")
+async def delete_session(session_id: str):
+    """
+    Abandon a session
+    """
+    if not get_session_store().discard(session_id):
+        raise HTTPException(
+            status_code=HTTPStatusCodes.NOT_FOUND,
+            detail=f"Session {session_id} not found"
+        )
+    return {"status": "success", "message": f"Session {session_id} deleted"}
+
+
+@router.websocket("/{session_id}/ws")
+async def session_websocket(websocket: WebSocket, session_id: str):
+    """
+    Stream answers over a WebSocket
+    
+    Each message {"item": n, "value": v} is answered with the provisional
+    scores, or {"error": "..."} if it could not be recorded.
+    """
+    store = get_session_store()
+    await websocket.accept()
+    if session_id not in store:
+        await websocket.send_json({"error": f"Session {session_id} not found"})
+        await websocket.close(code=1008)
+        return
+    
+    try:
+        while True:
+            message = await websocket.receive_json()
+            try:
+                await websocket.send_json(store.answer(session_id, message["item"], message["value"]))
+            except (KeyError, TypeError, ValueError) as e:
+                await websocket.send_json({"error": str(e)})
+    except WebSocketDisconnect:
+        logger.debug(f"Session {session_id} WebSocket disconnected")
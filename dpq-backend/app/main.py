@@ -3,12 +3,19 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from fastapi.exceptions import RequestValidationError
 import uvicorn
+import asyncio
 import logging
 import sys
 import os
 from datetime import datetime
 from contextlib import asynccontextmanager
 from app.config import active_settings, get_settings
+from app.services.chart_service import shutdown_chart_service
+from app.services.llm_gateway import get_llm_gateway, shutdown_llm_gateway
+from dpq.api_handler import close_api_handler
+from dpq.db_pool import close_db_pool, start_db_pool
+from dpq.write_behind import close_write_buffer, start_write_buffer
+from app.api.middleware import ResourceAccountingMiddleware
 
 # Configure logging based on environment
 def setup_logging():
@@ -51,10 +58,33 @@ async def lifespan(app: FastAPI):
     logger.info(f"🐛 Debug mode: {active_settings.debug}")
     logger.info(f"🌐 Host: {active_settings.host}:{active_settings.port}")
     logger.info(f"🔒 CORS origins: {active_settings.cors_origins}")
+    get_llm_gateway()
+    try:
+        pool = await start_db_pool()
+        logger.info(f"🗄️ Database pool: {pool.min_size}-{pool.max_size} connections, pgbouncer mode {pool.pgbouncer}")
+    except Exception as e:
+        # Handlers fall back to a connection per request
+        logger.warning(f"Database pool unavailable, connecting per request: {e}")
+    try:
+        from dpq.api_handler import save_assessments
+        buffer = await start_write_buffer(save_assessments)
+        if buffer is not None:
+            logger.info(f"📝 Assessment write buffer: {buffer.path} ({len(buffer)} pending)")
+    except Exception as e:
+        # Assessments are saved during the request instead
+        logger.warning(f"Assessment write buffer unavailable, saving directly: {e}")
     logger.info("✅ Server startup completed")
     yield
     # Shutdown
     logger.info("🛑 Shutting down DPQ Backend Server...")
+    # Waits for running renders; keep the loop free for the other shutdown steps
+    await asyncio.to_thread(shutdown_chart_service)
+    # Upgrades in flight still need the write buffer and the pool
+    await close_api_handler()
+    await shutdown_llm_gateway()
+    # Flushed while the pool is still open
+    await close_write_buffer()
+    await close_db_pool()
     logger.info("✅ Server shutdown completed")
 
 # Create FastAPI app
@@ -67,11 +97,17 @@ app = FastAPI(
 )
 
 # Import and include API routes
-from app.api.routes import assessments_router, videos_router
+from app.api.routes import (
+    assessments_router, videos_router, admin_router, charts_router, sessions_router, recommendations_router
+)
 
 # Include API routers
 app.include_router(assessments_router, prefix="/api")
 app.include_router(videos_router, prefix="/api")
+app.include_router(admin_router, prefix="/api")
+app.include_router(charts_router, prefix="/api")
+app.include_router(sessions_router, prefix="/api")
+app.include_router(recommendations_router, prefix="/api")
 
 # Configure CORS for mobile app access
 app.add_middleware(
@@ -82,6 +118,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Account tokens, child-process CPU and database time to each request
+app.add_middleware(ResourceAccountingMiddleware)
+
 # Global exception handlers
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request: Request, exc: HTTPException):
@@ -175,3 +175,55 @@ class AssessmentResponse(BaseModel):
     metadata: Dict[str, Any] = Field(..., description="Response metadata")
     created_at: datetime = Field(..., description="When the assessment was created")
     processed_at: datetime = Field(..., description="When the assessment was processed")
+
+
+class ChartFormat(str, Enum):
+    """Rendered chart formats"""
+    PNG = "png"
+    SVG = "svg"
+
+
+class ResultChartType(str, Enum):
+    """Charts available for a single assessment"""
+    FACTOR_RADAR = "factor_radar"
+    FACTOR_BARS = "factor_bars"
+    FACET_BARS = "facet_bars"
+    BIAS_BARS = "bias_bars"
+
+
+class ChartRequest(BaseModel):
+    """Scores to chart for one assessment (keys as produced by the DPQ scorer)"""
+    factor_scores: Dict[str, float] = Field(..., description="Factor scores keyed by factor name")
+    facet_scores: Optional[Dict[str, float]] = Field(None, description="Facet scores keyed by facet name")
+    bias_indicators: Optional[Dict[str, float]] = Field(None, description="AI bias indicators keyed by name")
+
+
+class TrendChartPoint(BaseModel):
+    """One assessment in a dog's history"""
+    assessment_date: str = Field(..., description="ISO assessment date")
+    factor_scores: Dict[str, float] = Field(..., description="Factor scores keyed by factor name")
+
+
+class TrendChartRequest(BaseModel):
+    """A dog's assessment history to chart"""
+    assessments: List[TrendChartPoint] = Field(..., description="Assessments in any order", min_length=1)
+
+
+class SessionAnswer(BaseModel):
+    """One answer in an in-progress questionnaire session"""
+    value: int = Field(..., description="Rating 1-7, or 0 to clear the answer", ge=0, le=7)
+
+
+class SessionAnswers(BaseModel):
+    """Several answers in an in-progress questionnaire session"""
+    responses: Dict[int, int] = Field(..., description="DPQ responses (question_number: response_value)")
+
+
+class RecommendationStreamRequest(BaseModel):
+    """Scores to stream recommendations for (keys as produced by the DPQ scorer), or a stored assessment"""
+    assessment_id: Optional[str] = Field(None, description="Assessment whose stored scores are used and "
+                                                           "whose stored recommendations are replaced")
+    breed: Optional[str] = Field(None, description="Dog breed")
+    factor_scores: Dict[str, float] = Field(default_factory=dict,
+                                            description="Factor scores keyed by factor name (without assessment_id)")
+    bias_indicators: Dict[str, float] = Field(default_factory=dict, description="AI bias indicators keyed by name")
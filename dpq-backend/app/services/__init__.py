@@ -6,16 +6,23 @@ This package contains service classes that handle business logic for:
 - Claude API integration for recommendations
 - Video processing and frame extraction
 - Service coordination and management
+- Chart rendering and caching
+- Shared async access to the Claude API
 """
 
 from .dpq_service import DPQService
 from .claude_service import ClaudeService
 from .video_service import VideoService
 from .service_manager import ServiceManager
+from .chart_service import ChartService
+from .llm_gateway import LLMGateway, LLMGatewayError
 
 __all__ = [
     "DPQService",
     "ClaudeService", 
     "VideoService",
-    "ServiceManager"
+    "ServiceManager",
+    "ChartService",
+    "LLMGateway",
+    "LLMGatewayError"
 ]
@@ -0,0 +1,144 @@
+"""
+Chart Service - Renders DPQ charts off the event loop
+
+This service encapsulates:
+- Rendering radar, bar and trend charts in a bounded process pool
+- Caching rendered PNG/SVG bytes by a content hash of the scores
+- Coalescing concurrent requests for the same chart
+"""
+
+import os
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple, Union, Any
+
+from dpq.dpq import DPQResults
+from dpq.visualization import (
+    ChartCache, FORMATS, chart_key, render_chart,
+    results_chart_spec, trend_chart_spec_from_results
+)
+
+logger = logging.getLogger(__name__)
+
+
+class ChartService:
+    """
+    Service class for rendering DPQ charts
+    """
+    
+    def __init__(self, max_workers: Optional[int] = None, cache_dir: Optional[str] = None,
+                 executor: Optional[Executor] = None):
+        """
+        Initialize the chart service
+        
+        Args:
+            max_workers: Render processes (DPQ_CHART_WORKERS, default 2)
+            cache_dir: Rendered chart directory (DPQ_CHART_CACHE_DIR, default data/charts), trimmed to
+                DPQ_CHART_CACHE_MAX_MB (default 1024)
+            executor: Use this executor instead of creating a process pool
+        """
+        self.max_workers = max_workers or int(os.getenv("DPQ_CHART_WORKERS", "2"))
+        self.cache = ChartCache(cache_dir or os.getenv("DPQ_CHART_CACHE_DIR", os.path.join("data", "charts")),
+                                max_disk_bytes=int(os.getenv("DPQ_CHART_CACHE_MAX_MB", "1024")) * 1024 * 1024)
+        self._executor = executor
+        self._owns_executor = executor is None
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.renders = 0
+        logger.info(f"Chart Service initialized ({self.max_workers} render workers)")
+    
+    @property
+    def executor(self) -> Executor:
+        """Process pool, started on first render"""
+        if self._executor is None:
+            # spawn: never fork a process that is running an event loop and threads
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+    
+    async def render(self, spec: Dict[str, Any], fmt: str = "png") -> Tuple[bytes, str]:
+        """
+        Render a chart spec, serving repeat requests from the cache
+        
+        Args:
+            spec: Chart spec from dpq.visualization
+            fmt: "png" or "svg"
+            
+        Returns:
+            Tuple of (chart bytes, content hash usable as an ETag)
+        """
+        if fmt not in FORMATS:
+            raise ValueError(f"Unsupported chart format '{fmt}'")
+        key = chart_key(spec, fmt)
+        
+        # The cache may read the rendered file from disk
+        data = await asyncio.to_thread(self.cache.get, key, fmt)
+        if data is not None:
+            return data, key
+        
+        # Identical charts requested concurrently share one render; callers only ever await it through
+        # shield, so a cancelled request neither cancels the render nor keeps it out of the cache
+        future = self._inflight.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(self.executor, render_chart, spec, fmt)
+            self._inflight[key] = future
+            future.add_done_callback(lambda done: self._rendered(key, fmt, done))
+        return await asyncio.shield(future), key
+    
+    def _rendered(self, key: str, fmt: str, future: asyncio.Future) -> None:
+        """Cache a finished render (done-callback, on the event loop)"""
+        if future.cancelled() or future.exception() is not None:
+            self._inflight.pop(key, None)
+            return
+        self.renders += 1
+        # Requests arriving before the write lands are served by the finished future
+        write = future.get_loop().run_in_executor(None, self.cache.put, key, fmt, future.result())
+        write.add_done_callback(lambda done: self._cached(key, done))
+    
+    def _cached(self, key: str, write: asyncio.Future) -> None:
+        self._inflight.pop(key, None)
+        if not write.cancelled() and write.exception() is not None:
+            logger.warning(f"Chart {key} rendered but not cached: {write.exception()}")
+    
+    async def results_chart(self, results: Union[DPQResults, Dict[str, Any]], chart: str = "factor_radar",
+                            fmt: str = "png") -> Tuple[bytes, str]:
+        """Render a factor, facet or bias chart for one assessment"""
+        return await self.render(results_chart_spec(results, chart), fmt)
+    
+    async def trend_chart(self, results_list: List[DPQResults], fmt: str = "png") -> Tuple[bytes, str]:
+        """Render a factor trend chart for a dog's assessment history"""
+        return await self.render(trend_chart_spec_from_results(results_list), fmt)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Render and cache counters"""
+        return {"renders": self.renders, "in_flight": len(self._inflight), **self.cache.stats()}
+    
+    def shutdown(self) -> None:
+        """Stop the render processes"""
+        if self._owns_executor and self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+            logger.info("Chart Service render pool stopped")
+
+
+_chart_service: Optional[ChartService] = None
+
+
+def get_chart_service() -> ChartService:
+    """Process-wide chart service"""
+    global _chart_service
+    if _chart_service is None:
+        _chart_service = ChartService()
+    return _chart_service
+
+
+def shutdown_chart_service() -> None:
+    """Stop the process-wide chart service, if it was started"""
+    global _chart_service
+    if _chart_service is not None:
+        _chart_service.shutdown()
+        _chart_service = None
@@ -5,13 +5,14 @@ This service encapsulates the business logic for:
 - Generating personalized training recommendations
 - Analyzing dog behavior insights
 - Providing care and exercise suggestions
+- Streaming recommendations tip by tip
 - Managing Claude API interactions
 """
 
 import sys
 import os
 import logging
-from typing import Dict, List, Optional, Any
+from typing import AsyncIterator, Dict, List, Optional, Any
 import json
 import asyncio
 from datetime import datetime
@@ -19,7 +20,14 @@ from datetime import datetime
 # Add the dpq directory to the path so we can import the existing modules
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'dpq'))
 
-from dpq.claude_recommender import ClaudeRecommendationGenerator, DogPersonalityProfile
+from dpq.claude_recommender import (
+    PROMPT_VERSION, ClaudeRecommendationGenerator, DogPersonalityProfile,
+    recommendation_profile, stored_recommendations
+)
+from dpq.recommendation_cache import RecommendationCache, get_recommendation_cache
+from dpq.recommendation_rules import UPGRADED_VERSION, get_recommendation_rules
+from dpq.recommendation_stream import RecommendationStreamParser, recommendation_events
+from .llm_gateway import LLMGateway, LLMGatewayError, get_llm_gateway
 
 logger = logging.getLogger(__name__)
 
@@ -29,15 +37,23 @@ class ClaudeService:
     Service class for handling Claude API operations and recommendations
     """
     
-    def __init__(self, api_key: str = None):
+    def __init__(self, api_key: str = None, gateway: Optional[LLMGateway] = None,
+                 cache: Optional[RecommendationCache] = None, db_handler=None):
         """
         Initialize the Claude service
         
         Args:
             api_key: Anthropic API key. If None, will try to get from environment
+            gateway: Async gateway for Claude calls. Defaults to the shared gateway.
+            cache: Recommendation cache. Defaults to the shared cache for the current prompt version.
+            db_handler: Object with get_assessment_personality() and save_recommendations_to_db().
+                Defaults to a DPQAPIHandler created on first use.
         """
         try:
-            self.claude_generator = ClaudeRecommendationGenerator(api_key=api_key)
+            self.gateway = gateway or get_llm_gateway()
+            self.cache = cache
+            self.db_handler = db_handler
+            self.claude_generator = ClaudeRecommendationGenerator(api_key=api_key, gateway=self.gateway)
             logger.info("Claude Service initialized successfully")
         except Exception as e:
             logger.error(f"Failed to initialize Claude Service: {str(e)}")
@@ -83,6 +99,76 @@ class ClaudeService:
             # Return fallback recommendations
             return await self._get_fallback_recommendations(personality_data)
     
+    async def stream_recommendations(self, personality_data: Optional[Dict[str, Any]],
+                                     assessment_id: Optional[str] = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Stream recommendations for a dog's normalized profile
+        
+        A cached profile is replayed at once. Otherwise Claude's response is
+        parsed as it streams, so each tip is yielded as soon as its closing
+        quote arrives. The cache and database are written after the stream ends.
+        
+        Args:
+            personality_data: Dictionary containing DPQ results and dog information
+                (not used given an assessment_id)
+            assessment_id: Assessment whose stored recommendations are replaced; they
+                are generated from its stored factor scores and bias indicators
+            
+        Yields:
+            category, tip and category_end events, then one done event with the
+            complete recommendations, or an error event
+        """
+        if assessment_id:
+            # Only the assessment's own scores may produce the recommendations saved to it
+            personality_data = await self.get_db_handler().get_assessment_personality(assessment_id)
+            if personality_data is None:
+                yield {"event": "error", "message": f"Assessment {assessment_id} not found"}
+                return
+        
+        cache = self.cache or get_recommendation_cache(PROMPT_VERSION)
+        profile = recommendation_profile(personality_data)
+        key = cache.key(profile)
+        recommendations = await cache.aget(key)
+        cached = recommendations is not None
+        
+        if cached:
+            for event in recommendation_events(recommendations):
+                yield event
+        else:
+            parser = RecommendationStreamParser()
+            try:
+                prompt = self.claude_generator.create_profile_prompt(profile)
+                async for text in self.gateway.stream_recommend(prompt):
+                    for event in parser.feed(text):
+                        yield event
+            except LLMGatewayError as e:
+                logger.error(f"Error streaming recommendations: {str(e)}")
+                yield {"event": "error", "message": str(e)}
+                return
+            if not parser.complete:
+                logger.error("Recommendation stream ended before the JSON object was complete")
+                yield {"event": "error", "message": "Incomplete recommendations response"}
+                return
+            recommendations = parser.result()
+            await cache.aput(key, recommendations)
+        
+        saved = None
+        if assessment_id:
+            saved = await self.get_db_handler().save_recommendations_to_db(assessment_id, {
+                **stored_recommendations(recommendations), "version": UPGRADED_VERSION, "source": "claude"
+            })
+            if not saved:
+                logger.warning(f"Recommendations for assessment {assessment_id} were not saved")
+        
+        yield {"event": "done", "recommendations": recommendations, "cached": cached, "saved": saved}
+    
+    def get_db_handler(self):
+        """Database handler, created on first use"""
+        if self.db_handler is None:
+            from dpq.api_handler import DPQAPIHandler
+            self.db_handler = DPQAPIHandler()
+        return self.db_handler
+    
     async def _call_claude_api(self, personality_data: Dict[str, Any]) -> Dict[str, Any]:
         """
         Call Claude API to generate recommendations
@@ -94,8 +180,8 @@ class ClaudeService:
             Claude API response with recommendations
         """
         try:
-            # Use the existing Claude generator
-            recommendations = self.claude_generator.generate_recommendations(personality_data)
+            # Use the existing Claude generator through the shared async gateway
+            recommendations = await self.claude_generator.agenerate_recommendations(personality_data)
             
             # Ensure the response is properly formatted
             if not isinstance(recommendations, dict):
@@ -180,11 +266,25 @@ class ClaudeService:
             personality_data: Original personality data
             
         Returns:
-            Basic fallback recommendations
+            Rule-based recommendations for the dog's scores, or basic ones without scores
         """
         try:
             dog_name = personality_data.get('dog_info', {}).get('name', 'your dog')
             
+            if personality_data.get('factor_scores'):
+                recommendations = get_recommendation_rules().recommend(
+                    personality_data['factor_scores'],
+                    personality_data.get('bias_indicators', {})
+                )
+                recommendations["metadata"] = {
+                    "generated_at": datetime.now().isoformat(),
+                    "model": "rules",
+                    "note": "Rule-based recommendations from the DPQ results. For AI-personalized advice, please try again later.",
+                    "dog_name": dog_name
+                }
+                logger.info(f"Rule-based fallback recommendations generated for dog: {dog_name}")
+                return recommendations
+            
             fallback_recommendations = {
                 "training_tips": [
                     "Start with basic obedience training using positive reinforcement",
@@ -278,7 +378,8 @@ class ClaudeService:
             return {
                 "service": "Claude Service",
                 "status": "active",
-                "api_available": True,
+                "api_available": self.gateway.available,
+                "gateway": self.gateway.get_stats(),
                 "last_check": datetime.now().isoformat(),
                 "features": [
                     "Personalized training recommendations",
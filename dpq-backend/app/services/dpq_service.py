@@ -12,6 +12,7 @@ import sys
 import os
 import logging
 from typing import Dict, List, Tuple, Optional, Any
+from dataclasses import asdict
 from datetime import datetime
 import json
 
@@ -19,6 +20,7 @@ import json
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'dpq'))
 
 from dpq.dpq import DogPersonalityQuestionnaire, DPQResults
+from dpq.recommendation_rules import get_recommendation_rules
 from dpq.response_formatter import DPQResponseFormatter
 
 logger = logging.getLogger(__name__)
@@ -32,7 +34,8 @@ class DPQService:
     def __init__(self):
         """Initialize the DPQ service"""
         self.dpq_analyzer = DogPersonalityQuestionnaire()
-        self.response_formatter = DPQResponseFormatter()
+        # Claude recommendations come from ClaudeService; formatting only adds the rule-based baseline
+        self.response_formatter = DPQResponseFormatter(recommendation_rules=get_recommendation_rules())
         logger.info("DPQ Service initialized")
     
     async def process_assessment(self, assessment_data: Dict[str, Any]) -> Dict[str, Any]:
@@ -48,27 +51,41 @@ class DPQService:
         try:
             logger.info(f"Processing assessment for dog: {assessment_data.get('dog_name', 'Unknown')}")
             
-            # Extract the questionnaire responses
-            responses = assessment_data.get('responses', {})
-            dog_info = assessment_data.get('dog_info', {})
+            results = await self.score_assessment(assessment_data)
+            formatted_results = await self._format_results(results, assessment_data.get('dog_info', {}))
             
-            # Validate responses
-            if not self._validate_responses(responses):
-                raise ValueError("Invalid response format or missing required responses")
-            
-            # Process the assessment using the existing DPQ logic
-            results = await self._analyze_personality(responses, dog_info)
-            
-            # Format the response
-            formatted_results = await self._format_results(results, dog_info)
-            
-            logger.info(f"Assessment processed successfully for dog: {dog_info.get('name', 'Unknown')}")
+            logger.info(f"Assessment processed successfully for dog: {assessment_data.get('dog_info', {}).get('name', 'Unknown')}")
             return formatted_results
             
         except Exception as e:
             logger.error(f"Error processing assessment: {str(e)}")
             raise
     
+    async def score_assessment(self, assessment_data: Dict[str, Any]) -> DPQResults:
+        """
+        Validate and score an assessment's responses
+        
+        Args:
+            assessment_data: Dictionary containing assessment information and responses
+            
+        Returns:
+            DPQResults object containing analysis results
+        """
+        # Extract the questionnaire responses
+        responses = assessment_data.get('responses', {})
+        dog_info = assessment_data.get('dog_info', {})
+        
+        # Validate responses
+        if not self._validate_responses(responses):
+            raise ValueError("Invalid response format or missing required responses")
+        
+        # Process the assessment using the existing DPQ logic
+        return await self._analyze_personality(responses, dog_info)
+    
+    async def format_results(self, results: DPQResults, dog_info: Dict[str, Any]) -> Dict[str, Any]:
+        """Format scored results for the API response"""
+        return await self._format_results(results, dog_info)
+    
     async def _analyze_personality(self, responses: Dict[int, int], dog_info: Dict[str, Any]) -> DPQResults:
         """
         Analyze personality using the existing DPQ logic
@@ -90,11 +107,8 @@ class DPQService:
                 processed_responses[q_num] = response
             
             # Use the existing DPQ analysis logic
-            results = self.dpq_analyzer.analyze_responses(processed_responses)
-            
-            # Add dog information to results
-            results.dog_id = dog_info.get('id', f"dog_{datetime.now().timestamp()}")
-            results.assessment_date = datetime.now().isoformat()
+            results = self.dpq_analyzer.score_assessment(
+                processed_responses, dog_id=dog_info.get('id', f"dog_{datetime.now().timestamp()}"))
             
             return results
             
@@ -116,7 +130,7 @@ class DPQService:
         try:
             # Use the existing response formatter
             formatted = self.response_formatter.format_assessment_response(
-                dpq_results=results,
+                dpq_results=asdict(results),
                 dog_info=dog_info,
                 user_id="test_user",
                 assessment_metadata={
@@ -0,0 +1,328 @@
+"""
+LLM Gateway - Shared async access to the Claude API
+
+This module provides:
+- One pooled AsyncAnthropic client per worker, created at app startup
+- Typed recommend() and analyze_frames() coroutines
+- Streaming recommendations as text deltas
+- Per-call timeouts and per-operation concurrency limits
+- Coalescing of identical in-flight calls
+- Circuit breaking, budgeted jittered retries and optional hedging of recommend() calls
+- Call, error, latency and coalescing counters
+- Token usage of each call, added to the current request's resource usage
+"""
+
+import os
+import json
+import time
+import asyncio
+import logging
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import anthropic
+import httpx
+
+from dpq.claude_recommender import extract_recommendations, recommendation_request
+from dpq.resilience import CircuitOpenError, QueueTimeoutError, Resilience, get_resilience, is_transient
+from dpq.resource_accounting import record_llm_usage
+from dpq.single_flight import get_single_flight, request_key
+from jobs.dog_behavior_analyzer import behavior_request, load_frame_images, parse_behavior_response
+
+logger = logging.getLogger(__name__)
+
+OPERATIONS = ("recommend", "analyze_frames")
+
+
+class LLMGatewayError(Exception):
+    """A Claude call failed, timed out or returned unusable output"""
+
+
+class LLMGateway:
+    """
+    Async gateway that every Claude call site goes through
+
+    Calls never block the event loop. Each operation has its own semaphore,
+    so a burst of slow vision requests cannot starve recommendations, and a
+    timeout that covers both queueing and the API call (only the call itself
+    counts for or against the circuit breaker). Identical requests
+    already in flight are awaited rather than sent again. While Claude keeps
+    failing, each operation's circuit breaker rejects calls at once so callers
+    go straight to their fallbacks.
+    """
+
+    def __init__(self, api_key: Optional[str] = None, client: Optional[anthropic.AsyncAnthropic] = None,
+                 recommend_concurrency: Optional[int] = None, vision_concurrency: Optional[int] = None,
+                 recommend_timeout: Optional[float] = None, vision_timeout: Optional[float] = None,
+                 max_connections: int = 32, hedge_after: Optional[float] = None,
+                 resilience: Optional[Dict[str, Resilience]] = None):
+        """
+        Initialize the gateway
+
+        Args:
+            api_key: Anthropic API key. If None, will try to get from environment
+            client: Use this async client instead of creating one
+            recommend_concurrency: Concurrent recommend() calls (DPQ_LLM_CONCURRENCY, default 8)
+            vision_concurrency: Concurrent analyze_frames() calls (DPQ_LLM_VISION_CONCURRENCY, default 2)
+            recommend_timeout: Seconds per recommend() call (DPQ_LLM_TIMEOUT, default 60)
+            vision_timeout: Seconds per analyze_frames() call (DPQ_LLM_VISION_TIMEOUT, default 180)
+            max_connections: HTTP connection pool size
+            hedge_after: Seconds after which a slow recommend() call is hedged with a
+                second request (DPQ_LLM_HEDGE_AFTER, default off)
+            resilience: Breaker and retry policy per operation. Defaults to the
+                process-wide ones from dpq.resilience, shared with the sync clients.
+        """
+        self.api_key = api_key or os.getenv('ANTHROPIC_API_KEY')
+        if client is None and self.api_key:
+            client = anthropic.AsyncAnthropic(
+                api_key=self.api_key,
+                # Retries are budgeted by the resilience layer instead
+                max_retries=0,
+                http_client=anthropic.DefaultAsyncHttpxClient(
+                    limits=httpx.Limits(max_connections=max_connections,
+                                        max_keepalive_connections=max_connections)
+                )
+            )
+        self.client = client
+
+        self.concurrency = {
+            "recommend": recommend_concurrency or int(os.getenv("DPQ_LLM_CONCURRENCY", "8")),
+            "analyze_frames": vision_concurrency or int(os.getenv("DPQ_LLM_VISION_CONCURRENCY", "2")),
+        }
+        self.timeouts = {
+            "recommend": recommend_timeout or float(os.getenv("DPQ_LLM_TIMEOUT", "60")),
+            "analyze_frames": vision_timeout or float(os.getenv("DPQ_LLM_VISION_TIMEOUT", "180")),
+        }
+        if hedge_after is None and os.getenv("DPQ_LLM_HEDGE_AFTER"):
+            hedge_after = float(os.getenv("DPQ_LLM_HEDGE_AFTER"))
+        self.hedge_delays = {"recommend": hedge_after, "analyze_frames": None}
+        self._limits = {operation: asyncio.Semaphore(limit) for operation, limit in self.concurrency.items()}
+        self._resilience = resilience or {operation: get_resilience(operation) for operation in OPERATIONS}
+        self._stats = {
+            operation: {"calls": 0, "errors": 0, "timeouts": 0, "queue_timeouts": 0, "rejected": 0, "in_flight": 0,
+                        "total_seconds": 0.0}
+            for operation in OPERATIONS
+        }
+
+        if self.client is None:
+            logger.warning("LLM Gateway has no ANTHROPIC_API_KEY; Claude calls will fail over to fallbacks")
+        else:
+            logger.info(f"LLM Gateway initialized (concurrency {self.concurrency})")
+
+    @property
+    def available(self) -> bool:
+        """Whether a client is configured"""
+        return self.client is not None
+
+    async def recommend(self, user_prompt: str, timeout: Optional[float] = None) -> Dict[str, List[str]]:
+        """
+        Generate recommendations for a prompt from dpq.claude_recommender
+
+        Args:
+            user_prompt: Recommendation prompt
+            timeout: Override the per-call timeout in seconds
+
+        Returns:
+            Dictionary with training_tips, exercise_needs, socialization,
+            daily_care and ai_communication lists
+
+        Raises:
+            LLMGatewayError: On API errors, timeouts or unparseable responses
+        """
+        request = recommendation_request(user_prompt)
+        message = await get_single_flight("recommend").ado(
+            request_key(request), lambda: self._create("recommend", timeout, request))
+        try:
+            return extract_recommendations(message.content[0].text)
+        except Exception as e:
+            self._stats["recommend"]["errors"] += 1
+            raise LLMGatewayError(f"Unparseable recommendation response: {e}") from e
+
+    async def stream_recommend(self, user_prompt: str, timeout: Optional[float] = None) -> AsyncIterator[str]:
+        """
+        Stream the response to a recommendation prompt as text deltas
+
+        Streams count against the recommend concurrency limit, timeout and
+        circuit breaker but are not coalesced, retried or hedged, since text
+        may already have been passed on.
+
+        Args:
+            user_prompt: Recommendation prompt
+            timeout: Override the per-call timeout in seconds (covers the whole stream)
+
+        Yields:
+            Text deltas of Claude's response
+
+        Raises:
+            LLMGatewayError: On API errors or timeouts
+        """
+        if self.client is None:
+            raise LLMGatewayError("Claude API key required. Set ANTHROPIC_API_KEY environment variable.")
+        counters = self._stats["recommend"]
+        breaker = self._resilience["recommend"].breaker
+        timeout = timeout or self.timeouts["recommend"]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        start = time.perf_counter()
+        counters["calls"] += 1
+        limit = self._limits["recommend"]
+        try:
+            breaker.allow()
+        except CircuitOpenError as e:
+            counters["rejected"] += 1
+            raise LLMGatewayError(str(e)) from e
+        try:
+            await asyncio.wait_for(limit.acquire(), timeout)
+        except asyncio.TimeoutError as e:
+            # Queued behind local calls: nothing to hold against Claude
+            breaker.record_cancelled()
+            counters["queue_timeouts"] += 1
+            counters["total_seconds"] += time.perf_counter() - start
+            raise LLMGatewayError(f"Claude recommend stream waited {timeout:.0f}s for a free slot") from e
+        except BaseException:
+            breaker.record_cancelled()
+            raise
+        outcome = None
+        try:
+            counters["in_flight"] += 1
+            try:
+                async with self.client.messages.stream(**recommendation_request(user_prompt)) as stream:
+                    deltas = stream.text_stream.__aiter__()
+                    while True:
+                        try:
+                            text = await asyncio.wait_for(deltas.__anext__(), max(deadline - loop.time(), 0))
+                        except StopAsyncIteration:
+                            break
+                        yield text
+                    record_llm_usage((await stream.get_final_message()).usage)
+                outcome = breaker.record_success
+            finally:
+                counters["in_flight"] -= 1
+                limit.release()
+        except asyncio.TimeoutError as e:
+            counters["timeouts"] += 1
+            outcome = breaker.record_failure
+            raise LLMGatewayError(f"Claude recommend stream timed out after {timeout:.0f}s") from e
+        except Exception as e:
+            counters["errors"] += 1
+            outcome = breaker.record_failure if is_transient(e) else breaker.record_success
+            raise LLMGatewayError(f"Claude API error: {str(e)}") from e
+        finally:
+            # A stream abandoned by its consumer has no outcome
+            (outcome or breaker.record_cancelled)()
+            counters["total_seconds"] += time.perf_counter() - start
+
+    async def analyze_frames(self, frames_dir: str, timeout: Optional[float] = None,
+                             content_hash: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Behavior analysis of extracted video frames
+
+        Args:
+            frames_dir: Directory of frame_<seconds>.jpg files
+            timeout: Override the per-call timeout in seconds
+            content_hash: Hash of the source video. Concurrent analyses with the
+                same hash share one call. Defaults to a hash of the frames.
+
+        Returns:
+            Parsed behavior analysis with emotion dimensions
+
+        Raises:
+            LLMGatewayError: On missing frames, API errors, timeouts or unparseable responses
+        """
+        images = await asyncio.to_thread(load_frame_images, frames_dir)
+        if not images:
+            raise LLMGatewayError("No frames found for analysis")
+        logger.info(f"Sending {len(images)} frames to Claude for behavior analysis")
+
+        request = behavior_request(images)
+        message = await get_single_flight("analyze_frames").ado(
+            content_hash or request_key(request), lambda: self._create("analyze_frames", timeout, request))
+        try:
+            return parse_behavior_response(message.content[0].text)
+        except json.JSONDecodeError as e:
+            self._stats["analyze_frames"]["errors"] += 1
+            raise LLMGatewayError(f"Failed to parse JSON response: {str(e)}") from e
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Per-operation call counters and mean latency"""
+        stats = {}
+        for operation, counters in self._stats.items():
+            calls = counters["calls"]
+            coalescing = get_single_flight(operation).stats()
+            stats[operation] = {
+                **{key: value for key, value in counters.items() if key != "total_seconds"},
+                "concurrency": self.concurrency[operation],
+                "timeout_seconds": self.timeouts[operation],
+                "mean_seconds": round(counters["total_seconds"] / calls, 3) if calls else None,
+                "coalesced": coalescing["coalesced"],
+                "coalescing_rate": coalescing["coalescing_rate"],
+                "hedge_after_seconds": self.hedge_delays[operation],
+                "circuit": self._resilience[operation].stats(),
+            }
+        return {
+            "available": self.available,
+            "operations": stats,
+            "retry_budget": self._resilience["recommend"].budget.stats(),
+        }
+
+    async def close(self) -> None:
+        """Close the HTTP connection pool"""
+        if self.client is not None:
+            await self.client.close()
+
+    async def _create(self, operation: str, timeout: Optional[float], request: Dict[str, Any]):
+        """messages.create under the operation's concurrency limit, timeout and resilience policy"""
+        if self.client is None:
+            raise LLMGatewayError("Claude API key required. Set ANTHROPIC_API_KEY environment variable.")
+        counters = self._stats[operation]
+        timeout = timeout or self.timeouts[operation]
+        start = time.perf_counter()
+        counters["calls"] += 1
+
+        async def attempt():
+            # Run under the operation's semaphore, which the resilience policy takes outside the attempt
+            counters["in_flight"] += 1
+            try:
+                message = await self.client.messages.create(**request)
+            finally:
+                counters["in_flight"] -= 1
+            if hasattr(message, 'usage'):
+                logger.info(f"Claude {operation} token usage: {message.usage}")
+                record_llm_usage(message.usage)
+            return message
+
+        try:
+            return await self._resilience[operation].acall(attempt, timeout, self.hedge_delays[operation],
+                                                           limit=self._limits[operation])
+        except CircuitOpenError as e:
+            counters["rejected"] += 1
+            raise LLMGatewayError(str(e)) from e
+        except QueueTimeoutError as e:
+            counters["queue_timeouts"] += 1
+            raise LLMGatewayError(f"Claude {operation} call waited {timeout:.0f}s for a free slot") from e
+        except asyncio.TimeoutError as e:
+            counters["timeouts"] += 1
+            raise LLMGatewayError(f"Claude {operation} call timed out after {timeout:.0f}s") from e
+        except Exception as e:
+            counters["errors"] += 1
+            raise LLMGatewayError(f"Claude API error: {str(e)}") from e
+        finally:
+            counters["total_seconds"] += time.perf_counter() - start
+
+
+_llm_gateway: Optional[LLMGateway] = None
+
+
+def get_llm_gateway() -> LLMGateway:
+    """Process-wide gateway (created by the app lifespan, or on first use)"""
+    global _llm_gateway
+    if _llm_gateway is None:
+        _llm_gateway = LLMGateway()
+    return _llm_gateway
+
+
+async def shutdown_llm_gateway() -> None:
+    """Close the process-wide gateway, if it was started"""
+    global _llm_gateway
+    if _llm_gateway is not None:
+        await _llm_gateway.close()
+        _llm_gateway = None
@@ -13,6 +13,7 @@ import asyncio
 from typing import Dict, List, Optional, Any
 from datetime import datetime
 
+from dpq.pipeline import Stage, StageGraph
 from .dpq_service import DPQService
 from .claude_service import ClaudeService
 from .video_service import VideoService
@@ -30,6 +31,7 @@ class ServiceManager:
         self.services = {}
         self.service_status = {}
         self.initialized = False
+        self.assessment_pipeline = self._assessment_pipeline()
         
         try:
             self._initialize_services()
@@ -58,6 +60,28 @@ class ServiceManager:
             logger.error(f"Error initializing services: {str(e)}")
             raise
     
+    def _assessment_pipeline(self) -> StageGraph:
+        """
+        Stages of process_complete_assessment
+        
+        Scoring runs once; formatting and the Claude recommendations both
+        start from the scores and run concurrently. Services are looked up
+        per run so restart_service takes effect.
+        """
+        return StageGraph([
+            Stage("scores", lambda assessment_data: self.services['dpq'].score_assessment(assessment_data),
+                  after=("assessment_data",)),
+            Stage("ai_recommendations", lambda scores, assessment_data: self.services['claude'].generate_recommendations({
+                      'dog_info': assessment_data.get('dog_info', {}),
+                      'factor_scores': scores.factor_scores,
+                      'facet_scores': scores.facet_scores,
+                      'personality_profile': scores.personality_profile,
+                      'bias_indicators': scores.bias_indicators,
+                  }), after=("scores", "assessment_data")),
+            Stage("dpq_results", lambda scores, assessment_data: self.services['dpq'].format_results(
+                      scores, assessment_data.get('dog_info', {})), after=("scores", "assessment_data")),
+        ], inputs=("assessment_data",))
+    
     async def process_complete_assessment(self, assessment_data: Dict[str, Any]) -> Dict[str, Any]:
         """
         Process a complete assessment including personality analysis and recommendations
@@ -74,13 +98,12 @@ class ServiceManager:
             
             logger.info(f"Processing complete assessment for dog: {assessment_data.get('dog_info', {}).get('name', 'Unknown')}")
             
-            # Step 1: Process DPQ assessment
-            dpq_results = await self.services['dpq'].process_assessment(assessment_data)
-            
-            # Step 2: Generate AI recommendations
-            recommendations = await self.services['claude'].generate_recommendations(dpq_results)
+            # Score once, then format and generate AI recommendations concurrently
+            outputs = await self.assessment_pipeline.run(assessment_data=assessment_data)
+            dpq_results = outputs['dpq_results']
+            recommendations = outputs['ai_recommendations']
             
-            # Step 3: Combine results
+            # Combine results
             complete_results = {
                 "assessment_id": f"assessment_{datetime.now().timestamp()}",
                 "status": "completed",
@@ -6,6 +6,7 @@ This service encapsulates the business logic for:
 - Frame extraction using FFmpeg
 - Behavior analysis from video frames
 - Video processing pipeline management
+- Accounting of ffmpeg/ffprobe CPU time and per-stage wall time
 """
 
 import sys
@@ -17,13 +18,15 @@ import shutil
 from typing import Dict, List, Optional, Any, Tuple
 from datetime import datetime
 import json
+import hashlib
 from pathlib import Path
 
 # Add the jobs directory to the path so we can import the existing modules
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'jobs'))
 
 from jobs.extract_diff_frames import extract_diff_frames_ffmpeg
-from jobs.dog_behavior_analyzer import analyze_frames_with_claude
+from dpq.resource_accounting import current_usage, run_process, stage
+from .llm_gateway import get_llm_gateway
 from jobs.emotion_mapper import add_emotion_dimensions
 
 logger = logging.getLogger(__name__)
@@ -87,15 +90,21 @@ class VideoService:
                 raise ValueError("Invalid video file format or corrupted file")
             
             # Extract frames from video
-            frames_dir = await self._extract_frames(video_file_path)
+            with stage("extract_frames"):
+                frames_dir = await self._extract_frames(video_file_path)
             
-            # Analyze frames for behavior
-            behavior_analysis = await self._analyze_behavior(frames_dir, dog_info)
+            # Analyze frames for behavior (concurrent uploads of the same video share one analysis)
+            with stage("hash_video"):
+                content_hash = await asyncio.to_thread(self._hash_video_file, video_file_path)
+            with stage("analyze_behavior"):
+                behavior_analysis = await self._analyze_behavior(frames_dir, dog_info, content_hash)
             
             # Clean up temporary files
             await self._cleanup_temp_files(frames_dir)
             
             # Prepare results
+            with stage("probe_duration"):
+                video_duration = await self._get_video_duration(video_file_path)
             results = {
                 "processing_status": "completed",
                 "dog_info": dog_info,
@@ -103,10 +112,15 @@ class VideoService:
                 "metadata": {
                     "processed_at": datetime.now().isoformat(),
                     "frames_extracted": len(os.listdir(frames_dir)) if frames_dir and os.path.exists(frames_dir) else 0,
-                    "video_duration": await self._get_video_duration(video_file_path)
+                    "video_duration": video_duration
                 }
             }
             
+            # Tokens, ffmpeg CPU and stage timings of the request so far
+            usage = current_usage()
+            if usage is not None:
+                results["metadata"]["resource_usage"] = usage.summary()
+            
             logger.info(f"Video processing completed successfully for dog: {dog_info.get('name', 'Unknown')}")
             return results
             
@@ -138,7 +152,8 @@ class VideoService:
                 video_path=video_file_path,
                 output_dir=frames_dir,
                 threshold=0.10,
-                ffmpeg_path=self.ffmpeg_path
+                ffmpeg_path=self.ffmpeg_path,
+                run=run_process
             )
             
             # Verify frames were extracted
@@ -153,13 +168,15 @@ class VideoService:
             logger.error(f"Error extracting frames: {str(e)}")
             raise
     
-    async def _analyze_behavior(self, frames_dir: str, dog_info: Dict[str, Any]) -> Dict[str, Any]:
+    async def _analyze_behavior(self, frames_dir: str, dog_info: Dict[str, Any],
+                                content_hash: Optional[str] = None) -> Dict[str, Any]:
         """
         Analyze behavior from extracted frames using Claude API
         
         Args:
             frames_dir: Directory containing extracted frames
             dog_info: Dictionary containing dog information
+            content_hash: Hash of the source video, used to coalesce identical analyses
             
         Returns:
             Dictionary containing behavior analysis results
@@ -167,20 +184,14 @@ class VideoService:
         try:
             logger.info(f"Analyzing behavior from frames in: {frames_dir}")
             
-            # Import anthropic client for behavior analysis
-            import anthropic
-            
-            # Get API key from environment
-            api_key = os.getenv('ANTHROPIC_API_KEY')
-            if not api_key:
+            # Shared async Claude client
+            gateway = get_llm_gateway()
+            if not gateway.available:
                 logger.warning("ANTHROPIC_API_KEY not found, using fallback analysis")
                 return await self._get_fallback_behavior_analysis(dog_info)
             
-            # Create Anthropic client
-            client = anthropic.Anthropic(api_key=api_key)
-            
             # Use the existing behavior analysis logic
-            analysis_results = await analyze_frames_with_claude(frames_dir, client)
+            analysis_results = await gateway.analyze_frames(frames_dir, content_hash=content_hash)
             
             # Add emotion dimensions if available
             try:
@@ -272,6 +283,22 @@ class VideoService:
             logger.error(f"Error validating video file: {str(e)}")
             return False
     
+    def _hash_video_file(self, video_file_path: str) -> str:
+        """
+        SHA-256 of the video file contents
+        
+        Args:
+            video_file_path: Path to the video file
+            
+        Returns:
+            Hex digest
+        """
+        digest = hashlib.sha256()
+        with open(video_file_path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+        return digest.hexdigest()
+    
     async def _get_video_duration(self, video_file_path: str) -> Optional[float]:
         """
         Get the duration of a video file
@@ -290,8 +317,6 @@ class VideoService:
                 logger.warning("FFprobe not found, cannot determine video duration")
                 return None
             
-            import subprocess
-            
             cmd = [
                 ffprobe_path,
                 '-v', 'quiet',
@@ -300,7 +325,7 @@ class VideoService:
                 video_file_path
             ]
             
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
+            result = run_process(cmd, capture_output=True, text=True, timeout=30)
             
             if result.returncode == 0:
                 duration = float(result.stdout.strip())
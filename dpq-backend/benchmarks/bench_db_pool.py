@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the shared database pool
+
+Saves synthetic assessments with DPQAPIHandler.save_assessment_to_db, first
+opening a connection per save (no pool started) and then through the pool
+the app lifespan starts, and reports saves per second and save latency.
+Connects with the DB_* environment variables; the rows are deleted
+afterwards.
+
+Usage:
+    python benchmarks/bench_db_pool.py [--saves 500] [--concurrency 20] [--min-size 2] [--max-size 10]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+import uuid
+from datetime import date
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from dpq.api_handler import DPQAPIHandler
+from dpq.db_pool import close_db_pool, get_db_pool, start_db_pool
+
+
+def assessment(user_id: str) -> dict:
+    return {
+        'assessment_id': str(uuid.uuid4()),
+        'dog_id': str(uuid.uuid4()),
+        'user_id': user_id,
+        'dog_info': {'name': 'BenchDog', 'breed': 'Border Collie', 'birthday': date(2020, 1, 1)},
+        'responses': {str(i): 4 for i in range(1, 46)},
+        'personality_factors': {'fearfulness': {'score': 4.0, 'level': 'Moderate'}},
+        'ai_bias_indicators': {'excitability_bias': 0.7, 'fearfulness_bias': 0.4, 'trainability_bias': 0.8},
+        'personality_summary': {'primary_type': 'High-Energy Companion'},
+        'ai_translator_config': {'communication_style': 'energetic_friendly'},
+        'recommendations': {'training_tips': ['Use positive reinforcement']},
+        'quality_metrics': {'reliability_score': 0.94, 'response_consistency': 'high',
+                            'extreme_response_bias': False, 'all_questions_answered': True},
+        'metadata': {'assessment_version': 'DPQ_Short_Form_v1.0', 'scoring_algorithm': 'Jones_2009_validated'},
+    }
+
+
+async def run_saves(handler: DPQAPIHandler, user_id: str, saves: int, concurrency: int):
+    """Saves per second and sorted per-save latencies"""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def save():
+        async with semaphore:
+            start = time.perf_counter()
+            if not await handler.save_assessment_to_db(assessment(user_id)):
+                raise RuntimeError("Assessment save failed")
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(save() for _ in range(saves)))
+    return saves / (time.perf_counter() - start), sorted(latencies)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Benchmark pooled against per-save database connections")
+    parser.add_argument("--saves", type=int, default=500, help="Assessments saved per mode")
+    parser.add_argument("--concurrency", type=int, default=20, help="Saves in flight at once")
+    parser.add_argument("--min-size", type=int, default=2, help="DPQ_DB_POOL_MIN")
+    parser.add_argument("--max-size", type=int, default=10, help="DPQ_DB_POOL_MAX")
+    args = parser.parse_args()
+    os.environ["DPQ_DB_POOL_MIN"] = str(args.min_size)
+    os.environ["DPQ_DB_POOL_MAX"] = str(args.max_size)
+
+    handler = DPQAPIHandler()
+    user_id = str(uuid.uuid4())
+    async with handler.db_connection() as conn:
+        await conn.execute("INSERT INTO users (user_id, email, password) VALUES ($1::uuid, $2, $3)",
+                           user_id, f"bench_{user_id}@example.com", "bench_password_hash")
+    try:
+        for mode in ("connect", "pool"):
+            if mode == "pool":
+                await start_db_pool()
+            rate, latencies = await run_saves(handler, user_id, args.saves, args.concurrency)
+            p50, p95 = latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.95)]
+            print(f"{mode:<8} {rate:8.1f} saves/s   p50 {p50 * 1e3:7.1f} ms   p95 {p95 * 1e3:7.1f} ms")
+        stats = get_db_pool().stats()
+        print(f"pool     {stats['size']} connections, pgbouncer mode {stats['pgbouncer']}, "
+              f"mean acquire wait {stats['mean_wait_seconds'] * 1e3:.2f} ms, "
+              f"max {stats['max_wait_seconds'] * 1e3:.2f} ms")
+    finally:
+        async with handler.db_connection() as conn:
+            await conn.execute("UPDATE dogs SET current_dpq_assessment_id = NULL WHERE user_id = $1::uuid", user_id)
+            await conn.execute("DELETE FROM dpq_assessments WHERE user_id = $1::uuid", user_id)
+            await conn.execute("DELETE FROM dogs WHERE user_id = $1::uuid", user_id)
+            await conn.execute("DELETE FROM users WHERE user_id = $1::uuid", user_id)
+        await close_db_pool()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
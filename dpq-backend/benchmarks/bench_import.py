@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the bulk questionnaire import
+
+Writes a synthetic CSV dataset and imports it with jobs/import_assessments.py,
+reporting rows per second for reading, validating, scoring and formatting
+(and loading, with --database, which uses the DB_* environment variables
+and the owner given by --user-id).
+
+A dry run handles about 15k rows/s on one core. The --database figure
+depends on the server and has to be measured against a Postgres with the
+schema applied and an existing user owning the dogs; no such number has
+been recorded yet.
+
+Usage:
+    python benchmarks/bench_import.py [--rows 100000] [--chunk-size 10000] [--database --user-id <uuid>]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from jobs.import_assessments import AssessmentImport, DryRunTarget, PostgresImportTarget, read_chunks
+
+
+def write_dataset(path: str, rows: int) -> None:
+    rng = np.random.default_rng(0)
+    latent = rng.normal(4, 1.3, size=(rows, 5))
+    ratings = np.clip(np.rint(latent[:, rng.integers(0, 5, 45)] + rng.normal(0, 1, size=(rows, 45))), 1, 7)
+    frame = pd.DataFrame(ratings.astype(np.uint8), columns=[f"q{i}" for i in range(1, 46)])
+    frame.insert(0, "name", [f"Dog {i}" for i in range(rows)])
+    frame.insert(1, "breed", rng.choice(["Beagle", "Border Collie", "Labrador Retriever", "Mixed"], rows))
+    frame.to_csv(path, index=False)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Benchmark the bulk questionnaire import")
+    parser.add_argument("--rows", type=int, default=100000, help="Rows in the synthetic dataset")
+    parser.add_argument("--chunk-size", type=int, default=10000, help="Rows per chunk")
+    parser.add_argument("--database", action="store_true", help="Load into Postgres instead of a dry run")
+    parser.add_argument("--user-id", default="00000000-0000-0000-0000-000000000000",
+                        help="Existing user owning the imported dogs (with --database)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "bench.csv")
+        write_dataset(path, args.rows)
+        target = await PostgresImportTarget.connect() if args.database else DryRunTarget()
+        job = AssessmentImport(target, f"bench-{time.time_ns()}", os.path.join(directory, "bench.json"),
+                               os.path.join(directory, "rejected.csv"), user_id=args.user_id)
+        start = time.perf_counter()
+        try:
+            checkpoint = await job.run(read_chunks(path, args.chunk_size))
+        finally:
+            await target.close()
+        elapsed = time.perf_counter() - start
+
+    mode = "database" if args.database else "dry run"
+    print(f"{mode}: {checkpoint['imported']} assessments in {elapsed:.2f} s "
+          f"({checkpoint['rows_done'] / elapsed:,.0f} rows/s)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
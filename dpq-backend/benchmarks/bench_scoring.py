@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for DPQ scoring
+
+Compares single-assessment latency of the compiled scoring plan against the
+original nested-dict/numpy implementation, and reports batch throughput of
+score_many.
+
+Usage:
+    python benchmarks/bench_scoring.py [--iterations 20000] [--batch 100000]
+"""
+
+import argparse
+import os
+import sys
+import timeit
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from dpq.dpq import DogPersonalityQuestionnaire
+
+
+def legacy_score(dpq: DogPersonalityQuestionnaire, responses):
+    """Original per-item scoring path (dict copy, nested loops, np.mean)"""
+    processed_responses = responses.copy()
+    for factor_name, facets in dpq.scoring_structure.items():
+        for facet_name, facet_info in facets.items():
+            for item in facet_info["reverse"]:
+                if item in processed_responses:
+                    processed_responses[item] = 8 - processed_responses[item]
+
+    facet_scores = {}
+    for factor_name, facets in dpq.scoring_structure.items():
+        for facet_name, facet_info in facets.items():
+            valid_scores = [processed_responses[item] for item in facet_info["items"] if item in processed_responses]
+            facet_scores[facet_name] = np.mean(valid_scores) if valid_scores else 4.0
+
+    factor_scores = {}
+    for factor_name, facets in dpq.scoring_structure.items():
+        factor_scores[factor_name] = np.mean([facet_scores[facet] for facet in facets])
+
+    dpq._generate_personality_profile(factor_scores, facet_scores)
+    dpq._calculate_bias_indicators(factor_scores, facet_scores)
+    return factor_scores
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark DPQ scoring paths")
+    parser.add_argument("--iterations", type=int, default=20000, help="Single-assessment iterations")
+    parser.add_argument("--batch", type=int, default=100000, help="Rows for the score_many benchmark")
+    args = parser.parse_args()
+
+    dpq = DogPersonalityQuestionnaire()
+    rng = np.random.default_rng(0)
+    responses = {i: int(v) for i, v in enumerate(rng.integers(1, 8, size=45), start=1)}
+
+    legacy = timeit.timeit(lambda: legacy_score(dpq, responses), number=args.iterations)
+    plan = timeit.timeit(lambda: dpq.plan.score(responses), number=args.iterations)
+    full = timeit.timeit(lambda: dpq.score_assessment(responses), number=args.iterations)
+
+    print(f"legacy nested-dict/numpy scoring: {legacy / args.iterations * 1e6:8.2f} us/assessment")
+    print(f"compiled plan (facets + factors): {plan / args.iterations * 1e6:8.2f} us/assessment")
+    print(f"score_assessment (full result):   {full / args.iterations * 1e6:8.2f} us/assessment")
+
+    matrix = rng.integers(1, 8, size=(args.batch, 45), dtype=np.uint8)
+    batch = timeit.timeit(lambda: dpq.score_many(matrix), number=1)
+    print(f"score_many ({args.batch} rows):        {args.batch / batch:12.0f} assessments/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the nearest-neighbour personality index
+
+Builds a SimilarityIndex over synthetic (correlated) DPQ assessments and
+reports build time, k-NN query latency and recall against exhaustive search.
+
+Usage:
+    python benchmarks/bench_similarity.py [--dogs 1000000] [--queries 200] [--space facets]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from dpq.dpq import DogPersonalityQuestionnaire
+from dpq.similarity import SimilarityIndex
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the DPQ similarity index")
+    parser.add_argument("--dogs", type=int, default=1000000, help="Indexed dogs")
+    parser.add_argument("--queries", type=int, default=200, help="k-NN queries to time")
+    parser.add_argument("--k", type=int, default=10, help="Neighbours per query")
+    parser.add_argument("--space", choices=["facets", "biases"], default="facets")
+    args = parser.parse_args()
+
+    dpq = DogPersonalityQuestionnaire()
+    rng = np.random.default_rng(0)
+    latent = rng.normal(4, 1.3, size=(args.dogs, 5))
+    matrix = latent[:, rng.integers(0, 5, 45)] + rng.normal(0, 1, size=(args.dogs, 45))
+    facets, factors, _ = dpq.score_many(np.clip(np.rint(matrix), 1, 7).astype(np.uint8))
+
+    index = SimilarityIndex(args.space)
+    vectors = index.vectors_from_scores(facets, factors)
+    start = time.perf_counter()
+    index.add_many([f"dog-{i}" for i in range(args.dogs)], vectors)
+    index.rebuild()
+    print(f"build ({args.dogs} dogs, {args.space}):   {time.perf_counter() - start:8.2f} s")
+
+    queries = vectors[rng.integers(0, args.dogs, args.queries)]
+    for n_probe in (8, 16, 32):
+        start = time.perf_counter()
+        results = [index.query(q, args.k, n_probe=n_probe) for q in queries]
+        latency = (time.perf_counter() - start) / args.queries * 1e3
+        recall = np.mean([
+            np.mean(np.isclose([r["distance"] for r in result],
+                               [r["distance"] for r in index.query(q, args.k, exact=True)]))
+            for q, result in zip(queries[:20], results)
+        ])
+        print(f"query n_probe={n_probe:<3d}              {latency:8.3f} ms   recall@{args.k} {recall:.2f}")
+
+    start = time.perf_counter()
+    index.query(queries[0], args.k, exact=True)
+    print(f"exhaustive query:               {(time.perf_counter() - start) * 1e3:8.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,5 +3,6 @@ from .dpq import DogPersonalityQuestionnaire, DPQAnalyzer
 from .claude_recommender import ClaudeRecommendationGenerator, replace_hardcoded_recommendations
 from .response_formatter import DPQResponseFormatter
 from .api_handler import DPQAPIHandler
+from .assessment_store import AssessmentStore, AssessmentBatch
 
-__all__ = ['DogPersonalityQuestionnaire', 'DPQAnalyzer', 'ClaudeRecommendationGenerator', 'replace_hardcoded_recommendations', 'DPQResponseFormatter', 'DPQAPIHandler']
+__all__ = ['DogPersonalityQuestionnaire', 'DPQAnalyzer', 'ClaudeRecommendationGenerator', 'replace_hardcoded_recommendations', 'DPQResponseFormatter', 'DPQAPIHandler', 'AssessmentStore', 'AssessmentBatch']
@@ -1,12 +1,25 @@
 # api_handler.py - Main API logic to coordinate DPQ assessment flow
 
-import json
-from typing import Dict, Any, Optional
+import asyncio
+import threading
+from contextlib import asynccontextmanager
+from typing import Dict, Any, List, Optional
 from datetime import datetime
 
 # Import your existing DPQ classes
 from .dpq import DogPersonalityQuestionnaire, DPQAnalyzer
 from .response_formatter import DPQResponseFormatter
+from .population_norms import get_population_norms
+from .reliability import get_reliability_tracker
+from .trends import get_trend_index
+from .similarity import get_similarity_index
+from .claude_recommender import ClaudeRecommendationGenerator, acached_recommendations, stored_recommendations
+from .recommendation_rules import UPGRADED_VERSION, get_recommendation_rules
+from .pipeline import Stage, StageGraph
+from .resource_accounting import connect_accounted, current_usage, set_user, track
+from .db_pool import connection_settings, get_db_pool, register_jsonb_codec
+from .write_behind import get_write_buffer
+from .profile_cache import dog_profile, get_dog_profile_cache, profile_from_assessment
 
 import asyncpg
 import os
@@ -14,6 +27,140 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+# Seconds a recommendation upgrade waits for its buffered assessment to be written
+UPGRADE_FLUSH_TIMEOUT = 300.0
+
+# Dog upsert, assessment insert and the dog's current assessment reference in one statement;
+# on_conflict is "" or an ON CONFLICT clause for the assessment
+SAVE_ASSESSMENT_SQL = """
+    WITH dog AS (
+        INSERT INTO dogs (dog_id, user_id, name, breed, birthday, current_dpq_assessment_id)
+        VALUES ($2, $3::uuid, $21, $22, $23, $1)
+        ON CONFLICT (dog_id)
+        DO UPDATE SET name = $21, breed = $22, birthday = $23,
+                      current_dpq_assessment_id = $1, updated_at = CURRENT_TIMESTAMP
+        -- A replayed older assessment is stored but does not become the dog's current one
+        WHERE dogs.current_dpq_assessment_id IS NULL OR NOT EXISTS (
+            SELECT 1 FROM dpq_assessments cur
+            WHERE cur.assessment_id = dogs.current_dpq_assessment_id AND cur.completed_at > $5)
+    )
+    INSERT INTO dpq_assessments (
+        assessment_id, dog_id, user_id, started_at, completed_at,
+        assessment_duration_minutes, device_type, app_version,
+        responses, personality_factors, ai_bias_indicators,
+        personality_summary, ai_translator_config, recommendations,
+        reliability_score, response_consistency, extreme_response_bias,
+        all_questions_answered, assessment_version, scoring_algorithm
+    ) VALUES ($1, $2, $3::uuid, $4, $5, $6, $7, $8, $9, $10, $11, $12, $13, $14, $15, $16, $17, $18, $19, $20)
+    {on_conflict}
+    RETURNING assessment_id
+"""
+
+
+def assessment_args(assessment_data: Dict[str, Any]) -> tuple:
+    """Parameters of SAVE_ASSESSMENT_SQL for a formatted assessment"""
+    dog_info = assessment_data['dog_info']
+    quality_metrics = assessment_data['quality_metrics']
+    return (
+        assessment_data['assessment_id'],
+        assessment_data['dog_id'],
+        assessment_data['user_id'],
+        assessment_data.get('started_at'),
+        assessment_data.get('completed_at'),
+        assessment_data.get('assessment_duration_minutes'),
+        assessment_data.get('device_type'),
+        assessment_data.get('app_version'),
+        # JSONB columns are encoded by the connection's codec (dpq.db_pool.register_jsonb_codec)
+        assessment_data['responses'],
+        assessment_data['personality_factors'],
+        assessment_data['ai_bias_indicators'],
+        assessment_data['personality_summary'],
+        assessment_data['ai_translator_config'],
+        assessment_data['recommendations'],
+        quality_metrics.get('reliability_score'),
+        quality_metrics.get('response_consistency'),
+        quality_metrics.get('extreme_response_bias'),
+        quality_metrics.get('all_questions_answered'),
+        assessment_data['metadata']['assessment_version'],
+        assessment_data['metadata']['scoring_algorithm'],
+        dog_info.get('name'),
+        dog_info.get('breed'),
+        dog_info.get('birthday'),
+    )
+
+
+async def open_db_connection():
+    """Open a dedicated database connection (queries are counted as round trips of the current request)"""
+    conn = await connect_accounted(asyncpg.connect, **connection_settings())
+    await register_jsonb_codec(conn)
+    return conn
+
+
+@asynccontextmanager
+async def db_connection():
+    """
+    A connection from the app's pool for the duration of the block
+
+    Outside the app (scripts, jobs) no pool is started, so a dedicated
+    connection is opened and closed instead.
+    """
+    pool = get_db_pool()
+    if pool is not None:
+        async with pool.acquire() as conn:
+            yield conn
+        return
+    conn = await open_db_connection()
+    try:
+        yield conn
+    finally:
+        await conn.close()
+
+
+async def save_assessments(assessments: List[Dict[str, Any]]) -> None:
+    """
+    Write a batch of buffered assessments (the write buffer's flush)
+
+    The rows are one pipelined executemany (a single round trip that applies
+    all of them or none), in order, so each dog ends up pointing at its latest
+    assessment. Assessments already stored are skipped, which makes replaying
+    a batch harmless.
+    """
+    async with db_connection() as conn:
+        await conn.executemany(SAVE_ASSESSMENT_SQL.format(on_conflict="ON CONFLICT (assessment_id) DO NOTHING"),
+                               [assessment_args(assessment) for assessment in assessments])
+    # Profiles put() when these assessments were logged are reloaded from the database; a dog
+    # already showing a newer buffered assessment keeps it
+    cache = get_dog_profile_cache()
+    for assessment in assessments:
+        cache.invalidate_if_current(assessment['dog_id'], assessment['assessment_id'])
+
+
+async def load_dog_profile(dog_id: str) -> Optional[Dict[str, Any]]:
+    """Profile of a dog and its current assessment from the database (one query), or None if unknown"""
+    async with db_connection() as conn:
+        row = await conn.fetchrow("""
+            SELECT d.dog_id, d.user_id, d.name, d.breed, d.birthday, d.current_dpq_assessment_id,
+                   a.completed_at, a.personality_factors, a.ai_bias_indicators, a.personality_summary,
+                   a.ai_translator_config, a.reliability_score, a.response_consistency,
+                   a.extreme_response_bias, a.assessment_version
+            FROM dogs d
+            LEFT JOIN dpq_assessments a ON a.assessment_id = d.current_dpq_assessment_id
+            WHERE d.dog_id = $1
+        """, dog_id)
+    if row is None:
+        return None
+    row = dict(row)
+    assessment = None
+    if row['current_dpq_assessment_id'] is not None and row['ai_translator_config'] is not None:
+        assessment = {
+            **row,
+            'assessment_id': row['current_dpq_assessment_id'],
+            'quality_metrics': {key: row[key] for key in
+                                ('reliability_score', 'response_consistency', 'extreme_response_bias')},
+        }
+    return dog_profile(row, assessment)
+
+
 class DPQAPIHandler:
     """
     Main API handler that coordinates the complete DPQ assessment flow:
@@ -21,12 +168,41 @@ class DPQAPIHandler:
     2. Run DPQ analysis
     3. Format results for frontend
     4. Handle database operations
+    5. Upgrade the rule-based recommendations with Claude's in the background
     """
     
-    def __init__(self):
+    def __init__(self, recommender: Optional[ClaudeRecommendationGenerator] = None):
+        """
+        Args:
+            recommender: Generator for the background recommendation upgrade. Defaults to
+                one using ANTHROPIC_API_KEY; without a key the rule-based baseline is kept.
+        """
         self.dpq = DogPersonalityQuestionnaire()
         self.analyzer = DPQAnalyzer()
-        self.formatter = DPQResponseFormatter()
+        self.norms_path = os.getenv("DPQ_NORMS_PATH", os.path.join("data", "population_norms.npz"))
+        self.population_norms = get_population_norms(self.norms_path)
+        self.reliability_path = os.getenv("DPQ_RELIABILITY_PATH", os.path.join("data", "reliability.npz"))
+        self.reliability = get_reliability_tracker(self.reliability_path)
+        self.trends_path = os.getenv("DPQ_TRENDS_PATH", os.path.join("data", "trends.npz"))
+        self.trends = get_trend_index(self.trends_path)
+        self.similarity_dir = os.getenv("DPQ_SIMILARITY_DIR", "data")
+        self.similarity = {
+            space: get_similarity_index(space, os.path.join(self.similarity_dir, f"similarity_{space}.npz"))
+            for space in ("facets", "biases")
+        }
+        self.recommendation_rules = get_recommendation_rules()
+        self.formatter = DPQResponseFormatter(population_norms=self.population_norms,
+                                              reliability=self.reliability,
+                                              recommendation_rules=self.recommendation_rules)
+        if recommender is None:
+            try:
+                recommender = ClaudeRecommendationGenerator()
+            except ValueError as e:
+                print(f"Recommendation upgrades disabled: {e}")
+        self.recommender = recommender
+        self._upgrades = set()
+        self._index_save: Optional[asyncio.Future] = None
+        self.pipeline = self._assessment_pipeline()
     
     async def process_assessment(self, request_data: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -53,31 +229,28 @@ class DPQAPIHandler:
             if not dog_info.get('name'):
                 raise ValueError("Dog name is required")
             
-            # 2. Convert string keys to integers for DPQ processing
-            numeric_responses = {int(k): v for k, v in responses.items()}
-            
-            # 3. Run DPQ analysis
-            dpq_results = self._run_dpq_analysis(numeric_responses)
-            
-            # 4. Format response for frontend
-            formatted_response = self.formatter.format_assessment_response(
-                dpq_results=dpq_results,
-                dog_info=dog_info,
-                user_id=user_id,
-                assessment_metadata=metadata,
-                responses=responses
-            )
+            set_user(user_id)
             
-            # 5. Save to database
-            db_saved = await self.save_assessment_to_db(formatted_response)
+            # 2. Score, format, then save while the indexes update, and schedule the upgrade
+            outputs = await self.pipeline.run(dog_info=dog_info, user_id=user_id,
+                                              responses=responses, metadata=metadata)
+            formatted_response = outputs['response']
+            formatted_response['trend'] = outputs['trend']
+            formatted_response['recommendations_pending'] = outputs['recommendations_pending']
+            db_saved = outputs['saved']
+            self._schedule_index_save()
 
-            # 6. Add success status
+            # 3. Add success status
             formatted_response['status'] = 'success'
             if db_saved:
                 formatted_response['message'] = 'Assessment completed and saved successfully'
             else:
                 formatted_response['message'] = 'Assessment completed but database save failed'
                 formatted_response['warning'] = 'Data not persisted'
+            
+            usage = current_usage()
+            if usage is not None:
+                formatted_response['resource_usage'] = usage.summary()
 
             return formatted_response
             
@@ -89,6 +262,177 @@ class DPQAPIHandler:
                 'error_type': type(e).__name__
             }
     
+    def _assessment_pipeline(self) -> StageGraph:
+        """
+        Stages of process_assessment; the index update and database save run concurrently
+        
+        The sync stages (scoring, formatting, the index update) run in threads.
+        """
+        return StageGraph([
+            Stage("dpq_results", self._score_responses, after=("responses",)),
+            Stage("response", self._format_response,
+                  after=("dpq_results", "dog_info", "user_id", "metadata", "responses")),
+            Stage("saved", self._persist_response, after=("response",)),
+            Stage("norms_updated", self._update_norms, after=("saved", "dpq_results", "dog_info")),
+            Stage("trend", self._update_indexes,
+                  after=("saved", "dpq_results", "dog_info", "metadata", "responses", "response")),
+            Stage("recommendations_pending", self._start_upgrade,
+                  after=("saved", "response", "dpq_results", "dog_info", "user_id")),
+        ], inputs=("dog_info", "user_id", "responses", "metadata"))
+    
+    async def _persist_response(self, response: Dict[str, Any]) -> bool:
+        return await self.persist_assessment(response)
+    
+    def _score_responses(self, responses: Dict[str, int]) -> Dict[str, Any]:
+        return self._run_dpq_analysis({int(k): v for k, v in responses.items()})
+    
+    def _format_response(self, dpq_results: Dict[str, Any], dog_info: Dict[str, Any], user_id: str,
+                         metadata: Dict[str, Any], responses: Dict[str, int]) -> Dict[str, Any]:
+        return self.formatter.format_assessment_response(
+            dpq_results=dpq_results,
+            dog_info=dog_info,
+            user_id=user_id,
+            assessment_metadata=metadata,
+            responses=responses
+        )
+    
+    def _update_indexes(self, saved: bool, dpq_results: Dict[str, Any], dog_info: Dict[str, Any],
+                        metadata: Dict[str, Any], responses: Dict[str, int],
+                        response: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Fold a saved assessment into reliability statistics, trends and similarity indexes; returns the trend
+        
+        Only the in-memory updates happen here; rebuilds and saves are left to _save_indexes.
+        An unsaved assessment is left out, so a retried submission is not counted twice.
+        A failure is logged and gives no trend: the assessment is scored and saved regardless.
+        """
+        if not saved:
+            return None
+        try:
+            self.reliability.update({int(k): v for k, v in responses.items()})
+            trend = self.trends.update(
+                response['dog_id'],
+                metadata.get('completed_at') or datetime.now().isoformat(),
+                dpq_results['factor_scores']
+            )
+            for space, index in self.similarity.items():
+                values = dpq_results['facet_scores'] if space == "facets" else dpq_results['bias_indicators']
+                index.add(response['dog_id'], values)
+            return trend
+        except Exception as e:
+            print(f"Index update failed for dog {response['dog_id']}: {e}")
+            return None
+    
+    def _update_norms(self, saved: bool, dpq_results: Dict[str, Any], dog_info: Dict[str, Any]) -> bool:
+        """Fold the assessment into the population norms once it is saved; returns whether it was"""
+        if not saved:
+            return False
+        try:
+            self.population_norms.update(
+                dpq_results['factor_scores'],
+                dpq_results['facet_scores'],
+                dog_info.get('breed')
+            )
+            return True
+        except Exception as e:
+            print(f"Population norms update failed: {e}")
+            return False
+    
+    def _save_indexes(self) -> None:
+        """Rebuild the similarity indexes and persist every index that is due (blocking)"""
+        self.population_norms.maybe_save(self.norms_path)
+        self.reliability.maybe_save(self.reliability_path)
+        self.trends.maybe_save(self.trends_path)
+        for space, index in self.similarity.items():
+            index.maybe_rebuild()
+            index.maybe_save(os.path.join(self.similarity_dir, f"similarity_{space}.npz"))
+    
+    def _schedule_index_save(self) -> None:
+        """Run _save_indexes in a thread outside the request, unless a run is still under way"""
+        if self._index_save is not None and not self._index_save.done():
+            return
+        
+        def saved(future: asyncio.Future) -> None:
+            if not future.cancelled() and future.exception() is not None:
+                print(f"Index save failed: {future.exception()}")
+        
+        self._index_save = asyncio.ensure_future(asyncio.to_thread(self._save_indexes))
+        self._index_save.add_done_callback(saved)
+    
+    async def _start_upgrade(self, saved: bool, response: Dict[str, Any], dpq_results: Dict[str, Any],
+                       dog_info: Dict[str, Any], user_id: str) -> bool:
+        """Replace the baseline recommendations with Claude's once they are ready; returns whether one is pending"""
+        # A coroutine so the pipeline runs it on the event loop, where the upgrade task is created
+        pending = saved and self.recommender is not None
+        if pending:
+            self._schedule_upgrade(response['assessment_id'], user_id, {
+                'dog_info': dog_info,
+                'factor_scores': dpq_results['factor_scores'],
+                'bias_indicators': dpq_results['bias_indicators'],
+            })
+        return pending
+    
+    async def close(self, timeout: float = 30.0) -> None:
+        """
+        Finish the background work started by requests before shutdown
+
+        Waits for the index save in flight, then saves the indexes once more so
+        updates since the last save are not lost. Recommendation upgrades get
+        timeout seconds; the ones still running are cancelled and keep the
+        rule-based baseline.
+        """
+        if self._upgrades:
+            _, running = await asyncio.wait(set(self._upgrades), timeout=timeout)
+            for task in running:
+                task.cancel()
+            if running:
+                print(f"Recommendation upgrades cancelled at shutdown: {len(running)}")
+                await asyncio.gather(*running, return_exceptions=True)
+        if self._index_save is not None:
+            # Runs in a thread, so it cannot be cancelled
+            await asyncio.gather(self._index_save, return_exceptions=True)
+            self._index_save = None
+        try:
+            await asyncio.to_thread(self._save_indexes)
+        except Exception as e:
+            print(f"Index save failed: {e}")
+    
+    def _schedule_upgrade(self, assessment_id: str, user_id: str, personality_data: Dict[str, Any]) -> None:
+        """Run upgrade_recommendations in the background, keeping the task referenced until it ends"""
+        async def upgrade():
+            # Accounted as its own job rather than to the request that scheduled it
+            with track("job:recommendation_upgrade", user_id):
+                await self.upgrade_recommendations(assessment_id, personality_data)
+        
+        task = asyncio.create_task(upgrade())
+        self._upgrades.add(task)
+        task.add_done_callback(self._upgrades.discard)
+    
+    async def upgrade_recommendations(self, assessment_id: str, personality_data: Dict[str, Any]) -> bool:
+        """
+        Replace an assessment's rule-based recommendations with Claude's
+        
+        Args:
+            assessment_id: Assessment whose recommendations are replaced
+            personality_data: dog_info, factor_scores and bias_indicators of the assessment
+            
+        Returns:
+            True if the upgraded recommendations were saved. On failure the baseline stays.
+        """
+        try:
+            recommendations = await acached_recommendations(personality_data, self.recommender)
+        except Exception as e:
+            print(f"Recommendation upgrade failed for {assessment_id}: {e}")
+            return False
+        # A buffered assessment has to reach the database before its recommendations can replace the baseline
+        buffer = get_write_buffer()
+        if buffer is not None and not await buffer.wait_flushed(assessment_id, timeout=UPGRADE_FLUSH_TIMEOUT):
+            print(f"Recommendation upgrade dropped for {assessment_id}: assessment not written yet")
+            return False
+        return await self.save_recommendations_to_db(assessment_id, {
+            **stored_recommendations(recommendations), "version": UPGRADED_VERSION, "source": "claude"
+        })
+    
     def _run_dpq_analysis(self, responses: Dict[int, int]) -> Dict[str, Any]:
         """
         Run the core DPQ analysis using your existing classes
@@ -107,50 +451,102 @@ class DPQAPIHandler:
                 raise ValueError(f"Invalid response value: {response} for question {question_num}")
         
         # Score the assessment using your existing DPQ classes
-        factor_scores = self.dpq.score_assessment(responses)
-        bias_indicators = self.analyzer.calculate_bias_indicators(responses, factor_scores)
-        personality_profile = self.analyzer.generate_personality_profile(factor_scores, bias_indicators)
+        results = self.dpq.score_assessment(responses)
         
         return {
-            'factor_scores': factor_scores,
-            'bias_indicators': bias_indicators,
-            'personality_profile': personality_profile
+            'factor_scores': results.factor_scores,
+            'facet_scores': results.facet_scores,
+            'bias_indicators': results.bias_indicators,
+            'personality_profile': results.personality_profile
         }
     
-    def get_dog_profile(self, dog_id: str) -> Dict[str, Any]:
+    async def get_dog_profile(self, dog_id: str) -> Dict[str, Any]:
         """
-        Get dog profile and latest assessment (placeholder for database integration)
+        Get dog profile and latest assessment
+        
+        Served from the process-wide profile cache (dpq.profile_cache), which
+        reads through to the database on a miss.
         
         Args:
             dog_id: UUID of the dog
             
         Returns:
-            Dog profile with latest assessment
+            Dog profile with its current assessment
         """
-        # TODO: Implement database lookup
-        # For now, return placeholder response
-        return {
-            'status': 'error',
-            'message': 'Database integration not yet implemented',
-            'dog_id': dog_id
-        }
+        try:
+            profile = await get_dog_profile_cache().get(dog_id, load_dog_profile)
+        except Exception as e:
+            print(f"Database read error: {e}")
+            return {'status': 'error', 'message': f'Database read error: {e}', 'dog_id': dog_id}
+        if profile is None:
+            return {'status': 'error', 'message': 'Dog not found', 'dog_id': dog_id}
+        return {'status': 'success', **profile}
     
-    def get_ai_translator_config(self, dog_id: str) -> Dict[str, Any]:
+    def get_dog_trends(self, dog_id: str) -> Dict[str, Any]:
+        """
+        Get the precomputed longitudinal trend summary for a dog
+        
+        Args:
+            dog_id: UUID of the dog
+            
+        Returns:
+            Per-factor slopes, significance, rolling means and change-point flags
+        """
+        summary = self.trends.summary(dog_id)
+        if summary is None:
+            return {
+                'status': 'error',
+                'message': 'No assessments recorded for this dog',
+                'dog_id': dog_id
+            }
+        return {'status': 'success', **summary}
+    
+    def get_similar_dogs(self, dog_id: str, space: str = "facets", k: int = 10) -> Dict[str, Any]:
+        """
+        Find the dogs whose personality is closest to this dog's latest assessment
+        
+        Args:
+            dog_id: UUID of the dog
+            space: "facets" (15 facet scores) or "biases" (14 bias indicators)
+            k: Number of similar dogs to return
+            
+        Returns:
+            Nearest dogs with their Euclidean distance
+        """
+        if space not in self.similarity:
+            raise ValueError(f"Unknown similarity space: {space}")
+        neighbours = self.similarity[space].query_dog(dog_id, k)
+        if neighbours is None:
+            return {
+                'status': 'error',
+                'message': 'No assessments recorded for this dog',
+                'dog_id': dog_id
+            }
+        return {'status': 'success', 'dog_id': dog_id, 'space': space, 'similar_dogs': neighbours}
+    
+    async def get_ai_translator_config(self, dog_id: str) -> Dict[str, Any]:
         """
         Get AI translator configuration for specific dog
         
+        The configuration of the dog's current assessment, from the profile cache.
+        
         Args:
             dog_id: UUID of the dog
             
         Returns:
             AI translator configuration
         """
-        # TODO: Implement database lookup for latest assessment
-        # For now, return placeholder response
+        profile = await self.get_dog_profile(dog_id)
+        if profile['status'] != 'success':
+            return profile
+        current = profile['current_assessment']
+        if current is None:
+            return {'status': 'error', 'message': 'No assessments recorded for this dog', 'dog_id': dog_id}
         return {
-            'status': 'error',
-            'message': 'Database integration not yet implemented',
-            'dog_id': dog_id
+            'status': 'success',
+            'dog_id': dog_id,
+            'assessment_id': current['assessment_id'],
+            'ai_translator_config': current['ai_translator_config'],
         }
     
     def validate_input_format(self, request_data: Dict[str, Any]) -> Dict[str, Any]:
@@ -198,77 +594,129 @@ class DPQAPIHandler:
             'errors': errors
         }
     async def get_db_connection(self):
-        """Get database connection"""
-        conn = await asyncpg.connect(
-            host=os.getenv("DB_HOST"),
-            database=os.getenv("DB_NAME"),
-            user=os.getenv("DB_USER"),
-            password=os.getenv("DB_PASSWORD"),
-            port=os.getenv("DB_PORT", "6543")
-        )
-        return conn
+        """Open a dedicated database connection (queries are counted as round trips of the current request)"""
+        return await open_db_connection()
+
+    def db_connection(self):
+        """A pooled (or, outside the app, dedicated) connection for the duration of an async with block"""
+        return db_connection()
+
+    async def persist_assessment(self, assessment_data: Dict[str, Any]) -> bool:
+        """
+        Persist an assessment without waiting on the database when the app runs a write buffer
+
+        The assessment is logged durably (dpq.write_behind) and written in the
+        background; outside the app, or if the log cannot be written, it is
+        saved directly.
+        """
+        buffer = get_write_buffer()
+        if buffer is not None:
+            try:
+                await buffer.append(assessment_data)
+            except Exception as e:
+                print(f"Write buffer error, saving directly: {e}")
+            else:
+                # Served from memory until the flush writes it (save_assessments then invalidates it)
+                get_dog_profile_cache().put(assessment_data['dog_id'], profile_from_assessment(assessment_data))
+                return True
+        return await self.save_assessment_to_db(assessment_data)
 
     async def save_assessment_to_db(self, assessment_data: Dict[str, Any]) -> bool:
-        """Save assessment results to database"""
+        """
+        Save assessment results to database
+        
+        The dog upsert, the assessment insert and the dog's current assessment
+        reference are one statement, so they take one round trip and either all
+        apply or none does (foreign keys are checked at the end of the statement).
+        """
         try:
-            conn = await self.get_db_connection()
-            
-            # Insert or update dog info
-            dog_info = assessment_data['dog_info']
-            await conn.execute("""
-                INSERT INTO dogs (dog_id, user_id, name, breed, birthday)
-                VALUES ($1, $2::uuid, $3, $4, $5)
-                ON CONFLICT (dog_id) 
-                DO UPDATE SET name = $3, breed = $4, birthday = $5, updated_at = CURRENT_TIMESTAMP
-            """, 
-            assessment_data['dog_id'],
-            assessment_data['user_id'], 
-            dog_info.get('name'),
-            dog_info.get('breed'),
-            dog_info.get('birthday')
-            )
-            
-            # Insert assessment
-            await conn.execute("""
-                INSERT INTO dpq_assessments (
-                    assessment_id, dog_id, user_id, started_at, completed_at,
-                    assessment_duration_minutes, device_type, app_version,
-                    responses, personality_factors, ai_bias_indicators,
-                    personality_summary, ai_translator_config, recommendations,
-                    reliability_score, response_consistency, extreme_response_bias,
-                    all_questions_answered, assessment_version, scoring_algorithm
-                ) VALUES ($1, $2, $3::uuid, $4, $5, $6, $7, $8, $9, $10, $11, $12, $13, $14, $15, $16, $17, $18, $19, $20)
-            """,
-            assessment_data['assessment_id'],
-            assessment_data['dog_id'],
-            assessment_data['user_id'],
-            assessment_data.get('started_at'),
-            assessment_data.get('completed_at'),
-            assessment_data.get('assessment_duration_minutes'),
-            assessment_data.get('device_type'),
-            assessment_data.get('app_version'),
-            json.dumps(assessment_data['responses']),
-            json.dumps(assessment_data['personality_factors']),
-            json.dumps(assessment_data['ai_bias_indicators']),
-            json.dumps(assessment_data['personality_summary']),
-            json.dumps(assessment_data['ai_translator_config']),
-            json.dumps(assessment_data['recommendations']),
-            assessment_data['quality_metrics'].get('reliability_score'),
-            assessment_data['quality_metrics'].get('response_consistency'),
-            assessment_data['quality_metrics'].get('extreme_response_bias'),
-            assessment_data['quality_metrics'].get('all_questions_answered'),
-            assessment_data['metadata']['assessment_version'],
-            assessment_data['metadata']['scoring_algorithm']
-            )
-            
-            # Update dog's current assessment reference
-            await conn.execute("""
-                UPDATE dogs SET current_dpq_assessment_id = $1 WHERE dog_id = $2
-            """, assessment_data['assessment_id'], assessment_data['dog_id'])
+            async with self.db_connection() as conn:
+                saved = await conn.fetchval(SAVE_ASSESSMENT_SQL.format(on_conflict=""),
+                                            *assessment_args(assessment_data))
+            # The dog's current assessment changed
+            get_dog_profile_cache().invalidate(assessment_data['dog_id'])
+            return saved is not None
             
-            await conn.close()
-            return True
+        except Exception as e:
+            print(f"Database save error: {e}")
+            return False
+
+    async def save_recommendations_to_db(self, assessment_id: str, recommendations: Dict[str, Any]) -> bool:
+        """
+        Replace the stored recommendations of an assessment
+        
+        Recommendations carrying a version only replace stored ones with a lower
+        (or no) version, so a late write never downgrades an assessment.
+        """
+        try:
+            async with self.db_connection() as conn:
+                result = await conn.execute("""
+                    UPDATE dpq_assessments SET recommendations = $2
+                    WHERE assessment_id = $1
+                      AND ($3::int IS NULL OR COALESCE((recommendations->>'version')::int, 0) < $3::int)
+                """, assessment_id, recommendations, recommendations.get('version'))
+            return result.endswith(" 1")
             
         except Exception as e:
             print(f"Database save error: {e}")
             return False
+
+    async def get_assessment_personality(self, assessment_id: str) -> Optional[Dict[str, Any]]:
+        """
+        dog_info (breed), factor_scores and bias_indicators of a stored assessment,
+        the input of recommendation_profile, or None if it does not exist
+        """
+        try:
+            async with self.db_connection() as conn:
+                row = await conn.fetchrow("""
+                    SELECT d.breed, a.personality_factors, a.ai_bias_indicators
+                    FROM dpq_assessments a
+                    LEFT JOIN dogs d ON d.dog_id = a.dog_id
+                    WHERE a.assessment_id = $1
+                """, assessment_id)
+            if row is None or row['personality_factors'] is None:
+                return None
+            return {
+                'dog_info': {'breed': row['breed']},
+                'factor_scores': {name: data['score'] for name, data in row['personality_factors'].items()},
+                'bias_indicators': row['ai_bias_indicators'] or {},
+            }
+            
+        except Exception as e:
+            print(f"Database read error: {e}")
+            return None
+
+    async def get_recommendations_from_db(self, assessment_id: str) -> Optional[Dict[str, Any]]:
+        """Stored recommendations of an assessment, or None if it does not exist"""
+        try:
+            async with self.db_connection() as conn:
+                row = await conn.fetchrow("""
+                    SELECT recommendations FROM dpq_assessments WHERE assessment_id = $1
+                """, assessment_id)
+            return row['recommendations'] if row is not None else None
+            
+        except Exception as e:
+            print(f"Database read error: {e}")
+            return None
+
+
+_api_handler: Optional[DPQAPIHandler] = None
+_api_handler_lock = threading.Lock()
+
+
+def get_api_handler() -> DPQAPIHandler:
+    """Process-wide handler shared by the API routes"""
+    global _api_handler
+    with _api_handler_lock:
+        if _api_handler is None:
+            _api_handler = DPQAPIHandler()
+        return _api_handler
+
+
+async def close_api_handler() -> None:
+    """Close the process-wide handler, if it was created (see DPQAPIHandler.close)"""
+    global _api_handler
+    with _api_handler_lock:
+        handler, _api_handler = _api_handler, None
+    if handler is not None:
+        await handler.close()
@@ -0,0 +1,281 @@
+# assessment_store.py - Columnar, memory-mappable storage for DPQ results
+
+import json
+import os
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from .dpq import DogPersonalityQuestionnaire, DPQResults
+
+
+@dataclass
+class AssessmentBatch:
+    """A contiguous range of stored assessments. Arrays are read-only memory maps."""
+    responses: np.ndarray        # N x 45 uint8, 0 = unanswered
+    facet_scores: np.ndarray     # N x 15 float32
+    factor_scores: np.ndarray    # N x 5 float32
+    dog_id_codes: np.ndarray     # N uint32, index into AssessmentStore.dog_ids
+    date_codes: np.ndarray       # N uint32, index into AssessmentStore.assessment_dates
+
+    def __len__(self) -> int:
+        return len(self.responses)
+
+
+class AssessmentStore:
+    """
+    Append-only columnar store for DPQ assessments
+
+    Each column is a raw fixed-width binary file in one directory, so any row
+    range can be memory-mapped without parsing:
+
+        responses.u8          N x 45 uint8 raw responses
+        facet_scores.f32      N x 15 float32
+        factor_scores.f32     N x 5 float32
+        dog_id.u32            N uint32 dictionary codes
+        assessment_date.u32   N uint32 dictionary codes
+        dog_id.dict           one JSON string per line, line number = code
+        assessment_date.dict  one JSON string per line, line number = code
+        schema.json           column widths and facet/factor ordering
+
+    Dictionaries are written before the value columns, so a torn append leaves
+    at most some unreferenced dictionary entries, a partial last dictionary
+    line and a partial last row. Readers ignore partial lines and rows; the
+    next append truncates them first. The store assumes a single writer.
+    """
+
+    FIXED_COLUMNS = {
+        "responses": ("responses.u8", np.uint8),
+        "facet_scores": ("facet_scores.f32", np.float32),
+        "factor_scores": ("factor_scores.f32", np.float32),
+        "dog_id": ("dog_id.u32", np.uint32),
+        "assessment_date": ("assessment_date.u32", np.uint32),
+    }
+    DICTIONARY_COLUMNS = ("dog_id", "assessment_date")
+
+    def __init__(self, directory: str, questionnaire: Optional[DogPersonalityQuestionnaire] = None):
+        """
+        Open (or create) a store
+
+        Args:
+            directory: Store directory, created if missing
+            questionnaire: Defines facet/factor column order. Defaults to the standard DPQ.
+        """
+        self.directory = directory
+        self.questionnaire = questionnaire or DogPersonalityQuestionnaire()
+        os.makedirs(directory, exist_ok=True)
+
+        self.schema = self._load_or_create_schema()
+        self.widths = {
+            "responses": self.schema["n_items"],
+            "facet_scores": len(self.schema["facet_names"]),
+            "factor_scores": len(self.schema["factor_names"]),
+            "dog_id": 1,
+            "assessment_date": 1,
+        }
+
+        self._dictionaries: Dict[str, List[str]] = {}
+        self._codes: Dict[str, Dict[str, int]] = {}
+        for column in self.DICTIONARY_COLUMNS:
+            values = self._read_dictionary(column)
+            self._dictionaries[column] = values
+            self._codes[column] = {value: code for code, value in enumerate(values)}
+
+        # Complete rows; opening never modifies the columns, which a writer may be appending to
+        self._rows = self._complete_rows()
+        self._repaired = False
+
+    @property
+    def facet_names(self) -> List[str]:
+        return self.schema["facet_names"]
+
+    @property
+    def factor_names(self) -> List[str]:
+        return self.schema["factor_names"]
+
+    @property
+    def dog_ids(self) -> List[str]:
+        """Dictionary for the dog_id column (code -> value)"""
+        return self._dictionaries["dog_id"]
+
+    @property
+    def assessment_dates(self) -> List[str]:
+        """Dictionary for the assessment_date column (code -> value)"""
+        return self._dictionaries["assessment_date"]
+
+    def __len__(self) -> int:
+        return self._rows
+
+    def append(self, responses: np.ndarray, facet_scores: np.ndarray, factor_scores: np.ndarray,
+               dog_ids: Sequence[str], assessment_dates: Sequence[str]) -> int:
+        """
+        Append a block of scored assessments
+
+        Args:
+            responses: N x 45 ratings (0 for unanswered)
+            facet_scores: N x 15 scores in facet_names order
+            factor_scores: N x 5 scores in factor_names order
+            dog_ids: N dog identifiers
+            assessment_dates: N ISO dates
+
+        Returns:
+            Index of the first appended row
+        """
+        n = len(dog_ids)
+        blocks = {
+            "responses": np.ascontiguousarray(responses, dtype=np.uint8),
+            "facet_scores": np.ascontiguousarray(facet_scores, dtype=np.float32),
+            "factor_scores": np.ascontiguousarray(factor_scores, dtype=np.float32),
+        }
+        for column, block in blocks.items():
+            if block.shape != (n, self.widths[column]):
+                raise ValueError(f"{column} must have shape ({n}, {self.widths[column]}), got {block.shape}")
+        if len(assessment_dates) != n:
+            raise ValueError(f"assessment_dates must have {n} entries, got {len(assessment_dates)}")
+
+        if not self._repaired:
+            self._rows = self._repair()
+            self._repaired = True
+
+        blocks["dog_id"] = self._encode("dog_id", dog_ids)
+        blocks["assessment_date"] = self._encode("assessment_date", assessment_dates)
+
+        for column, block in blocks.items():
+            with open(self._path(column), "ab") as f:
+                f.write(block.tobytes())
+
+        first_row = self._rows
+        self._rows += n
+        return first_row
+
+    def append_results(self, results_list: Sequence[DPQResults]) -> int:
+        """Append DPQResults objects, returning the index of the first appended row"""
+        responses = self.questionnaire.responses_to_matrix([r.raw_scores for r in results_list])
+        facet_scores = np.array([[r.facet_scores[name] for name in self.facet_names] for r in results_list],
+                                dtype=np.float32).reshape(-1, len(self.facet_names))
+        factor_scores = np.array([[r.factor_scores[name] for name in self.factor_names] for r in results_list],
+                                 dtype=np.float32).reshape(-1, len(self.factor_names))
+        return self.append(
+            responses,
+            facet_scores,
+            factor_scores,
+            [r.dog_id for r in results_list],
+            [r.assessment_date for r in results_list],
+        )
+
+    def column(self, name: str, start: int = 0, stop: Optional[int] = None) -> np.ndarray:
+        """Memory-map rows [start, stop) of a single column"""
+        filename, dtype = self.FIXED_COLUMNS[name]
+        start, stop, _ = slice(start, stop).indices(self._rows)
+        stop = max(start, stop)
+        width = self.widths[name]
+        shape = (stop - start, width) if name not in self.DICTIONARY_COLUMNS else (stop - start,)
+        if stop == start:
+            return np.empty(shape, dtype=dtype)
+        itemsize = np.dtype(dtype).itemsize
+        return np.memmap(self._path(name), dtype=dtype, mode="r",
+                         offset=start * width * itemsize, shape=shape)
+
+    def read(self, start: int = 0, stop: Optional[int] = None) -> AssessmentBatch:
+        """Memory-map rows [start, stop) of every column"""
+        return AssessmentBatch(
+            responses=self.column("responses", start, stop),
+            facet_scores=self.column("facet_scores", start, stop),
+            factor_scores=self.column("factor_scores", start, stop),
+            dog_id_codes=self.column("dog_id", start, stop),
+            date_codes=self.column("assessment_date", start, stop),
+        )
+
+    def rows_for_dog(self, dog_id: str) -> np.ndarray:
+        """Row indices of every assessment stored for a dog"""
+        code = self._codes["dog_id"].get(dog_id)
+        if code is None:
+            return np.empty(0, dtype=np.int64)
+        return np.flatnonzero(self.column("dog_id") == code)
+
+    def _encode(self, column: str, values: Sequence[str]) -> np.ndarray:
+        """Dictionary-encode values, persisting any new dictionary entries first"""
+        codes = self._codes[column]
+        dictionary = self._dictionaries[column]
+        encoded = np.empty(len(values), dtype=np.uint32)
+        new_values = []
+        for i, value in enumerate(values):
+            value = str(value)
+            code = codes.get(value)
+            if code is None:
+                code = len(dictionary)
+                codes[value] = code
+                dictionary.append(value)
+                new_values.append(value)
+            encoded[i] = code
+        if new_values:
+            with open(self._dictionary_path(column), "a") as f:
+                f.write("".join(json.dumps(value) + "\n" for value in new_values))
+        return encoded
+
+    def _complete_rows(self) -> int:
+        """Number of rows present in every column"""
+        rows = None
+        for column, (_, dtype) in self.FIXED_COLUMNS.items():
+            path = self._path(column)
+            row_bytes = self.widths[column] * np.dtype(dtype).itemsize
+            column_rows = os.path.getsize(path) // row_bytes if os.path.exists(path) else 0
+            rows = column_rows if rows is None else min(rows, column_rows)
+        return rows
+
+    def _repair(self) -> int:
+        """Truncate columns to their complete rows and dictionaries to their complete lines (before the first append)"""
+        for column in self.DICTIONARY_COLUMNS:
+            path = self._dictionary_path(column)
+            if os.path.exists(path):
+                complete = len(self._complete_lines(path))
+                if os.path.getsize(path) != complete:
+                    os.truncate(path, complete)
+        for column in self.FIXED_COLUMNS:
+            path = self._path(column)
+            if not os.path.exists(path):
+                open(path, "wb").close()
+        rows = self._complete_rows()
+        for column, (_, dtype) in self.FIXED_COLUMNS.items():
+            row_bytes = self.widths[column] * np.dtype(dtype).itemsize
+            if os.path.getsize(self._path(column)) != rows * row_bytes:
+                os.truncate(self._path(column), rows * row_bytes)
+        return rows
+
+    def _load_or_create_schema(self) -> Dict:
+        path = os.path.join(self.directory, "schema.json")
+        schema = {
+            "version": 1,
+            "n_items": len(self.questionnaire.questions),
+            "facet_names": list(self.questionnaire.facet_names),
+            "factor_names": list(self.questionnaire.factor_names),
+        }
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                existing = json.load(f)
+            if existing != schema:
+                raise ValueError(f"Assessment store at {self.directory} was written with a different schema")
+            return existing
+        with open(path, "w") as f:
+            json.dump(schema, f, indent=2)
+        return schema
+
+    def _read_dictionary(self, column: str) -> List[str]:
+        path = self._dictionary_path(column)
+        if not os.path.exists(path):
+            return []
+        return [json.loads(line) for line in self._complete_lines(path).decode("utf-8").splitlines() if line.strip()]
+
+    @staticmethod
+    def _complete_lines(path: str) -> bytes:
+        """Contents of a dictionary file up to its last newline (a torn append leaves a partial line)"""
+        with open(path, "rb") as f:
+            data = f.read()
+        return data[:data.rfind(b"\n") + 1]
+
+    def _path(self, column: str) -> str:
+        return os.path.join(self.directory, self.FIXED_COLUMNS[column][0])
+
+    def _dictionary_path(self, column: str) -> str:
+        return os.path.join(self.directory, f"{column}.dict")
@@ -1,9 +1,148 @@
 import anthropic
+import asyncio
 import json
-from typing import Dict, List, Optional
+from typing import Any, Dict, List, Optional
 import os
 from dataclasses import dataclass
 
+from .population_norms import normalize_breed
+from .recommendation_cache import RecommendationCache, get_recommendation_cache
+from .resilience import get_resilience
+from .resource_accounting import record_llm_usage
+from .single_flight import get_single_flight, request_key
+
+# Bump whenever the prompt or its inputs change; cached recommendations from
+# older versions are then ignored and purged
+PROMPT_VERSION = 1
+
+# Bias indicators included in the prompt
+KEY_INDICATORS = [
+    'fearfulness_bias', 'aggression_bias', 'excitability_bias',
+    'trainability_bias', 'social_confidence', 'activity_level'
+]
+
+SYSTEM_PROMPT = """You are a professional dog behaviorist and trainer specializing in personalized dog care recommendations. 
+
+    Based on Dog Personality Questionnaire (DPQ) results, provide specific, actionable recommendations. Always format your response as valid JSON with exactly these keys: training_tips, exercise_needs, socialization, daily_care, ai_communication.
+
+    Make recommendations specific to the individual dog's personality profile. Avoid generic advice."""
+
+RESPONSE_FORMAT = """
+
+Please provide specific, actionable recommendations in the following categories. Format your response as JSON with these exact keys:
+
+{
+  "training_tips": [
+    "Specific training advice based on personality",
+    "Methods that work best for this personality type",
+    "Training challenges to watch for"
+  ],
+  "exercise_needs": [
+    "Exercise recommendations based on activity level",
+    "Types of physical activities that suit this dog",
+    "Mental stimulation suggestions"
+  ],
+  "socialization": [
+    "Social interaction recommendations",
+    "How to handle social situations",
+    "Building confidence tips"
+  ],
+  "daily_care": [
+    "Daily routine suggestions",
+    "Environmental considerations",
+    "Stress management tips"
+  ],
+  "ai_communication": [
+    "How AI should communicate with this dog's personality",
+    "Tone and approach recommendations for AI translation",
+    "Behavioral interpretation guidelines for AI"
+  ]
+}
+
+Make recommendations specific to this dog's personality profile. Avoid generic advice - focus on what makes this dog unique based on the DPQ results."""
+
+
+def factor_level(score: float) -> str:
+    """Prompt level for a 1-7 factor score"""
+    return "High" if score >= 5.5 else "Moderate" if score >= 4.5 else "Low"
+
+
+def bias_level(value: float) -> str:
+    """Prompt band for a 0-1 bias indicator"""
+    return "High" if value >= 0.7 else "Moderate" if value >= 0.4 else "Low"
+
+
+def recommendation_request(user_prompt: str) -> Dict[str, Any]:
+    """messages.create arguments for a recommendation prompt"""
+    return {
+        "model": "claude-sonnet-4-20250514",
+        "max_tokens": 4000,
+        "system": [
+            {
+                "type": "text", 
+                "text": SYSTEM_PROMPT,
+                "cache_control": {"type": "ephemeral"}
+            }
+        ],
+        "messages": [
+            {
+                "role": "user",
+                "content": user_prompt
+            }
+        ]
+    }
+
+
+def extract_recommendations(response_text: str) -> Dict[str, List[str]]:
+    """Extract the recommendations JSON from Claude's response, raising if there is none"""
+    # Try to extract JSON from the response
+    start_idx = response_text.find('{')
+    end_idx = response_text.rfind('}') + 1
+    
+    if start_idx != -1 and end_idx != -1:
+        json_str = response_text[start_idx:end_idx]
+        recommendations = json.loads(json_str)
+        
+        # Validate structure
+        expected_keys = ['training_tips', 'exercise_needs', 'socialization', 'daily_care', 'ai_communication']
+        for key in expected_keys:
+            if key not in recommendations:
+                recommendations[key] = []
+        
+        return recommendations
+    else:
+        raise ValueError("No JSON found in response")
+
+
+def recommendation_profile(personality_data: Dict) -> Dict[str, Any]:
+    """
+    Normalized inputs of the cached recommendation prompt
+
+    Recommendations depend only on the breed, the level of each factor and the
+    band of each key bias indicator, so dogs sharing these share a cache entry.
+    """
+    dog_info = personality_data.get('dog_info') or {}
+    bias_indicators = personality_data.get('bias_indicators', {})
+    indicators = [name for name in KEY_INDICATORS if name in bias_indicators]
+    if not indicators:
+        indicators = sorted(bias_indicators)
+    return {
+        'breed': normalize_breed(dog_info.get('breed')),
+        'factors': {factor: factor_level(score)
+                    for factor, score in personality_data.get('factor_scores', {}).items()},
+        'indicators': {name: bias_level(bias_indicators[name]) for name in indicators},
+    }
+
+
+def stored_recommendations(recommendations: Dict[str, List[str]]) -> Dict[str, List[str]]:
+    """Shape of dpq_assessments.recommendations (as written by DPQResponseFormatter)"""
+    return {
+        "training_tips": recommendations.get('training_tips', []),
+        "exercise_needs": recommendations.get('exercise_needs', []),
+        "ai_translator_tips": recommendations.get('ai_communication', []),
+    }
+
+
 @dataclass
 class DogPersonalityProfile:
     """Structured personality data for Claude API"""
@@ -19,18 +158,33 @@ class ClaudeRecommendationGenerator:
     Generate personalized dog training and care recommendations using Claude API
     """
     
-    def __init__(self, api_key: str = None):
+    def __init__(self, api_key: str = None, gateway=None):
         """
         Initialize with Claude API key
         
         Args:
             api_key: Anthropic API key. If None, will try to get from environment
+            gateway: Shared async gateway (app.services.llm_gateway.LLMGateway) used
+                by the async methods. Without one they run the sync client in a thread.
         """
         self.api_key = api_key or os.getenv('ANTHROPIC_API_KEY')
         if not self.api_key:
             raise ValueError("Claude API key required. Set ANTHROPIC_API_KEY environment variable or pass api_key parameter.")
         
-        self.client = anthropic.Anthropic(api_key=self.api_key)
+        self.gateway = gateway
+        self._client = None
+    
+    @property
+    def client(self) -> anthropic.Anthropic:
+        """Synchronous client, created on first use (retries are left to dpq.resilience)"""
+        if self._client is None:
+            self._client = anthropic.Anthropic(api_key=self.api_key, max_retries=0,
+                                               timeout=float(os.getenv("DPQ_LLM_TIMEOUT", "60")))
+        return self._client
+    
+    @client.setter
+    def client(self, client: anthropic.Anthropic) -> None:
+        self._client = client
     
     def generate_recommendations(self, personality_data: Dict) -> Dict[str, List[str]]:
         """
@@ -46,31 +200,8 @@ class ClaudeRecommendationGenerator:
             # Create structured prompt for Claude
             user_prompt = self._create_recommendation_prompt(personality_data)
             
-            # System prompt for recommendations
-            system_prompt = """You are a professional dog behaviorist and trainer specializing in personalized dog care recommendations. 
-
-    Based on Dog Personality Questionnaire (DPQ) results, provide specific, actionable recommendations. Always format your response as valid JSON with exactly these keys: training_tips, exercise_needs, socialization, daily_care, ai_communication.
-
-    Make recommendations specific to the individual dog's personality profile. Avoid generic advice."""
-            
             # Call Claude API
-            message = self.client.messages.create(
-                model="claude-sonnet-4-20250514",
-                max_tokens=4000,
-                system=[
-                    {
-                        "type": "text", 
-                        "text": system_prompt,
-                        "cache_control": {"type": "ephemeral"}
-                    }
-                ],
-                messages=[
-                    {
-                        "role": "user",
-                        "content": user_prompt
-                    }
-                ]
-            )
+            message = self._create_message(user_prompt)
             
             # Parse Claude's response
             recommendations = self._parse_claude_response(message.content[0].text)
@@ -80,6 +211,62 @@ class ClaudeRecommendationGenerator:
             print(f"Error generating Claude recommendations: {e}")
             return self._fallback_recommendations()
     
+    def generate_profile_recommendations(self, profile: Dict[str, Any]) -> Dict[str, List[str]]:
+        """
+        Generate recommendations for a normalized profile (see recommendation_profile)
+        
+        Unlike generate_recommendations this raises instead of falling back, so
+        callers only cache genuine responses.
+        
+        Args:
+            profile: Output of recommendation_profile
+            
+        Returns:
+            Dictionary with categorized recommendations
+        """
+        message = self._create_message(self.create_profile_prompt(profile))
+        return extract_recommendations(message.content[0].text)
+    
+    async def agenerate_recommendations(self, personality_data: Dict) -> Dict[str, List[str]]:
+        """
+        Async generate_recommendations that never blocks the event loop
+        
+        Args:
+            personality_data: Dictionary containing DPQ results and dog info
+            
+        Returns:
+            Dictionary with categorized recommendations
+        """
+        if self.gateway is None:
+            return await asyncio.to_thread(self.generate_recommendations, personality_data)
+        try:
+            return await self.gateway.recommend(self._create_recommendation_prompt(personality_data))
+        except Exception as e:
+            print(f"Error generating Claude recommendations: {e}")
+            return self._fallback_recommendations()
+    
+    async def agenerate_profile_recommendations(self, profile: Dict[str, Any]) -> Dict[str, List[str]]:
+        """Async generate_profile_recommendations (raises on failure)"""
+        if self.gateway is None:
+            return await asyncio.to_thread(self.generate_profile_recommendations, profile)
+        return await self.gateway.recommend(self.create_profile_prompt(profile))
+    
+    def _create_message(self, user_prompt: str):
+        """
+        Send one recommendation prompt to Claude, sharing the call with identical in-flight prompts
+        
+        Goes through the process-wide recommend circuit breaker and retry
+        budget, so it fails fast (CircuitOpenError) while Claude is down.
+        """
+        request = recommendation_request(user_prompt)
+        
+        def create():
+            message = self.client.messages.create(**request)
+            record_llm_usage(getattr(message, 'usage', None))
+            return message
+        
+        return get_single_flight("recommend").do(request_key(request), lambda: get_resilience("recommend").call(create))
+    
     def _create_recommendation_prompt(self, personality_data: Dict) -> str:
         """Create a detailed prompt for Claude based on personality data"""
         
@@ -103,89 +290,59 @@ Personality Factor Scores (1-7 scale, where 4 is neutral):
         
         # Add factor scores with interpretations
         for factor, score in factor_scores.items():
-            level = "High" if score >= 5.5 else "Moderate" if score >= 4.5 else "Low"
-            prompt += f"- {factor}: {score:.1f} ({level})\n"
+            prompt += f"- {factor}: {score:.1f} ({factor_level(score)})\n"
         
         prompt += f"""
 Key Behavioral Indicators (0-1 scale):
 """
         
         # Add most relevant bias indicators
-        key_indicators = [
-            'fearfulness_bias', 'aggression_bias', 'excitability_bias',
-            'trainability_bias', 'social_confidence', 'activity_level'
-        ]
-
-        for indicator in key_indicators:
+        for indicator in KEY_INDICATORS:
             if indicator in bias_indicators:
                 value = bias_indicators[indicator]
-                level = "High" if value >= 0.7 else "Moderate" if value >= 0.4 else "Low"
-                prompt += f"- {indicator.replace('_', ' ').title()}: {value:.2f} ({level})\n"
+                prompt += f"- {indicator.replace('_', ' ').title()}: {value:.2f} ({bias_level(value)})\n"
 
         # Debug: Add all available indicators if none of the key ones were found
-        if not any(indicator in bias_indicators for indicator in key_indicators):
+        if not any(indicator in bias_indicators for indicator in KEY_INDICATORS):
             prompt += "\nAll available indicators:\n"
             for indicator, value in bias_indicators.items():
-                level = "High" if value >= 0.7 else "Moderate" if value >= 0.4 else "Low"
-                prompt += f"- {indicator.replace('_', ' ').title()}: {value:.2f} ({level})\n"
+                prompt += f"- {indicator.replace('_', ' ').title()}: {value:.2f} ({bias_level(value)})\n"
                 
-        prompt += f"""
+        prompt += RESPONSE_FORMAT
 
-Please provide specific, actionable recommendations in the following categories. Format your response as JSON with these exact keys:
+        return prompt
+    
+    def create_profile_prompt(self, profile: Dict[str, Any]) -> str:
+        """Create a prompt from a normalized profile, shared by every dog with that profile"""
+        breed = profile.get('breed')
+        breed = breed.title() if breed else 'Unknown breed'
+        
+        prompt = f"""You are a professional dog behaviorist and trainer. Based on the Dog Personality Questionnaire (DPQ) results below, provide personalized recommendations for this dog, a {breed}.
 
-{{
-  "training_tips": [
-    "Specific training advice based on personality",
-    "Methods that work best for this personality type",
-    "Training challenges to watch for"
-  ],
-  "exercise_needs": [
-    "Exercise recommendations based on activity level",
-    "Types of physical activities that suit this dog",
-    "Mental stimulation suggestions"
-  ],
-  "socialization": [
-    "Social interaction recommendations",
-    "How to handle social situations",
-    "Building confidence tips"
-  ],
-  "daily_care": [
-    "Daily routine suggestions",
-    "Environmental considerations",
-    "Stress management tips"
-  ],
-  "ai_communication": [
-    "How AI should communicate with this dog's personality",
-    "Tone and approach recommendations for AI translation",
-    "Behavioral interpretation guidelines for AI"
-  ]
-}}
+PERSONALITY ASSESSMENT RESULTS:
 
-Make recommendations specific to this dog's personality profile. Avoid generic advice - focus on what makes this dog unique based on the DPQ results."""
+Dog Information:
+- Breed: {breed}
 
+Personality Factor Levels (1-7 scale: Low below 4.5, Moderate 4.5-5.5, High 5.5 and above):
+"""
+        for factor, level in profile.get('factors', {}).items():
+            prompt += f"- {factor}: {level}\n"
+        
+        prompt += """
+Key Behavioral Indicators (0-1 scale: Low below 0.4, Moderate 0.4-0.7, High 0.7 and above):
+"""
+        for indicator, level in profile.get('indicators', {}).items():
+            prompt += f"- {indicator.replace('_', ' ').title()}: {level}\n"
+        
+        prompt += RESPONSE_FORMAT
+        
         return prompt
     
     def _parse_claude_response(self, response_text: str) -> Dict[str, List[str]]:
         """Parse Claude's JSON response into structured recommendations"""
         try:
-            # Try to extract JSON from the response
-            start_idx = response_text.find('{')
-            end_idx = response_text.rfind('}') + 1
-            
-            if start_idx != -1 and end_idx != -1:
-                json_str = response_text[start_idx:end_idx]
-                recommendations = json.loads(json_str)
-                
-                # Validate structure
-                expected_keys = ['training_tips', 'exercise_needs', 'socialization', 'daily_care', 'ai_communication']
-                for key in expected_keys:
-                    if key not in recommendations:
-                        recommendations[key] = []
-                
-                return recommendations
-            else:
-                raise ValueError("No JSON found in response")
-                
+            return extract_recommendations(response_text)
         except Exception as e:
             print(f"Error parsing Claude response: {e}")
             print(f"Raw response: {response_text[:500]}...")
@@ -217,22 +374,28 @@ Make recommendations specific to this dog's personality profile. Avoid generic a
         }
 
 # Integration function for your existing code
-def replace_hardcoded_recommendations(dpq_results_dict: Dict, dog_info: Dict, api_key: str = None) -> Dict[str, List[str]]:
+def replace_hardcoded_recommendations(dpq_results_dict: Dict, dog_info: Dict, api_key: str = None,
+                                      use_cache: bool = True,
+                                      cache: Optional[RecommendationCache] = None) -> Dict[str, List[str]]:
     """
     Replace hardcoded recommendations with Claude API-generated ones
     
+    By default recommendations are generated from the normalized profile
+    (breed, factor levels, bias bands) and cached, so only the first dog with
+    a given profile waits for Claude.
+    
     Args:
         dpq_results_dict: DPQ results dictionary
         dog_info: Dog information dictionary
         api_key: Claude API key (optional if set in environment)
+        use_cache: Look up and store recommendations in the recommendation cache.
+            False sends the full per-dog prompt every time.
+        cache: Cache to use. Defaults to the process-wide cache for PROMPT_VERSION.
     
     Returns:
         Dictionary with AI-generated recommendations
     """
     try:
-        # Initialize Claude recommender
-        recommender = ClaudeRecommendationGenerator(api_key=api_key)
-        
         # Prepare personality data
         personality_data = {
             'dog_info': dog_info,
@@ -241,8 +404,11 @@ def replace_hardcoded_recommendations(dpq_results_dict: Dict, dog_info: Dict, ap
             'personality_profile': dpq_results_dict.get('personality_profile', {})
         }
         
-        # Generate recommendations
-        recommendations = recommender.generate_recommendations(personality_data)
+        if use_cache:
+            recommendations = _cached_recommendations(personality_data, api_key, cache)
+        else:
+            recommender = ClaudeRecommendationGenerator(api_key=api_key)
+            recommendations = recommender.generate_recommendations(personality_data)
         
         # Convert to format expected by your existing code
         formatted_recommendations = {
@@ -265,3 +431,42 @@ def replace_hardcoded_recommendations(dpq_results_dict: Dict, dog_info: Dict, ap
             'ai_communication_guidelines': ["Use gentle, consistent communication approaches"]
         }
 
+
+def _cached_recommendations(personality_data: Dict, api_key: Optional[str],
+                            cache: Optional[RecommendationCache]) -> Dict[str, List[str]]:
+    """Profile recommendations from the cache, generating and storing them on a miss"""
+    if cache is None:
+        cache = get_recommendation_cache(PROMPT_VERSION)
+    profile = recommendation_profile(personality_data)
+    key = cache.key(profile)
+    recommendations = cache.get(key)
+    if recommendations is not None:
+        return recommendations
+    
+    recommender = ClaudeRecommendationGenerator(api_key=api_key)
+    try:
+        recommendations = recommender.generate_profile_recommendations(profile)
+    except Exception as e:
+        print(f"Error generating Claude recommendations: {e}")
+        return recommender._fallback_recommendations()
+    cache.put(key, recommendations)
+    return recommendations
+
+
+async def acached_recommendations(personality_data: Dict, recommender: ClaudeRecommendationGenerator,
+                                  cache: Optional[RecommendationCache] = None) -> Dict[str, List[str]]:
+    """
+    Async profile recommendations from the cache, generating and storing them on a miss
+    
+    Unlike _cached_recommendations this raises when Claude fails, so callers
+    can keep what they already have instead of a generic fallback.
+    """
+    if cache is None:
+        cache = get_recommendation_cache(PROMPT_VERSION)
+    profile = recommendation_profile(personality_data)
+    key = cache.key(profile)
+    recommendations = await cache.aget(key)
+    if recommendations is None:
+        recommendations = await recommender.agenerate_profile_recommendations(profile)
+        await cache.aput(key, recommendations)
+    return recommendations
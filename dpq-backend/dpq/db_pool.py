@@ -0,0 +1,293 @@
+# db_pool.py - Shared asyncpg connection pool
+
+import asyncio
+import json
+import os
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict, Optional
+
+from .resource_accounting import AccountedConnection, record_db, record_db_wait
+from .response_formatter import JSONFragment
+
+try:
+    import orjson
+except ImportError:  # optional; the json module is used instead
+    orjson = None
+
+# pgbouncer listens on this port; its transaction pooling cannot keep prepared statements
+PGBOUNCER_PORT = 6543
+
+# Upper bounds (seconds) of the acquire wait histogram
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+
+# Version byte of the binary jsonb format
+_JSONB_VERSION = b"\x01"
+
+
+def dump_json(value: Any) -> bytes:
+    """UTF-8 JSON of a value (numpy scalars and arrays included when orjson is installed)"""
+    if orjson is not None:
+        return orjson.dumps(value, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(value).encode()
+
+
+def load_json(data: bytes) -> Any:
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+
+def encode_jsonb(value: Any) -> bytes:
+    """
+    Binary jsonb of a value
+
+    Fragments reuse their precomputed text and a str is taken to be JSON
+    text already (what asyncpg expects without a codec).
+    """
+    if isinstance(value, JSONFragment):
+        return _JSONB_VERSION + value.json.encode()
+    if isinstance(value, str):
+        return _JSONB_VERSION + value.encode()
+    return _JSONB_VERSION + dump_json(value)
+
+
+def decode_jsonb(data: bytes) -> Any:
+    return load_json(data[1:])
+
+
+async def register_jsonb_codec(connection) -> None:
+    """Exchange jsonb values with a connection as Python objects, in binary format"""
+    await connection.set_type_codec("jsonb", schema="pg_catalog", encoder=encode_jsonb,
+                                    decoder=decode_jsonb, format="binary")
+
+
+def connection_settings(pgbouncer: Optional[bool] = None) -> Dict[str, Any]:
+    """
+    asyncpg connect arguments from the DB_* environment variables
+
+    Args:
+        pgbouncer: Disable the prepared statement cache; None reads DPQ_DB_PGBOUNCER
+            ("auto" (default) enables it on port 6543, otherwise true/false)
+    """
+    port = int(os.getenv("DB_PORT", str(PGBOUNCER_PORT)))
+    if pgbouncer is None:
+        setting = os.getenv("DPQ_DB_PGBOUNCER", "auto").lower()
+        pgbouncer = port == PGBOUNCER_PORT if setting == "auto" else setting in ("1", "true", "yes")
+    settings = {
+        "host": os.getenv("DB_HOST"),
+        "database": os.getenv("DB_NAME"),
+        "user": os.getenv("DB_USER"),
+        "password": os.getenv("DB_PASSWORD"),
+        "port": port,
+    }
+    if pgbouncer:
+        settings["statement_cache_size"] = 0
+    return settings
+
+
+class DatabasePool:
+    """
+    asyncpg pool shared by every handler and service of a worker
+
+    Every connection gets the jsonb codec (register_jsonb_codec).
+    Connections idle for longer than health_check_after are checked with
+    SELECT 1 before being handed out; a connection that fails the check is
+    terminated and another one acquired. asyncpg itself closes connections
+    idle for max_idle and replaces connections that break while in use.
+    Acquire waits are kept in a histogram and added to the current request's
+    resource usage.
+    """
+
+    def __init__(self, min_size: int = 2, max_size: int = 10, acquire_timeout: float = 10.0,
+                 health_check_after: float = 30.0, max_idle: float = 300.0,
+                 settings: Optional[Dict[str, Any]] = None, create_pool: Optional[Callable] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Args:
+            min_size: Connections opened at start and kept open
+            max_size: Most connections open at once
+            acquire_timeout: Seconds to wait for a free connection
+            health_check_after: Idle seconds after which a connection is checked before use
+            max_idle: Idle seconds after which asyncpg closes a connection (0 keeps them)
+            settings: asyncpg connect arguments (default: connection_settings())
+            create_pool: asyncpg.create_pool or a stand-in for tests
+        """
+        if not 0 <= min_size <= max_size or max_size < 1:
+            raise ValueError(f"Invalid pool size: min {min_size}, max {max_size}")
+        self.min_size = min_size
+        self.max_size = max_size
+        self.acquire_timeout = acquire_timeout
+        self.health_check_after = health_check_after
+        self.max_idle = max_idle
+        self.settings = settings if settings is not None else connection_settings()
+        self._create_pool = create_pool
+        self._clock = clock
+        self._pool = None
+        self._started_at = 0.0
+        # Last release time per connection, keyed by backend PID and kept in release order
+        self._released: Dict[int, float] = {}
+        self._acquires = 0
+        self._wait_seconds = 0.0
+        self._max_wait = 0.0
+        self._wait_counts = [0] * (len(WAIT_BUCKETS) + 1)
+        self._timeouts = 0
+        self._health_checks = 0
+        self._unhealthy = 0
+
+    @property
+    def pgbouncer(self) -> bool:
+        return self.settings.get("statement_cache_size") == 0
+
+    async def start(self) -> "DatabasePool":
+        """Open the pool's min_size connections"""
+        create_pool = self._create_pool
+        if create_pool is None:
+            import asyncpg
+            create_pool = asyncpg.create_pool
+        self._pool = await create_pool(min_size=self.min_size, max_size=self.max_size,
+                                       max_inactive_connection_lifetime=self.max_idle,
+                                       init=register_jsonb_codec, **self.settings)
+        self._started_at = self._clock()
+        return self
+
+    async def close(self) -> None:
+        """Close every connection, waiting for acquired ones to be released"""
+        if self._pool is not None:
+            pool, self._pool = self._pool, None
+            await pool.close()
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[AccountedConnection]:
+        """
+        A healthy connection for the duration of the block
+
+        Raises:
+            RuntimeError: The pool is not started
+            asyncio.TimeoutError: No connection became free within acquire_timeout
+        """
+        pool = self._pool
+        if pool is None:
+            raise RuntimeError("Database pool is not started")
+        connection = await self._checkout(pool)
+        try:
+            yield AccountedConnection(connection)
+        finally:
+            self._mark_released(connection)
+            await pool.release(connection)
+
+    async def _checkout(self, pool):
+        deadline = self._clock() + self.acquire_timeout
+        waited = 0.0
+        try:
+            # Every failed check discards a connection, so max_size + 1 attempts reach a new one
+            for _ in range(self.max_size + 1):
+                start = time.perf_counter()
+                try:
+                    connection = await pool.acquire(timeout=max(deadline - self._clock(), 0))
+                except asyncio.TimeoutError:
+                    self._timeouts += 1
+                    raise
+                finally:
+                    waited += time.perf_counter() - start
+                if await self._healthy(pool, connection):
+                    return connection
+            raise ConnectionError("No healthy database connection available")
+        finally:
+            self._record_wait(waited)
+
+    async def _healthy(self, pool, connection) -> bool:
+        last_used = self._released.get(connection.get_server_pid(), self._started_at)
+        if self._clock() - last_used < self.health_check_after:
+            return True
+        self._health_checks += 1
+        start = time.perf_counter()
+        try:
+            await connection.fetchval("SELECT 1", timeout=min(self.acquire_timeout, 5.0))
+            return True
+        except Exception:
+            self._unhealthy += 1
+            self._released.pop(connection.get_server_pid(), None)
+            connection.terminate()
+            await pool.release(connection)
+            return False
+        finally:
+            record_db(1, time.perf_counter() - start)
+
+    def _mark_released(self, connection) -> None:
+        pid = connection.get_server_pid()
+        self._released.pop(pid, None)
+        self._released[pid] = self._clock()
+        # PIDs of connections asyncpg closed are never released again; drop the oldest
+        while len(self._released) > 4 * self.max_size:
+            del self._released[next(iter(self._released))]
+
+    def _record_wait(self, seconds: float) -> None:
+        self._acquires += 1
+        self._wait_seconds += seconds
+        self._max_wait = max(self._max_wait, seconds)
+        self._wait_counts[next((i for i, bound in enumerate(WAIT_BUCKETS) if seconds <= bound),
+                               len(WAIT_BUCKETS))] += 1
+        record_db_wait(seconds)
+
+    def stats(self) -> Dict[str, Any]:
+        """Pool size, acquire waits and health checks"""
+        pool = self._pool
+        return {
+            "started": pool is not None,
+            "pgbouncer": self.pgbouncer,
+            "min_size": self.min_size,
+            "max_size": self.max_size,
+            "size": pool.get_size() if pool is not None else 0,
+            "idle": pool.get_idle_size() if pool is not None else 0,
+            "acquires": self._acquires,
+            "acquire_timeouts": self._timeouts,
+            "mean_wait_seconds": round(self._wait_seconds / self._acquires, 6) if self._acquires else None,
+            "max_wait_seconds": round(self._max_wait, 6),
+            "wait_histogram": {
+                **{f"<={bound}": count for bound, count in zip(WAIT_BUCKETS, self._wait_counts)},
+                f">{WAIT_BUCKETS[-1]}": self._wait_counts[-1],
+            },
+            "health_checks": self._health_checks,
+            "unhealthy_connections": self._unhealthy,
+        }
+
+
+_db_pool: Optional[DatabasePool] = None
+_db_pool_lock = threading.Lock()
+
+
+def get_db_pool() -> Optional[DatabasePool]:
+    """The worker's pool, or None outside the app (scripts and jobs connect per use)"""
+    return _db_pool
+
+
+async def start_db_pool() -> DatabasePool:
+    """
+    Start the worker's pool (called from the app lifespan)
+
+    Configured by DPQ_DB_POOL_MIN (default 2), DPQ_DB_POOL_MAX (default 10),
+    DPQ_DB_ACQUIRE_TIMEOUT (seconds, default 10), DPQ_DB_HEALTH_CHECK_AFTER
+    (idle seconds, default 30), DPQ_DB_MAX_IDLE (seconds, default 300) and
+    DPQ_DB_PGBOUNCER (see connection_settings).
+    """
+    global _db_pool
+    pool = DatabasePool(min_size=int(os.getenv("DPQ_DB_POOL_MIN", "2")),
+                        max_size=int(os.getenv("DPQ_DB_POOL_MAX", "10")),
+                        acquire_timeout=float(os.getenv("DPQ_DB_ACQUIRE_TIMEOUT", "10")),
+                        health_check_after=float(os.getenv("DPQ_DB_HEALTH_CHECK_AFTER", "30")),
+                        max_idle=float(os.getenv("DPQ_DB_MAX_IDLE", "300")))
+    await pool.start()
+    with _db_pool_lock:
+        previous, _db_pool = _db_pool, pool
+    if previous is not None:
+        await previous.close()
+    return pool
+
+
+async def close_db_pool() -> None:
+    global _db_pool
+    with _db_pool_lock:
+        pool, _db_pool = _db_pool, None
+    if pool is not None:
+        await pool.close()
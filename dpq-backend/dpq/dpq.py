@@ -26,6 +26,7 @@ from datetime import datetime
 import json
 from typing import Dict, List, Tuple, Optional
 from dataclasses import dataclass, asdict
+from functools import lru_cache
 import warnings
 
 warnings.filterwarnings('ignore')
@@ -35,6 +36,173 @@ plt.style.use('default')
 sns.set_palette("husl")
 
 
+# Output order of the AI translation bias indicators
+BIAS_INDICATOR_NAMES = (
+    "fearfulness_bias", "aggression_bias", "excitability_bias", "trainability_bias",
+    "social_confidence", "dog_sociability", "environmental_adaptability", "handling_tolerance",
+    "attention_seeking", "activity_level", "impulse_control",
+    "territorial_tendency", "resource_guarding", "prey_drive"
+)
+
+
+# Factors whose score (>= 5.0) marks a dominant trait, in report order
+DOMINANT_TRAIT_RULES = (
+    ("Factor 1 - Fearfulness", "Cautious/Fearful"),
+    ("Factor 2 - Aggression towards People", "Protective/Aggressive"),
+    ("Factor 3 - Activity/Excitability", "Energetic/Excitable"),
+    ("Factor 4 - Responsiveness to Training", "Trainable/Responsive"),
+    ("Factor 5 - Aggression towards Animals", "Animal-Reactive")
+)
+
+
+class ScoringPlan:
+    """
+    Flat, precompiled form of a DPQ scoring structure.
+
+    Built once per distinct structure (see get_scoring_plan) and shared by every
+    DogPersonalityQuestionnaire in the process. Scoring walks index tuples instead
+    of the nested structure dict, so a single assessment is scored in plain Python
+    without temporary lists or numpy calls.
+    """
+
+    def __init__(self, structure_key: Tuple, n_items: int):
+        self.n_items = n_items
+        self.factor_names = tuple(factor for factor, _ in structure_key)
+        self.facet_names = tuple(facet for _, facets in structure_key for facet, _, _ in facets)
+        self.bias_names = BIAS_INDICATOR_NAMES
+
+        # (item, reversed) pairs per facet and facet indices per factor
+        facet_items = []
+        factor_facets = []
+        for _, facets in structure_key:
+            start = len(facet_items)
+            for _, items, reverse in facets:
+                facet_items.append(tuple((item, item in reverse) for item in items))
+            factor_facets.append(tuple(range(start, len(facet_items))))
+        self.facet_items = tuple(facet_items)
+        self.factor_facets = tuple(factor_facets)
+
+        # Weight matrices for vectorized batch scoring
+        self.reverse_vector = np.zeros(n_items, dtype=bool)
+        self.facet_weights = np.zeros((n_items, len(self.facet_names)))
+        self.factor_weights = np.zeros((len(self.facet_names), len(self.factor_names)), dtype=np.int64)
+        for facet_index, items in enumerate(self.facet_items):
+            for item, reverse in items:
+                self.facet_weights[item - 1, facet_index] = 1
+                self.reverse_vector[item - 1] |= reverse
+        for factor_index, facet_indices in enumerate(self.factor_facets):
+            self.factor_weights[list(facet_indices), factor_index] = 1
+        for array in (self.reverse_vector, self.facet_weights, self.factor_weights):
+            array.flags.writeable = False
+
+        # Positions used by the bias indicator and profile formulas
+        factor_index = {name: i for i, name in enumerate(self.factor_names)}
+        facet_index = {name: i for i, name in enumerate(self.facet_names)}
+        self._fearfulness = factor_index["Factor 1 - Fearfulness"]
+        self._aggression_people = factor_index["Factor 2 - Aggression towards People"]
+        self._excitability = factor_index["Factor 3 - Activity/Excitability"]
+        self._trainability = factor_index["Factor 4 - Responsiveness to Training"]
+        self._aggression_animals = factor_index["Factor 5 - Aggression towards Animals"]
+        self._fear_of_people = facet_index["Fear of People"]
+        self._fear_of_dogs = facet_index["Fear of Dogs"]
+        self._nonsocial_fear = facet_index["Nonsocial Fear"]
+        self._fear_of_handling = facet_index["Fear of Handling"]
+        self._playfulness = facet_index["Playfulness"]
+        self._companionability = facet_index["Companionability"]
+        self._excitability_facet = facet_index["Excitability"]
+        self._active_engagement = facet_index["Active Engagement"]
+        self._controllability = facet_index["Controllability"]
+        self._general_aggression = facet_index["General Aggression"]
+        self._situational_aggression = facet_index["Situational Aggression"]
+        self._prey_drive = facet_index["Prey Drive"]
+        self.dominant_trait_rules = tuple((factor_index[factor], trait) for factor, trait in DOMINANT_TRAIT_RULES)
+
+    def score(self, responses: Dict[int, int]) -> Tuple[List[float], List[float]]:
+        """Return (facet_values, factor_values) for one response dict, in plan order"""
+        get = responses.get
+        facet_values = []
+        for items in self.facet_items:
+            total = 0
+            count = 0
+            for item, reverse in items:
+                value = get(item)
+                if value is not None:
+                    total += 8 - value if reverse else value
+                    count += 1
+            facet_values.append(total / count if count else 4.0)
+
+        # Summing left to right matches np.mean rounding for these short lists
+        factor_values = [
+            sum([facet_values[i] for i in facet_indices]) / len(facet_indices)
+            for facet_indices in self.factor_facets
+        ]
+        return facet_values, factor_values
+
+    def bias_indicators(self, factors, facets) -> Tuple:
+        """
+        Evaluate the bias indicator formulas, in bias_names order
+
+        factors and facets are indexable in plan order. Elements may be floats or
+        numpy columns; the formulas are plain arithmetic and work for both.
+        """
+        return (
+            # Communication biases
+            factors[self._fearfulness] / 7.0,
+            (factors[self._aggression_people] + factors[self._aggression_animals]) / 14.0,
+            factors[self._excitability] / 7.0,
+            factors[self._trainability] / 7.0,
+
+            # Specific behavioral biases
+            (7 - facets[self._fear_of_people]) / 7.0,
+            (7 - facets[self._fear_of_dogs] + facets[self._playfulness]) / 14.0,
+            (7 - facets[self._nonsocial_fear]) / 7.0,
+            (7 - facets[self._fear_of_handling]) / 7.0,
+
+            # Energy and attention biases
+            facets[self._companionability] / 7.0,
+            (facets[self._excitability_facet] + facets[self._active_engagement]) / 14.0,
+            facets[self._controllability] / 7.0,
+
+            # Territorial and protective biases
+            facets[self._general_aggression] / 7.0,
+            facets[self._situational_aggression] / 7.0,
+            facets[self._prey_drive] / 7.0
+        )
+
+    def profile(self, factors) -> Dict[str, str]:
+        """Build the interpretive personality profile from factor values in plan order"""
+        profile = {}
+        for name, score in zip(self.factor_names, factors):
+            if score >= 5.5:
+                profile[name] = "High"
+            elif score >= 4.5:
+                profile[name] = "Moderate"
+            else:
+                profile[name] = "Low"
+
+        dominant_traits = [trait for index, trait in self.dominant_trait_rules if factors[index] >= 5.0]
+        profile["Dominant_Traits"] = ", ".join(dominant_traits) if dominant_traits else "Balanced"
+        return profile
+
+
+def _structure_key(scoring_structure: Dict) -> Tuple:
+    """Hashable snapshot of a nested scoring structure"""
+    return tuple(
+        (factor, tuple((facet, tuple(info["items"]), frozenset(info["reverse"])) for facet, info in facets.items()))
+        for factor, facets in scoring_structure.items()
+    )
+
+
+@lru_cache(maxsize=None)
+def _compile_scoring_plan(structure_key: Tuple, n_items: int) -> ScoringPlan:
+    return ScoringPlan(structure_key, n_items)
+
+
+def get_scoring_plan(scoring_structure: Dict, n_items: int = 45) -> ScoringPlan:
+    """Return the process-wide compiled plan for a scoring structure"""
+    return _compile_scoring_plan(_structure_key(scoring_structure), n_items)
+
+
 @dataclass
 class DPQResults:
     """Data class to store DPQ assessment results"""
@@ -141,6 +309,15 @@ class DogPersonalityQuestionnaire:
             7: "Agree strongly"
         }
 
+        # Compiled once per process and shared across instances
+        self.plan = get_scoring_plan(self.scoring_structure, len(self.questions))
+        self.factor_names = list(self.plan.factor_names)
+        self.facet_names = list(self.plan.facet_names)
+        self.bias_names = list(self.plan.bias_names)
+        self.reverse_vector = self.plan.reverse_vector
+        self.facet_weights = self.plan.facet_weights
+        self.factor_weights = self.plan.factor_weights
+
     def display_questionnaire(self) -> None:
         """Display the complete questionnaire for manual completion"""
         print("=" * 80)
@@ -191,41 +368,18 @@ class DogPersonalityQuestionnaire:
 
     def score_assessment(self, responses: Dict[int, int], dog_id: str = "Unknown") -> DPQResults:
         """Score the DPQ assessment and return comprehensive results"""
+        plan = self.plan
        
-        # Reverse code items where needed
-        processed_responses = responses.copy()
-        for factor_name, facets in self.scoring_structure.items():
-            for facet_name, facet_info in facets.items():
-                for item in facet_info["reverse"]:
-                    if item in processed_responses:
-                        processed_responses[item] = 8 - processed_responses[item]
-       
-        # Calculate facet scores
-        facet_scores = {}
-        for factor_name, facets in self.scoring_structure.items():
-            for facet_name, facet_info in facets.items():
-                items = facet_info["items"]
-                valid_scores = [processed_responses[item] for item in items if item in processed_responses]
-                if valid_scores:
-                    facet_scores[facet_name] = np.mean(valid_scores)
-                else:
-                    facet_scores[facet_name] = 4.0  # Neutral if no valid responses
-       
-        # Calculate factor scores
-        factor_scores = {}
-        for factor_name, facets in self.scoring_structure.items():
-            factor_facets = list(facets.keys())
-            valid_facet_scores = [facet_scores[facet] for facet in factor_facets if facet in facet_scores]
-            if valid_facet_scores:
-                factor_scores[factor_name] = np.mean(valid_facet_scores)
-            else:
-                factor_scores[factor_name] = 4.0
+        # Calculate facet and factor scores (reverse coding is part of the plan)
+        facet_values, factor_values = plan.score(responses)
+        facet_scores = dict(zip(plan.facet_names, facet_values))
+        factor_scores = dict(zip(plan.factor_names, factor_values))
        
         # Generate personality profile
-        personality_profile = self._generate_personality_profile(factor_scores, facet_scores)
+        personality_profile = plan.profile(factor_values)
        
         # Calculate bias indicators for AI translation
-        bias_indicators = self._calculate_bias_indicators(factor_scores, facet_scores)
+        bias_indicators = dict(zip(plan.bias_names, plan.bias_indicators(factor_values, facet_values)))
        
         return DPQResults(
             dog_id=dog_id,
@@ -237,71 +391,71 @@ class DogPersonalityQuestionnaire:
             bias_indicators=bias_indicators
         )
 
+    def responses_to_matrix(self, responses_list: List[Dict[int, int]]) -> np.ndarray:
+        """Pack response dicts into an N x 45 uint8 matrix (0 marks an unanswered item)"""
+        matrix = np.zeros((len(responses_list), len(self.questions)), dtype=np.uint8)
+        for row, responses in enumerate(responses_list):
+            for item, value in responses.items():
+                matrix[row, int(item) - 1] = value
+        return matrix
+
+    def score_many(self, responses: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Score a batch of assessments in one vectorized pass
+
+        Args:
+            responses: N x 45 matrix of 1-7 ratings, column i holding item i + 1.
+                       0 marks an unanswered item.
+
+        Returns:
+            Tuple of (facet_scores N x 15, factor_scores N x 5, bias_indicators N x 14),
+            with columns ordered as facet_names, factor_names and bias_names.
+            Values are identical to those produced by score_assessment.
+        """
+        matrix = np.asarray(responses)
+        if matrix.ndim != 2 or matrix.shape[1] != len(self.questions):
+            raise ValueError(f"Expected an N x {len(self.questions)} response matrix, got shape {matrix.shape}")
+        if matrix.size and (matrix.min() < 0 or matrix.max() > 7):
+            raise ValueError("Response values must be between 1 and 7 (0 for unanswered)")
+        matrix = matrix.astype(np.float64)
+
+        # Reverse code items where needed
+        answered = matrix > 0
+        coded = np.where(self.reverse_vector & answered, 8 - matrix, matrix)
+
+        # Facet scores are the mean of the answered items, neutral if none were answered.
+        # Item sums are small integers, so the float matmul is exact.
+        sums = coded @ self.facet_weights
+        counts = answered.astype(np.float64) @ self.facet_weights
+        facet_scores = np.where(counts > 0, sums / np.maximum(counts, 1), 4.0)
+
+        # Factor scores are the mean of their facets. Facet columns are accumulated in
+        # structure order (rather than with a matmul) so rounding matches np.mean exactly.
+        factor_scores = np.empty((matrix.shape[0], len(self.factor_names)))
+        for factor_index in range(len(self.factor_names)):
+            columns = np.flatnonzero(self.factor_weights[:, factor_index])
+            total = facet_scores[:, columns[0]].copy()
+            for column in columns[1:]:
+                total += facet_scores[:, column]
+            factor_scores[:, factor_index] = total / len(columns)
+
+        # The bias formulas are plain arithmetic, so they evaluate column-wise as-is
+        bias_indicators = np.column_stack(self.plan.bias_indicators(factor_scores.T, facet_scores.T))
+
+        return facet_scores, factor_scores, bias_indicators
+
     def _generate_personality_profile(self, factor_scores: Dict[str, float],
                                     facet_scores: Dict[str, float]) -> Dict[str, str]:
         """Generate interpretive personality profile"""
-        profile = {}
-       
-        # Factor interpretations
-        for factor, score in factor_scores.items():
-            if score >= 5.5:
-                level = "High"
-            elif score >= 4.5:
-                level = "Moderate"
-            else:
-                level = "Low"
-            profile[factor] = level
-       
-        # Overall personality summary
-        dominant_traits = []
-        if factor_scores["Factor 1 - Fearfulness"] >= 5.0:
-            dominant_traits.append("Cautious/Fearful")
-        if factor_scores["Factor 2 - Aggression towards People"] >= 5.0:
-            dominant_traits.append("Protective/Aggressive")
-        if factor_scores["Factor 3 - Activity/Excitability"] >= 5.0:
-            dominant_traits.append("Energetic/Excitable")
-        if factor_scores["Factor 4 - Responsiveness to Training"] >= 5.0:
-            dominant_traits.append("Trainable/Responsive")
-        if factor_scores["Factor 5 - Aggression towards Animals"] >= 5.0:
-            dominant_traits.append("Animal-Reactive")
-       
-        if not dominant_traits:
-            dominant_traits.append("Balanced")
-       
-        profile["Dominant_Traits"] = ", ".join(dominant_traits)
-       
-        return profile
+        return self.plan.profile([factor_scores[name] for name in self.plan.factor_names])
 
     def _calculate_bias_indicators(self, factor_scores: Dict[str, float],
                                  facet_scores: Dict[str, float]) -> Dict[str, float]:
         """Calculate bias indicators for AI translation system"""
-       
-        bias_indicators = {
-            # Communication biases
-            "fearfulness_bias": factor_scores["Factor 1 - Fearfulness"] / 7.0,
-            "aggression_bias": (factor_scores["Factor 2 - Aggression towards People"] +
-                              factor_scores["Factor 5 - Aggression towards Animals"]) / 14.0,
-            "excitability_bias": factor_scores["Factor 3 - Activity/Excitability"] / 7.0,
-            "trainability_bias": factor_scores["Factor 4 - Responsiveness to Training"] / 7.0,
-           
-            # Specific behavioral biases
-            "social_confidence": (7 - facet_scores["Fear of People"]) / 7.0,
-            "dog_sociability": (7 - facet_scores["Fear of Dogs"] + facet_scores["Playfulness"]) / 14.0,
-            "environmental_adaptability": (7 - facet_scores["Nonsocial Fear"]) / 7.0,
-            "handling_tolerance": (7 - facet_scores["Fear of Handling"]) / 7.0,
-           
-            # Energy and attention biases
-            "attention_seeking": facet_scores["Companionability"] / 7.0,
-            "activity_level": (facet_scores["Excitability"] + facet_scores["Active Engagement"]) / 14.0,
-            "impulse_control": facet_scores["Controllability"] / 7.0,
-           
-            # Territorial and protective biases
-            "territorial_tendency": facet_scores["General Aggression"] / 7.0,
-            "resource_guarding": facet_scores["Situational Aggression"] / 7.0,
-            "prey_drive": facet_scores["Prey Drive"] / 7.0
-        }
-       
-        return bias_indicators
+        plan = self.plan
+        factors = [factor_scores[name] for name in plan.factor_names]
+        facets = [facet_scores[name] for name in plan.facet_names]
+        return dict(zip(plan.bias_names, plan.bias_indicators(factors, facets)))
 
 
 class DPQAnalyzer:
@@ -357,103 +511,16 @@ class DPQAnalyzer:
     
     def generate_report(self, results: DPQResults) -> str:
         """Generate a comprehensive assessment report"""
-        
-        report = f"""
-{'='*80}
-DOG PERSONALITY ASSESSMENT REPORT
-{'='*80}
+        return self.report_engine.render_text(results)
 
-Dog ID: {results.dog_id}
-Assessment Date: {results.assessment_date}
-Total Questions Completed: {len(results.raw_scores)}
-
-{'='*80}
-PERSONALITY FACTOR SCORES
-{'='*80}
-
-"""
-        
-        # Factor scores section
-        for factor, score in results.factor_scores.items():
-            interpretation = results.personality_profile.get(factor, "Unknown")
-            description = self.factor_descriptions.get(factor, {})
-            
-            report += f"{factor}:\n"
-            report += f"  Score: {score:.2f}/7.00 ({interpretation})\n"
-            report += f"  Description: {description.get('description', 'No description available')}\n"
-            
-            if interpretation == "High":
-                report += f"  Interpretation: {description.get('high', '')}\n"
-            elif interpretation == "Low":
-                report += f"  Interpretation: {description.get('low', '')}\n"
-            else:
-                report += f"  Interpretation: Moderate levels of this trait\n"
-            report += "\n"
-        
-        # Personality summary
-        report += f"""
-{'='*80}
-PERSONALITY SUMMARY
-{'='*80}
-
-Dominant Traits: {results.personality_profile.get('Dominant_Traits', 'Unknown')}
-
-"""
-        
-        # Bias indicators section
-        report += f"""
-{'='*80}
-AI TRANSLATION BIAS INDICATORS
-{'='*80}
-
-These indicators help calibrate AI translation systems to your dog's personality:
-
-"""
-        
-        # Group bias indicators by category
-        communication_biases = ["fearfulness_bias", "aggression_bias", "excitability_bias", "trainability_bias"]
-        social_biases = ["social_confidence", "dog_sociability", "environmental_adaptability", "handling_tolerance"]
-        behavioral_biases = ["attention_seeking", "activity_level", "impulse_control"]
-        protective_biases = ["territorial_tendency", "resource_guarding", "prey_drive"]
-        
-        categories = [
-            ("Communication Interpretation Biases", communication_biases),
-            ("Social Interaction Biases", social_biases),
-            ("Behavioral Response Biases", behavioral_biases),
-            ("Protective/Territorial Biases", protective_biases)
-        ]
-        
-        for category_name, bias_list in categories:
-            report += f"\n{category_name}:\n"
-            report += "-" * len(category_name) + "\n"
-            
-            for bias in bias_list:
-                if bias in results.bias_indicators:
-                    value = results.bias_indicators[bias]
-                    description = self.bias_descriptions.get(bias, "No description available")
-                    level = self._interpret_bias_level(value)
-                    
-                    report += f"  {bias.replace('_', ' ').title()}: {value:.3f} ({level})\n"
-                    report += f"    → {description}\n"
-        
-        # Recommendations section
-        report += f"""
-
-{'='*80}
-AI TRANSLATION RECOMMENDATIONS
-{'='*80}
-
-Based on this personality profile, AI translation systems should:
-
-"""
-        
-        recommendations = self._generate_recommendations(results)
-        for rec in recommendations:
-            report += f"• {rec}\n"
-        
-        report += f"\n{'='*80}\n"
-        
-        return report
+    @property
+    def report_engine(self):
+        """Compiled report templates (text, HTML, JSON), built on first use"""
+        engine = getattr(self, "_report_engine", None)
+        if engine is None:
+            from .reports import ReportEngine
+            engine = self._report_engine = ReportEngine(self)
+        return engine
     
     def _interpret_bias_level(self, value: float) -> str:
         """Interpret bias indicator levels"""
@@ -523,6 +590,23 @@ Based on this personality profile, AI translation systems should:
             print(f"Error loading results: {e}")
             return None
     
+    def export_results_to_store(self, results_list: List[DPQResults], directory: str):
+        """Append DPQ results to the columnar assessment store at directory"""
+        from .assessment_store import AssessmentStore
+        store = AssessmentStore(directory)
+        store.append_results(results_list)
+        return store
+
+    def open_results_store(self, directory: str):
+        """Open a columnar assessment store for memory-mapped analysis"""
+        from .assessment_store import AssessmentStore
+        return AssessmentStore(directory)
+    
+    def analyze_trends(self, results_list: List[DPQResults]) -> Dict:
+        """Per-factor slopes, significance, rolling means and change points over a dog's history"""
+        from .trends import TrendEngine
+        return TrendEngine().from_results(results_list)
+    
     def compare_assessments(self, results_list: List[DPQResults]) -> Dict:
         """Compare multiple assessments (e.g., over time)"""
         if len(results_list) < 2:
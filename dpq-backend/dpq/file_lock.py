@@ -0,0 +1,32 @@
+# file_lock.py - Serialize read-modify-write of files shared by worker processes
+
+import os
+from contextlib import contextmanager
+from typing import Iterator
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-worker deployments only
+    fcntl = None
+
+
+@contextmanager
+def locked_file(path: str) -> Iterator[None]:
+    """
+    Hold an exclusive lock on path for the duration of the block
+
+    The lock is an flock on a "<path>.lock" sibling, so the file itself can be
+    replaced atomically while the lock is held. Processes that do not take the
+    lock are not excluded.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path + ".lock", "a") as lock:
+        if fcntl is not None:
+            fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_UN)
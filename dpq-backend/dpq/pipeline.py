@@ -0,0 +1,122 @@
+# pipeline.py - Run declared stages concurrently in dependency order
+
+import asyncio
+import inspect
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from .resource_accounting import stage as accounted_stage
+
+
+@dataclass(frozen=True)
+class Stage:
+    """
+    One step of a pipeline
+
+    fn is called with the outputs of the stages (or inputs) named in after
+    as keyword arguments. Coroutine functions run on the event loop; other
+    callables run in a thread (asyncio.to_thread), and an awaitable they
+    return is awaited on the loop.
+    """
+    name: str
+    fn: Callable[..., Any]
+    after: Tuple[str, ...] = ()
+
+
+class StageGraph:
+    """
+    Stages with declared dependencies, each run at most once per execution
+
+    run() starts every stage as soon as the stages it depends on have
+    finished, so independent stages overlap. Outputs are memoized for the
+    execution: a stage that several others depend on runs once and they all
+    receive its output. Stages that become ready together start in the
+    order they were added.
+    """
+
+    def __init__(self, stages: Iterable[Stage] = (), inputs: Iterable[str] = ()):
+        """
+        Args:
+            stages: Stages of the graph
+            inputs: Names of values passed to run() that stages may depend on
+        """
+        self.inputs = tuple(inputs)
+        self.stages: Dict[str, Stage] = {}
+        for stage in stages:
+            self.add(stage)
+
+    def add(self, stage: Stage) -> "StageGraph":
+        """Add a stage; raises ValueError on duplicate names, unknown dependencies or cycles"""
+        if stage.name in self.stages or stage.name in self.inputs:
+            raise ValueError(f"Duplicate stage: {stage.name}")
+        unknown = [name for name in stage.after if name not in self.stages and name not in self.inputs]
+        if unknown:
+            # Stages are added after their dependencies, which also rules out cycles
+            raise ValueError(f"Stage {stage.name} depends on unknown stages: {', '.join(unknown)}")
+        self.stages[stage.name] = stage
+        return self
+
+    def dependencies(self, targets: Iterable[str]) -> List[str]:
+        """The targets and every stage they depend on, in a runnable order"""
+        order: List[str] = []
+        seen = set(self.inputs)
+
+        def visit(name: str) -> None:
+            if name in seen:
+                return
+            if name not in self.stages:
+                raise ValueError(f"Unknown stage: {name}")
+            seen.add(name)
+            for dependency in self.stages[name].after:
+                visit(dependency)
+            order.append(name)
+
+        for target in targets:
+            visit(target)
+        return order
+
+    async def run(self, targets: Optional[Iterable[str]] = None, **inputs: Any) -> Dict[str, Any]:
+        """
+        Run the targets (default: every stage) and the stages they depend on
+
+        Args:
+            targets: Stages whose outputs are needed
+            **inputs: Values of the graph's inputs
+
+        Returns:
+            Inputs and the output of every stage that ran, by name
+
+        Raises:
+            The first exception raised by a stage; stages still running are cancelled
+        """
+        missing = [name for name in self.inputs if name not in inputs]
+        if missing:
+            raise ValueError(f"Missing pipeline inputs: {', '.join(missing)}")
+        outputs: Dict[str, Any] = dict(inputs)
+        tasks: Dict[str, asyncio.Task] = {}
+
+        async def execute(stage: Stage) -> Any:
+            await asyncio.gather(*(tasks[name] for name in stage.after if name in tasks))
+            kwargs = {name: outputs[name] for name in stage.after}
+            with accounted_stage(stage.name):
+                if inspect.iscoroutinefunction(stage.fn):
+                    result = await stage.fn(**kwargs)
+                else:
+                    result = await asyncio.to_thread(stage.fn, **kwargs)
+                    if inspect.isawaitable(result):
+                        result = await result
+            outputs[stage.name] = result
+            return result
+
+        # Every task exists before any runs, so a stage awaited by several others starts once
+        for name in self.dependencies(self.stages if targets is None else targets):
+            tasks[name] = asyncio.ensure_future(execute(self.stages[name]))
+        try:
+            await asyncio.gather(*tasks.values())
+        except BaseException:
+            for task in tasks.values():
+                task.cancel()
+            # Let cancelled stages unwind before reporting the failure
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+            raise
+        return outputs
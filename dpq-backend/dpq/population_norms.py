@@ -0,0 +1,286 @@
+# population_norms.py - Streaming population percentiles for DPQ scores
+
+import os
+import threading
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from .dpq import DogPersonalityQuestionnaire
+from .file_lock import locked_file
+
+# Every facet score is a mean of 1-3 integer ratings (denominator 1, 2 or 3) and
+# every factor score is a mean of 2-4 facet scores, so all reachable scores are
+# multiples of 1/72 on [1, 7]. Histograms on that grid are exact quantile sketches.
+GRID_RESOLUTION = 72
+GRID_MIN = 1.0
+GRID_MAX = 7.0
+N_BINS = int((GRID_MAX - GRID_MIN) * GRID_RESOLUTION) + 1
+
+ALL_DOGS = "__all__"
+
+
+def normalize_breed(breed: Optional[str]) -> Optional[str]:
+    """Canonical breed key, or None when the breed is unknown"""
+    if not breed:
+        return None
+    key = " ".join(str(breed).lower().split())
+    if not key or key in ("unknown", "unknown breed", "mixed", "mixed breed"):
+        return None
+    return key
+
+
+class PopulationNorms:
+    """
+    Mergeable per-breed score distributions for every facet and factor
+
+    Counts are kept on the exact score grid, one (metrics x bins) histogram per
+    breed plus one for the whole population. Updates are O(metrics); percentile
+    lookups index a cached mid-rank table, rebuilt in constant time (independent
+    of the number of assessments) after updates.
+
+    Workers may share one file: save() adds the counts gathered since the last
+    save to the file's instead of overwriting it.
+    """
+
+    def __init__(self, facet_names: Optional[Sequence[str]] = None,
+                 factor_names: Optional[Sequence[str]] = None,
+                 min_breed_samples: int = 30):
+        """
+        Args:
+            facet_names: Facet order. Defaults to the standard DPQ.
+            factor_names: Factor order. Defaults to the standard DPQ.
+            min_breed_samples: Breeds with fewer assessments report no breed percentile
+        """
+        if facet_names is None or factor_names is None:
+            dpq = DogPersonalityQuestionnaire()
+            facet_names = dpq.facet_names
+            factor_names = dpq.factor_names
+        self.facet_names = list(facet_names)
+        self.factor_names = list(factor_names)
+        self.metric_names = self.factor_names + self.facet_names
+        self.metric_index = {name: i for i, name in enumerate(self.metric_names)}
+        self.min_breed_samples = min_breed_samples
+
+        self._counts: Dict[str, np.ndarray] = {}
+        self._totals: Dict[str, int] = {}
+        self._tables: Dict[str, np.ndarray] = {}
+        # Counts added since the last save (save() adds them to the file's)
+        self._unsaved: Dict[str, np.ndarray] = {}
+        self._lock = threading.Lock()
+        self.updates_since_save = 0
+
+    @staticmethod
+    def score_to_bin(score):
+        """Grid bin for a score (scalar or array)"""
+        bins = np.rint((np.asarray(score, dtype=np.float64) - GRID_MIN) * GRID_RESOLUTION)
+        return np.clip(bins, 0, N_BINS - 1).astype(np.int64)
+
+    def update(self, factor_scores: Dict[str, float], facet_scores: Dict[str, float],
+               breed: Optional[str] = None) -> None:
+        """Add one scored assessment"""
+        values = [factor_scores[name] for name in self.factor_names] + [facet_scores[name] for name in self.facet_names]
+        bins = self.score_to_bin(values)
+        rows = np.arange(len(self.metric_names))
+        with self._lock:
+            for group in self._groups(breed):
+                self._histogram(group)[rows, bins] += 1
+                self._histogram(group, self._unsaved)[rows, bins] += 1
+                self._totals[group] += 1
+                self._tables.pop(group, None)
+            self.updates_since_save += 1
+
+    def update_many(self, factor_matrix: np.ndarray, facet_matrix: np.ndarray,
+                    breeds: Optional[Sequence[Optional[str]]] = None) -> None:
+        """
+        Add a batch of scored assessments
+
+        Args:
+            factor_matrix: N x 5 scores in factor_names order
+            facet_matrix: N x 15 scores in facet_names order
+            breeds: Optional N breed names
+        """
+        values = np.hstack([np.asarray(factor_matrix, dtype=np.float64), np.asarray(facet_matrix, dtype=np.float64)])
+        bins = self.score_to_bin(values)
+        rows = np.broadcast_to(np.arange(len(self.metric_names)), bins.shape)
+        keys = [normalize_breed(b) for b in breeds] if breeds is not None else [None] * len(bins)
+
+        with self._lock:
+            groups = {ALL_DOGS: np.ones(len(bins), dtype=bool)}
+            for key in set(k for k in keys if k):
+                groups[key] = np.array([k == key for k in keys])
+            for group, mask in groups.items():
+                counts = np.zeros((len(self.metric_names), N_BINS), dtype=np.int64)
+                np.add.at(counts, (rows[mask], bins[mask]), 1)
+                self._histogram(group)[:] += counts
+                self._histogram(group, self._unsaved)[:] += counts
+                self._totals[group] += int(mask.sum())
+                self._tables.pop(group, None)
+            self.updates_since_save += len(bins)
+
+    def merge(self, other: "PopulationNorms") -> None:
+        """Fold another worker's counts into this one"""
+        if other.metric_names != self.metric_names:
+            raise ValueError("Cannot merge population norms with different metrics")
+        with self._lock:
+            for group, counts in other._counts.items():
+                self._histogram(group)[:] += counts
+                self._histogram(group, self._unsaved)[:] += counts
+                self._totals[group] += other._totals[group]
+                self._tables.pop(group, None)
+
+    def count(self, breed: Optional[str] = None) -> int:
+        """Number of assessments seen for a breed, or for everyone"""
+        group = normalize_breed(breed) if breed else ALL_DOGS
+        return self._totals.get(group, 0) if group else 0
+
+    def breeds(self) -> List[str]:
+        return sorted(group for group in self._counts if group != ALL_DOGS)
+
+    def percentile(self, name: str, score: float, breed: Optional[str] = None) -> Optional[float]:
+        """
+        Mid-rank percentile (0-100) of a score against the population
+
+        Args:
+            name: Factor or facet name
+            score: Score on the 1-7 scale
+            breed: Rank within this breed instead of the whole population
+
+        Returns:
+            Percentile, or None if there is not enough data
+        """
+        group = ALL_DOGS
+        if breed is not None:
+            group = normalize_breed(breed)
+            if not group or self._totals.get(group, 0) < self.min_breed_samples:
+                return None
+        table = self._table(group)
+        if table is None:
+            return None
+        bin_index = min(max(round((score - GRID_MIN) * GRID_RESOLUTION), 0), N_BINS - 1)
+        return float(table[self.metric_index[name], bin_index])
+
+    def percentiles(self, factor_scores: Dict[str, float], facet_scores: Dict[str, float],
+                    breed: Optional[str] = None) -> Dict[str, Dict[str, Optional[float]]]:
+        """Population and breed percentiles for every factor and facet"""
+        result = {}
+        for scores in (factor_scores, facet_scores):
+            for name, score in scores.items():
+                if name in self.metric_index:
+                    result[name] = {
+                        "percentile": self.percentile(name, score),
+                        "breed_percentile": self.percentile(name, score, breed) if breed else None,
+                    }
+        return result
+
+    def save(self, path: str) -> None:
+        """
+        Add the counts gathered since the last save to the file's, atomically
+
+        The file's counts then include every worker's saved updates and become
+        this instance's counts. An unreadable file is moved to <path>.corrupt.
+        """
+        with self._lock, locked_file(path):
+            merged: Dict[str, np.ndarray] = {}
+            if os.path.exists(path):
+                try:
+                    merged = self.load(path)._counts
+                except Exception as e:
+                    print(f"Error loading population norms from {path}, moving it to {path}.corrupt: {e}")
+                    os.replace(path, path + ".corrupt")
+            for group, counts in self._unsaved.items():
+                merged[group] = merged[group] + counts if group in merged else counts.copy()
+
+            groups = sorted(merged)
+            counts = np.stack([merged[g] for g in groups]) if groups else np.zeros((0, len(self.metric_names), N_BINS), dtype=np.int64)
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                np.savez_compressed(
+                    f,
+                    groups=np.array(groups, dtype=str),
+                    counts=counts,
+                    metric_names=np.array(self.metric_names, dtype=str),
+                    n_factors=np.array(len(self.factor_names)),
+                )
+            os.replace(tmp_path, path)
+
+            self._counts = merged
+            self._totals = {group: int(counts[0].sum()) for group, counts in merged.items()}
+            self._tables = {}
+            self._unsaved = {}
+            self.updates_since_save = 0
+
+    def maybe_save(self, path: str, every: int = 100) -> bool:
+        """Persist if at least `every` updates arrived since the last save"""
+        if self.updates_since_save >= every:
+            self.save(path)
+            return True
+        return False
+
+    @classmethod
+    def load(cls, path: str, min_breed_samples: int = 30) -> "PopulationNorms":
+        """Load persisted norms"""
+        with np.load(path) as data:
+            metric_names = [str(n) for n in data["metric_names"]]
+            n_factors = int(data["n_factors"])
+            norms = cls(metric_names[n_factors:], metric_names[:n_factors], min_breed_samples)
+            for group, counts in zip(data["groups"], data["counts"]):
+                norms._counts[str(group)] = counts.astype(np.int64)
+                norms._totals[str(group)] = int(counts[0].sum())
+        return norms
+
+    @classmethod
+    def load_or_create(cls, path: str, min_breed_samples: int = 30) -> "PopulationNorms":
+        """Load persisted norms, or start empty if none exist or they are unreadable"""
+        if os.path.exists(path):
+            try:
+                return cls.load(path, min_breed_samples)
+            except Exception as e:
+                print(f"Error loading population norms from {path}: {e}")
+        return cls(min_breed_samples=min_breed_samples)
+
+    def _groups(self, breed: Optional[str]) -> List[str]:
+        key = normalize_breed(breed)
+        return [ALL_DOGS, key] if key else [ALL_DOGS]
+
+    def _histogram(self, group: str, histograms: Optional[Dict[str, np.ndarray]] = None) -> np.ndarray:
+        """A group's counts (in histograms, default the current counts), created empty if missing"""
+        if histograms is None:
+            histograms = self._counts
+            if group not in histograms:
+                self._totals[group] = 0
+        counts = histograms.get(group)
+        if counts is None:
+            counts = np.zeros((len(self.metric_names), N_BINS), dtype=np.int64)
+            histograms[group] = counts
+        return counts
+
+    def _table(self, group: str) -> Optional[np.ndarray]:
+        """Cached mid-rank percentile table for a group"""
+        table = self._tables.get(group)
+        if table is None:
+            # Under the lock so a table is never built from (and cached past) a concurrent update
+            with self._lock:
+                total = self._totals.get(group, 0)
+                if not total:
+                    return None
+                counts = self._counts[group]
+                below = np.cumsum(counts, axis=1) - counts
+                table = (below + 0.5 * counts) * (100.0 / total)
+                self._tables[group] = table
+        return table
+
+
+_shared_norms: Dict[str, PopulationNorms] = {}
+_shared_lock = threading.Lock()
+
+
+def get_population_norms(path: Optional[str] = None) -> PopulationNorms:
+    """Process-wide norms instance for a persistence path (DPQ_NORMS_PATH by default)"""
+    path = path or os.getenv("DPQ_NORMS_PATH", os.path.join("data", "population_norms.npz"))
+    with _shared_lock:
+        norms = _shared_norms.get(path)
+        if norms is None:
+            norms = PopulationNorms.load_or_create(path)
+            _shared_norms[path] = norms
+        return norms
@@ -0,0 +1,286 @@
+# profile_cache.py - Read-through cache of dog profiles and their current assessment
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from .db_pool import dump_json
+from .single_flight import SingleFlight
+
+Profile = Dict[str, Any]
+
+
+def _iso(value: Any) -> Any:
+    """Dates and times as ISO strings, other values unchanged"""
+    return value.isoformat() if hasattr(value, "isoformat") else value
+
+
+def dog_profile(dog: Dict[str, Any], assessment: Optional[Dict[str, Any]]) -> Profile:
+    """
+    Profile of a dog and its current assessment
+
+    Args:
+        dog: dog_id, user_id, name, breed and birthday
+        assessment: assessment_id, completed_at, personality_factors, ai_bias_indicators,
+            personality_summary, ai_translator_config, quality_metrics and assessment_version
+            of the dog's current assessment, or None if it has none
+    """
+    current = None
+    if assessment is not None:
+        current = {
+            "assessment_id": str(assessment["assessment_id"]),
+            "completed_at": _iso(assessment.get("completed_at")),
+            "personality_factors": assessment["personality_factors"],
+            "ai_bias_indicators": assessment["ai_bias_indicators"],
+            "personality_summary": assessment["personality_summary"],
+            "ai_translator_config": assessment["ai_translator_config"],
+            "quality_metrics": assessment["quality_metrics"],
+            "assessment_version": assessment.get("assessment_version"),
+        }
+    return {
+        "dog_id": str(dog["dog_id"]),
+        "user_id": str(dog["user_id"]) if dog.get("user_id") is not None else None,
+        "name": dog.get("name"),
+        "breed": dog.get("breed"),
+        "birthday": _iso(dog.get("birthday")),
+        "current_assessment": current,
+    }
+
+
+def profile_from_assessment(assessment_data: Dict[str, Any]) -> Profile:
+    """Profile of a dog from a formatted assessment that just became its current one"""
+    dog_info = assessment_data['dog_info']
+    quality_metrics = assessment_data['quality_metrics']
+    return dog_profile(
+        {**dog_info, "dog_id": assessment_data['dog_id'], "user_id": assessment_data['user_id']},
+        {
+            **assessment_data,
+            "quality_metrics": {key: quality_metrics.get(key) for key in
+                                ("reliability_score", "response_consistency", "extreme_response_bias")},
+            "assessment_version": assessment_data['metadata']['assessment_version'],
+        })
+
+
+class DogProfileCache:
+    """
+    In-process LRU of dog profiles in front of the database
+
+    get() serves a cached profile, or loads it with the given loader (one
+    load per dog at a time; concurrent misses share it). Unknown dogs are
+    cached as None for negative_ttl_seconds. The LRU is bounded both by
+    entry count and by the JSON size of the cached profiles.
+
+    The assessment write path calls invalidate() or put() whenever a dog's
+    current assessment changes. Each call starts a new generation of the dog's
+    entry: a load that was in flight at that moment is returned to its callers
+    but not cached, and later misses start a fresh load instead of joining it.
+    Other workers only notice the change when their entry expires after
+    ttl_seconds.
+
+    Cached profiles are shared between callers and must not be modified.
+    """
+
+    def __init__(self, max_entries: int = 10000, max_bytes: int = 64 * 1024 * 1024,
+                 ttl_seconds: float = 300.0, negative_ttl_seconds: float = 30.0,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Args:
+            max_entries: Most profiles (and unknown dogs) kept
+            max_bytes: Most JSON bytes of profiles kept
+            ttl_seconds: Lifetime of a profile
+            negative_ttl_seconds: Lifetime of an unknown-dog entry
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.negative_ttl_seconds = negative_ttl_seconds
+        self._clock = clock
+        # dog_id -> (expires_at, size in bytes, profile or None)
+        self._entries: "OrderedDict[str, Tuple[float, int, Optional[Profile]]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        # dog_id -> loads in flight and their generation, bumped by put()/invalidate(); a load is only
+        # cached if no bump happened while it ran. Dogs without a load in flight are at generation 0.
+        self._loading: Dict[str, int] = {}
+        self._generations: Dict[str, int] = {}
+        self._flight = SingleFlight("dog_profile")
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.loads = 0
+        self.invalidations = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def lookup(self, dog_id: str) -> Tuple[bool, Optional[Profile]]:
+        """(True, profile or None for an unknown dog) if cached, else (False, None)"""
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(dog_id)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(dog_id)
+                    if entry[2] is None:
+                        self.negative_hits += 1
+                    else:
+                        self.hits += 1
+                    return True, entry[2]
+                self._discard(dog_id)
+            self.misses += 1
+            return False, None
+
+    async def get(self, dog_id: str, loader: Callable[[str], Awaitable[Optional[Profile]]]) -> Optional[Profile]:
+        """
+        Profile of a dog, or None if the dog does not exist
+
+        Args:
+            loader: Reads the profile from the database (None for an unknown dog)
+
+        Raises:
+            Whatever the loader raises (nothing is cached then)
+        """
+        cached, profile = self.lookup(dog_id)
+        if cached:
+            return profile
+
+        with self._lock:
+            generation = self._generations.get(dog_id, 0)
+
+        async def load():
+            with self._lock:
+                self.loads += 1
+                self._loading[dog_id] = self._loading.get(dog_id, 0) + 1
+            try:
+                profile = await loader(dog_id)
+            except BaseException:
+                with self._lock:
+                    self._end_load(dog_id)
+                raise
+            with self._lock:
+                if self._end_load(dog_id) == generation:
+                    self._store(dog_id, profile)
+            return profile
+
+        return await self._flight.ado(f"{dog_id}:{generation}", load)
+
+    def put(self, dog_id: str, profile: Profile) -> None:
+        """Replace a dog's profile (its current assessment just changed)"""
+        with self._lock:
+            self._bump(dog_id)
+            self.invalidations += 1
+            self._store(dog_id, profile)
+
+    def invalidate(self, dog_id: str) -> None:
+        """Drop a dog's profile (its current assessment just changed)"""
+        with self._lock:
+            self._bump(dog_id)
+            self.invalidations += 1
+            self._discard(dog_id)
+
+    def invalidate_if_current(self, dog_id: str, assessment_id: str) -> bool:
+        """
+        Drop a dog's profile unless it is cached with a different current assessment
+
+        Used once an assessment reaches the database: a profile put() for that
+        assessment (or an uncached dog, whose in-flight load may predate the
+        write) is reloaded, while a profile already showing another assessment,
+        such as a newer one still in the write buffer, is kept.
+
+        Returns:
+            True if the profile was invalidated
+        """
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(dog_id)
+            if entry is not None and entry[0] > now:
+                current = entry[2]["current_assessment"] if entry[2] is not None else None
+                if current is not None and current["assessment_id"] != str(assessment_id):
+                    return False
+            self._bump(dog_id)
+            self.invalidations += 1
+            self._discard(dog_id)
+            return True
+
+    def clear(self) -> None:
+        with self._lock:
+            for dog_id in self._loading:
+                self._bump(dog_id)
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Size and hit/miss counters for this process"""
+        with self._lock:
+            lookups = self.hits + self.negative_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "negative_hits": self.negative_hits,
+                "misses": self.misses,
+                "loads": self.loads,
+                "coalesced_loads": self._flight.coalesced,
+                "invalidations": self.invalidations,
+                "evictions": self.evictions,
+                "hit_rate": round((self.hits + self.negative_hits) / lookups, 4) if lookups else None,
+            }
+
+    def _store(self, dog_id: str, profile: Optional[Profile]) -> None:
+        """Insert into the LRU, evicting the least recently used past either bound (lock held)"""
+        self._discard(dog_id)
+        ttl = self.ttl_seconds if profile is not None else self.negative_ttl_seconds
+        size = len(dump_json(profile)) if profile is not None else 0
+        self._entries[dog_id] = (self._clock() + ttl, size, profile)
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            _, (_, evicted_size, _) = self._entries.popitem(last=False)
+            self._bytes -= evicted_size
+            self.evictions += 1
+
+    def _bump(self, dog_id: str) -> None:
+        """Start a new generation of a dog's entry, so loads in flight are not cached or joined (lock held)"""
+        if dog_id in self._loading:
+            self._generations[dog_id] = self._generations.get(dog_id, 0) + 1
+
+    def _end_load(self, dog_id: str) -> int:
+        """Count a finished load and return the dog's generation as it ended (lock held)"""
+        generation = self._generations.get(dog_id, 0)
+        self._loading[dog_id] -= 1
+        if not self._loading[dog_id]:
+            del self._loading[dog_id]
+            self._generations.pop(dog_id, None)
+        return generation
+
+    def _discard(self, dog_id: str) -> None:
+        entry = self._entries.pop(dog_id, None)
+        if entry is not None:
+            self._bytes -= entry[1]
+
+
+_profile_cache: Optional[DogProfileCache] = None
+_profile_cache_lock = threading.Lock()
+
+
+def get_dog_profile_cache() -> DogProfileCache:
+    """
+    Process-wide cache
+
+    Sized by DPQ_PROFILE_CACHE_ENTRIES (default 10000) and DPQ_PROFILE_CACHE_MB
+    (default 64); entries live DPQ_PROFILE_CACHE_TTL seconds (default 300),
+    unknown dogs DPQ_PROFILE_CACHE_NEGATIVE_TTL seconds (default 30).
+    """
+    global _profile_cache
+    with _profile_cache_lock:
+        if _profile_cache is None:
+            _profile_cache = DogProfileCache(
+                max_entries=int(os.getenv("DPQ_PROFILE_CACHE_ENTRIES", "10000")),
+                max_bytes=int(float(os.getenv("DPQ_PROFILE_CACHE_MB", "64")) * 1024 * 1024),
+                ttl_seconds=float(os.getenv("DPQ_PROFILE_CACHE_TTL", "300")),
+                negative_ttl_seconds=float(os.getenv("DPQ_PROFILE_CACHE_NEGATIVE_TTL", "30")))
+        return _profile_cache
@@ -0,0 +1,229 @@
+# recommendation_cache.py - Two-tier cache for LLM-generated recommendations
+
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+
+class RecommendationCache:
+    """
+    In-process LRU in front of a persistent SQLite table
+
+    Entries are keyed by a hash of the normalized prompt inputs and the prompt
+    version, so bumping the version invalidates everything generated with the
+    old prompt. Entries expire after ttl_seconds in both tiers. The SQLite tier
+    is shared by every worker process on the host and survives restarts.
+
+    get()/put() block on SQLite; code on an event loop uses aget()/aput(),
+    which only leave the loop for the SQLite tier.
+    """
+
+    def __init__(self, path: Optional[str] = None, prompt_version: int = 1,
+                 max_entries: int = 4096, ttl_seconds: int = 30 * 24 * 60 * 60):
+        """
+        Args:
+            path: SQLite database file. None keeps the cache in memory only.
+            prompt_version: Version of the prompt the cached values were generated with
+            max_entries: Capacity of the in-process LRU
+            ttl_seconds: Lifetime of an entry
+        """
+        self.path = path
+        self.prompt_version = prompt_version
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self.memory_hits = 0
+        self.persistent_hits = 0
+        self.misses = 0
+        self.writes = 0
+        if path:
+            self._open(path)
+
+    def key(self, inputs: Dict[str, Any]) -> str:
+        """Cache key for normalized prompt inputs"""
+        payload = json.dumps({"version": self.prompt_version, "inputs": inputs},
+                             sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Cached value, or None if missing or expired"""
+        now = time.time()
+        value = self._memory_get(key, now)
+        return value if value is not None else self._persistent_get(key, now)
+
+    async def aget(self, key: str) -> Optional[Dict[str, Any]]:
+        """get() for async callers: memory hits return at once, the SQLite tier is read in a thread"""
+        now = time.time()
+        value = self._memory_get(key, now)
+        if value is not None:
+            return value
+        if self._db is None:
+            return self._persistent_get(key, now)
+        return await asyncio.to_thread(self._persistent_get, key, now)
+
+    def put(self, key: str, value: Dict[str, Any]) -> None:
+        """Store a value in both tiers"""
+        expires_at = self._memory_put(key, value)
+        self._persistent_put(key, value, expires_at)
+
+    async def aput(self, key: str, value: Dict[str, Any]) -> None:
+        """put() for async callers: the SQLite tier is written in a thread"""
+        expires_at = self._memory_put(key, value)
+        if self._db is not None:
+            await asyncio.to_thread(self._persistent_put, key, value, expires_at)
+
+    def _memory_get(self, key: str, now: float) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self.memory_hits += 1
+                    return entry[1]
+                del self._entries[key]
+            return None
+
+    def _persistent_get(self, key: str, now: float) -> Optional[Dict[str, Any]]:
+        """Read from SQLite, remembering a hit in memory; counts a miss otherwise"""
+        with self._lock:
+            if self._db is not None:
+                try:
+                    row = self._db.execute(
+                        "SELECT value, expires_at FROM recommendations WHERE key = ? AND prompt_version = ?",
+                        (key, self.prompt_version)).fetchone()
+                except sqlite3.Error as e:
+                    print(f"Error reading recommendation cache: {e}")
+                    row = None
+                if row is not None and row[1] > now:
+                    value = json.loads(row[0])
+                    self._remember(key, row[1], value)
+                    self.persistent_hits += 1
+                    return value
+
+            self.misses += 1
+            return None
+
+    def _memory_put(self, key: str, value: Dict[str, Any]) -> float:
+        expires_at = time.time() + self.ttl_seconds
+        with self._lock:
+            self._remember(key, expires_at, value)
+            self.writes += 1
+        return expires_at
+
+    def _persistent_put(self, key: str, value: Dict[str, Any], expires_at: float) -> None:
+        with self._lock:
+            if self._db is not None:
+                try:
+                    with self._db:
+                        self._db.execute(
+                            "INSERT OR REPLACE INTO recommendations (key, prompt_version, value, expires_at) "
+                            "VALUES (?, ?, ?, ?)",
+                            (key, self.prompt_version, json.dumps(value), expires_at))
+                except sqlite3.Error as e:
+                    print(f"Error writing recommendation cache: {e}")
+
+    def purge(self) -> int:
+        """Delete expired entries and entries from other prompt versions, returning how many rows"""
+        now = time.time()
+        with self._lock:
+            for key in [k for k, (expires_at, _) in self._entries.items() if expires_at <= now]:
+                del self._entries[key]
+            if self._db is None:
+                return 0
+            with self._db:
+                cursor = self._db.execute(
+                    "DELETE FROM recommendations WHERE expires_at <= ? OR prompt_version != ?",
+                    (now, self.prompt_version))
+            return cursor.rowcount
+
+    def clear(self) -> None:
+        """Drop every entry in both tiers"""
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                with self._db:
+                    self._db.execute("DELETE FROM recommendations")
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for this process"""
+        with self._lock:
+            lookups = self.memory_hits + self.persistent_hits + self.misses
+            persistent_entries = None
+            if self._db is not None:
+                try:
+                    persistent_entries = self._db.execute("SELECT COUNT(*) FROM recommendations").fetchone()[0]
+                except sqlite3.Error:
+                    pass
+            return {
+                "prompt_version": self.prompt_version,
+                "memory_entries": len(self._entries),
+                "persistent_entries": persistent_entries,
+                "memory_hits": self.memory_hits,
+                "persistent_hits": self.persistent_hits,
+                "misses": self.misses,
+                "writes": self.writes,
+                "hit_rate": round((self.memory_hits + self.persistent_hits) / lookups, 4) if lookups else None,
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def _open(self, path: str) -> None:
+        try:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            db = sqlite3.connect(path, check_same_thread=False, timeout=5.0)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS recommendations (
+                    key TEXT PRIMARY KEY,
+                    prompt_version INTEGER NOT NULL,
+                    value TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+            """)
+            db.commit()
+            self._db = db
+            self.purge()
+        except sqlite3.Error as e:
+            print(f"Error opening recommendation cache at {path}: {e}")
+            self._db = None
+
+    def _remember(self, key: str, expires_at: float, value: Dict[str, Any]) -> None:
+        """Insert into the LRU (lock held)"""
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+_shared_caches: Dict[Tuple[str, int], RecommendationCache] = {}
+_shared_lock = threading.Lock()
+
+
+def get_recommendation_cache(prompt_version: int = 1, path: Optional[str] = None) -> RecommendationCache:
+    """
+    Process-wide cache (persisted at DPQ_RECOMMENDATION_CACHE_PATH by default)
+
+    Setting DPQ_RECOMMENDATION_CACHE_PATH to an empty string keeps the cache in memory only.
+    """
+    if path is None:
+        path = os.getenv("DPQ_RECOMMENDATION_CACHE_PATH", os.path.join("data", "recommendations.sqlite3"))
+    with _shared_lock:
+        cache = _shared_caches.get((path, prompt_version))
+        if cache is None:
+            cache = RecommendationCache(path or None, prompt_version=prompt_version)
+            _shared_caches[(path, prompt_version)] = cache
+        return cache
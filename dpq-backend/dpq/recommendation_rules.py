@@ -0,0 +1,226 @@
+# recommendation_rules.py - Instant rule-based recommendations from bias indicators and factor levels
+
+import threading
+from bisect import bisect_right
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .recommendation_stream import RECOMMENDATION_CATEGORIES
+
+# Versions of the recommendations stored with an assessment. The rule-based
+# baseline is returned inline; the LLM upgrade replaces it with a higher version.
+BASELINE_VERSION = 1
+UPGRADED_VERSION = 2
+
+FEARFULNESS = "Factor 1 - Fearfulness"
+ACTIVITY = "Factor 3 - Activity/Excitability"
+TRAINABILITY = "Factor 4 - Responsiveness to Training"
+ANIMAL_AGGRESSION = "Factor 5 - Aggression towards Animals"
+
+# (input, low, high, category, tip): the tip applies when low <= value < high,
+# with None leaving that side open. Inputs are bias indicators (0-1) or factor
+# scores (1-7; High from 5.5, Low below 4.5 as in the Claude prompt).
+RULES: List[Tuple[str, Optional[float], Optional[float], str, str]] = [
+    # Training
+    ("trainability_bias", 0.6, None, "training_tips",
+     "Build on this dog's responsiveness with short, structured sessions that add new cues steadily"),
+    ("trainability_bias", None, 0.6, "training_tips",
+     "Keep sessions to a few minutes and use high-value rewards to hold attention"),
+    (TRAINABILITY, 5.5, None, "training_tips",
+     "Advanced obedience or a dog sport will keep this eager learner engaged"),
+    ("impulse_control", None, 0.4, "training_tips",
+     "Practise impulse-control games such as wait-at-the-door and leave-it every day"),
+    ("fearfulness_bias", 0.6, None, "training_tips",
+     "Train in quiet, familiar places before adding distractions"),
+    ("excitability_bias", 0.6, None, "training_tips",
+     "Teach a settle cue and reward calm behaviour between exercises"),
+    ("aggression_bias", 0.5, None, "training_tips",
+     "Use reward-based methods only and work with a qualified behaviourist on triggers"),
+    ("resource_guarding", 0.6, None, "training_tips",
+     "Trade for items rather than taking them, and teach a reliable drop cue"),
+
+    # Exercise
+    ("activity_level", 0.6, None, "exercise_needs",
+     "Plan at least two vigorous sessions a day, such as running, fetch or tug"),
+    ("activity_level", 0.4, 0.6, "exercise_needs",
+     "Daily walks plus a short play session meet moderate energy needs"),
+    ("activity_level", None, 0.4, "exercise_needs",
+     "Short, gentle walks and sniffing games suit a lower energy level"),
+    (ACTIVITY, 5.5, None, "exercise_needs",
+     "Vary routes and activities so exercise stays challenging"),
+    ("excitability_bias", 0.6, None, "exercise_needs",
+     "Add mental work such as puzzle feeders and scent games to take the edge off excitement"),
+    ("prey_drive", 0.6, None, "exercise_needs",
+     "Use a long line in unfenced areas and channel chasing into flirt-pole play"),
+
+    # Socialization
+    ("social_confidence", None, 0.4, "socialization",
+     "Introduce new people gradually and let the dog choose when to approach"),
+    ("dog_sociability", None, 0.4, "socialization",
+     "Prefer calm one-to-one dog meetings over busy dog parks"),
+    ("dog_sociability", 0.6, None, "socialization",
+     "Regular play with well-matched dogs helps meet this dog's social needs"),
+    (ANIMAL_AGGRESSION, 5.5, None, "socialization",
+     "Keep meetings with other animals controlled, on lead and at a distance"),
+    ("environmental_adaptability", None, 0.4, "socialization",
+     "Visit new places in small steps, pairing each with treats"),
+    ("handling_tolerance", None, 0.4, "socialization",
+     "Pair handling and vet-style checks with rewards in short sessions"),
+    ("territorial_tendency", 0.6, None, "socialization",
+     "Manage visitors at the door with a mat or crate routine"),
+
+    # Daily care
+    ("fearfulness_bias", 0.6, None, "daily_care",
+     "Provide a quiet retreat space and keep the daily routine predictable"),
+    (FEARFULNESS, 5.5, None, "daily_care",
+     "Watch for stress signals and avoid flooding the dog with new experiences"),
+    ("attention_seeking", 0.6, None, "daily_care",
+     "Schedule one-to-one attention and practise short periods alone"),
+    ("activity_level", 0.6, None, "daily_care",
+     "Provide chews and enrichment so energy has an outlet indoors"),
+    ("handling_tolerance", None, 0.4, "daily_care",
+     "Build grooming into the routine in brief, rewarded steps"),
+
+    # AI communication (the DPQAnalyzer translation rules)
+    ("fearfulness_bias", 0.6, None, "ai_communication",
+     "Use calm, reassuring tones and avoid sudden or loud vocalizations"),
+    ("fearfulness_bias", 0.6, None, "ai_communication",
+     "Interpret neutral behaviors as potentially anxiety-related"),
+    ("aggression_bias", 0.5, None, "ai_communication",
+     "Be cautious with territorial or protective interpretations"),
+    ("excitability_bias", 0.6, None, "ai_communication",
+     "Expect high-energy responses and enthusiastic communications"),
+    ("trainability_bias", 0.6, None, "ai_communication",
+     "Dog likely responds well to clear commands and structure"),
+    ("trainability_bias", None, 0.6, "ai_communication",
+     "May need more patience and alternative communication approaches"),
+    ("social_confidence", None, 0.4, "ai_communication",
+     "Approach social situations gradually and with extra care"),
+    ("dog_sociability", None, 0.4, "ai_communication",
+     "Be cautious around other dogs, may prefer human company"),
+    ("activity_level", 0.6, None, "ai_communication",
+     "Expect active, movement-oriented communications"),
+    ("activity_level", None, 0.6, "ai_communication",
+     "Dog may prefer calm, low-energy interactions"),
+]
+
+# Tips used to fill categories that too few rules applied to
+GENERAL_TIPS: Dict[str, List[str]] = {
+    "training_tips": [
+        "Use treats and praise to reward good behavior",
+        "Be consistent with commands and expectations",
+    ],
+    "exercise_needs": [
+        "Include mental stimulation through puzzle toys and training",
+        "Monitor your dog's energy levels and adjust accordingly",
+    ],
+    "socialization": [
+        "Use positive experiences to build confidence",
+        "Monitor your dog's comfort level and don't force interactions",
+    ],
+    "daily_care": [
+        "Establish a consistent daily routine",
+        "Ensure regular veterinary check-ups",
+    ],
+    "ai_communication": [
+        "Pay attention to your dog's body language and vocalizations",
+        "Use clear, consistent signals when communicating",
+    ],
+}
+
+# Per input: band boundaries and the (category, tip) pairs of each band
+RuleTable = Tuple[str, List[float], List[Tuple[Tuple[str, str], ...]]]
+
+
+class RecommendationRules:
+    """
+    Rule table compiled into one band lookup per input
+
+    Each input's thresholds split its range into bands, and every band holds
+    the tips of all rules covering it. Recommending is then one bisect per
+    input, with no rule evaluation, so it is cheap enough to run inline.
+    """
+
+    def __init__(self, rules: Sequence[Tuple] = RULES, general_tips: Optional[Dict[str, List[str]]] = None,
+                 min_tips: int = 2, max_tips: int = 4):
+        """
+        Args:
+            rules: (input, low, high, category, tip) rules (see RULES)
+            general_tips: Filler tips per category. Defaults to GENERAL_TIPS.
+            min_tips: Categories with fewer matching tips are filled from general_tips
+            max_tips: Most tips returned per category
+        """
+        self.general_tips = GENERAL_TIPS if general_tips is None else general_tips
+        self.min_tips = min_tips
+        self.max_tips = max_tips
+        self._tables = self._compile(rules)
+
+    @staticmethod
+    def _compile(rules: Sequence[Tuple]) -> List[RuleTable]:
+        by_input: Dict[str, List[Tuple]] = {}
+        for name, low, high, category, tip in rules:
+            if category not in RECOMMENDATION_CATEGORIES:
+                raise ValueError(f"Unknown recommendation category: {category}")
+            by_input.setdefault(name, []).append((low, high, category, tip))
+
+        tables = []
+        for name, input_rules in by_input.items():
+            boundaries = sorted({bound for low, high, _, _ in input_rules
+                                 for bound in (low, high) if bound is not None})
+            bands = []
+            # Band i covers [boundaries[i - 1], boundaries[i]), open at both ends
+            for i in range(len(boundaries) + 1):
+                start = boundaries[i - 1] if i > 0 else None
+                end = boundaries[i] if i < len(boundaries) else None
+                bands.append(tuple(
+                    (category, tip) for low, high, category, tip in input_rules
+                    if (low is None or (start is not None and start >= low))
+                    and (high is None or (end is not None and end <= high))
+                ))
+            tables.append((name, boundaries, bands))
+        return tables
+
+    def recommend(self, factor_scores: Dict[str, float],
+                  bias_indicators: Dict[str, float]) -> Dict[str, List[str]]:
+        """
+        Baseline recommendations in the shape Claude returns
+
+        Args:
+            factor_scores: Factor scores keyed by factor name
+            bias_indicators: AI bias indicators keyed by name
+
+        Returns:
+            Tips for every category in RECOMMENDATION_CATEGORIES
+        """
+        recommendations: Dict[str, List[str]] = {category: [] for category in RECOMMENDATION_CATEGORIES}
+        for name, boundaries, bands in self._tables:
+            value = bias_indicators.get(name)
+            if value is None:
+                value = factor_scores.get(name)
+                if value is None:
+                    continue
+            for category, tip in bands[bisect_right(boundaries, value)]:
+                tips = recommendations[category]
+                if tip not in tips:
+                    tips.append(tip)
+
+        for category, tips in recommendations.items():
+            for tip in self.general_tips.get(category, []):
+                if len(tips) >= self.min_tips:
+                    break
+                if tip not in tips:
+                    tips.append(tip)
+            del tips[self.max_tips:]
+        return recommendations
+
+
+_shared_rules: Optional[RecommendationRules] = None
+_shared_lock = threading.Lock()
+
+
+def get_recommendation_rules() -> RecommendationRules:
+    """Process-wide rules compiled from RULES"""
+    global _shared_rules
+    with _shared_lock:
+        if _shared_rules is None:
+            _shared_rules = RecommendationRules()
+        return _shared_rules
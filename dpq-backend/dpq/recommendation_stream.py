@@ -0,0 +1,181 @@
+# recommendation_stream.py - Incremental parsing of streamed recommendation JSON
+
+import json
+from typing import Any, Dict, List, Optional
+
+RECOMMENDATION_CATEGORIES = ['training_tips', 'exercise_needs', 'socialization', 'daily_care', 'ai_communication']
+
+def recommendation_events(recommendations: Dict[str, List[str]]) -> List[Dict[str, Any]]:
+    """The events RecommendationStreamParser would emit for complete recommendations"""
+    events = []
+    for category, tips in recommendations.items():
+        if not isinstance(tips, list):
+            continue
+        events.append({"event": "category", "category": category})
+        for index, tip in enumerate(tips):
+            events.append({"event": "tip", "category": category, "index": index, "text": tip})
+        events.append({"event": "category_end", "category": category, "count": len(tips)})
+    return events
+
+
+# Parser states
+SEEK_OBJECT, SEEK_KEY, KEY, SEEK_COLON, SEEK_VALUE, SEEK_ITEM, ITEM, SKIP, DONE = range(9)
+
+
+class RecommendationStreamParser:
+    """
+    Push parser for Claude's recommendations JSON as it streams in
+
+    Feed text deltas as they arrive; each call returns the events completed
+    by that delta:
+
+        {"event": "category", "category": "training_tips"}
+        {"event": "tip", "category": "training_tips", "index": 0, "text": "..."}
+        {"event": "category_end", "category": "training_tips", "count": 3}
+
+    Like extract_recommendations, text before the first '{' is ignored. The
+    expected shape is an object of string arrays; other values are skipped.
+    """
+
+    def __init__(self):
+        self.recommendations: Dict[str, List[str]] = {}
+        self._state = SEEK_OBJECT
+        self._buffer: List[str] = []
+        self._escaped = False
+        self._key: Optional[str] = None
+        # Nesting and string state of a skipped value
+        self._skip_depth = 0
+        self._skip_string = False
+        self._skip_return = SEEK_KEY
+
+    @property
+    def complete(self) -> bool:
+        """Whether the closing '}' of the object has been seen"""
+        return self._state == DONE
+
+    def feed(self, text: str) -> List[Dict[str, Any]]:
+        """Consume a text delta, returning the events it completed"""
+        events = []
+        i, n = 0, len(text)
+        while i < n:
+            state = self._state
+            if state in (KEY, ITEM):
+                i = self._read_string(text, i, events)
+                continue
+            if state == DONE:
+                break
+            char = text[i]
+            i += 1
+            if state == SEEK_OBJECT:
+                if char == '{':
+                    self._state = SEEK_KEY
+            elif state == SKIP:
+                if self._skip(char):
+                    i -= 1
+            elif char in ' \t\r\n,':
+                continue
+            elif state == SEEK_KEY:
+                if char == '"':
+                    self._state = KEY
+                elif char == '}':
+                    self._state = DONE
+            elif state == SEEK_COLON:
+                if char == ':':
+                    self._state = SEEK_VALUE
+            elif state == SEEK_VALUE:
+                if char == '[':
+                    self.recommendations[self._key] = []
+                    events.append({"event": "category", "category": self._key})
+                    self._state = SEEK_ITEM
+                else:
+                    self._start_skip(char, SEEK_KEY)
+            elif state == SEEK_ITEM:
+                if char == '"':
+                    self._state = ITEM
+                elif char == ']':
+                    events.append({"event": "category_end", "category": self._key,
+                                   "count": len(self.recommendations[self._key])})
+                    self._state = SEEK_KEY
+                else:
+                    self._start_skip(char, SEEK_ITEM)
+        return events
+
+    def result(self) -> Dict[str, List[str]]:
+        """Recommendations parsed so far, with every expected category present"""
+        recommendations = dict(self.recommendations)
+        for key in RECOMMENDATION_CATEGORIES:
+            recommendations.setdefault(key, [])
+        return recommendations
+
+    def _read_string(self, text: str, i: int, events: List[Dict[str, Any]]) -> int:
+        """Consume string content up to and including the closing quote"""
+        n = len(text)
+        start = i
+        while i < n:
+            if self._escaped:
+                self._escaped = False
+                i += 1
+                continue
+            # Jump to the next quote or backslash
+            quote = text.find('"', i)
+            backslash = text.find('\\', i, quote if quote != -1 else n)
+            if backslash != -1:
+                self._escaped = True
+                i = backslash + 1
+                continue
+            if quote == -1:
+                i = n
+                break
+            self._buffer.append(text[start:quote])
+            value = json.loads('"' + "".join(self._buffer) + '"')
+            self._buffer = []
+            self._string_done(value, events)
+            return quote + 1
+        self._buffer.append(text[start:i])
+        return i
+
+    def _string_done(self, value: str, events: List[Dict[str, Any]]) -> None:
+        if self._state == KEY:
+            self._key = value
+            self._state = SEEK_COLON
+        else:
+            tips = self.recommendations[self._key]
+            events.append({"event": "tip", "category": self._key, "index": len(tips), "text": value})
+            tips.append(value)
+            self._state = SEEK_ITEM
+
+    def _start_skip(self, char: str, return_state: int) -> None:
+        """Skip a value that is not a string array, starting at char"""
+        self._skip_return = return_state
+        self._skip_depth = 0
+        self._skip_string = False
+        self._state = SKIP
+        self._skip(char)
+
+    def _skip(self, char: str) -> bool:
+        """Advance through a skipped value; True if char ends it and must be parsed again"""
+        if self._skip_string:
+            if self._escaped:
+                self._escaped = False
+            elif char == '\\':
+                self._escaped = True
+            elif char == '"':
+                self._skip_string = False
+                if self._skip_depth == 0:
+                    self._state = self._skip_return
+            return False
+        if char == '"':
+            self._skip_string = True
+        elif char in '[{':
+            self._skip_depth += 1
+        elif char in ']}':
+            self._skip_depth -= 1
+            if self._skip_depth < 0:
+                # The enclosing array or object closed right after a scalar
+                self._state = self._skip_return
+                return True
+            if self._skip_depth == 0:
+                self._state = self._skip_return
+        elif char == ',' and self._skip_depth == 0:
+            self._state = self._skip_return
+        return False
@@ -0,0 +1,232 @@
+# reliability.py - Incremental internal-consistency reliability for the DPQ
+
+import os
+import threading
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from .dpq import DogPersonalityQuestionnaire
+from .file_lock import locked_file
+
+
+class ReliabilityTracker:
+    """
+    Running item means and covariances for Cronbach's alpha
+
+    Keeps the count, mean vector and co-moment matrix of reverse-coded item
+    responses over complete assessments. A single update is a Welford step
+    (O(45^2)); batches and other workers' snapshots are combined with Chan's
+    parallel formula, so trackers can be merged in any order.
+
+    Workers may share one file: save() merges the statistics gathered since the
+    last save into the file's instead of overwriting it.
+    """
+
+    def __init__(self, questionnaire: Optional[DogPersonalityQuestionnaire] = None):
+        self.questionnaire = questionnaire or DogPersonalityQuestionnaire()
+        plan = self.questionnaire.plan
+        self.n_items = plan.n_items
+        self.reverse_vector = plan.reverse_vector
+
+        # Zero-based item indices per facet and per factor
+        self.facet_items = {
+            name: np.array([item - 1 for item, _ in items])
+            for name, items in zip(plan.facet_names, plan.facet_items)
+        }
+        self.factor_items = {
+            name: np.concatenate([self.facet_items[plan.facet_names[i]] for i in facet_indices])
+            for name, facet_indices in zip(plan.factor_names, plan.factor_facets)
+        }
+
+        self.n = 0
+        self.mean = np.zeros(self.n_items)
+        self.m2 = np.zeros((self.n_items, self.n_items))
+        # (n, mean, M2) of the assessments added since the last save
+        self._unsaved = _empty(self.n_items)
+        self._alphas = None
+        self._lock = threading.Lock()
+        self.updates_since_save = 0
+
+    def update(self, responses: Dict[int, int]) -> bool:
+        """
+        Add one assessment
+
+        Returns:
+            False if the assessment was incomplete and skipped
+        """
+        if len(responses) < self.n_items:
+            return False
+        x = np.array([responses[item] for item in range(1, self.n_items + 1)], dtype=np.float64)
+        x = np.where(self.reverse_vector, 8 - x, x)
+        with self._lock:
+            self.n, self.mean, self.m2 = _welford((self.n, self.mean, self.m2), x)
+            self._unsaved = _welford(self._unsaved, x)
+            self._alphas = None
+            self.updates_since_save += 1
+        return True
+
+    def update_many(self, matrix: np.ndarray) -> int:
+        """
+        Add a batch of assessments (N x 45, 0 = unanswered)
+
+        Returns:
+            Number of complete assessments added
+        """
+        matrix = np.asarray(matrix, dtype=np.float64)
+        matrix = matrix[(matrix > 0).all(axis=1)]
+        if not len(matrix):
+            return 0
+        coded = np.where(self.reverse_vector, 8 - matrix, matrix)
+        mean = coded.mean(axis=0)
+        centered = coded - mean
+        self._combine(len(coded), mean, centered.T @ centered)
+        return len(coded)
+
+    def merge(self, other: "ReliabilityTracker") -> None:
+        """Fold another tracker's statistics into this one"""
+        self.merge_snapshot(other.snapshot())
+
+    def snapshot(self) -> Dict[str, np.ndarray]:
+        """Copy of the sufficient statistics, suitable for persisting or shipping to another worker"""
+        with self._lock:
+            return {"n": np.array(self.n), "mean": self.mean.copy(), "m2": self.m2.copy()}
+
+    def merge_snapshot(self, snapshot: Dict[str, np.ndarray]) -> None:
+        self._combine(int(snapshot["n"]), np.asarray(snapshot["mean"]), np.asarray(snapshot["m2"]))
+
+    def covariance(self) -> Optional[np.ndarray]:
+        """Sample covariance of the coded items, or None with fewer than two assessments"""
+        if self.n < 2:
+            return None
+        return self.m2 / (self.n - 1)
+
+    def alphas(self) -> Dict[str, object]:
+        """Cronbach's alpha for every facet and factor (None where undefined)"""
+        alphas = self._alphas
+        if alphas is None:
+            # Under the lock so alphas are never computed from (and cached past) a concurrent update
+            with self._lock:
+                covariance = self.covariance()
+                alphas = {
+                    "sample_size": self.n,
+                    "facets": {name: self._alpha(covariance, items) for name, items in self.facet_items.items()},
+                    "factors": {name: self._alpha(covariance, items) for name, items in self.factor_items.items()},
+                }
+                self._alphas = alphas
+        return alphas
+
+    def overall_reliability(self) -> Optional[float]:
+        """Mean factor alpha, used as the assessment reliability score"""
+        values = [a for a in self.alphas()["factors"].values() if a is not None]
+        return round(float(np.mean(values)), 2) if values else None
+
+    def save(self, path: str) -> None:
+        """
+        Merge the statistics gathered since the last save into the file's, atomically
+
+        The file's statistics then include every worker's saved updates and
+        become this tracker's. An unreadable file is moved to <path>.corrupt.
+        """
+        with self._lock, locked_file(path):
+            stored = _empty(self.n_items)
+            if os.path.exists(path):
+                try:
+                    with np.load(path) as data:
+                        stored = (int(data["n"]), data["mean"], data["m2"])
+                except Exception as e:
+                    print(f"Error loading reliability statistics from {path}, moving it to {path}.corrupt: {e}")
+                    os.replace(path, path + ".corrupt")
+            n, mean, m2 = _chan(stored, self._unsaved)
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                np.savez(f, n=np.array(n), mean=mean, m2=m2)
+            os.replace(tmp_path, path)
+
+            self.n, self.mean, self.m2 = n, mean, m2
+            self._unsaved = _empty(self.n_items)
+            self._alphas = None
+            self.updates_since_save = 0
+
+    def maybe_save(self, path: str, every: int = 100) -> bool:
+        """Persist if at least `every` updates arrived since the last save"""
+        if self.updates_since_save >= every:
+            self.save(path)
+            return True
+        return False
+
+    @classmethod
+    def load_or_create(cls, path: str) -> "ReliabilityTracker":
+        """Load persisted statistics, or start empty if none exist or they are unreadable"""
+        tracker = cls()
+        if os.path.exists(path):
+            try:
+                with np.load(path) as data:
+                    # Already in the file, so not unsaved
+                    tracker.n, tracker.mean, tracker.m2 = _chan(_empty(tracker.n_items),
+                                                                (int(data["n"]), data["mean"], data["m2"]))
+            except Exception as e:
+                print(f"Error loading reliability statistics from {path}: {e}")
+        return tracker
+
+    def _combine(self, n_b: int, mean_b: np.ndarray, m2_b: np.ndarray) -> None:
+        if n_b == 0:
+            return
+        with self._lock:
+            self.n, self.mean, self.m2 = _chan((self.n, self.mean, self.m2), (n_b, mean_b, m2_b))
+            self._unsaved = _chan(self._unsaved, (n_b, mean_b, m2_b))
+            self._alphas = None
+            self.updates_since_save += n_b
+
+    @staticmethod
+    def _alpha(covariance: Optional[np.ndarray], items: np.ndarray) -> Optional[float]:
+        if covariance is None or len(items) < 2:
+            return None
+        sub = covariance[np.ix_(items, items)]
+        total_variance = sub.sum()
+        if total_variance <= 0:
+            return None
+        k = len(items)
+        return round(float(k / (k - 1) * (1 - np.trace(sub) / total_variance)), 4)
+
+
+def _empty(n_items: int) -> Tuple[int, np.ndarray, np.ndarray]:
+    return 0, np.zeros(n_items), np.zeros((n_items, n_items))
+
+
+def _welford(stats: Tuple[int, np.ndarray, np.ndarray], x: np.ndarray) -> Tuple[int, np.ndarray, np.ndarray]:
+    """Welford update of (n, mean, M2) with one observation"""
+    n, mean, m2 = stats
+    n += 1
+    delta = x - mean
+    mean = mean + delta / n
+    return n, mean, m2 + np.outer(delta, x - mean)
+
+
+def _chan(a: Tuple[int, np.ndarray, np.ndarray],
+          b: Tuple[int, np.ndarray, np.ndarray]) -> Tuple[int, np.ndarray, np.ndarray]:
+    """Chan et al. parallel combination of two (n, mean, M2) triples"""
+    n_a, mean_a, m2_a = a
+    n_b, mean_b, m2_b = b
+    if n_b == 0:
+        return n_a, mean_a, m2_a
+    if n_a == 0:
+        return n_b, np.array(mean_b, dtype=np.float64), np.array(m2_b, dtype=np.float64)
+    n = n_a + n_b
+    delta = mean_b - mean_a
+    return n, mean_a + delta * (n_b / n), m2_a + m2_b + np.outer(delta, delta) * (n_a * n_b / n)
+
+
+_shared_trackers: Dict[str, ReliabilityTracker] = {}
+_shared_lock = threading.Lock()
+
+
+def get_reliability_tracker(path: Optional[str] = None) -> ReliabilityTracker:
+    """Process-wide tracker for a persistence path (DPQ_RELIABILITY_PATH by default)"""
+    path = path or os.getenv("DPQ_RELIABILITY_PATH", os.path.join("data", "reliability.npz"))
+    with _shared_lock:
+        tracker = _shared_trackers.get(path)
+        if tracker is None:
+            tracker = ReliabilityTracker.load_or_create(path)
+            _shared_trackers[path] = tracker
+        return tracker
@@ -0,0 +1,363 @@
+# reports.py - Compiled DPQ report templates (text, HTML, JSON) and bulk export
+
+import html
+import json
+import os
+import re
+import zipfile
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+from .dpq import DPQAnalyzer, DPQResults
+
+FORMATS = ("text", "html", "json")
+EXTENSIONS = {"text": "txt", "html": "html", "json": "json"}
+
+RULE = "=" * 80
+
+# Bias indicators grouped into report sections, in display order
+BIAS_CATEGORIES = (
+    ("Communication Interpretation Biases", ("fearfulness_bias", "aggression_bias", "excitability_bias", "trainability_bias")),
+    ("Social Interaction Biases", ("social_confidence", "dog_sociability", "environmental_adaptability", "handling_tolerance")),
+    ("Behavioral Response Biases", ("attention_seeking", "activity_level", "impulse_control")),
+    ("Protective/Territorial Biases", ("territorial_tendency", "resource_guarding", "prey_drive")),
+)
+
+TEXT_HEADER = f"""
+{RULE}
+DOG PERSONALITY ASSESSMENT REPORT
+{RULE}
+
+Dog ID: %s
+Assessment Date: %s
+Total Questions Completed: %d
+
+{RULE}
+PERSONALITY FACTOR SCORES
+{RULE}
+
+"""
+
+TEXT_SUMMARY = f"""
+{RULE}
+PERSONALITY SUMMARY
+{RULE}
+
+Dominant Traits: %s
+
+
+{RULE}
+AI TRANSLATION BIAS INDICATORS
+{RULE}
+
+These indicators help calibrate AI translation systems to your dog's personality:
+
+"""
+
+TEXT_RECOMMENDATIONS = f"""
+
+{RULE}
+AI TRANSLATION RECOMMENDATIONS
+{RULE}
+
+Based on this personality profile, AI translation systems should:
+
+"""
+
+TEXT_FOOTER = f"\n{RULE}\n"
+
+HTML_HEAD = """<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+<style>
+body {{ font-family: -apple-system, "Segoe UI", Roboto, sans-serif; color: #1F2430; max-width: 860px; margin: 2rem auto; }}
+.dpq-report {{ border-bottom: 1px solid #D0D5DD; padding-bottom: 2rem; margin-bottom: 2rem; }}
+h1 {{ color: #4271FF; font-size: 1.5rem; }}
+h2 {{ font-size: 1.15rem; border-bottom: 2px solid #4271FF; padding-bottom: .25rem; }}
+table {{ border-collapse: collapse; width: 100%; }}
+th, td {{ text-align: left; padding: .35rem .5rem; border-bottom: 1px solid #EAECF0; vertical-align: top; }}
+.level-High {{ color: #D92D20; }} .level-Low {{ color: #067647; }}
+</style>
+</head>
+<body>
+"""
+
+HTML_TAIL = "</body>\n</html>\n"
+
+
+class ReportEngine:
+    """
+    Renders DPQ assessment reports from templates compiled once
+
+    All static text (section rules, descriptions, category headings) is baked
+    into per-factor and per-bias %-format strings when the engine is built, so
+    rendering a report is a handful of small substitutions joined once. The text
+    output is identical to the original DPQAnalyzer.generate_report.
+    """
+
+    def __init__(self, analyzer: Optional[DPQAnalyzer] = None):
+        """
+        Args:
+            analyzer: Supplies descriptions, bias levels and recommendations.
+                Defaults to a new DPQAnalyzer. Templates are compiled from its
+                descriptions at construction time.
+        """
+        self.analyzer = analyzer or DPQAnalyzer()
+        self._text_factors: Dict[Tuple[str, str], str] = {}
+        self._html_factors: Dict[Tuple[str, str], str] = {}
+
+        bias_descriptions = self.analyzer.bias_descriptions
+        self._categories = []
+        for category_name, biases in BIAS_CATEGORIES:
+            entries = []
+            for bias in biases:
+                label = bias.replace('_', ' ').title()
+                description = bias_descriptions.get(bias, "No description available")
+                entries.append((bias, label, description))
+            self._categories.append((category_name, entries))
+
+        self._text_categories = [
+            (f"\n{category_name}:\n" + "-" * len(category_name) + "\n",
+             [(bias, _literal(f"  {label}: ") + "%.3f (%s)\n" + _literal(f"    → {description}\n"))
+              for bias, label, description in entries])
+            for category_name, entries in self._categories
+        ]
+        self._html_categories = [
+            (f"<h3>{html.escape(category_name)}</h3>\n<table>\n",
+             [(bias, _literal(f"<tr><th>{html.escape(label)}</th>")
+               + '<td class="level-%s">%.3f (%s)</td>'
+               + _literal(f"<td>{html.escape(description)}</td></tr>\n"))
+              for bias, label, description in entries])
+            for category_name, entries in self._categories
+        ]
+
+    def render(self, results: DPQResults, fmt: str = "text") -> str:
+        """Render one report as "text", "html" or "json" """
+        if fmt == "text":
+            return self.render_text(results)
+        if fmt == "html":
+            return self.render_html(results)
+        if fmt == "json":
+            return self.render_json(results)
+        raise ValueError(f"Unsupported report format '{fmt}', expected one of {FORMATS}")
+
+    def render_text(self, results: DPQResults) -> str:
+        """Plain-text report"""
+        parts = [TEXT_HEADER % (results.dog_id, results.assessment_date, len(results.raw_scores))]
+        profile = results.personality_profile
+        for factor, score in results.factor_scores.items():
+            interpretation = profile.get(factor, "Unknown")
+            template = self._text_factors.get((factor, interpretation))
+            if template is None:
+                template = self._compile_text_factor(factor, interpretation)
+            parts.append(template % score)
+
+        parts.append(TEXT_SUMMARY % (profile.get('Dominant_Traits', 'Unknown'),))
+
+        level = self.analyzer._interpret_bias_level
+        indicators = results.bias_indicators
+        for heading, entries in self._text_categories:
+            parts.append(heading)
+            for bias, template in entries:
+                if bias in indicators:
+                    value = indicators[bias]
+                    parts.append(template % (value, level(value)))
+
+        parts.append(TEXT_RECOMMENDATIONS)
+        for rec in self.analyzer._generate_recommendations(results):
+            parts.append(f"• {rec}\n")
+        parts.append(TEXT_FOOTER)
+        return "".join(parts)
+
+    def render_html(self, results: DPQResults) -> str:
+        """Standalone HTML document for one report"""
+        title = html.escape(f"DPQ Report - {results.dog_id}")
+        return HTML_HEAD.format(title=title) + self.render_html_fragment(results) + HTML_TAIL
+
+    def render_html_fragment(self, results: DPQResults) -> str:
+        """One report as an <article> element, for embedding or batch documents"""
+        escape = html.escape
+        parts = [
+            '<article class="dpq-report">\n<h1>Dog Personality Assessment Report</h1>\n'
+            f"<p><strong>Dog ID:</strong> {escape(str(results.dog_id))}<br>\n"
+            f"<strong>Assessment Date:</strong> {escape(str(results.assessment_date))}<br>\n"
+            f"<strong>Total Questions Completed:</strong> {len(results.raw_scores)}</p>\n"
+            "<h2>Personality Factor Scores</h2>\n<table>\n"
+            "<tr><th>Factor</th><th>Score</th><th>Description</th><th>Interpretation</th></tr>\n"
+        ]
+        profile = results.personality_profile
+        for factor, score in results.factor_scores.items():
+            interpretation = profile.get(factor, "Unknown")
+            template = self._html_factors.get((factor, interpretation))
+            if template is None:
+                template = self._compile_html_factor(factor, interpretation)
+            parts.append(template % score)
+        parts.append("</table>\n<h2>Personality Summary</h2>\n"
+                     f"<p><strong>Dominant Traits:</strong> {escape(str(profile.get('Dominant_Traits', 'Unknown')))}</p>\n"
+                     "<h2>AI Translation Bias Indicators</h2>\n"
+                     "<p>These indicators help calibrate AI translation systems to your dog's personality:</p>\n")
+
+        level = self.analyzer._interpret_bias_level
+        indicators = results.bias_indicators
+        for heading, entries in self._html_categories:
+            parts.append(heading)
+            for bias, template in entries:
+                if bias in indicators:
+                    value = indicators[bias]
+                    bias_level = level(value)
+                    parts.append(template % (bias_level, value, bias_level))
+            parts.append("</table>\n")
+
+        parts.append("<h2>AI Translation Recommendations</h2>\n"
+                     "<p>Based on this personality profile, AI translation systems should:</p>\n<ul>\n")
+        for rec in self.analyzer._generate_recommendations(results):
+            parts.append(f"<li>{escape(rec)}</li>\n")
+        parts.append("</ul>\n</article>\n")
+        return "".join(parts)
+
+    def render_dict(self, results: DPQResults) -> Dict:
+        """Report content as a JSON-serializable dict"""
+        descriptions = self.analyzer.factor_descriptions
+        profile = results.personality_profile
+        factors = []
+        for factor, score in results.factor_scores.items():
+            interpretation = profile.get(factor, "Unknown")
+            factors.append({
+                "name": factor,
+                "score": round(float(score), 4),
+                "level": interpretation,
+                "description": descriptions.get(factor, {}).get('description', 'No description available'),
+                "interpretation": _factor_interpretation(descriptions.get(factor, {}), interpretation),
+            })
+
+        level = self.analyzer._interpret_bias_level
+        indicators = results.bias_indicators
+        categories = []
+        for category_name, entries in self._categories:
+            categories.append({
+                "category": category_name,
+                "indicators": [
+                    {"name": bias, "label": label, "value": round(float(indicators[bias]), 4),
+                     "level": level(indicators[bias]), "description": description}
+                    for bias, label, description in entries if bias in indicators
+                ],
+            })
+
+        return {
+            "dog_id": results.dog_id,
+            "assessment_date": results.assessment_date,
+            "total_questions": len(results.raw_scores),
+            "factors": factors,
+            "dominant_traits": profile.get('Dominant_Traits', 'Unknown'),
+            "bias_categories": categories,
+            "recommendations": self.analyzer._generate_recommendations(results),
+        }
+
+    def render_json(self, results: DPQResults, indent: Optional[int] = None) -> str:
+        """Report content as a JSON string"""
+        return json.dumps(self.render_dict(results), indent=indent, ensure_ascii=False)
+
+    def iter_reports(self, results_iter: Iterable[DPQResults], fmt: str = "text") -> Iterator[Tuple[str, str]]:
+        """
+        Lazily render reports
+
+        Yields:
+            (file name, report) pairs; names are unique and filesystem-safe
+        """
+        if fmt not in FORMATS:
+            raise ValueError(f"Unsupported report format '{fmt}', expected one of {FORMATS}")
+        extension = EXTENSIONS[fmt]
+        for index, results in enumerate(results_iter):
+            yield f"{index:06d}_{_safe_name(results.dog_id)}.{extension}", self.render(results, fmt)
+
+    def write_batch(self, results_iter: Iterable[DPQResults], path: str, fmt: str = "text") -> int:
+        """
+        Stream reports for many dogs to a file or zip archive
+
+        Only one report is held in memory at a time. A path ending in .zip gets
+        one archive member per report; otherwise reports go into a single file
+        (text reports back to back, one HTML document, or JSON Lines). The file
+        is written to a temporary path and moved into place when complete.
+
+        Args:
+            results_iter: DPQResults, e.g. a generator over stored assessments
+            path: Output .zip or file path
+            fmt: "text", "html" or "json"
+
+        Returns:
+            Number of reports written
+        """
+        if fmt not in FORMATS:
+            raise ValueError(f"Unsupported report format '{fmt}', expected one of {FORMATS}")
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        count = 0
+        try:
+            if path.lower().endswith(".zip"):
+                with zipfile.ZipFile(tmp_path, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+                    for name, report in self.iter_reports(results_iter, fmt):
+                        archive.writestr(name, report)
+                        count += 1
+            else:
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    if fmt == "html":
+                        f.write(HTML_HEAD.format(title="DPQ Reports"))
+                    for results in results_iter:
+                        if fmt == "text":
+                            f.write(self.render_text(results))
+                        elif fmt == "html":
+                            f.write(self.render_html_fragment(results))
+                        else:
+                            f.write(self.render_json(results) + "\n")
+                        count += 1
+                    if fmt == "html":
+                        f.write(HTML_TAIL)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return count
+
+    def _compile_text_factor(self, factor: str, interpretation: str) -> str:
+        description = self.analyzer.factor_descriptions.get(factor, {})
+        template = _literal(f"{factor}:\n  Score: ") + "%.2f" + _literal(
+            f"/7.00 ({interpretation})\n"
+            f"  Description: {description.get('description', 'No description available')}\n"
+            f"  Interpretation: {_factor_interpretation(description, interpretation)}\n\n")
+        self._text_factors[(factor, interpretation)] = template
+        return template
+
+    def _compile_html_factor(self, factor: str, interpretation: str) -> str:
+        description = self.analyzer.factor_descriptions.get(factor, {})
+        escape = html.escape
+        template = (
+            _literal(f"<tr><th>{escape(str(factor))}</th>")
+            + "<td>%.2f/7.00 "
+            + _literal(
+                f'(<span class="level-{escape(str(interpretation))}">{escape(str(interpretation))}</span>)</td>'
+                f"<td>{escape(description.get('description', 'No description available'))}</td>"
+                f"<td>{escape(_factor_interpretation(description, interpretation))}</td></tr>\n")
+        )
+        self._html_factors[(factor, interpretation)] = template
+        return template
+
+
+def _factor_interpretation(description: Dict[str, str], interpretation: str) -> str:
+    if interpretation == "High":
+        return description.get('high', '')
+    if interpretation == "Low":
+        return description.get('low', '')
+    return "Moderate levels of this trait"
+
+
+def _literal(text: str) -> str:
+    """Make literal text safe to embed in a %-format template"""
+    return text.replace("%", "%%")
+
+
+def _safe_name(value) -> str:
+    return re.sub(r"[^A-Za-z0-9._-]+", "_", str(value)).strip("._")[:64] or "dog"
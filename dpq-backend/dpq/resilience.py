@@ -0,0 +1,371 @@
+# resilience.py - Circuit breaking, budgeted retries and hedging for Claude calls
+
+import asyncio
+import os
+import random
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import anthropic
+
+# Statuses worth retrying: timeouts, conflicts, rate limits and server errors (529 is "overloaded")
+RETRYABLE_STATUSES = (408, 409, 429)
+
+
+class CircuitOpenError(Exception):
+    """The upstream is considered unhealthy and the call was not attempted"""
+
+    def __init__(self, name: str, retry_in: float):
+        super().__init__(f"{name} circuit open; next probe in {retry_in:.1f}s")
+        self.name = name
+        self.retry_in = retry_in
+
+
+class QueueTimeoutError(Exception):
+    """The deadline passed while the call waited for a local concurrency slot; the upstream was not called"""
+
+    def __init__(self, name: str):
+        super().__init__(f"{name} call timed out waiting for a free slot")
+        self.name = name
+
+
+def is_transient(error: BaseException) -> bool:
+    """Whether an error says the upstream is unhealthy (and the call may be retried)"""
+    if isinstance(error, (anthropic.APIConnectionError, asyncio.TimeoutError, TimeoutError, ConnectionError)):
+        return True
+    status = getattr(error, "status_code", None)
+    return isinstance(status, int) and (status in RETRYABLE_STATUSES or status >= 500)
+
+
+class CircuitBreaker:
+    """
+    Fail fast while an upstream keeps failing
+
+    Closed, the breaker counts consecutive transient failures and opens after
+    failure_threshold of them. Open, every call is rejected until reset_timeout
+    has passed; then a single probe call is let through (half-open), which
+    closes the breaker on success and reopens it on failure.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self.opened = 0
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == self.OPEN and self._clock() - self._opened_at >= self.reset_timeout:
+                return self.HALF_OPEN
+            return self._state
+
+    def allow(self) -> None:
+        """Admit a call, or raise CircuitOpenError"""
+        with self._lock:
+            if self._state == self.OPEN:
+                retry_in = self._opened_at + self.reset_timeout - self._clock()
+                if retry_in > 0:
+                    self.rejected += 1
+                    raise CircuitOpenError(self.name, retry_in)
+                self._state = self.HALF_OPEN
+            if self._state == self.HALF_OPEN:
+                if self._probing:
+                    self.rejected += 1
+                    raise CircuitOpenError(self.name, 0.0)
+                self._probing = True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or (self._state == self.CLOSED
+                                                 and self._failures >= self.failure_threshold):
+                if self._state != self.OPEN:
+                    self.opened += 1
+                self._state = self.OPEN
+                self._opened_at = self._clock()
+            self._probing = False
+
+    def record_cancelled(self) -> None:
+        """An admitted call was abandoned without an outcome (e.g. a losing hedge)"""
+        with self._lock:
+            self._probing = False
+
+    def stats(self) -> Dict[str, Any]:
+        state = self.state
+        with self._lock:
+            return {
+                "state": state,
+                "consecutive_failures": self._failures,
+                "opened": self.opened,
+                "rejected": self.rejected,
+            }
+
+
+class RetryBudget:
+    """
+    Token bucket that bounds retries (and hedges) across all callers
+
+    Every call deposits ratio tokens and each retry withdraws one, so retries
+    stay near ratio of the traffic. min_per_second tokens are added over time
+    so a quiet worker can still retry. During an outage this stops retries
+    from multiplying the load on the upstream.
+    """
+
+    def __init__(self, ratio: float = 0.1, min_per_second: float = 0.5, capacity: float = 10.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.capacity = capacity
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._tokens = capacity
+        self._updated = clock()
+        self.withdrawn = 0
+        self.denied = 0
+
+    def deposit(self) -> None:
+        with self._lock:
+            self._tokens = min(self.capacity, self._tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        """Take one token for a retry; False when the budget is spent"""
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.min_per_second)
+            self._updated = now
+            if self._tokens < 1:
+                self.denied += 1
+                return False
+            self._tokens -= 1
+            self.withdrawn += 1
+            return True
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"tokens": round(self._tokens, 2), "withdrawn": self.withdrawn, "denied": self.denied}
+
+
+class Resilience:
+    """
+    Circuit breaker, jittered retries and hedging around one kind of call
+
+    Transient failures are retried up to max_retries times with full-jitter
+    exponential backoff, each retry paid for from the shared RetryBudget.
+    acall() can also hedge: if the call has not finished after hedge_delay
+    seconds a second identical call is started and the first result wins.
+    """
+
+    def __init__(self, name: str, breaker: Optional[CircuitBreaker] = None,
+                 budget: Optional[RetryBudget] = None, max_retries: int = 2,
+                 base_delay: float = 0.5, max_delay: float = 8.0, rng: Optional[random.Random] = None):
+        self.name = name
+        self.breaker = breaker or CircuitBreaker(name)
+        self.budget = budget or get_retry_budget()
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._rng = rng or random.Random()
+        self.retries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def backoff(self, retry: int) -> float:
+        """Full-jitter delay before the given retry (0-based)"""
+        return self._rng.uniform(0, min(self.max_delay, self.base_delay * 2 ** retry))
+
+    def call(self, fn: Callable[[], Any]) -> Any:
+        """Run fn() with the breaker and retries (blocking)"""
+        self.breaker.allow()
+        self.budget.deposit()
+        retry = 0
+        while True:
+            try:
+                result = fn()
+            except Exception as e:
+                self._record(e)
+                delay = self._retry_delay(e, retry, None)
+                if delay is None:
+                    raise
+            else:
+                self.breaker.record_success()
+                return result
+            time.sleep(delay)
+            retry += 1
+            self.breaker.allow()
+
+    async def acall(self, factory: Callable[[], Awaitable[Any]], timeout: Optional[float] = None,
+                    hedge_delay: Optional[float] = None, limit: Optional[asyncio.Semaphore] = None) -> Any:
+        """
+        Await factory() with the breaker, retries and optional hedging
+
+        Args:
+            factory: Starts one attempt of the call
+            timeout: Seconds for all attempts together, queueing for limit included
+            hedge_delay: Start a hedged attempt if one has not finished after this many seconds
+            limit: Held by each attempt while it runs. Time spent waiting for it is
+                local queueing, so it is not reported to the breaker.
+
+        Raises:
+            CircuitOpenError: While the breaker is open (including between retries)
+            QueueTimeoutError: When the timeout is reached while waiting for limit
+            asyncio.TimeoutError: When the timeout is reached during the call
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout if timeout is not None else None
+        self.breaker.allow()
+        self.budget.deposit()
+        retry = 0
+        while True:
+            try:
+                return await self._hedged(factory, deadline, hedge_delay, limit)
+            except Exception as e:
+                delay = self._retry_delay(e, retry, deadline)
+                if delay is None:
+                    raise
+            await asyncio.sleep(delay)
+            retry += 1
+            self.breaker.allow()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.breaker.stats(),
+            "retries": self.retries,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+        }
+
+    def _retry_delay(self, error: Exception, retry: int, deadline: Optional[float]) -> Optional[float]:
+        """Backoff before retrying error, or None when it must be raised"""
+        if retry >= self.max_retries or not is_transient(error):
+            return None
+        delay = self.backoff(retry)
+        if deadline is not None and asyncio.get_running_loop().time() + delay >= deadline:
+            return None
+        if not self.budget.withdraw():
+            return None
+        self.retries += 1
+        return delay
+
+    def _record(self, error: BaseException) -> None:
+        if is_transient(error):
+            self.breaker.record_failure()
+        else:
+            # The upstream answered (e.g. a 400); that says nothing against its health
+            self.breaker.record_success()
+
+    async def _attempt(self, factory: Callable[[], Awaitable[Any]], deadline: Optional[float],
+                       limit: Optional[asyncio.Semaphore] = None) -> Any:
+        if limit is not None:
+            await self._acquire(limit, deadline)
+        try:
+            if deadline is None:
+                result = await factory()
+            else:
+                result = await asyncio.wait_for(factory(), deadline - asyncio.get_running_loop().time())
+        except asyncio.CancelledError:
+            self.breaker.record_cancelled()
+            raise
+        except Exception as e:
+            self._record(e)
+            raise
+        finally:
+            if limit is not None:
+                limit.release()
+        self.breaker.record_success()
+        return result
+
+    async def _acquire(self, limit: asyncio.Semaphore, deadline: Optional[float]) -> None:
+        """Wait for a slot; running out of time here says nothing about the upstream"""
+        try:
+            if deadline is None:
+                await limit.acquire()
+            else:
+                await asyncio.wait_for(limit.acquire(), deadline - asyncio.get_running_loop().time())
+        except asyncio.TimeoutError:
+            self.breaker.record_cancelled()
+            raise QueueTimeoutError(self.name) from None
+        except BaseException:
+            self.breaker.record_cancelled()
+            raise
+
+    async def _hedged(self, factory: Callable[[], Awaitable[Any]], deadline: Optional[float],
+                      hedge_delay: Optional[float], limit: Optional[asyncio.Semaphore]) -> Any:
+        if hedge_delay is None:
+            return await self._attempt(factory, deadline, limit)
+
+        first = asyncio.ensure_future(self._attempt(factory, deadline, limit))
+        pending = {first}
+        try:
+            done, _ = await asyncio.wait(pending, timeout=hedge_delay)
+            if done:
+                return first.result()
+            # Hedges cost a retry token and are never sent to a recovering upstream
+            if self.breaker.state != CircuitBreaker.CLOSED or not self.budget.withdraw():
+                return await first
+            self.hedges += 1
+            second = asyncio.ensure_future(self._attempt(factory, deadline, limit))
+            pending.add(second)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is second:
+                            self.hedge_wins += 1
+                        return task.result()
+            return first.result()
+        finally:
+            for task in pending:
+                task.cancel()
+
+
+_retry_budget: Optional[RetryBudget] = None
+_resilience: Dict[str, Resilience] = {}
+_resilience_lock = threading.Lock()
+
+
+def get_retry_budget() -> RetryBudget:
+    """Process-wide retry budget shared by every Claude call (DPQ_LLM_RETRY_RATIO, default 0.1)"""
+    global _retry_budget
+    with _resilience_lock:
+        if _retry_budget is None:
+            _retry_budget = RetryBudget(ratio=float(os.getenv("DPQ_LLM_RETRY_RATIO", "0.1")))
+        return _retry_budget
+
+
+def get_resilience(name: str) -> Resilience:
+    """
+    Process-wide Resilience for a kind of Claude call
+
+    Configured by DPQ_LLM_RETRIES (default 2), DPQ_LLM_BREAKER_THRESHOLD
+    (consecutive failures, default 5) and DPQ_LLM_BREAKER_RESET (seconds, default 30).
+    """
+    budget = get_retry_budget()
+    with _resilience_lock:
+        resilience = _resilience.get(name)
+        if resilience is None:
+            breaker = CircuitBreaker(name,
+                                     failure_threshold=int(os.getenv("DPQ_LLM_BREAKER_THRESHOLD", "5")),
+                                     reset_timeout=float(os.getenv("DPQ_LLM_BREAKER_RESET", "30")))
+            resilience = _resilience[name] = Resilience(
+                name, breaker, budget, max_retries=int(os.getenv("DPQ_LLM_RETRIES", "2")))
+        return resilience
@@ -0,0 +1,320 @@
+# resource_accounting.py - Per-request and per-job resource accounting
+
+import contextvars
+import os
+import subprocess
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+TOKEN_FIELDS = ("input_tokens", "output_tokens", "cache_read_input_tokens", "cache_creation_input_tokens")
+
+# Totals aggregated per endpoint and per user
+TOTAL_FIELDS = TOKEN_FIELDS + ("llm_calls", "child_cpu_seconds", "child_processes",
+                               "db_round_trips", "db_seconds", "db_acquire_seconds", "wall_seconds")
+
+
+class ResourceUsage:
+    """
+    Resources consumed by one request or background job
+
+    Shared by every task and thread that runs in the request's context, so
+    updates take a lock.
+    """
+
+    def __init__(self, endpoint: str, user_id: Optional[str] = None):
+        self.endpoint = endpoint
+        self.user_id = user_id
+        self.totals: Dict[str, float] = {field: 0 for field in TOTAL_FIELDS}
+        self.stages: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._start = time.perf_counter()
+        self._finished = False
+
+    def add(self, **amounts: float) -> None:
+        """Add to the totals (keys from TOTAL_FIELDS)"""
+        with self._lock:
+            for field, amount in amounts.items():
+                self.totals[field] += amount
+
+    def add_stage(self, name: str, seconds: float) -> None:
+        with self._lock:
+            self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def finish(self) -> None:
+        """Fix the wall time at the end of the request or job"""
+        with self._lock:
+            self.totals["wall_seconds"] = time.perf_counter() - self._start
+            self._finished = True
+
+    def summary(self) -> Dict[str, Any]:
+        """Totals, prompt-cache hit ratio and per-stage wall seconds (so far, if still running)"""
+        with self._lock:
+            totals = dict(self.totals)
+            stages = {name: round(seconds, 4) for name, seconds in self.stages.items()}
+            if not self._finished:
+                totals["wall_seconds"] = time.perf_counter() - self._start
+        for field in ("child_cpu_seconds", "db_seconds", "db_acquire_seconds", "wall_seconds"):
+            totals[field] = round(totals[field], 4)
+        return {
+            "endpoint": self.endpoint,
+            "user_id": self.user_id,
+            **totals,
+            "cache_hit_ratio": cache_hit_ratio(totals),
+            "stages": stages,
+        }
+
+
+def cache_hit_ratio(totals: Dict[str, float]) -> Optional[float]:
+    """Share of prompt tokens read from the prompt cache"""
+    prompt_tokens = (totals["input_tokens"] + totals["cache_read_input_tokens"]
+                     + totals["cache_creation_input_tokens"])
+    return round(totals["cache_read_input_tokens"] / prompt_tokens, 4) if prompt_tokens else None
+
+
+_current: contextvars.ContextVar[Optional[ResourceUsage]] = contextvars.ContextVar("resource_usage", default=None)
+
+
+def current_usage() -> Optional[ResourceUsage]:
+    """Usage of the request or job running in this context, if any"""
+    return _current.get()
+
+
+@contextmanager
+def track(endpoint: str, user_id: Optional[str] = None,
+          ledger: Optional["ResourceLedger"] = None) -> Iterator[ResourceUsage]:
+    """
+    Account everything run in this context to a new ResourceUsage
+
+    Tasks created and threads started via asyncio.to_thread inside the block
+    inherit it. The usage is added to the ledger when the block exits.
+    """
+    usage = ResourceUsage(endpoint, user_id)
+    token = _current.set(usage)
+    try:
+        yield usage
+    finally:
+        _current.reset(token)
+        usage.finish()
+        (ledger or get_resource_ledger()).record(usage)
+
+
+def set_user(user_id: Optional[str]) -> None:
+    """Attribute the current request to a user once it is known"""
+    usage = _current.get()
+    if usage is not None and user_id:
+        usage.user_id = user_id
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Add the block's wall time to a named stage of the current usage"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        usage = _current.get()
+        if usage is not None:
+            usage.add_stage(name, time.perf_counter() - start)
+
+
+def record_llm_usage(usage: Any) -> None:
+    """Add an Anthropic message's usage (message.usage) to the current usage"""
+    current = _current.get()
+    if current is None or usage is None:
+        return
+    current.add(llm_calls=1, **{field: getattr(usage, field, None) or 0 for field in TOKEN_FIELDS})
+
+
+def record_db(round_trips: int, seconds: float) -> None:
+    current = _current.get()
+    if current is not None:
+        current.add(db_round_trips=round_trips, db_seconds=seconds)
+
+
+def record_db_wait(seconds: float) -> None:
+    """Add time spent waiting for a pooled connection to the current usage"""
+    current = _current.get()
+    if current is not None:
+        current.add(db_acquire_seconds=seconds)
+
+
+class _AccountedPopen(subprocess.Popen):
+    """Popen that reaps its child with wait4 to keep the child's rusage"""
+
+    rusage = None
+
+    def _try_wait(self, wait_flags):
+        if not hasattr(os, "wait4"):  # Windows
+            return super()._try_wait(wait_flags)
+        try:
+            pid, status, rusage = os.wait4(self.pid, wait_flags)
+        except ChildProcessError:
+            # Reaped elsewhere (e.g. SIGCLD ignored); nothing to account
+            return self.pid, 0
+        if pid == self.pid:
+            self.rusage = rusage
+        return pid, status
+
+
+def run_process(cmd: List[str], **kwargs) -> subprocess.CompletedProcess:
+    """
+    subprocess.run() that adds the child's CPU seconds to the current usage
+
+    Takes the same arguments as subprocess.run (input, timeout, check,
+    capture_output and Popen arguments).
+    """
+    input = kwargs.pop("input", None)
+    timeout = kwargs.pop("timeout", None)
+    check = kwargs.pop("check", False)
+    if kwargs.pop("capture_output", False):
+        kwargs["stdout"] = subprocess.PIPE
+        kwargs["stderr"] = subprocess.PIPE
+    if input is not None:
+        kwargs["stdin"] = subprocess.PIPE
+
+    with _AccountedPopen(cmd, **kwargs) as process:
+        try:
+            stdout, stderr = process.communicate(input, timeout=timeout)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+            raise
+        finally:
+            _record_child(process.rusage)
+        returncode = process.poll()
+    if check and returncode:
+        raise subprocess.CalledProcessError(returncode, cmd, stdout, stderr)
+    return subprocess.CompletedProcess(cmd, returncode, stdout, stderr)
+
+
+def _record_child(rusage) -> None:
+    current = _current.get()
+    if current is not None:
+        cpu = rusage.ru_utime + rusage.ru_stime if rusage is not None else 0.0
+        current.add(child_processes=1, child_cpu_seconds=cpu)
+
+
+class AccountedConnection:
+    """
+    Wraps an asyncpg connection, counting each query as a database round trip
+
+    Any other attribute is passed through to the connection.
+    """
+
+    QUERY_METHODS = ("execute", "executemany", "fetch", "fetchrow", "fetchval", "copy_records_to_table")
+
+    def __init__(self, connection):
+        self._connection = connection
+
+    def __getattr__(self, name: str):
+        attribute = getattr(self._connection, name)
+        if name not in self.QUERY_METHODS:
+            return attribute
+
+        async def query(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await attribute(*args, **kwargs)
+            finally:
+                record_db(1, time.perf_counter() - start)
+        return query
+
+
+async def connect_accounted(connect, **kwargs) -> AccountedConnection:
+    """Open a connection with connect(**kwargs), counting the connect as a round trip"""
+    start = time.perf_counter()
+    try:
+        connection = await connect(**kwargs)
+    finally:
+        record_db(1, time.perf_counter() - start)
+    return AccountedConnection(connection)
+
+
+class ResourceLedger:
+    """
+    Usage totals per endpoint and per user
+
+    Users are kept in LRU order and the least recently seen are dropped past
+    max_users, so the ledger stays bounded.
+    """
+
+    def __init__(self, max_users: int = 10000):
+        self.max_users = max_users
+        self._lock = threading.Lock()
+        self._endpoints: Dict[str, Dict[str, float]] = {}
+        self._users: "OrderedDict[str, Dict[str, float]]" = OrderedDict()
+
+    def record(self, usage: ResourceUsage) -> None:
+        """Add a finished request or job to its endpoint and user"""
+        with usage._lock:
+            totals = dict(usage.totals)
+        with self._lock:
+            self._add(self._endpoints.setdefault(usage.endpoint, self._empty()), totals)
+            if usage.user_id:
+                entry = self._users.get(usage.user_id)
+                if entry is None:
+                    entry = self._users[usage.user_id] = self._empty()
+                    if len(self._users) > self.max_users:
+                        self._users.popitem(last=False)
+                else:
+                    self._users.move_to_end(usage.user_id)
+                self._add(entry, totals)
+
+    def top(self, by: str = "endpoint", sort: str = "input_tokens", limit: int = 20) -> List[Dict[str, Any]]:
+        """
+        Most expensive endpoints or users
+
+        Args:
+            by: "endpoint" or "user"
+            sort: Total to order by (a TOTAL_FIELDS name)
+            limit: Number of rows
+
+        Returns:
+            Rows with the totals, request count, means per request and cache hit ratio
+        """
+        if by not in ("endpoint", "user"):
+            raise ValueError(f"Unknown grouping: {by}")
+        if sort not in TOTAL_FIELDS:
+            raise ValueError(f"Unknown total: {sort}")
+        with self._lock:
+            entries = [(name, dict(totals)) for name, totals in
+                       (self._endpoints if by == "endpoint" else self._users).items()]
+        entries.sort(key=lambda entry: entry[1][sort], reverse=True)
+        rows = []
+        for name, totals in entries[:limit]:
+            requests = totals.pop("requests")
+            rows.append({
+                by: name,
+                "requests": requests,
+                **{field: round(value, 4) for field, value in totals.items()},
+                "mean_wall_seconds": round(totals["wall_seconds"] / requests, 4),
+                "mean_tokens": round((totals["input_tokens"] + totals["output_tokens"]) / requests, 1),
+                "cache_hit_ratio": cache_hit_ratio(totals),
+            })
+        return rows
+
+    def reset(self) -> None:
+        with self._lock:
+            self._endpoints.clear()
+            self._users.clear()
+
+    @staticmethod
+    def _empty() -> Dict[str, float]:
+        return {"requests": 0, **{field: 0 for field in TOTAL_FIELDS}}
+
+    @staticmethod
+    def _add(entry: Dict[str, float], totals: Dict[str, float]) -> None:
+        entry["requests"] += 1
+        for field, value in totals.items():
+            entry[field] += value
+
+
+_ledger = ResourceLedger()
+
+
+def get_resource_ledger() -> ResourceLedger:
+    """Process-wide ledger of this worker"""
+    return _ledger
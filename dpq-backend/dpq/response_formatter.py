@@ -2,27 +2,225 @@
 
 import json
 from datetime import datetime
-from typing import Dict, Any, Optional
+from functools import lru_cache
+from typing import Dict, Any, Optional, Tuple
 import uuid
-from .claude_recommender import replace_hardcoded_recommendations
+from .claude_recommender import replace_hardcoded_recommendations, stored_recommendations
+from .recommendation_rules import BASELINE_VERSION
+
+# Short keys of the DPQ factor names used by the tables below
+FACTOR_KEYS = {
+    "Factor 1 - Fearfulness": "fearfulness",
+    "Factor 2 - Aggression towards People": "aggression_people",
+    "Factor 3 - Activity/Excitability": "activity_excitability",
+    "Factor 4 - Responsiveness to Training": "training_responsiveness",
+    "Factor 5 - Aggression towards Animals": "aggression_animals",
+}
+
+FACTOR_DESCRIPTIONS = {
+    'fearfulness': {
+        'High': 'Shows high levels of anxiety and fear responses',
+        'Moderate': 'Shows moderate levels of anxiety and fear responses',
+        'Low': 'Generally confident and calm in various situations'
+    },
+    'aggression_people': {
+        'High': 'May show aggressive tendencies toward people',
+        'Moderate': 'Shows some wariness or assertiveness with people',
+        'Low': 'Generally friendly and non-aggressive toward people'
+    },
+    'activity_excitability': {
+        'High': 'Highly energetic, excitable, and active',
+        'Moderate': 'Moderately energetic with balanced activity levels',
+        'Low': 'Calm and low-energy, prefers quiet activities'
+    },
+    'training_responsiveness': {
+        'High': 'Highly trainable and responsive to commands',
+        'Moderate': 'Moderately trainable with consistent effort',
+        'Low': 'May be challenging to train, requires patience'
+    },
+    'aggression_animals': {
+        'High': 'Shows high reactivity or aggression toward other animals',
+        'Moderate': 'Shows moderate reactivity toward other animals',
+        'Low': 'Generally peaceful and non-aggressive with other animals'
+    }
+}
+
+# (factor key, level) -> dominant trait and key characteristic
+DOMINANT_TRAITS = {
+    ('activity_excitability', 'High'): 'Energetic/Excitable',
+    ('training_responsiveness', 'High'): 'Trainable/Responsive',
+    ('fearfulness', 'High'): 'Sensitive/Cautious',
+}
+KEY_CHARACTERISTICS = {
+    ('activity_excitability', 'High'): "Very energetic and playful",
+    ('training_responsiveness', 'High'): "Highly trainable and responsive",
+    ('aggression_people', 'Low'): "Generally friendly with people",
+    ('fearfulness', 'High'): "Sensitive and needs gentle handling",
+}
+DEFAULT_CHARACTERISTICS = ["Well-balanced personality", "Adaptable to various situations"]
+
+# (factor key, levels) -> trait tag used by PERSONALITY_TYPES
+TRAIT_TAGS = (
+    ('activity_excitability', ('High',), "high_energy"),
+    ('activity_excitability', ('Low', 'Moderate-Low'), "low_energy"),
+    ('training_responsiveness', ('High',), "high_trainability"),
+    ('training_responsiveness', ('Low', 'Moderate-Low'), "low_trainability"),
+    ('fearfulness', ('High',), "high_fearfulness"),
+    ('aggression_people', ('High',), "high_aggression"),
+    ('aggression_animals', ('High',), "high_aggression"),
+)
+
+# Primary type of the first entry whose tags the dog has all of ("moderate": no High factor)
+PERSONALITY_TYPES = (
+    (("high_aggression", "high_energy"), "Assertive Guardian"),
+    (("high_energy", "high_trainability"), "High-Energy Companion"),
+    (("high_fearfulness", "high_trainability"), "Sensitive Learner"),
+    (("high_fearfulness", "low_trainability"), "Anxious Independent"),
+    (("high_energy", "low_trainability"), "Independent Adventurer"),
+    (("high_energy",), "Energetic Explorer"),
+    (("low_energy", "high_trainability"), "Calm Companion"),
+    (("high_trainability",), "Eager Learner"),
+    (("high_fearfulness",), "Sensitive Soul"),
+    (("low_energy", "low_trainability"), "Laid-Back Independent"),
+    (("moderate",), "Balanced Companion"),
+)
+DEFAULT_PERSONALITY_TYPE = "Unique Personality"
+
+# Personality levels as ((factor name, level), ...) in factor order
+Levels = Tuple[Tuple[str, str], ...]
+
+
+class ReadOnlyDict(dict):
+    """dict that refuses modification, so a shared value cannot be changed by one of its users"""
+
+    __slots__ = ()
+
+    def _read_only(self, *args, **kwargs):
+        raise TypeError(f"{type(self).__name__} is read-only")
+
+    __setitem__ = __delitem__ = __ior__ = _read_only
+    clear = pop = popitem = setdefault = update = _read_only
+
+    def __reduce__(self):
+        # copy and pickle would otherwise refill the new instance item by item
+        return type(self), (dict(self),)
+
+
+def read_only(value: Any) -> Any:
+    """Value with its dicts made ReadOnlyDicts and its lists tuples, recursively"""
+    if isinstance(value, dict):
+        return ReadOnlyDict({key: read_only(item) for key, item in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(read_only(item) for item in value)
+    return value
+
+
+class JSONFragment(ReadOnlyDict):
+    """
+    Memoized response section that carries its JSON text
+
+    Fragments are shared between responses, so they are read-only all the
+    way down (nested lists become tuples); copy one into a dict to change it.
+    """
+
+    __slots__ = ("json",)
+
+    def __init__(self, value: Dict[str, Any]):
+        super().__init__(read_only(value))
+        self.json = json.dumps(value)
+
+    def __reduce__(self):
+        return type(self), (json.loads(self.json),)
+
+
+def factor_description(factor_name: str, level: str) -> str:
+    """Description of a factor at a level"""
+    key = FACTOR_KEYS.get(factor_name, factor_name)
+    return FACTOR_DESCRIPTIONS.get(key, {}).get(level, f"{level} levels for {factor_name}")
+
+
+def primary_type(levels: Levels) -> str:
+    """Classify a dog's personality type from its factor levels"""
+    tags = set()
+    for factor_name, level in levels:
+        key = FACTOR_KEYS.get(factor_name, factor_name)
+        tags.update(tag for factor, tag_levels, tag in TRAIT_TAGS if factor == key and level in tag_levels)
+    if not any(level == 'High' for _, level in levels):
+        tags.add("moderate")
+    for required, personality_type in PERSONALITY_TYPES:
+        if tags.issuperset(required):
+            return personality_type
+    return DEFAULT_PERSONALITY_TYPE
+
+
+@lru_cache(maxsize=4096)
+def personality_summary(levels: Levels) -> JSONFragment:
+    """
+    Personality summary for a combination of factor levels (memoized)
+
+    Five factors at five levels give 3125 possible summaries, so each is
+    built and serialized once.
+    """
+    traits = [(FACTOR_KEYS.get(factor_name, factor_name), level) for factor_name, level in levels]
+    dominant_traits = [DOMINANT_TRAITS[trait] for trait in traits if trait in DOMINANT_TRAITS]
+    key_characteristics = [KEY_CHARACTERISTICS[trait] for trait in traits if trait in KEY_CHARACTERISTICS]
+    return JSONFragment({
+        "dominant_traits": dominant_traits[:2],  # Top 2 traits
+        "primary_type": primary_type(levels),
+        "key_characteristics": (key_characteristics or DEFAULT_CHARACTERISTICS)[:5]
+    })
+
+
+@lru_cache(maxsize=8192)
+def ai_translator_config(excitability: float, fearfulness: float, trainability: float) -> JSONFragment:
+    """
+    AI translator configuration for three bias indicators (memoized)
+
+    The formatter rounds indicators to two decimals, so the distinct inputs
+    are few and mostly repeat.
+    """
+    if excitability > 0.7:
+        communication_style = "energetic_friendly"
+    elif fearfulness > 0.7:
+        communication_style = "calm_reassuring"
+    elif trainability > 0.7:
+        communication_style = "structured_positive"
+    else:
+        communication_style = "balanced_adaptive"
+    
+    return JSONFragment({
+        "communication_style": communication_style,
+        "tone_adjustments": {
+            "base_energy_level": "high" if excitability > 0.6 else "moderate",
+            "excitement_threshold": round(excitability, 2),
+            "calming_needed": fearfulness > 0.6,
+            "authority_response": "positive" if trainability > 0.6 else "gentle"
+        },
+        "response_modifications": {
+            "increase_enthusiasm": round(excitability, 2),
+            "add_training_cues": round(trainability, 2),
+            "reduce_fear_language": round(1.0 - fearfulness, 2),
+            "enhance_play_references": round(excitability * 0.8, 2)
+        }
+    })
+
 
 class DPQResponseFormatter:
     """
     Formats DPQ assessment results into the JSON format expected by frontend
     """
     
-    def __init__(self):
-        self.personality_type_mapping = {
-            # Based on dominant traits combinations
-            ("high_energy", "high_trainability"): "High-Energy Companion",
-            ("high_energy", "low_trainability"): "Independent Adventurer", 
-            ("low_energy", "high_trainability"): "Calm Companion",
-            ("low_energy", "low_trainability"): "Laid-Back Independent",
-            ("high_fearfulness", "high_trainability"): "Sensitive Learner",
-            ("high_fearfulness", "low_trainability"): "Anxious Independent",
-            ("high_aggression", "high_energy"): "Assertive Guardian",
-            ("moderate", "moderate"): "Balanced Companion"
-        }
+    def __init__(self, population_norms=None, reliability=None, recommendation_rules=None):
+        """
+        Args:
+            population_norms: Optional PopulationNorms used to add percentile ranks
+            reliability: Optional ReliabilityTracker supplying Cronbach's alpha values
+            recommendation_rules: Optional RecommendationRules. When given, recommendations
+                are the rule-based baseline instead of a blocking Claude call.
+        """
+        self.population_norms = population_norms
+        self.reliability = reliability
+        self.recommendation_rules = recommendation_rules
     
     def format_assessment_response(self, 
                                  dpq_results: Dict[str, Any],
@@ -51,6 +249,17 @@ class DPQResponseFormatter:
         # Format personality factors
         personality_factors = self._format_personality_factors(dpq_results['factor_scores'])
         
+        # Rank against our own population (None until enough data exists)
+        population_percentiles = None
+        if self.population_norms is not None:
+            population_percentiles = self.population_norms.percentiles(
+                dpq_results['factor_scores'],
+                dpq_results.get('facet_scores', {}),
+                dog_info.get('breed')
+            )
+            for factor_name, factor_data in personality_factors.items():
+                factor_data.update(population_percentiles.get(factor_name, {}))
+        
         # Generate AI bias indicators (this is critical for AI translator)
         ai_bias_indicators = self._format_ai_bias_indicators(dpq_results['bias_indicators'])
         
@@ -105,6 +314,9 @@ class DPQResponseFormatter:
             # Assessment quality metrics (stored in dpq_assessments table)
             "quality_metrics": quality_metrics,
             
+            # Percentile ranks per factor and facet, overall and within breed
+            "population_percentiles": population_percentiles,
+            
             # Versioning (stored in dpq_assessments table)
             "metadata": {
                 "assessment_version": "DPQ_Short_Form_v1.0",
@@ -127,7 +339,7 @@ class DPQResponseFormatter:
             factors[factor_name] = {
                 "score": round(score, 1),
                 "level": level,
-                "description": self._get_factor_description(factor_name, level),
+                "description": factor_description(factor_name, level),
             }
         
         return factors
@@ -145,74 +357,34 @@ class DPQResponseFormatter:
     
     def _generate_personality_summary(self, personality_factors: Dict[str, Any]) -> Dict[str, Any]:
         """
-        Generate human-readable personality summary
+        Generate human-readable personality summary (a shared JSONFragment)
         """
-        # Identify dominant traits
-        dominant_traits = []
-        high_factors = []
-        
-        for factor_name, factor_data in personality_factors.items():
-            if factor_data['level'] == 'High':
-                high_factors.append(factor_name)
-                if factor_name == 'activity_excitability':
-                    dominant_traits.append('Energetic/Excitable')
-                elif factor_name == 'training_responsiveness':
-                    dominant_traits.append('Trainable/Responsive')
-                elif factor_name == 'fearfulness':
-                    dominant_traits.append('Sensitive/Cautious')
-        
-        # Determine primary personality type
-        primary_type = self._determine_primary_type(high_factors)
-        
-        # Generate key characteristics
-        key_characteristics = self._generate_key_characteristics(personality_factors)
-        
-        return {
-            "dominant_traits": dominant_traits[:2],  # Top 2 traits
-            "primary_type": primary_type,
-            "key_characteristics": key_characteristics
-        }
+        return personality_summary(tuple((factor_name, factor_data['level'])
+                                         for factor_name, factor_data in personality_factors.items()))
     
     def _generate_ai_translator_config(self, ai_bias_indicators: Dict[str, float]) -> Dict[str, Any]:
         """
-        Generate AI translator configuration based on bias indicators
+        Generate AI translator configuration based on bias indicators (a shared JSONFragment)
         """
-        # Determine communication style
-        excitability = ai_bias_indicators.get('excitability_bias', 0.5)
-        fearfulness = ai_bias_indicators.get('fearfulness_bias', 0.5)
-        trainability = ai_bias_indicators.get('trainability_bias', 0.5)
-        
-        if excitability > 0.7:
-            communication_style = "energetic_friendly"
-        elif fearfulness > 0.7:
-            communication_style = "calm_reassuring"
-        elif trainability > 0.7:
-            communication_style = "structured_positive"
-        else:
-            communication_style = "balanced_adaptive"
-        
-        return {
-            "communication_style": communication_style,
-            "tone_adjustments": {
-                "base_energy_level": "high" if excitability > 0.6 else "moderate",
-                "excitement_threshold": round(excitability, 2),
-                "calming_needed": fearfulness > 0.6,
-                "authority_response": "positive" if trainability > 0.6 else "gentle"
-            },
-            "response_modifications": {
-                "increase_enthusiasm": round(excitability, 2),
-                "add_training_cues": round(trainability, 2),
-                "reduce_fear_language": round(1.0 - fearfulness, 2),
-                "enhance_play_references": round(excitability * 0.8, 2)
-            }
-        }
+        return ai_translator_config(
+            ai_bias_indicators.get('excitability_bias', 0.5),
+            ai_bias_indicators.get('fearfulness_bias', 0.5),
+            ai_bias_indicators.get('trainability_bias', 0.5)
+        )
     
     def _generate_recommendations(self, personality_factors: Dict[str, Any],
                                 ai_bias_indicators: Dict[str, float],
                                 dog_info: Dict[str, Any]) -> Dict[str, Any]:
         """
-        Generate recommendations using Claude API
+        Generate recommendations using Claude API, or the rule-based baseline if configured
         """
+        if self.recommendation_rules is not None:
+            baseline = self.recommendation_rules.recommend(
+                {name: data['score'] for name, data in personality_factors.items()},
+                ai_bias_indicators
+            )
+            return {**stored_recommendations(baseline), "version": BASELINE_VERSION, "source": "rules"}
+        
         try:
             # Prepare data for Claude API
             dpq_results_dict = {
@@ -258,8 +430,16 @@ class DPQResponseFormatter:
         # Calculate response consistency (mock implementation)
         consistency = "high" if len(unique_values) >= 4 else "low"
         
+        # Internal-consistency reliability of the instrument over our population
+        reliability_score = None
+        reliability = None
+        if self.reliability is not None:
+            reliability_score = self.reliability.overall_reliability()
+            reliability = self.reliability.alphas()
+        
         return {
-            "reliability_score": 0.94,  # Mock score - would be calculated from actual data
+            "reliability_score": reliability_score,
+            "reliability": reliability,
             "response_consistency": consistency,
             "extreme_response_bias": extreme_bias,
             "all_questions_answered": len(responses) == 45
@@ -300,80 +480,3 @@ class DPQResponseFormatter:
             return "Moderate-Low"
         else:
             return "Low"
-    
-
-    def _get_factor_description(self, factor_name: str, level: str) -> str:
-        """
-        Get description for personality factor
-        """
-        descriptions = {
-            'fearfulness': {
-                'High': 'Shows high levels of anxiety and fear responses',
-                'Moderate': 'Shows moderate levels of anxiety and fear responses',
-                'Low': 'Generally confident and calm in various situations'
-            },
-            'aggression_people': {
-                'High': 'May show aggressive tendencies toward people',
-                'Moderate': 'Shows some wariness or assertiveness with people',
-                'Low': 'Generally friendly and non-aggressive toward people'
-            },
-            'activity_excitability': {
-                'High': 'Highly energetic, excitable, and active',
-                'Moderate': 'Moderately energetic with balanced activity levels',
-                'Low': 'Calm and low-energy, prefers quiet activities'
-            },
-            'training_responsiveness': {
-                'High': 'Highly trainable and responsive to commands',
-                'Moderate': 'Moderately trainable with consistent effort',
-                'Low': 'May be challenging to train, requires patience'
-            },
-            'aggression_animals': {
-                'High': 'Shows high reactivity or aggression toward other animals',
-                'Moderate': 'Shows moderate reactivity toward other animals',
-                'Low': 'Generally peaceful and non-aggressive with other animals'
-            }
-        }
-        
-        return descriptions.get(factor_name, {}).get(level, f"{level} levels for {factor_name}")
-    
-    def _determine_primary_type(self, high_factors: list) -> str:
-        """
-        Determine primary personality type based on high factors
-        """
-        if 'activity_excitability' in high_factors and 'training_responsiveness' in high_factors:
-            return "High-Energy Companion"
-        elif 'activity_excitability' in high_factors:
-            return "Energetic Explorer"
-        elif 'training_responsiveness' in high_factors:
-            return "Eager Learner"
-        elif 'fearfulness' in high_factors:
-            return "Sensitive Soul"
-        elif len(high_factors) == 0:
-            return "Balanced Companion"
-        else:
-            return "Unique Personality"
-    
-    def _generate_key_characteristics(self, personality_factors: Dict[str, Any]) -> list:
-        """
-        Generate key characteristics based on personality factors
-        """
-        characteristics = []
-        
-        for factor_name, factor_data in personality_factors.items():
-            level = factor_data['level']
-            
-            if factor_name == 'activity_excitability' and level == 'High':
-                characteristics.append("Very energetic and playful")
-            elif factor_name == 'training_responsiveness' and level == 'High':
-                characteristics.append("Highly trainable and responsive")
-            elif factor_name == 'aggression_people' and level == 'Low':
-                characteristics.append("Generally friendly with people")
-            elif factor_name == 'fearfulness' and level == 'High':
-                characteristics.append("Sensitive and needs gentle handling")
-        
-        # Add default characteristics if none found
-        if not characteristics:
-            characteristics.append("Well-balanced personality")
-            characteristics.append("Adaptable to various situations")
-        
-        return characteristics[:5]  # Limit to 5 characteristics
\ No newline at end of file
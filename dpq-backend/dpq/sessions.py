@@ -0,0 +1,270 @@
+# sessions.py - Incremental provisional scoring for in-progress questionnaires
+
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from .dpq import DogPersonalityQuestionnaire
+
+# Three bits per answer (0 = unanswered, 1-7 = rating), 21 answers per 64-bit word
+BITS_PER_ANSWER = 3
+ANSWERS_PER_WORD = 21
+
+
+class SessionStore:
+    """
+    Compact table of in-progress DPQ sessions with O(1) answer updates
+
+    Each session is one row of fixed-width numpy columns: the 45 answers packed
+    three bits each into 64-bit words, a 64-bit answered mask and the 15
+    reverse-coded facet sums (about 50 bytes per session). Recording an answer
+    touches one word, one mask bit and one facet sum; provisional facet and
+    factor scores are read off the sums. pack()/unpack() give a 23-byte form
+    for key-value storage.
+    """
+
+    def __init__(self, questionnaire: Optional[DogPersonalityQuestionnaire] = None,
+                 ttl_seconds: int = 24 * 60 * 60, initial_capacity: int = 1024):
+        """
+        Args:
+            questionnaire: Defines the scoring structure. Defaults to the standard DPQ.
+            ttl_seconds: Sessions untouched for this long are expired
+            initial_capacity: Rows to preallocate
+        """
+        self.questionnaire = questionnaire or DogPersonalityQuestionnaire()
+        plan = self.questionnaire.plan
+        self.plan = plan
+        self.n_items = plan.n_items
+        self.n_words = -(-self.n_items // ANSWERS_PER_WORD)
+        self.ttl_seconds = ttl_seconds
+
+        # item -> (facet index, reversed); facet -> answered-mask bits
+        self.item_facet = [-1] * (self.n_items + 1)
+        self.item_reversed = [False] * (self.n_items + 1)
+        self.facet_masks = []
+        for facet_index, items in enumerate(plan.facet_items):
+            mask = 0
+            for item, reverse in items:
+                self.item_facet[item] = facet_index
+                self.item_reversed[item] = reverse
+                mask |= 1 << (item - 1)
+            self.facet_masks.append(mask)
+
+        self._answers = np.zeros((initial_capacity, self.n_words), dtype=np.uint64)
+        self._masks = np.zeros(initial_capacity, dtype=np.uint64)
+        self._facet_sums = np.zeros((initial_capacity, len(plan.facet_names)), dtype=np.uint8)
+        self._touched = np.zeros(initial_capacity, dtype=np.uint32)
+        self._row_ids: List[Optional[str]] = [None] * initial_capacity
+        self._rows: Dict[str, int] = {}
+        self._last_expiry = time.time()
+        self._free: List[int] = list(range(initial_capacity - 1, -1, -1))
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._rows
+
+    def create(self, session_id: Optional[str] = None) -> str:
+        """Start an empty session and return its ID (expiring idle sessions at most once a minute)"""
+        session_id = session_id or uuid.uuid4().hex
+        if time.time() - self._last_expiry > 60:
+            self.expire()
+        with self._lock:
+            if session_id in self._rows:
+                raise ValueError(f"Session {session_id} already exists")
+            row = self._allocate()
+            self._rows[session_id] = row
+            self._row_ids[row] = session_id
+            self._touched[row] = int(time.time())
+        return session_id
+
+    def answer(self, session_id: str, item: int, value: int) -> Dict:
+        """
+        Record (or change) one answer and return the provisional scores
+
+        Args:
+            session_id: Session ID
+            item: Question number (1-45)
+            value: Rating 1-7, or 0 to clear the answer
+        """
+        item, value = int(item), int(value)
+        if not 1 <= item <= self.n_items:
+            raise ValueError(f"Invalid question number: {item}")
+        if not 0 <= value <= 7:
+            raise ValueError(f"Invalid response value: {value} for question {item}")
+
+        word, shift = divmod(item - 1, ANSWERS_PER_WORD)
+        shift *= BITS_PER_ANSWER
+        facet = self.item_facet[item]
+        with self._lock:
+            row = self._row(session_id)
+            packed = int(self._answers[row, word])
+            previous = (packed >> shift) & 7
+            self._answers[row, word] = (packed & ~(7 << shift)) | (value << shift)
+
+            bit = 1 << (item - 1)
+            mask = int(self._masks[row])
+            self._masks[row] = mask | bit if value else mask & ~bit
+            if facet >= 0:
+                delta = self._coded(item, value) - self._coded(item, previous)
+                self._facet_sums[row, facet] = int(self._facet_sums[row, facet]) + delta
+            self._touched[row] = int(time.time())
+            return self._provisional(session_id, row)
+
+    def answer_many(self, session_id: str, responses: Dict[int, int]) -> Dict:
+        """Record several answers and return the provisional scores"""
+        result = None
+        for item, value in responses.items():
+            result = self.answer(session_id, item, value)
+        return result if result is not None else self.scores(session_id)
+
+    def scores(self, session_id: str) -> Dict:
+        """Current provisional scores"""
+        with self._lock:
+            return self._provisional(session_id, self._row(session_id))
+
+    def responses(self, session_id: str) -> Dict[int, int]:
+        """Answered items as a score_assessment-ready dict"""
+        with self._lock:
+            words = [int(w) for w in self._answers[self._row(session_id)]]
+        responses = {}
+        for item in range(1, self.n_items + 1):
+            word, shift = divmod(item - 1, ANSWERS_PER_WORD)
+            value = (words[word] >> (shift * BITS_PER_ANSWER)) & 7
+            if value:
+                responses[item] = value
+        return responses
+
+    def discard(self, session_id: str) -> bool:
+        """Drop a session, returning False if it did not exist"""
+        with self._lock:
+            row = self._rows.pop(session_id, None)
+            if row is None:
+                return False
+            self._clear(row)
+            return True
+
+    def expire(self, now: Optional[float] = None) -> int:
+        """Drop sessions idle for longer than ttl_seconds, returning how many"""
+        now = now if now is not None else time.time()
+        cutoff = int(now) - self.ttl_seconds
+        with self._lock:
+            self._last_expiry = now
+            # Free rows have touched == 0
+            stale = np.flatnonzero((self._touched > 0) & (self._touched < cutoff))
+            for row in stale:
+                del self._rows[self._row_ids[row]]
+                self._clear(row)
+        return len(stale)
+
+    def pack(self, session_id: str) -> bytes:
+        """23-byte session state (135 answer bits + 45 mask bits) for key-value storage"""
+        with self._lock:
+            row = self._row(session_id)
+            words = [int(w) for w in self._answers[row]]
+            mask = int(self._masks[row])
+        answers = 0
+        for i, word in enumerate(words):
+            answers |= word << (i * ANSWERS_PER_WORD * BITS_PER_ANSWER)
+        answer_bytes = -(-self.n_items * BITS_PER_ANSWER // 8)
+        mask_bytes = -(-self.n_items // 8)
+        return answers.to_bytes(answer_bytes, "little") + mask.to_bytes(mask_bytes, "little")
+
+    def unpack(self, session_id: str, state: bytes) -> Dict:
+        """Load (or replace) a session from pack() output and return its scores"""
+        answer_bytes = -(-self.n_items * BITS_PER_ANSWER // 8)
+        answers = int.from_bytes(state[:answer_bytes], "little")
+        if session_id not in self._rows:
+            self.create(session_id)
+        else:
+            # Reset in place: the row stays allocated to this session
+            with self._lock:
+                row = self._row(session_id)
+                self._answers[row] = 0
+                self._masks[row] = 0
+                self._facet_sums[row] = 0
+                self._touched[row] = int(time.time())
+        responses = {}
+        for item in range(1, self.n_items + 1):
+            value = (answers >> ((item - 1) * BITS_PER_ANSWER)) & 7
+            if value:
+                responses[item] = value
+        return self.answer_many(session_id, responses)
+
+    def _provisional(self, session_id: str, row: int) -> Dict:
+        """Provisional facet/factor scores from the running sums (lock held)"""
+        plan = self.plan
+        mask = int(self._masks[row])
+        sums = self._facet_sums[row].tolist()
+
+        facet_values = []
+        for facet_mask, total in zip(self.facet_masks, sums):
+            count = (mask & facet_mask).bit_count()
+            facet_values.append(total / count if count else None)
+
+        # Factors average the facets answered so far (left to right, as in scoring)
+        factor_values = []
+        for facet_indices in plan.factor_facets:
+            answered = [facet_values[i] for i in facet_indices if facet_values[i] is not None]
+            factor_values.append(sum(answered) / len(answered) if answered else None)
+
+        answered = mask.bit_count()
+        return {
+            "session_id": session_id,
+            "answered": answered,
+            "total": self.n_items,
+            "fraction_answered": round(answered / self.n_items, 4),
+            "complete": answered == self.n_items,
+            "facet_scores": dict(zip(plan.facet_names, facet_values)),
+            "factor_scores": dict(zip(plan.factor_names, factor_values)),
+        }
+
+    def _coded(self, item: int, value: int) -> int:
+        if not value:
+            return 0
+        return 8 - value if self.item_reversed[item] else value
+
+    def _row(self, session_id: str) -> int:
+        row = self._rows.get(session_id)
+        if row is None:
+            raise KeyError(f"Session {session_id} not found")
+        return row
+
+    def _allocate(self) -> int:
+        """Take a free row, doubling the columns when none are left (lock held)"""
+        if not self._free:
+            capacity = len(self._masks)
+            grown = 2 * capacity
+            self._answers = np.concatenate([self._answers, np.zeros((capacity, self.n_words), dtype=np.uint64)])
+            self._masks = np.concatenate([self._masks, np.zeros(capacity, dtype=np.uint64)])
+            self._facet_sums = np.concatenate([self._facet_sums, np.zeros_like(self._facet_sums)])
+            self._touched = np.concatenate([self._touched, np.zeros(capacity, dtype=np.uint32)])
+            self._row_ids.extend([None] * capacity)
+            self._free = list(range(grown - 1, capacity - 1, -1))
+        return self._free.pop()
+
+    def _clear(self, row: int) -> None:
+        self._answers[row] = 0
+        self._masks[row] = 0
+        self._facet_sums[row] = 0
+        self._touched[row] = 0
+        self._row_ids[row] = None
+        self._free.append(row)
+
+
+_shared_store: Optional[SessionStore] = None
+_shared_lock = threading.Lock()
+
+
+def get_session_store() -> SessionStore:
+    """Process-wide session store"""
+    global _shared_store
+    with _shared_lock:
+        if _shared_store is None:
+            _shared_store = SessionStore()
+        return _shared_store
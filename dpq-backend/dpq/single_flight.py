@@ -0,0 +1,111 @@
+# single_flight.py - Coalesce identical in-flight calls
+
+import asyncio
+import hashlib
+import json
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict
+
+
+def request_key(request: Any) -> str:
+    """Stable hash of a JSON-serializable request"""
+    payload = json.dumps(request, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SingleFlight:
+    """
+    Share one in-flight call between concurrent callers with the same key
+
+    The first caller for a key runs the call; callers arriving while it is in
+    flight wait for its result (or exception) instead of repeating it. Nothing
+    is kept once the call finishes, so this is not a cache. do() coalesces
+    across threads, ado() across tasks on an event loop.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls: Dict[str, Future] = {}
+        self._tasks: Dict[str, asyncio.Future] = {}
+        self.executions = 0
+        self.coalesced = 0
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        """Run fn(), or wait for the identical call already running in another thread"""
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+                self.executions += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            return future.result()
+        try:
+            result = fn()
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+    async def ado(self, key: str, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """Await factory(), or the identical call already running on this event loop"""
+        task = self._tasks.get(key)
+        if task is None or task.get_loop() is not asyncio.get_running_loop():
+            task = asyncio.ensure_future(factory())
+            self._tasks[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+            with self._lock:
+                self.executions += 1
+        else:
+            with self._lock:
+                self.coalesced += 1
+        # A cancelled caller must not cancel the call the others are waiting on
+        return await asyncio.shield(task)
+
+    def stats(self) -> Dict[str, Any]:
+        """Execution and coalescing counters"""
+        with self._lock:
+            calls = self.executions + self.coalesced
+            return {
+                "calls": calls,
+                "executions": self.executions,
+                "coalesced": self.coalesced,
+                "coalescing_rate": round(self.coalesced / calls, 4) if calls else None,
+                "in_flight": len(self._calls) + len(self._tasks),
+            }
+
+    def _forget(self, key: str, task: asyncio.Future) -> None:
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+        if not task.cancelled():
+            # Mark the exception retrieved when every waiter has gone away
+            task.exception()
+
+
+_single_flights: Dict[str, SingleFlight] = {}
+_single_flights_lock = threading.Lock()
+
+
+def get_single_flight(name: str) -> SingleFlight:
+    """Process-wide SingleFlight for a kind of call"""
+    with _single_flights_lock:
+        flight = _single_flights.get(name)
+        if flight is None:
+            flight = _single_flights[name] = SingleFlight(name)
+        return flight
+
+
+def single_flight_stats() -> Dict[str, Dict[str, Any]]:
+    """Counters of every process-wide SingleFlight"""
+    with _single_flights_lock:
+        flights = list(_single_flights.values())
+    return {flight.name: flight.stats() for flight in flights}
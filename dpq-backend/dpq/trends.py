@@ -0,0 +1,591 @@
+# trends.py - Longitudinal factor trends over a dog's assessment history
+
+import math
+import os
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from .dpq import DogPersonalityQuestionnaire, DPQResults
+from .file_lock import locked_file
+
+DAYS_PER_YEAR = 365.25
+
+# Defaults: trailing window of 3 assessments, a shift of 0.75 points (1-7 scale)
+# from the previous window marks a change point, slopes are tested at p < 0.05.
+DEFAULT_WINDOW = 3
+DEFAULT_CHANGE_THRESHOLD = 0.75
+DEFAULT_ALPHA = 0.05
+
+_lgamma = np.vectorize(math.lgamma, otypes=[np.float64])
+
+
+def dates_to_days(dates: Sequence[str]) -> np.ndarray:
+    """ISO dates or datetimes -> float days since the Unix epoch"""
+    return np.array([str(d)[:10] for d in dates], dtype="datetime64[D]").astype(np.float64)
+
+
+def _betacf(a: np.ndarray, b: np.ndarray, x: np.ndarray, iterations: int = 200) -> np.ndarray:
+    """Continued fraction for the incomplete beta function (modified Lentz)"""
+    tiny = 1e-300
+    qab, qap, qam = a + b, a + 1.0, a - 1.0
+    c = np.ones_like(x)
+    d = 1.0 - qab * x / qap
+    d = 1.0 / np.where(np.abs(d) < tiny, tiny, d)
+    h = d.copy()
+    for m in range(1, iterations + 1):
+        m2 = 2 * m
+        for aa in (m * (b - m) * x / ((qam + m2) * (a + m2)),
+                   -(a + m) * (qab + m) * x / ((a + m2) * (qap + m2))):
+            d = 1.0 + aa * d
+            d = 1.0 / np.where(np.abs(d) < tiny, tiny, d)
+            c = 1.0 + aa / c
+            c = np.where(np.abs(c) < tiny, tiny, c)
+            step = d * c
+            h = h * step
+        if np.all(np.abs(step - 1.0) < 1e-12):
+            break
+    return h
+
+
+def _betainc(a: np.ndarray, b: np.ndarray, x: np.ndarray) -> np.ndarray:
+    """Regularized incomplete beta I_x(a, b), elementwise"""
+    a, b, x = np.broadcast_arrays(np.asarray(a, np.float64), np.asarray(b, np.float64),
+                                  np.clip(np.asarray(x, np.float64), 0.0, 1.0))
+    swap = x > (a + 1.0) / (a + b + 2.0)
+    a2, b2, x2 = np.where(swap, b, a), np.where(swap, a, b), np.where(swap, 1.0 - x, x)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        log_front = a2 * np.log(x2) + b2 * np.log1p(-x2) - (_lgamma(a2) + _lgamma(b2) - _lgamma(a2 + b2))
+        result = np.exp(log_front) * _betacf(a2, b2, x2) / a2
+    result = np.where(x2 == 0.0, 0.0, result)
+    return np.where(swap, 1.0 - result, result)
+
+
+def t_test_p_values(t: np.ndarray, df: np.ndarray) -> np.ndarray:
+    """Two-sided p-values of Student t statistics (NaN where df < 1 or t is NaN)"""
+    t = np.asarray(t, dtype=np.float64)
+    df = np.broadcast_to(np.asarray(df, dtype=np.float64), t.shape)
+    valid = (df >= 1) & ~np.isnan(t)
+    safe_df = np.where(valid, df, 1.0)
+    with np.errstate(over="ignore", invalid="ignore"):
+        x = np.where(np.isinf(t), 0.0, safe_df / (safe_df + np.square(np.where(valid, t, 0.0))))
+    p = _betainc(safe_df / 2.0, 0.5, x)
+    return np.where(valid, p, np.nan)
+
+
+def _regression(n, sx, sxx, sy, sxy, syy):
+    """
+    Least-squares slope and its significance from running sums
+
+    Args:
+        n, sx, sxx: Count, sum and sum of squares of the time axis (broadcastable)
+        sy, sxy, syy: Per-factor sums of scores, time*score and score squares
+
+    Returns:
+        (slope, p_value); slope is NaN without two distinct times, p is NaN below three points
+    """
+    n = np.asarray(n, dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        safe_n = np.where(n > 0, n, 1.0)
+        s_xx = sxx - sx * sx / safe_n
+        s_xy = sxy - sx * sy / safe_n
+        s_yy = syy - sy * sy / safe_n
+        defined = (n >= 2) & (s_xx > 1e-12)
+        slope = np.where(defined, s_xy / np.where(defined, s_xx, 1.0), np.nan)
+        sse = np.maximum(s_yy - slope * s_xy, 0.0)
+        df = n - 2
+        standard_error = np.sqrt(sse / np.where(df > 0, df, 1.0) / np.where(defined, s_xx, 1.0))
+        # A perfect fit is infinitely significant unless the line is flat
+        t = np.where(standard_error > 0, slope / standard_error,
+                     np.where(np.abs(slope) > 1e-12, np.inf, 0.0))
+    p_value = t_test_p_values(np.where(defined & (df > 0), t, np.nan), df)
+    return slope, p_value
+
+
+def _reanchor(time_sums: np.ndarray, score_sums: np.ndarray, shift: float) -> tuple:
+    """Running sums with the time axis moved by shift years (x -> x + shift)"""
+    n, sx, sxx = time_sums
+    sy, sxy, syy = score_sums
+    return (np.array([n, sx + n * shift, sxx + 2 * shift * sx + n * shift * shift]),
+            np.stack([sy, sxy + shift * sy, syy]))
+
+
+@dataclass
+class TrendResult:
+    """
+    Trends for D dogs with up to T assessments each (F factors)
+
+    Histories are left-aligned: assessment t of dog d is valid when t < counts[d].
+    Rolling means and change points are NaN/False at padded positions.
+    """
+    factor_names: List[str]
+    days: np.ndarray            # D x T days since epoch
+    counts: np.ndarray          # D assessments per dog
+    slopes: np.ndarray          # D x F points per year
+    p_values: np.ndarray        # D x F two-sided p-values for the slope
+    significant: np.ndarray     # D x F bool
+    rolling_means: np.ndarray   # D x T x F trailing means
+    change_points: np.ndarray   # D x T x F bool
+    dog_ids: Optional[List[str]] = None
+
+    def __len__(self) -> int:
+        return len(self.counts)
+
+    def for_dog(self, index: int) -> Dict:
+        """JSON-friendly trend summary for one dog"""
+        count = int(self.counts[index])
+        days = self.days[index, :count]
+        dates = [str(np.datetime64(int(day), "D")) for day in days]
+        factors = {}
+        for f, name in enumerate(self.factor_names):
+            factors[name] = _factor_summary(
+                self.slopes[index, f], self.p_values[index, f], self.significant[index, f],
+                self.rolling_means[index, count - 1, f] if count else np.nan,
+                bool(self.change_points[index, count - 1, f]) if count else False,
+            )
+            factors[name]["rolling_means"] = [round(float(v), 3) for v in self.rolling_means[index, :count, f]]
+            factors[name]["change_point_dates"] = [
+                dates[t] for t in np.flatnonzero(self.change_points[index, :count, f])
+            ]
+        return {
+            "dog_id": self.dog_ids[index] if self.dog_ids else None,
+            "assessments": count,
+            "first_date": dates[0] if dates else None,
+            "last_date": dates[-1] if dates else None,
+            "factors": factors,
+        }
+
+
+def _factor_summary(slope, p_value, significant, rolling_mean, change_point) -> Dict:
+    slope = float(slope)
+    p_value = float(p_value)
+    significant = bool(significant)
+    if significant:
+        direction = "increasing" if slope > 0 else "decreasing"
+    else:
+        direction = "stable"
+    return {
+        "slope_per_year": None if math.isnan(slope) else round(slope, 4),
+        "p_value": None if math.isnan(p_value) else round(p_value, 4),
+        "significant": significant,
+        "direction": direction,
+        "rolling_mean": None if math.isnan(float(rolling_mean)) else round(float(rolling_mean), 3),
+        "change_point": change_point,
+    }
+
+
+def pad_histories(histories: Sequence[tuple]) -> tuple:
+    """
+    Stack ragged (days, scores) histories into left-aligned arrays
+
+    Args:
+        histories: One (days (T_i,), scores (T_i x F)) pair per dog, in date order
+
+    Returns:
+        (days D x T, scores D x T x F, counts D)
+    """
+    counts = np.array([len(days) for days, _ in histories], dtype=np.int64)
+    n_factors = np.asarray(histories[0][1]).shape[-1] if histories else 0
+    width = int(counts.max()) if len(counts) else 0
+    days = np.zeros((len(histories), width))
+    scores = np.zeros((len(histories), width, n_factors))
+    for i, (dog_days, dog_scores) in enumerate(histories):
+        days[i, :counts[i]] = dog_days
+        scores[i, :counts[i]] = dog_scores
+    return days, scores, counts
+
+
+def compute_trends(days: np.ndarray, scores: np.ndarray, counts: Optional[np.ndarray] = None,
+                   factor_names: Optional[Sequence[str]] = None,
+                   window: int = DEFAULT_WINDOW,
+                   change_threshold: float = DEFAULT_CHANGE_THRESHOLD,
+                   alpha: float = DEFAULT_ALPHA) -> TrendResult:
+    """
+    Slopes, rolling means, change points and significance in one vectorized pass
+
+    Args:
+        days: T (one dog) or D x T days since epoch, in date order per dog
+        scores: T x F or D x T x F factor scores
+        counts: Valid assessments per dog (left-aligned); defaults to all T
+        factor_names: Names for the F columns. Defaults to the standard DPQ factors.
+        window: Trailing window (assessments) for rolling means and change points
+        change_threshold: Shift from the previous window's mean that flags a change point
+        alpha: Significance level for the slope
+
+    Returns:
+        TrendResult with a leading dog axis (length 1 for a single history)
+    """
+    days = np.asarray(days, dtype=np.float64)
+    scores = np.asarray(scores, dtype=np.float64)
+    if days.ndim == 1:
+        days, scores = days[None, :], scores[None, :, :]
+    n_dogs, width, n_factors = scores.shape
+    if days.shape != (n_dogs, width):
+        raise ValueError(f"days must have shape ({n_dogs}, {width}), got {days.shape}")
+    if counts is None:
+        counts = np.full(n_dogs, width, dtype=np.int64)
+    counts = np.asarray(counts, dtype=np.int64)
+    if factor_names is None:
+        factor_names = DogPersonalityQuestionnaire().factor_names
+
+    mask = np.arange(width)[None, :] < counts[:, None]
+    y = np.where(mask[:, :, None], scores, 0.0)
+    # Time axis in years from each dog's first assessment keeps the sums well conditioned
+    x = np.where(mask, (days - days[:, :1]) / DAYS_PER_YEAR, 0.0)
+
+    slopes, p_values = _regression(
+        counts[:, None],
+        x.sum(axis=1)[:, None],
+        (x * x).sum(axis=1)[:, None],
+        y.sum(axis=1),
+        np.einsum("dt,dtf->df", x, y),
+        (y * y).sum(axis=1),
+    )
+    significant = np.nan_to_num(p_values, nan=1.0) < alpha
+
+    # Trailing means from a prefix sum: mean of scores (t - window, t]
+    prefix = np.concatenate([np.zeros((n_dogs, 1, n_factors)), np.cumsum(y, axis=1)], axis=1)
+    positions = np.arange(width)
+    lower = np.maximum(positions + 1 - window, 0)
+    rolling_means = (prefix[:, positions + 1] - prefix[:, lower]) / (positions + 1 - lower)[None, :, None]
+    rolling_means = np.where(mask[:, :, None], rolling_means, np.nan)
+
+    # Change point: a score that departs from the mean of the previous full window
+    change_points = np.zeros((n_dogs, width, n_factors), dtype=bool)
+    if width > window:
+        t = positions[window:]
+        previous = (prefix[:, t] - prefix[:, t - window]) / window
+        change_points[:, window:] = (np.abs(y[:, window:] - previous) >= change_threshold) & mask[:, window:, None]
+
+    return TrendResult(
+        factor_names=list(factor_names),
+        days=days,
+        counts=counts,
+        slopes=slopes,
+        p_values=p_values,
+        significant=significant,
+        rolling_means=rolling_means,
+        change_points=change_points,
+    )
+
+
+class TrendEngine:
+    """Trend analysis over DPQResults lists or a columnar AssessmentStore"""
+
+    def __init__(self, questionnaire: Optional[DogPersonalityQuestionnaire] = None,
+                 window: int = DEFAULT_WINDOW,
+                 change_threshold: float = DEFAULT_CHANGE_THRESHOLD,
+                 alpha: float = DEFAULT_ALPHA):
+        self.questionnaire = questionnaire or DogPersonalityQuestionnaire()
+        self.factor_names = list(self.questionnaire.factor_names)
+        self.window = window
+        self.change_threshold = change_threshold
+        self.alpha = alpha
+
+    def from_results(self, results_list: List[DPQResults]) -> Dict:
+        """Trend summary for one dog's DPQResults (any order)"""
+        ordered = sorted(results_list, key=lambda r: str(r.assessment_date))
+        days = dates_to_days([r.assessment_date for r in ordered])
+        scores = np.array([[r.factor_scores[name] for name in self.factor_names] for r in ordered],
+                          dtype=np.float64).reshape(-1, len(self.factor_names))
+        result = self._compute(days, scores)
+        result.dog_ids = [ordered[0].dog_id if ordered else None]
+        return result.for_dog(0)
+
+    def cohort_trends(self, store, dog_ids: Optional[Sequence[str]] = None) -> TrendResult:
+        """
+        Trends for every dog (or the given dogs) in an AssessmentStore at once
+
+        Args:
+            store: AssessmentStore
+            dog_ids: Restrict to these dogs; defaults to all stored dogs
+        """
+        if list(store.factor_names) != self.factor_names:
+            raise ValueError("Assessment store factors do not match the questionnaire")
+        batch = store.read()
+        dog_codes = np.asarray(batch.dog_id_codes, dtype=np.int64)
+        day_lookup = dates_to_days(store.assessment_dates) if store.assessment_dates else np.zeros(0)
+        days = day_lookup[np.asarray(batch.date_codes, dtype=np.int64)]
+
+        if dog_ids is None:
+            dog_ids = list(store.dog_ids)
+        code_lookup = {dog_id: code for code, dog_id in enumerate(store.dog_ids)}
+        wanted = np.array([code_lookup.get(dog_id, -1) for dog_id in dog_ids], dtype=np.int64)
+
+        # Map each stored row to its position in dog_ids, then group by (dog, day)
+        position = np.full(len(store.dog_ids) + 1, -1, dtype=np.int64)
+        position[wanted[wanted >= 0]] = np.flatnonzero(wanted >= 0)
+        row_dog = position[dog_codes]
+        rows = np.flatnonzero(row_dog >= 0)
+        rows = rows[np.lexsort((rows, days[rows], row_dog[rows]))]
+        row_dog = row_dog[rows]
+
+        counts = np.bincount(row_dog, minlength=len(dog_ids))
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        slot = np.arange(len(rows)) - starts[row_dog]
+        width = int(counts.max()) if len(counts) else 0
+        padded_days = np.zeros((len(dog_ids), width))
+        padded_scores = np.zeros((len(dog_ids), width, len(self.factor_names)))
+        padded_days[row_dog, slot] = days[rows]
+        padded_scores[row_dog, slot] = np.asarray(batch.factor_scores, dtype=np.float64)[rows]
+
+        result = self._compute(padded_days, padded_scores, counts)
+        result.dog_ids = list(dog_ids)
+        return result
+
+    def dog_trend(self, store, dog_id: str) -> Dict:
+        """Trend summary for one dog in an AssessmentStore"""
+        return self.cohort_trends(store, [dog_id]).for_dog(0)
+
+    def _compute(self, days, scores, counts=None) -> TrendResult:
+        return compute_trends(days, scores, counts, self.factor_names,
+                              self.window, self.change_threshold, self.alpha)
+
+
+class TrendIndex:
+    """
+    Precomputed per-dog trend summaries, updated incrementally
+
+    Each dog keeps running regression sums (count, time, time^2, and per factor
+    score, time*score, score^2) plus its last window+1 factor scores, so saving
+    an assessment is O(factors) and serving a summary never rereads history.
+    Updates are expected in date order per dog; the regression sums are order
+    independent, rolling means and change points follow arrival order.
+    Workers sharing a file merge the sums they gathered since their last save
+    into it (see save).
+    """
+
+    def __init__(self, factor_names: Optional[Sequence[str]] = None,
+                 window: int = DEFAULT_WINDOW,
+                 change_threshold: float = DEFAULT_CHANGE_THRESHOLD,
+                 alpha: float = DEFAULT_ALPHA):
+        if factor_names is None:
+            factor_names = DogPersonalityQuestionnaire().factor_names
+        self.factor_names = list(factor_names)
+        self.window = window
+        self.change_threshold = change_threshold
+        self.alpha = alpha
+
+        self.dog_index: Dict[str, int] = {}
+        self.dog_ids: List[str] = []
+        n_factors = len(self.factor_names)
+        self.origin = np.zeros(0)               # first assessment day per dog
+        self.last_day = np.zeros(0)
+        self.time_sums = np.zeros((0, 3))       # n, sum x, sum x^2
+        self.score_sums = np.zeros((0, 3, n_factors))  # sum y, sum xy, sum y^2
+        self.recent = np.zeros((0, window + 1, n_factors))  # oldest first, NaN padded
+        self._unsaved: Dict[str, tuple] = {}   # dog_id -> (time sums, score sums) since the last save
+        self._lock = threading.Lock()
+        self.updates_since_save = 0
+
+    def __len__(self) -> int:
+        return len(self.dog_ids)
+
+    def update(self, dog_id: str, assessment_date: str, factor_scores: Dict[str, float]) -> Dict:
+        """Fold one saved assessment into a dog's summary and return the new summary"""
+        day = float(dates_to_days([assessment_date])[0])
+        y = np.array([factor_scores[name] for name in self.factor_names], dtype=np.float64)
+        with self._lock:
+            i = self._row(dog_id, day)
+            x = (day - self.origin[i]) / DAYS_PER_YEAR
+            time_step = np.array([1.0, x, x * x])
+            score_step = np.stack([y, x * y, y * y])
+            self.time_sums[i] += time_step
+            self.score_sums[i] += score_step
+            unsaved = self._unsaved.get(dog_id)
+            if unsaved is None:
+                self._unsaved[dog_id] = (time_step, score_step)
+            else:
+                unsaved[0][:] += time_step
+                unsaved[1][:] += score_step
+            self.recent[i, :-1] = self.recent[i, 1:]
+            self.recent[i, -1] = y
+            self.last_day[i] = max(self.last_day[i], day)
+            self.updates_since_save += 1
+        return self.summary(dog_id)
+
+    def summary(self, dog_id: str) -> Optional[Dict]:
+        """Current trend summary for a dog, or None if it has no assessments"""
+        if dog_id not in self.dog_index:
+            return None
+        return self.summaries([dog_id])[0]
+
+    def summaries(self, dog_ids: Optional[Sequence[str]] = None) -> List[Optional[Dict]]:
+        """Trend summaries for many dogs in one vectorized pass"""
+        if dog_ids is None:
+            dog_ids = list(self.dog_ids)
+        with self._lock:
+            rows = np.array([self.dog_index.get(dog_id, -1) for dog_id in dog_ids], dtype=np.int64)
+            known = rows >= 0
+            idx = rows[known]
+            time_sums = self.time_sums[idx]
+            score_sums = self.score_sums[idx]
+            recent = self.recent[idx].copy()
+            origin = self.origin[idx]
+            last_day = self.last_day[idx]
+
+        slopes, p_values = _regression(
+            time_sums[:, 0:1], time_sums[:, 1:2], time_sums[:, 2:3],
+            score_sums[:, 0], score_sums[:, 1], score_sums[:, 2],
+        )
+        significant = np.nan_to_num(p_values, nan=1.0) < self.alpha
+        with np.errstate(invalid="ignore"):
+            rolling_means = np.nanmean(recent[:, 1:], axis=1)
+            previous = recent[:, :-1]
+            full_window = ~np.isnan(previous).any(axis=1)
+            change_points = full_window & (np.abs(recent[:, -1] - previous.mean(axis=1)) >= self.change_threshold)
+
+        summaries: List[Optional[Dict]] = [None] * len(dog_ids)
+        for j, position in enumerate(np.flatnonzero(known)):
+            summaries[position] = {
+                "dog_id": dog_ids[position],
+                "assessments": int(time_sums[j, 0]),
+                "first_date": str(np.datetime64(int(origin[j]), "D")),
+                "last_date": str(np.datetime64(int(last_day[j]), "D")),
+                "factors": {
+                    name: _factor_summary(slopes[j, f], p_values[j, f], significant[j, f],
+                                          rolling_means[j, f], bool(change_points[j, f]))
+                    for f, name in enumerate(self.factor_names)
+                },
+            }
+        return summaries
+
+    def rebuild_from_store(self, store) -> int:
+        """Replay an AssessmentStore in date order, returning the number of assessments"""
+        batch = store.read()
+        days = dates_to_days(store.assessment_dates)[np.asarray(batch.date_codes, dtype=np.int64)] \
+            if len(batch) else np.zeros(0)
+        dog_codes = np.asarray(batch.dog_id_codes, dtype=np.int64)
+        factors = np.asarray(batch.factor_scores, dtype=np.float64)
+        for row in np.lexsort((np.arange(len(batch)), days, dog_codes)):
+            day = str(np.datetime64(int(days[row]), "D"))
+            self.update(store.dog_ids[dog_codes[row]], day, dict(zip(store.factor_names, factors[row])))
+        return len(batch)
+
+    def save(self, path: str) -> None:
+        """
+        Merge the summaries updated since the last save into the file's, atomically
+
+        Regression sums are added, re-anchored to the earlier first assessment;
+        the recent window comes from whichever side saw the later assessment.
+        The file's summaries then include every worker's saved updates and
+        become this index's.
+        """
+        with self._lock, locked_file(path):
+            merged = TrendIndex(self.factor_names, self.window, self.change_threshold, self.alpha)
+            if os.path.exists(path):
+                try:
+                    merged._read(path)
+                except Exception as e:
+                    print(f"Error loading trend summaries from {path}, moving it to {path}.corrupt: {e}")
+                    os.replace(path, path + ".corrupt")
+                    merged = TrendIndex(self.factor_names, self.window, self.change_threshold, self.alpha)
+            for dog_id, (time_sums, score_sums) in self._unsaved.items():
+                i = self.dog_index[dog_id]
+                j = merged._row(dog_id, self.origin[i])
+                anchor = min(self.origin[i], merged.origin[j])
+                stored = _reanchor(merged.time_sums[j], merged.score_sums[j],
+                                   (merged.origin[j] - anchor) / DAYS_PER_YEAR)
+                added = _reanchor(time_sums, score_sums, (self.origin[i] - anchor) / DAYS_PER_YEAR)
+                merged.time_sums[j] = stored[0] + added[0]
+                merged.score_sums[j] = stored[1] + added[1]
+                merged.origin[j] = anchor
+                if self.last_day[i] >= merged.last_day[j]:
+                    merged.recent[j] = self.recent[i]
+                    merged.last_day[j] = self.last_day[i]
+
+            n = len(merged.dog_ids)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                np.savez(
+                    f,
+                    dog_ids=np.array(merged.dog_ids, dtype=str),
+                    factor_names=np.array(self.factor_names, dtype=str),
+                    origin=merged.origin[:n],
+                    last_day=merged.last_day[:n],
+                    time_sums=merged.time_sums[:n],
+                    score_sums=merged.score_sums[:n],
+                    recent=merged.recent[:n],
+                )
+            os.replace(tmp_path, path)
+
+            for name in ("dog_ids", "dog_index", "origin", "last_day", "time_sums", "score_sums", "recent"):
+                setattr(self, name, getattr(merged, name))
+            self._unsaved = {}
+            self.updates_since_save = 0
+
+    def maybe_save(self, path: str, every: int = 100) -> bool:
+        """Persist if at least `every` updates arrived since the last save"""
+        if self.updates_since_save >= every:
+            self.save(path)
+            return True
+        return False
+
+    @classmethod
+    def load_or_create(cls, path: str) -> "TrendIndex":
+        """Load persisted summaries, or start empty if none exist or they are unreadable"""
+        index = cls()
+        if os.path.exists(path):
+            try:
+                index._read(path)
+            except Exception as e:
+                print(f"Error loading trend summaries from {path}: {e}")
+                return cls()
+        return index
+
+    def _read(self, path: str) -> None:
+        """Replace this (empty) index's summaries with the file's"""
+        with np.load(path) as data:
+            if [str(n) for n in data["factor_names"]] != self.factor_names:
+                raise ValueError("factor names do not match the questionnaire")
+            if data["recent"].shape[1] != self.window + 1:
+                raise ValueError("summaries were written with a different window")
+            self.dog_ids = [str(d) for d in data["dog_ids"]]
+            self.dog_index = {dog_id: i for i, dog_id in enumerate(self.dog_ids)}
+            for name in ("origin", "last_day", "time_sums", "score_sums", "recent"):
+                setattr(self, name, np.array(data[name]))
+
+    def _row(self, dog_id: str, day: float) -> int:
+        """Row for a dog, appending an empty summary anchored at day if new"""
+        i = self.dog_index.get(dog_id)
+        if i is None:
+            i = len(self.dog_ids)
+            if i == len(self.origin):
+                self._grow(max(16, 2 * i))
+            self.dog_index[dog_id] = i
+            self.dog_ids.append(dog_id)
+            self.origin[i] = day
+            self.last_day[i] = day
+        return i
+
+    def _grow(self, capacity: int) -> None:
+        """Reallocate the summary arrays (amortized doubling)"""
+        n = len(self.dog_ids)
+        n_factors = len(self.factor_names)
+        grown = {
+            "origin": np.zeros(capacity),
+            "last_day": np.zeros(capacity),
+            "time_sums": np.zeros((capacity, 3)),
+            "score_sums": np.zeros((capacity, 3, n_factors)),
+            "recent": np.full((capacity, self.window + 1, n_factors), np.nan),
+        }
+        for name, array in grown.items():
+            array[:n] = getattr(self, name)[:n]
+            setattr(self, name, array)
+
+
+_shared_indexes: Dict[str, TrendIndex] = {}
+_shared_lock = threading.Lock()
+
+
+def get_trend_index(path: Optional[str] = None) -> TrendIndex:
+    """Process-wide trend index for a persistence path (DPQ_TRENDS_PATH by default)"""
+    path = path or os.getenv("DPQ_TRENDS_PATH", os.path.join("data", "trends.npz"))
+    with _shared_lock:
+        index = _shared_indexes.get(path)
+        if index is None:
+            index = TrendIndex.load_or_create(path)
+            _shared_indexes[path] = index
+        return index
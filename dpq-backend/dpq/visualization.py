@@ -0,0 +1,294 @@
+# visualization.py - Server-side DPQ charts (radar, bar and trend) with a render cache
+
+import hashlib
+import io
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Union
+
+import matplotlib
+import numpy as np
+from matplotlib.figure import Figure
+
+from .dpq import DogPersonalityQuestionnaire, DPQResults
+
+# Bump when chart styling changes so cached renders are invalidated
+STYLE_VERSION = 1
+
+FORMATS = ("png", "svg")
+RESULT_CHARTS = ("factor_radar", "factor_bars", "facet_bars", "bias_bars")
+
+PRIMARY_COLOR = "#4271FF"
+SERIES_COLORS = ("#4271FF", "#FF6B6B", "#2EC4B6", "#FFB020", "#8E6CFF")
+MIMETYPES = {"png": "image/png", "svg": "image/svg+xml"}
+
+_questionnaire = None
+
+
+def _dpq() -> DogPersonalityQuestionnaire:
+    global _questionnaire
+    if _questionnaire is None:
+        _questionnaire = DogPersonalityQuestionnaire()
+    return _questionnaire
+
+
+def _short_factor_name(name: str) -> str:
+    """'Factor 1 - Fearfulness' -> 'Fearfulness'"""
+    return name.split(" - ", 1)[-1]
+
+
+def results_chart_spec(results: Union[DPQResults, Dict], chart: str = "factor_radar") -> Dict:
+    """
+    Chart spec for one assessment
+
+    Args:
+        results: DPQResults, or a dict with factor_scores / facet_scores / bias_indicators
+        chart: One of RESULT_CHARTS
+
+    Returns:
+        JSON-serializable spec for render_chart
+    """
+    if chart not in RESULT_CHARTS:
+        raise ValueError(f"Unknown chart '{chart}', expected one of {RESULT_CHARTS}")
+    if isinstance(results, DPQResults):
+        results = {"factor_scores": results.factor_scores, "facet_scores": results.facet_scores,
+                   "bias_indicators": results.bias_indicators}
+    dpq = _dpq()
+
+    if chart in ("factor_radar", "factor_bars"):
+        names, values, value_range = dpq.factor_names, results["factor_scores"], (1.0, 7.0)
+        labels = [_short_factor_name(name) for name in names]
+        title = "Personality Factors"
+    elif chart == "facet_bars":
+        names, values, value_range = dpq.facet_names, results["facet_scores"], (1.0, 7.0)
+        labels = list(names)
+        title = "Personality Facets"
+    else:
+        names, values, value_range = dpq.bias_names, results["bias_indicators"], (0.0, 1.0)
+        labels = [name.replace("_", " ").title() for name in names]
+        title = "AI Translator Bias Indicators"
+
+    return {
+        "chart": "radar" if chart == "factor_radar" else "bars",
+        "title": title,
+        "labels": labels,
+        "values": [round(float(values[name]), 4) for name in names],
+        "range": list(value_range),
+    }
+
+
+def trend_chart_spec(dates: Sequence[str], factor_scores: np.ndarray,
+                     factor_names: Optional[Sequence[str]] = None) -> Dict:
+    """
+    Chart spec for a dog's factor history
+
+    Args:
+        dates: T assessment dates, in date order
+        factor_scores: T x F factor scores
+        factor_names: Names for the F columns. Defaults to the standard DPQ factors.
+    """
+    factor_scores = np.asarray(factor_scores, dtype=np.float64).reshape(len(dates), -1)
+    factor_names = list(factor_names or _dpq().factor_names)
+    return {
+        "chart": "trend",
+        "title": "Personality Over Time",
+        "dates": [str(d)[:10] for d in dates],
+        "series": {
+            _short_factor_name(name): [round(float(v), 4) for v in factor_scores[:, i]]
+            for i, name in enumerate(factor_names)
+        },
+        "range": [1.0, 7.0],
+    }
+
+
+def trend_chart_spec_from_results(results_list: List[DPQResults]) -> Dict:
+    """Trend chart spec for a list of DPQResults (any order)"""
+    ordered = sorted(results_list, key=lambda r: str(r.assessment_date))
+    names = _dpq().factor_names
+    scores = [[r.factor_scores[name] for name in names] for r in ordered]
+    return trend_chart_spec([r.assessment_date for r in ordered], scores, names)
+
+
+def chart_key(spec: Dict, fmt: str) -> str:
+    """Content hash identifying a rendered chart"""
+    payload = json.dumps({"spec": spec, "format": fmt, "style": STYLE_VERSION},
+                         sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def render_chart(spec: Dict, fmt: str = "png") -> bytes:
+    """
+    Render a chart spec to PNG or SVG bytes
+
+    Pure function of its arguments (no pyplot state), so it is safe to run in
+    worker processes or threads.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported chart format '{fmt}', expected one of {FORMATS}")
+    kind = spec["chart"]
+    low, high = spec["range"]
+
+    if kind == "radar":
+        fig = Figure(figsize=(6, 6), dpi=150)
+        ax = fig.add_subplot(projection="polar")
+        angles = np.linspace(0, 2 * np.pi, len(spec["labels"]), endpoint=False)
+        closed_angles = np.append(angles, angles[0])
+        closed_values = np.append(spec["values"], spec["values"][0])
+        ax.plot(closed_angles, closed_values, color=PRIMARY_COLOR, linewidth=2)
+        ax.fill(closed_angles, closed_values, color=PRIMARY_COLOR, alpha=0.25)
+        ax.set_xticks(angles)
+        ax.set_xticklabels(spec["labels"], fontsize=9)
+        ax.set_ylim(low, high)
+        ax.grid(color="silver", linestyle="--")
+    elif kind == "bars":
+        fig = Figure(figsize=(8, max(3, 0.45 * len(spec["labels"]) + 1)), dpi=150)
+        ax = fig.add_subplot()
+        positions = np.arange(len(spec["labels"]))
+        ax.barh(positions, np.asarray(spec["values"]) - low, left=low, color=PRIMARY_COLOR)
+        ax.set_yticks(positions)
+        ax.set_yticklabels(spec["labels"], fontsize=9)
+        ax.invert_yaxis()
+        ax.set_xlim(low, high)
+        ax.grid(axis="x", color="silver", linestyle="--")
+        ax.spines["top"].set_visible(False)
+        ax.spines["right"].set_visible(False)
+    elif kind == "trend":
+        fig = Figure(figsize=(9, 5), dpi=150)
+        ax = fig.add_subplot()
+        dates = np.array(spec["dates"], dtype="datetime64[D]")
+        for color, (label, values) in zip(SERIES_COLORS * 2, spec["series"].items()):
+            ax.plot(dates, values, marker="o", color=color, label=label)
+        ax.set_ylim(low, high)
+        ax.legend(loc="best", fontsize=8)
+        ax.grid(color="silver", linestyle="--")
+        ax.spines["top"].set_visible(False)
+        ax.spines["right"].set_visible(False)
+        fig.autofmt_xdate()
+    else:
+        raise ValueError(f"Unknown chart type '{kind}'")
+
+    ax.set_title(spec.get("title", ""), fontsize=14)
+    fig.tight_layout()
+    buffer = io.BytesIO()
+    # No timestamps or random SVG ids, so identical specs render identical bytes
+    metadata = {"Date": None} if fmt == "svg" else {"Software": None}
+    with matplotlib.rc_context({"svg.hashsalt": "dpq"}):
+        fig.savefig(buffer, format=fmt, metadata=metadata)
+    return buffer.getvalue()
+
+
+class ChartCache:
+    """
+    Two-level cache of rendered charts keyed by chart_key
+
+    A byte-bounded in-memory LRU sits in front of an optional directory of
+    rendered files, so repeat views never re-render, across restarts included.
+    The directory is bounded too: once it outgrows max_disk_bytes the least
+    recently used files (by mtime, refreshed on every disk hit) are deleted
+    down to 90% of the budget. Processes sharing the directory each trim it.
+    """
+
+    def __init__(self, directory: Optional[str] = None, max_memory_bytes: int = 64 * 1024 * 1024,
+                 max_disk_bytes: int = 1024 * 1024 * 1024):
+        self.directory = directory
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._memory_bytes = 0
+        self._disk_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.disk_evictions = 0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            self._disk_bytes = sum(size for _, size, _ in self._disk_files())
+
+    def get(self, key: str, fmt: str) -> Optional[bytes]:
+        """Cached chart bytes, or None"""
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return data
+        if self.directory:
+            path = self._path(key, fmt)
+            try:
+                with open(path, "rb") as f:
+                    data = f.read()
+                os.utime(path)
+            except FileNotFoundError:
+                pass
+            else:
+                self._remember(key, data)
+                with self._lock:
+                    self.hits += 1
+                return data
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: str, fmt: str, data: bytes) -> None:
+        """Store rendered chart bytes"""
+        self._remember(key, data)
+        if self.directory:
+            path = self._path(key, fmt)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            with self._lock:
+                self._disk_bytes += len(data)
+                over = self._disk_bytes > self.max_disk_bytes
+            if over:
+                self._trim_disk()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._entries), "memory_bytes": self._memory_bytes,
+                    "disk_bytes": self._disk_bytes, "disk_evictions": self.disk_evictions,
+                    "hits": self.hits, "misses": self.misses}
+
+    def _trim_disk(self) -> None:
+        """Delete the least recently used files until the directory is within 90% of its budget"""
+        files = sorted(self._disk_files())
+        total = sum(size for _, size, _ in files)
+        evicted = 0
+        for _, size, path in files:
+            if total <= 0.9 * self.max_disk_bytes:
+                break
+            try:
+                os.remove(path)
+                evicted += 1
+            except FileNotFoundError:
+                pass
+            total -= size
+        with self._lock:
+            self._disk_bytes = total
+            self.disk_evictions += evicted
+
+    def _disk_files(self):
+        """(mtime, size, path) of every rendered file in the directory"""
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and not entry.name.endswith(".tmp"):
+                stat = entry.stat()
+                yield stat.st_mtime, stat.st_size, entry.path
+
+    def _remember(self, key: str, data: bytes) -> None:
+        if len(data) > self.max_memory_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._memory_bytes -= len(previous)
+            self._entries[key] = data
+            self._memory_bytes += len(data)
+            while self._memory_bytes > self.max_memory_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._memory_bytes -= len(evicted)
+
+    def _path(self, key: str, fmt: str) -> str:
+        return os.path.join(self.directory, f"{key}.{fmt}")
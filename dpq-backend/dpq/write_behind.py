@@ -0,0 +1,395 @@
+# write_behind.py - Durable write-behind buffer for completed assessments
+
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+from .db_pool import dump_json, load_json
+
+# (seq, assessment_id, attempts, assessment) of a logged assessment
+LogRow = Tuple[int, str, int, Dict[str, Any]]
+
+
+def transient_error(error: Exception) -> bool:
+    """Whether a failed write should be retried unchanged (the database is unreachable or overloaded)"""
+    if isinstance(error, (OSError, asyncio.TimeoutError)):
+        return True
+    try:
+        import asyncpg
+    except ImportError:
+        return False
+    return isinstance(error, (asyncpg.PostgresConnectionError, asyncpg.InterfaceError,
+                              asyncpg.TooManyConnectionsError, asyncpg.CannotConnectNowError))
+
+
+class WriteBehindBuffer:
+    """
+    Local durable log of completed assessments, written to Postgres in the background
+
+    append() commits an assessment to a SQLite table (WAL mode, synchronous=FULL)
+    and returns, so a request never waits on Postgres. A flusher task reads
+    the log in arrival order and passes batches of batch_size to flush (one
+    multi-row write), deleting them once it returns. While the database is
+    unreachable (transient_error) the batches stay in the log and are retried
+    with exponential backoff. A batch failing for another reason is retried
+    one assessment at a time; an assessment failing max_attempts times is
+    kept in the log marked dead (see stats()) rather than blocking the others.
+
+    Workers may share the file. Each claims the rows it reads for
+    claim_seconds, so two workers never flush the same batch; rows a worker
+    claimed and did not write (it crashed or stopped) are taken over once
+    the claim lapses. What is left at close() is written by the next start().
+    A crash between a write and its delete writes the batch again, so flush
+    must be idempotent.
+    """
+
+    def __init__(self, path: str, flush: Callable[[List[Dict[str, Any]]], Awaitable[Any]],
+                 batch_size: int = 100, flush_interval: float = 0.2, max_attempts: int = 5,
+                 max_backoff: float = 30.0, claim_seconds: float = 60.0,
+                 is_transient: Callable[[Exception], bool] = transient_error):
+        """
+        Args:
+            path: SQLite database file, created if missing
+            flush: Writes a batch of assessments; raises if nothing was written
+            batch_size: Most assessments per flush call
+            flush_interval: Seconds between flushes (doubled after each failed one up to max_backoff)
+            max_attempts: Non-transient failures after which an assessment is marked dead
+            claim_seconds: How long rows read by this buffer are kept from other workers sharing the file
+            is_transient: Classifies flush errors; transient ones do not count as attempts
+        """
+        self.path = path
+        self._flush = flush
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_attempts = max_attempts
+        self.max_backoff = max_backoff
+        self.claim_seconds = claim_seconds
+        self.is_transient = is_transient
+        self._owner = uuid.uuid4().hex
+        self._lock = threading.Lock()
+        self._db = self._open(path)
+        # Assessments in the log not yet written (assessment_id -> seq, in seq order), and those
+        # marked dead. Read from the log once, then kept up to date by this worker's appends and
+        # writes; what other workers sharing the file write is caught up by _settle_others.
+        self._pending: "OrderedDict[str, int]" = OrderedDict()
+        self._dead = set()
+        self._load()
+        self._task: Optional[asyncio.Task] = None
+        self._flushed: Optional[asyncio.Condition] = None
+        self._stopping: Optional[asyncio.Event] = None
+        self.appended = 0
+        self.written = 0
+        self.batches = 0
+        self.failures = 0
+        self.last_error: Optional[str] = None
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    async def start(self) -> "WriteBehindBuffer":
+        """Start the flusher, which first writes what a previous run left in the log"""
+        self._flushed = asyncio.Condition()
+        self._stopping = asyncio.Event()
+        if self._pending:
+            print(f"Write-behind: replaying {len(self._pending)} assessments from {self.path}")
+        self._task = asyncio.create_task(self._run())
+        return self
+
+    async def close(self, timeout: float = 10.0) -> None:
+        """Stop the flusher after it writes what is left; anything not written stays in the log"""
+        if self._task is not None:
+            task, self._task = self._task, None
+            self._stopping.set()
+            try:
+                await asyncio.wait_for(task, timeout)
+            except asyncio.TimeoutError:
+                print(f"Write-behind: {len(self)} assessments left in {self.path} at shutdown: flush timed out")
+        with self._lock:
+            # Hand unwritten rows to the other workers (or the next start) at once
+            with self._db:
+                self._db.execute("UPDATE assessments SET owner = NULL WHERE owner = ?", (self._owner,))
+            self._db.close()
+
+    async def append(self, assessment: Dict[str, Any]) -> None:
+        """Durably log a completed assessment for writing"""
+        await asyncio.to_thread(self._append, assessment)
+
+    async def wait_flushed(self, assessment_id: str, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until an appended assessment is written to the database
+
+        Returns:
+            False if it was marked dead or is still pending after timeout seconds
+        """
+        if self._flushed is None:
+            return assessment_id not in self._pending and assessment_id not in self._dead
+
+        async def written():
+            async with self._flushed:
+                await self._flushed.wait_for(lambda: assessment_id not in self._pending)
+
+        try:
+            await asyncio.wait_for(written(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return assessment_id not in self._dead
+
+    async def flush(self) -> int:
+        """
+        Write the logged assessments
+
+        Returns:
+            Number of assessments written
+
+        Raises:
+            The flush error if it is transient (the remaining assessments stay in the log)
+        """
+        written = 0
+        while True:
+            rows = await asyncio.to_thread(self._read_batch)
+            # Assessments written or marked dead by other workers since the last read
+            await self._notify()
+            if not rows:
+                return written
+            try:
+                await self._flush([assessment for _, _, _, assessment in rows])
+            except Exception as e:
+                self._record_failure(e)
+                if self.is_transient(e):
+                    raise
+                # Isolate the failing assessments; the others wait for the next flush
+                return written + await self._flush_each(rows)
+            await self._remove(rows)
+            self.batches += 1
+            written += len(rows)
+
+    async def _flush_each(self, rows: Sequence[LogRow]) -> int:
+        written = 0
+        for row in rows:
+            seq, assessment_id, attempts, assessment = row
+            try:
+                await self._flush([assessment])
+            except Exception as e:
+                self._record_failure(e)
+                if self.is_transient(e):
+                    raise
+                dead = attempts + 1 >= self.max_attempts
+                await asyncio.to_thread(self._mark_failed, seq, attempts + 1, dead, repr(e))
+                if dead:
+                    print(f"Write-behind: assessment {assessment_id} failed {attempts + 1} times, kept as dead: {e}")
+                    self._dead.add(assessment_id)
+                    await self._remove([], done=[assessment_id])
+                continue
+            await self._remove([row])
+            self.batches += 1
+            written += 1
+        return written
+
+    async def _remove(self, rows: Sequence[LogRow], done: Sequence[str] = ()) -> None:
+        """Wake wait_flushed callers and delete written rows from the log"""
+        # Settled before the delete, which a timed-out close() may interrupt (the rows are then written again)
+        for assessment_id in [*(row[1] for row in rows), *done]:
+            self._pending.pop(assessment_id, None)
+        self.written += len(rows)
+        await self._notify()
+        if rows:
+            await asyncio.to_thread(self._delete, [row[0] for row in rows])
+
+    async def _notify(self) -> None:
+        if self._flushed is not None:
+            async with self._flushed:
+                self._flushed.notify_all()
+
+    async def _run(self) -> None:
+        failures = 0
+        while True:
+            # A flush started after close() was called is the last one
+            stopping = self._stopping.is_set()
+            try:
+                await self.flush()
+                failures = 0
+            except Exception as e:
+                failures += 1
+                if stopping:
+                    print(f"Write-behind: {len(self)} assessments left in {self.path} at shutdown: {e}")
+                else:
+                    print(f"Write-behind: flush failed with {len(self)} assessments pending: {e}")
+            if stopping:
+                return
+            try:
+                await asyncio.wait_for(self._stopping.wait(), min(self.flush_interval * 2 ** failures, self.max_backoff))
+            except asyncio.TimeoutError:
+                pass
+
+    def _record_failure(self, error: Exception) -> None:
+        self.failures += 1
+        self.last_error = f"{type(error).__name__}: {error}"
+
+    def stats(self) -> Dict[str, Any]:
+        """Log size and flush counters"""
+        with self._lock:
+            pending, dead, oldest = self._db.execute("""
+                SELECT COALESCE(SUM(dead = 0), 0), COALESCE(SUM(dead), 0), MIN(CASE WHEN dead = 0 THEN enqueued_at END)
+                FROM assessments
+            """).fetchone()
+        return {
+            "path": self.path,
+            "running": self._task is not None,
+            "pending": pending,
+            "dead": dead,
+            "oldest_pending_seconds": round(time.time() - oldest, 3) if oldest is not None else None,
+            "appended": self.appended,
+            "written": self.written,
+            "batches": self.batches,
+            "failures": self.failures,
+            "last_error": self.last_error,
+        }
+
+    def _append(self, assessment: Dict[str, Any]) -> None:
+        payload = dump_json(assessment)
+        with self._lock:
+            with self._db:
+                seq = self._db.execute(
+                    "INSERT INTO assessments (assessment_id, payload, enqueued_at) VALUES (?, ?, ?)",
+                    (assessment['assessment_id'], payload, time.time())).lastrowid
+            self._pending.pop(assessment['assessment_id'], None)
+            self._pending[assessment['assessment_id']] = seq
+            self.appended += 1
+
+    def _read_batch(self) -> List[LogRow]:
+        """Claim and read the oldest unclaimed (or own, or lapsed) rows"""
+        now = time.time()
+        with self._lock:
+            with self._db:
+                self._db.execute("""
+                    UPDATE assessments SET owner = ?, claimed_at = ? WHERE seq IN (
+                        SELECT seq FROM assessments
+                        WHERE dead = 0 AND (owner IS NULL OR owner = ? OR claimed_at < ?)
+                        ORDER BY seq LIMIT ?)
+                """, (self._owner, now, self._owner, now - self.claim_seconds, self.batch_size))
+            rows = self._db.execute(
+                "SELECT seq, assessment_id, attempts, payload FROM assessments WHERE dead = 0 AND owner = ? "
+                "ORDER BY seq LIMIT ?", (self._owner, self.batch_size)).fetchall()
+            self._settle_others()
+        return [(seq, assessment_id, attempts, load_json(payload)) for seq, assessment_id, attempts, payload in rows]
+
+    def _load(self) -> None:
+        """Read the pending and dead assessments from the log (once, at startup)"""
+        with self._lock:
+            for seq, assessment_id, is_dead in self._db.execute(
+                    "SELECT seq, assessment_id, dead FROM assessments ORDER BY seq"):
+                if is_dead:
+                    self._dead.add(assessment_id)
+                else:
+                    self._pending.pop(assessment_id, None)
+                    self._pending[assessment_id] = seq
+
+    def _settle_others(self) -> None:
+        """
+        Drop pending assessments other workers have written or marked dead (lock held)
+
+        Rows are claimed oldest first, so every pending assessment older than
+        the oldest live row in the log is settled. Both lookups use the
+        (dead, seq) index, so this does not grow with the backlog.
+        """
+        if not self._pending:
+            return
+        oldest = self._db.execute("SELECT MIN(seq) FROM assessments WHERE dead = 0").fetchone()[0]
+        if oldest is not None and next(iter(self._pending.values())) >= oldest:
+            return
+        if oldest is None:
+            oldest = next(reversed(self._pending.values())) + 1
+        dead = {assessment_id for (assessment_id,) in self._db.execute(
+            "SELECT assessment_id FROM assessments WHERE dead = 1 AND seq < ?", (oldest,))}
+        while self._pending and next(iter(self._pending.values())) < oldest:
+            assessment_id, _ = self._pending.popitem(last=False)
+            if assessment_id in dead:
+                self._dead.add(assessment_id)
+
+    def _delete(self, seqs: List[int]) -> None:
+        with self._lock:
+            with self._db:
+                self._db.executemany("DELETE FROM assessments WHERE seq = ?", [(seq,) for seq in seqs])
+
+    def _mark_failed(self, seq: int, attempts: int, dead: bool, error: str) -> None:
+        with self._lock:
+            with self._db:
+                self._db.execute("UPDATE assessments SET attempts = ?, dead = ?, last_error = ? WHERE seq = ?",
+                                 (attempts, int(dead), error, seq))
+
+    @staticmethod
+    def _open(path: str) -> sqlite3.Connection:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        db = sqlite3.connect(path, check_same_thread=False, timeout=5.0)
+        db.execute("PRAGMA journal_mode=WAL")
+        # Every append is on disk before the request returns
+        db.execute("PRAGMA synchronous=FULL")
+        db.execute("""
+            CREATE TABLE IF NOT EXISTS assessments (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                assessment_id TEXT NOT NULL,
+                payload BLOB NOT NULL,
+                enqueued_at REAL NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                dead INTEGER NOT NULL DEFAULT 0,
+                last_error TEXT,
+                owner TEXT,
+                claimed_at REAL
+            )
+        """)
+        # Logs written before rows were claimed
+        columns = {row[1] for row in db.execute("PRAGMA table_info(assessments)")}
+        for column, kind in (("owner", "TEXT"), ("claimed_at", "REAL")):
+            if column not in columns:
+                db.execute(f"ALTER TABLE assessments ADD COLUMN {column} {kind}")
+        # Oldest live rows (claims, _settle_others) and dead rows without scanning the backlog
+        db.execute("CREATE INDEX IF NOT EXISTS assessments_dead_seq ON assessments (dead, seq)")
+        db.commit()
+        return db
+
+
+_write_buffer: Optional[WriteBehindBuffer] = None
+_write_buffer_lock = threading.Lock()
+
+
+def get_write_buffer() -> Optional[WriteBehindBuffer]:
+    """The worker's buffer, or None outside the app (assessments are then saved directly)"""
+    return _write_buffer
+
+
+async def start_write_buffer(flush: Callable[[List[Dict[str, Any]]], Awaitable[Any]]) -> Optional[WriteBehindBuffer]:
+    """
+    Start the worker's buffer (called from the app lifespan)
+
+    Configured by DPQ_WRITE_BUFFER_PATH (default data/write_buffer.sqlite3;
+    an empty string disables the buffer), DPQ_WRITE_BUFFER_BATCH (default 100)
+    and DPQ_WRITE_BUFFER_INTERVAL (seconds, default 0.2). Workers on one host
+    share the file; each writes the rows it claims.
+    """
+    global _write_buffer
+    path = os.getenv("DPQ_WRITE_BUFFER_PATH", os.path.join("data", "write_buffer.sqlite3"))
+    if not path:
+        return None
+    buffer = WriteBehindBuffer(path, flush, batch_size=int(os.getenv("DPQ_WRITE_BUFFER_BATCH", "100")),
+                               flush_interval=float(os.getenv("DPQ_WRITE_BUFFER_INTERVAL", "0.2")))
+    await buffer.start()
+    with _write_buffer_lock:
+        previous, _write_buffer = _write_buffer, buffer
+    if previous is not None:
+        await previous.close()
+    return buffer
+
+
+async def close_write_buffer() -> None:
+    global _write_buffer
+    with _write_buffer_lock:
+        buffer, _write_buffer = _write_buffer, None
+    if buffer is not None:
+        await buffer.close()
@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+"""
+Regenerate stored recommendations after a recommendation prompt change
+
+Assessments are streamed from dpq_assessments in assessment_id order, one
+chunk at a time. Within a chunk, dogs are grouped by normalized recommendation
+profile (see dpq.claude_recommender.recommendation_profile), so each distinct
+prompt is generated once. Profiles that are not already in the recommendation
+cache go to the Message Batches API as one batch per chunk. The job polls the
+batch until it ends, caches every result, and resubmits the requests that
+failed (up to --max-attempts batches per chunk) before writing the chunk back
+in one executemany. Assessments whose profile still failed are skipped and
+listed in the checkpoint.
+
+A JSON checkpoint is written after every batch submission and every chunk. An
+interrupted run resumes from the last completed chunk and collects the chunk's
+in-flight batches instead of resubmitting them.
+
+Usage:
+    python jobs/backfill_recommendations.py --checkpoint data/backfill.json
+    python jobs/backfill_recommendations.py --base-url http://127.0.0.1:8080  # fake batch endpoint
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import anthropic
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from dpq.claude_recommender import (PROMPT_VERSION, ClaudeRecommendationGenerator, extract_recommendations,
+                                    recommendation_profile, recommendation_request, stored_recommendations)
+from dpq.recommendation_cache import RecommendationCache, get_recommendation_cache
+from dpq.db_pool import connection_settings, register_jsonb_codec
+from dpq.resource_accounting import connect_accounted, record_llm_usage, stage, track
+
+# Row shape yielded by assessment stores: (assessment_id, breed, personality_factors, ai_bias_indicators)
+AssessmentRow = Tuple[str, Optional[str], Dict[str, Any], Dict[str, float]]
+
+
+def assessment_profile(breed: Optional[str], personality_factors: Dict[str, Any],
+                       ai_bias_indicators: Dict[str, float]) -> Dict[str, Any]:
+    """recommendation_profile for a stored assessment"""
+    return recommendation_profile({
+        'dog_info': {'breed': breed},
+        'factor_scores': {name: data['score'] for name, data in personality_factors.items()},
+        'bias_indicators': ai_bias_indicators,
+    })
+
+
+class PostgresAssessments:
+    """Keyset-paginated reads and bulk recommendation writes on dpq_assessments"""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    @classmethod
+    async def connect(cls) -> "PostgresAssessments":
+        """Connect with the same DB_* settings as DPQAPIHandler (see dpq.db_pool.connection_settings)"""
+        import asyncpg
+        conn = await connect_accounted(asyncpg.connect, **connection_settings())
+        await register_jsonb_codec(conn)
+        return cls(conn)
+
+    async def fetch_chunk(self, after_id: Optional[str], limit: int,
+                          until_id: Optional[str] = None) -> List[AssessmentRow]:
+        """
+        Next assessments in assessment_id order
+
+        Args:
+            after_id: Exclusive lower bound (None starts from the beginning)
+            limit: Maximum number of rows
+            until_id: Inclusive upper bound, used to re-read an interrupted chunk
+        """
+        conditions, args = ["a.personality_factors IS NOT NULL"], []
+        if after_id is not None:
+            args.append(after_id)
+            conditions.append(f"a.assessment_id > ${len(args)}")
+        if until_id is not None:
+            args.append(until_id)
+            conditions.append(f"a.assessment_id <= ${len(args)}")
+        args.append(limit)
+        rows = await self.conn.fetch(f"""
+            SELECT a.assessment_id::text AS assessment_id, d.breed,
+                   a.personality_factors, a.ai_bias_indicators
+            FROM dpq_assessments a
+            LEFT JOIN dogs d ON d.dog_id = a.dog_id
+            WHERE {' AND '.join(conditions)}
+            ORDER BY a.assessment_id
+            LIMIT ${len(args)}
+        """, *args)
+        return [(row['assessment_id'], row['breed'], row['personality_factors'],
+                 row['ai_bias_indicators'] or {}) for row in rows]
+
+    async def write_recommendations(self, updates: List[Tuple[str, Dict[str, List[str]]]]) -> int:
+        """Write (assessment_id, recommendations) pairs in one transaction"""
+        if not updates:
+            return 0
+        async with self.conn.transaction():
+            await self.conn.executemany(
+                "UPDATE dpq_assessments SET recommendations = $2 WHERE assessment_id = $1", updates
+            )
+        return len(updates)
+
+    async def close(self) -> None:
+        await self.conn.close()
+
+
+class RecommendationBackfill:
+    """Resumable batch regeneration of stored recommendations"""
+
+    def __init__(self, store, client: anthropic.AsyncAnthropic, checkpoint_path: str,
+                 cache: Optional[RecommendationCache] = None, chunk_size: int = 5000,
+                 poll_interval: float = 60.0, max_attempts: int = 3):
+        """
+        Args:
+            store: Assessment store with fetch_chunk() and write_recommendations()
+            client: Async Anthropic client (point base_url at a fake endpoint for tests)
+            checkpoint_path: JSON file recording progress
+            cache: Recommendation cache for PROMPT_VERSION. Defaults to the shared cache.
+            chunk_size: Assessments per chunk, and the upper bound on requests per batch
+            poll_interval: Seconds between batch status checks
+            max_attempts: Batches per chunk before assessments with a failing profile are skipped
+        """
+        self.store = store
+        self.client = client
+        self.checkpoint_path = checkpoint_path
+        self.cache = cache if cache is not None else get_recommendation_cache(PROMPT_VERSION)
+        self.chunk_size = chunk_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.prompts = ClaudeRecommendationGenerator(api_key=client.api_key)
+        self.checkpoint = self._load_checkpoint()
+
+    async def run(self, max_chunks: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Process chunks until the table is exhausted
+
+        Args:
+            max_chunks: Stop after this many chunks (the checkpoint allows resuming)
+
+        Returns:
+            The checkpoint, including progress counters
+        """
+        chunks = 0
+        while max_chunks is None or chunks < max_chunks:
+            pending = self.checkpoint["pending"]
+            rows = await self.store.fetch_chunk(self.checkpoint["after_id"], self.chunk_size,
+                                                pending["until_id"] if pending else None)
+            if not rows:
+                break
+            await self._process_chunk(rows)
+            chunks += 1
+            print(f"Backfill: {self.checkpoint['assessments_updated']} assessments updated, "
+                  f"{self.checkpoint['profiles_generated']} profiles generated, "
+                  f"{self.checkpoint['profiles_failed']} failed")
+        return self.checkpoint
+
+    async def _process_chunk(self, rows: List[AssessmentRow]) -> None:
+        """Dedupe, generate missing profiles, write back and advance the checkpoint"""
+        until_id = rows[-1][0]
+        profiles: Dict[str, Dict[str, Any]] = {}
+        assessment_keys: List[Tuple[str, str]] = []
+        for assessment_id, breed, personality_factors, ai_bias_indicators in rows:
+            profile = assessment_profile(breed, personality_factors, ai_bias_indicators)
+            key = self.cache.key(profile)
+            profiles.setdefault(key, profile)
+            assessment_keys.append((assessment_id, key))
+
+        recommendations = {}
+        for key in profiles:
+            cached = self.cache.get(key)
+            if cached is not None:
+                recommendations[key] = cached
+        self.checkpoint["profiles_cached"] += len(recommendations)
+
+        # Collect batches left in flight by an interrupted run before submitting anything new;
+        # they count towards the chunk's attempts
+        pending = self.checkpoint["pending"]
+        batch_ids = list(pending["batch_ids"]) if pending else []
+        for batch_id in batch_ids:
+            collected = await self._collect(batch_id)
+            recommendations.update({key: value for key, value in collected.items()
+                                    if value is not None and key in profiles})
+
+        # Requests that failed are resubmitted before the checkpoint moves past the chunk
+        missing = [key for key in profiles if key not in recommendations]
+        while missing and len(batch_ids) < self.max_attempts:
+            batch_id = await self._submit({key: profiles[key] for key in missing}, until_id)
+            batch_ids.append(batch_id)
+            collected = await self._collect(batch_id)
+            recommendations.update({key: value for key, value in collected.items()
+                                    if value is not None and key in profiles})
+            missing = [key for key in missing if key not in recommendations]
+
+        updates = [(assessment_id, stored_recommendations(recommendations[key]))
+                   for assessment_id, key in assessment_keys if key in recommendations]
+        failed = [assessment_id for assessment_id, key in assessment_keys if key not in recommendations]
+        self.checkpoint["assessments_updated"] += await self.store.write_recommendations(updates)
+        self.checkpoint["assessments_skipped"] += len(failed)
+        self.checkpoint["failed_assessments"].extend(failed)
+        self.checkpoint["after_id"] = until_id
+        self.checkpoint["pending"] = None
+        self._save_checkpoint()
+
+    async def _submit(self, profiles: Dict[str, Dict[str, Any]], until_id: str) -> str:
+        """Create a batch with one request per profile, keyed by cache key, and record it as pending"""
+        batch = await self.client.messages.batches.create(requests=[
+            {"custom_id": key, "params": recommendation_request(self.prompts.create_profile_prompt(profile))}
+            for key, profile in profiles.items()
+        ])
+        pending = self.checkpoint["pending"] or {"batch_ids": [], "until_id": until_id}
+        pending["batch_ids"].append(batch.id)
+        self.checkpoint["pending"] = pending
+        self.checkpoint["batches"].append(batch.id)
+        self._save_checkpoint()
+        print(f"Submitted batch {batch.id} with {len(profiles)} profiles")
+        return batch.id
+
+    async def _collect(self, batch_id: str) -> Dict[str, Optional[Dict[str, List[str]]]]:
+        """
+        Wait for a batch to end and cache its successful results
+
+        Returns:
+            Recommendations by custom_id, None for requests that failed
+        """
+        with stage("batch_wait"):
+            while True:
+                batch = await self.client.messages.batches.retrieve(batch_id)
+                if batch.processing_status == "ended":
+                    break
+                await asyncio.sleep(self.poll_interval)
+
+        results = {}
+        async for entry in await self.client.messages.batches.results(batch_id):
+            results[entry.custom_id] = None
+            if entry.result.type != "succeeded":
+                print(f"Batch {batch_id} request {entry.custom_id} {entry.result.type}")
+                continue
+            record_llm_usage(getattr(entry.result.message, 'usage', None))
+            try:
+                value = extract_recommendations(entry.result.message.content[0].text)
+            except Exception as e:
+                print(f"Error parsing batch result {entry.custom_id}: {e}")
+                continue
+            self.cache.put(entry.custom_id, value)
+            results[entry.custom_id] = value
+        generated = sum(value is not None for value in results.values())
+        self.checkpoint["profiles_generated"] += generated
+        self.checkpoint["profiles_failed"] += len(results) - generated
+        return results
+
+    def _load_checkpoint(self) -> Dict[str, Any]:
+        fresh = {
+            "prompt_version": PROMPT_VERSION, "after_id": None, "pending": None, "batches": [],
+            "assessments_updated": 0, "assessments_skipped": 0, "failed_assessments": [],
+            "profiles_cached": 0, "profiles_generated": 0, "profiles_failed": 0,
+            "started_at": time.time(),
+        }
+        if not os.path.exists(self.checkpoint_path):
+            return fresh
+        with open(self.checkpoint_path, encoding="utf-8") as f:
+            checkpoint = json.load(f)
+        if checkpoint.get("prompt_version") != PROMPT_VERSION:
+            print(f"Checkpoint {self.checkpoint_path} is for prompt version "
+                  f"{checkpoint.get('prompt_version')}; starting over")
+            return fresh
+        print(f"Resuming backfill after assessment {checkpoint['after_id']}")
+        return {**fresh, **checkpoint}
+
+    def _save_checkpoint(self) -> None:
+        directory = os.path.dirname(self.checkpoint_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.checkpoint_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.checkpoint, f, indent=2)
+        os.replace(tmp_path, self.checkpoint_path)
+
+
+async def backfill(args) -> Dict[str, Any]:
+    """Run the job, returning the checkpoint with the job's resource usage"""
+    client = anthropic.AsyncAnthropic(api_key=args.api_key or os.getenv('ANTHROPIC_API_KEY'),
+                                      base_url=args.base_url)
+    with track("job:backfill_recommendations") as usage:
+        store = await PostgresAssessments.connect()
+        try:
+            job = RecommendationBackfill(store, client, args.checkpoint, chunk_size=args.chunk_size,
+                                         poll_interval=args.poll_interval, max_attempts=args.max_attempts)
+            checkpoint = await job.run(max_chunks=args.max_chunks)
+        finally:
+            await store.close()
+            await client.close()
+    return {**checkpoint, "resource_usage": usage.summary()}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Regenerate stored recommendations with the current prompt via the Message Batches API."
+    )
+    parser.add_argument(
+        "--checkpoint", default=os.path.join("data", "backfill_recommendations.json"),
+        help="Progress file; rerun with the same file to resume (default: data/backfill_recommendations.json)"
+    )
+    parser.add_argument(
+        "--chunk-size", type=int, default=5000,
+        help="Assessments per chunk and maximum requests per batch (default 5000)"
+    )
+    parser.add_argument(
+        "--poll-interval", type=float, default=60.0,
+        help="Seconds between batch status checks (default 60)"
+    )
+    parser.add_argument(
+        "--max-attempts", type=int, default=3,
+        help="Batches per chunk before assessments whose profile keeps failing are skipped (default 3)"
+    )
+    parser.add_argument(
+        "--max-chunks", type=int, default=None,
+        help="Stop after this many chunks"
+    )
+    parser.add_argument("--api-key", default=None, help="Anthropic API key (default: ANTHROPIC_API_KEY)")
+    parser.add_argument("--base-url", default=None, help="Batch API base URL, e.g. a local fake endpoint")
+    args = parser.parse_args()
+
+    if not (args.api_key or os.getenv('ANTHROPIC_API_KEY')):
+        print("Error: Claude API key required. Set ANTHROPIC_API_KEY or pass --api-key", file=sys.stderr)
+        sys.exit(1)
+
+    checkpoint = asyncio.run(backfill(args))
+    print(json.dumps({key: value for key, value in checkpoint.items()
+                      if key not in ("batches", "failed_assessments")}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
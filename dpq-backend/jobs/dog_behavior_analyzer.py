@@ -1,42 +1,18 @@
 import anthropic
 import base64
+import inspect
 import json
 import os
 import logging
+from typing import Any, Dict, List, Optional, Union
 logger = logging.getLogger(__name__)
 from .emotion_mapper import add_emotion_dimensions
+from dpq.resilience import get_resilience
+from dpq.resource_accounting import record_llm_usage
+from dpq.single_flight import get_single_flight, request_key
 
-async def analyze_frames_with_claude(frames_dir: str, client: anthropic.Anthropic) -> dict:
-    """Analyze extracted dog frames using Claude's vision capabilities with prompt caching"""
-    
-    # Get all frame files and sort by timestamp
-    frame_files = [f for f in os.listdir(frames_dir) if f.endswith('.jpg')]
-    frame_files.sort(key=lambda x: float(x.replace('frame_', '').replace('.jpg', '')))
-    
-    if not frame_files:
-        return {"error": "No frames found for analysis"}
-    
-    logger.info(f"Found {len(frame_files)} frames to analyze with cached prompt")
-    
-    # Prepare images for Claude
-    base64_images = []
-    
-    for frame_file in frame_files:
-        frame_path = os.path.join(frames_dir, frame_file)
-        
-        with open(frame_path, "rb") as image_file:
-            image_data = base64.b64encode(image_file.read()).decode()
-            base64_images.append({
-                "type": "image",
-                "source": {
-                    "type": "base64",
-                    "media_type": "image/jpeg",
-                    "data": image_data
-                }
-            })
-    
-    # Cached system prompt
-    cached_system_prompt = """You are an expert canine behaviorist and animal psychologist. Analyze the provided video frames of a dog and provide a comprehensive behavioral assessment.
+# Cached system prompt
+BEHAVIOR_SYSTEM_PROMPT = """You are an expert canine behaviorist and animal psychologist. Analyze the provided video frames of a dog and provide a comprehensive behavioral assessment.
 
 Analysis Requirements:
 
@@ -113,47 +89,110 @@ IMPORTANT:
 - Include all required fields
 - DO NOT wrap the response in markdown code blocks or backticks - return raw JSON only"""
 
+
+def load_frame_images(frames_dir: str) -> List[Dict[str, Any]]:
+    """Base64 image content blocks for every extracted frame, in timestamp order"""
+    frame_files = [f for f in os.listdir(frames_dir) if f.endswith('.jpg')]
+    frame_files.sort(key=lambda x: float(x.replace('frame_', '').replace('.jpg', '')))
+    
+    base64_images = []
+    for frame_file in frame_files:
+        frame_path = os.path.join(frames_dir, frame_file)
+        
+        with open(frame_path, "rb") as image_file:
+            image_data = base64.b64encode(image_file.read()).decode()
+            base64_images.append({
+                "type": "image",
+                "source": {
+                    "type": "base64",
+                    "media_type": "image/jpeg",
+                    "data": image_data
+                }
+            })
+    return base64_images
+
+
+def parse_behavior_response(response_text: str) -> dict:
+    """Parse Claude's behavior analysis JSON (raises json.JSONDecodeError)"""
+    response_text = response_text.strip()
+    
+    # Remove markdown if present
+    if response_text.startswith('```json'):
+        response_text = response_text[7:]
+    if response_text.endswith('```'):
+        response_text = response_text[:-3]
+    response_text = response_text.strip()
+    
+    analysis_result = json.loads(response_text)
+    return add_emotion_dimensions(analysis_result)
+
+
+def behavior_request(base64_images: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """messages.create arguments for a behavior analysis"""
+    return {
+        "model": "claude-sonnet-4-20250514",
+        "max_tokens": 4000,
+        "system": [
+            {
+                "type": "text",
+                "text": BEHAVIOR_SYSTEM_PROMPT,
+                "cache_control": {"type": "ephemeral"}  # Cache this prompt
+            }
+        ],
+        "messages": [
+            {
+                "role": "user",
+                "content": base64_images
+            }
+        ]
+    }
+
+
+async def analyze_frames_with_claude(frames_dir: str,
+                                     client: Union[anthropic.Anthropic, anthropic.AsyncAnthropic],
+                                     content_hash: Optional[str] = None) -> dict:
+    """
+    Analyze extracted dog frames using Claude's vision capabilities with prompt caching
+    
+    Concurrent analyses with the same content_hash (the source video's hash,
+    or by default a hash of the frames) share one Claude call, which goes
+    through the analyze_frames circuit breaker and retry budget.
+    """
+    
+    base64_images = load_frame_images(frames_dir)
+    
+    if not base64_images:
+        return {"error": "No frames found for analysis"}
+    
+    logger.info(f"Found {len(base64_images)} frames to analyze with cached prompt")
+    
+    response_text = ""
     try:
         logger.info("Sending frames to Claude for analysis with cached prompt...")
         
-        # Send to Claude with cached system prompt
-        message = client.messages.create(
-            model="claude-sonnet-4-20250514",
-            max_tokens=4000,
-            system=[
-                {
-                    "type": "text",
-                    "text": cached_system_prompt,
-                    "cache_control": {"type": "ephemeral"}  # Cache this prompt
-                }
-            ],
-            messages=[
-                {
-                    "role": "user",
-                    "content": base64_images
-                }
-            ]
-        )
+        # Send to Claude with cached system prompt (sync or async client)
+        request = behavior_request(base64_images)
+        
+        async def create():
+            message = client.messages.create(**request)
+            if inspect.isawaitable(message):
+                message = await message
+            record_llm_usage(getattr(message, 'usage', None))
+            return message
+        
+        message = await get_single_flight("analyze_frames").ado(content_hash or request_key(request),
+                                                                lambda: get_resilience("analyze_frames").acall(create))
         
         # Log cache usage if available
         if hasattr(message, 'usage'):
             logger.info(f"Token usage: {message.usage}")
         
-        # Parse response
-        response_text = message.content[0].text.strip()
-        
-        # Remove markdown if present
-        if response_text.startswith('```json'):
-            response_text = response_text[7:]
-        if response_text.endswith('```'):
-            response_text = response_text[:-3]
-        response_text = response_text.strip()
+        response_text = message.content[0].text
         
         logger.info("Received response from Claude, parsing JSON...")
         
-        analysis_result = json.loads(response_text)
+        analysis_result = parse_behavior_response(response_text)
         logger.info("Successfully parsed Claude response")
-        analysis_result = add_emotion_dimensions(analysis_result)
         
         return analysis_result
         
@@ -6,10 +6,11 @@ import shutil
 import subprocess
 import sys
 
-def extract_diff_frames_ffmpeg(video_path, output_dir, threshold, ffmpeg_path):
+def extract_diff_frames_ffmpeg(video_path, output_dir, threshold, ffmpeg_path, run=subprocess.run):
     """
     Uses `ffmpeg -vf select=gt(scene,threshold)` to extract frames
     that differ by at least `threshold` (0.0–1.0). Filenames include the timestamp.
+    `run` replaces subprocess.run, e.g. with one that accounts ffmpeg's CPU time.
     """
     os.makedirs(output_dir, exist_ok=True)
 
@@ -26,7 +27,7 @@ def extract_diff_frames_ffmpeg(video_path, output_dir, threshold, ffmpeg_path):
     ]
 
     # Run ffmpeg; capture stderr for showinfo logs
-    proc = subprocess.run(
+    proc = run(
         cmd,
         stderr=subprocess.PIPE,
         stdout=subprocess.DEVNULL,
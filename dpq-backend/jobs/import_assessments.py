@@ -0,0 +1,431 @@
+#!/usr/bin/env python3
+"""
+Import completed questionnaires from a CSV or Parquet research dataset
+
+The file is read one chunk at a time. Each chunk's item columns are
+validated and scored in one vectorized pass (DogPersonalityQuestionnaire.score_many),
+formatted like DPQResponseFormatter with the rule-based recommendations,
+and COPYed into staging tables. dogs and dpq_assessments are then filled
+from the staging tables in one transaction per chunk.
+
+Assessment IDs are derived from the source name and row number, and dog IDs
+from the source name and the dataset's dog_id column (or the row), so
+importing a row twice leaves one assessment. --merge-dogs drops the source
+name from dog IDs, so datasets sharing dog_id values update the same dogs. A JSON checkpoint is written after every chunk; an
+interrupted run resumes after the last committed chunk. Rejected rows are
+appended to a CSV with the reason.
+
+Columns:
+    q1 ... q45                        1-7 ratings (--item-prefix replaces "q")
+    name                              Dog name
+    user_id                           Owning user, unless --user-id is given
+    dog_id, breed, birthday, completed_at   Optional
+
+Usage:
+    python jobs/import_assessments.py data/study.csv --user-id 6f1c...
+    python jobs/import_assessments.py data/study.parquet --chunk-size 20000 --dry-run
+    python jobs/import_assessments.py data/followup.csv --source study --merge-dogs
+"""
+import argparse
+import asyncio
+import csv
+import json
+import os
+import sys
+import time
+import uuid
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from dpq.db_pool import connection_settings, register_jsonb_codec
+from dpq.dpq import DogPersonalityQuestionnaire
+from dpq.recommendation_rules import get_recommendation_rules
+from dpq.resource_accounting import connect_accounted, stage, track
+from dpq.response_formatter import DPQResponseFormatter
+
+# Namespace of the assessment and dog IDs derived from source rows
+IMPORT_NAMESPACE = uuid.uuid5(uuid.NAMESPACE_URL, "dpq-backend/import_assessments")
+
+UUID_PATTERN = r"[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}"
+
+DOG_COLUMNS = ("dog_id", "user_id", "name", "breed", "birthday")
+ASSESSMENT_COLUMNS = (
+    "assessment_id", "dog_id", "user_id", "completed_at", "device_type",
+    "responses", "personality_factors", "ai_bias_indicators", "personality_summary",
+    "ai_translator_config", "recommendations", "response_consistency", "extreme_response_bias",
+    "all_questions_answered", "assessment_version", "scoring_algorithm",
+)
+
+# Checks in reporting order: the first failing one is the row's rejection reason
+REJECTION_REASONS = (
+    "missing or non-numeric item", "non-integer item", "item outside 1-7",
+    "missing dog name", "missing or invalid user_id", "invalid birthday", "invalid completed_at",
+)
+
+
+def read_chunks(path: str, chunk_size: int, skip_rows: int = 0) -> Iterator[pd.DataFrame]:
+    """Data frames of up to chunk_size rows, starting after skip_rows data rows"""
+    if path.endswith((".parquet", ".pq")):
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            if skip_rows >= batch.num_rows:
+                skip_rows -= batch.num_rows
+                continue
+            yield batch.slice(skip_rows).to_pandas()
+            skip_rows = 0
+        return
+    text_columns = {column: str for column in ("dog_id", "user_id", "name", "breed")}
+    yield from pd.read_csv(path, chunksize=chunk_size, dtype=text_columns,
+                           skiprows=range(1, skip_rows + 1))
+
+
+class PostgresImportTarget:
+    """COPY into staging tables, then one transactional merge into dogs and dpq_assessments"""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    @classmethod
+    async def connect(cls) -> "PostgresImportTarget":
+        """Connect with the same DB_* settings as DPQAPIHandler (see dpq.db_pool.connection_settings)"""
+        import asyncpg
+        conn = await connect_accounted(asyncpg.connect, **connection_settings())
+        await register_jsonb_codec(conn)
+        return cls(conn)
+
+    async def write(self, dogs: List[Tuple], assessments: List[Tuple]) -> int:
+        """
+        Load one chunk
+
+        Dogs are upserted and pointed at their latest imported assessment,
+        unless their current assessment was completed later; assessments that
+        already exist are skipped.
+
+        Returns:
+            Number of assessments inserted
+        """
+        if not assessments:
+            return 0
+        assessment_columns = ", ".join(ASSESSMENT_COLUMNS)
+        async with self.conn.transaction():
+            await self.conn.execute(f"""
+                CREATE TEMP TABLE import_dogs ON COMMIT DROP AS
+                    SELECT {', '.join(DOG_COLUMNS)} FROM dogs WITH NO DATA;
+                CREATE TEMP TABLE import_assessments ON COMMIT DROP AS
+                    SELECT {assessment_columns} FROM dpq_assessments WITH NO DATA
+            """)
+            await self.conn.copy_records_to_table("import_dogs", records=dogs, columns=DOG_COLUMNS)
+            await self.conn.copy_records_to_table("import_assessments", records=assessments,
+                                                  columns=ASSESSMENT_COLUMNS)
+            await self.conn.execute("""
+                INSERT INTO dogs (dog_id, user_id, name, breed, birthday)
+                SELECT DISTINCT ON (dog_id) dog_id, user_id, name, breed, birthday FROM import_dogs
+                ORDER BY dog_id
+                ON CONFLICT (dog_id)
+                DO UPDATE SET name = EXCLUDED.name, breed = EXCLUDED.breed, birthday = EXCLUDED.birthday,
+                              updated_at = CURRENT_TIMESTAMP
+            """)
+            result = await self.conn.execute(f"""
+                INSERT INTO dpq_assessments ({assessment_columns})
+                SELECT {assessment_columns} FROM import_assessments
+                ON CONFLICT (assessment_id) DO NOTHING
+            """)
+            await self.conn.execute("""
+                UPDATE dogs SET current_dpq_assessment_id = latest.assessment_id
+                FROM (SELECT DISTINCT ON (dog_id) dog_id, assessment_id, completed_at FROM import_assessments
+                      ORDER BY dog_id, completed_at DESC NULLS LAST) AS latest
+                WHERE dogs.dog_id = latest.dog_id
+                  AND (dogs.current_dpq_assessment_id IS NULL
+                       OR NOT EXISTS (SELECT 1 FROM dpq_assessments cur
+                                      WHERE cur.assessment_id = dogs.current_dpq_assessment_id
+                                        AND (cur.completed_at > latest.completed_at
+                                             OR latest.completed_at IS NULL)))
+            """)
+        return int(result.split()[-1])
+
+    async def close(self) -> None:
+        await self.conn.close()
+
+
+class DryRunTarget:
+    """Validates, scores and formats without writing (--dry-run, benchmarks)"""
+
+    async def write(self, dogs: List[Tuple], assessments: List[Tuple]) -> int:
+        return len(assessments)
+
+    async def close(self) -> None:
+        pass
+
+
+class AssessmentImport:
+    """Resumable chunked import of one dataset file"""
+
+    def __init__(self, target, source: str, checkpoint_path: str, rejects_path: str,
+                 user_id: Optional[str] = None, item_prefix: str = "q", fingerprint: Optional[Dict] = None,
+                 merge_dogs: bool = False):
+        """
+        Args:
+            target: Store with write(dogs, assessments) (PostgresImportTarget or DryRunTarget)
+            source: Dataset name; assessment IDs are derived from it and the row number
+            checkpoint_path: JSON file recording progress
+            rejects_path: CSV receiving rejected rows with their reason
+            user_id: Owner of every imported dog when the file has no user_id column
+            item_prefix: Item columns are item_prefix + 1 ... 45
+            fingerprint: Identifies the input file; a checkpoint for another file is discarded
+            merge_dogs: Derive dog IDs from the dog_id column alone, so every source
+                with the same dog_id imports into the same dog
+        """
+        self.target = target
+        self.source = source
+        self.checkpoint_path = checkpoint_path
+        self.rejects_path = rejects_path
+        self.user_id = user_id
+        self.merge_dogs = merge_dogs
+        self.dpq = DogPersonalityQuestionnaire()
+        self.formatter = DPQResponseFormatter(recommendation_rules=get_recommendation_rules())
+        self.item_columns = [f"{item_prefix}{item}" for item in self.dpq.questions]
+        self.response_keys = [str(item) for item in self.dpq.questions]
+        self.fingerprint = fingerprint or {}
+        self.checkpoint = self._load_checkpoint()
+        self._truncate_rejects()
+
+    async def run(self, chunks: Iterable[pd.DataFrame], max_chunks: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Import chunks (which must start after the checkpoint's rows_done)
+
+        Args:
+            max_chunks: Stop after this many chunks (the checkpoint allows resuming)
+
+        Returns:
+            The checkpoint, including progress counters
+        """
+        start = time.perf_counter()
+        rows = 0
+        for count, frame in enumerate(chunks):
+            if max_chunks is not None and count >= max_chunks:
+                break
+            with stage("prepare"):
+                dogs, assessments, rejects = self.prepare(frame, self.checkpoint["rows_done"])
+            with stage("copy"):
+                inserted = await self.target.write(dogs, assessments)
+            self._write_rejects(frame.columns, rejects)
+            rows += len(frame)
+            checkpoint = self.checkpoint
+            checkpoint["rows_done"] += len(frame)
+            checkpoint["imported"] += inserted
+            checkpoint["already_imported"] += len(assessments) - inserted
+            checkpoint["rejected"] += len(rejects)
+            self._save_checkpoint()
+            print(f"Import: {checkpoint['rows_done']} rows, {checkpoint['imported']} imported, "
+                  f"{checkpoint['rejected']} rejected ({rows / (time.perf_counter() - start):.0f} rows/s)")
+        return self.checkpoint
+
+    def prepare(self, frame: pd.DataFrame, rows_before: int) -> Tuple[List[Tuple], List[Tuple], List[Tuple]]:
+        """
+        Validate, score and format one chunk
+
+        Args:
+            frame: Rows of the dataset
+            rows_before: Data rows preceding the chunk in the file
+
+        Returns:
+            (dog records, assessment records, rejected (row number, reason, values)),
+            records in DOG_COLUMNS and ASSESSMENT_COLUMNS order
+        """
+        missing = [column for column in self.item_columns + ["name"] if column not in frame.columns]
+        if "user_id" not in frame.columns and self.user_id is None:
+            missing.append("user_id (or --user-id)")
+        if missing:
+            raise ValueError(f"Missing columns: {', '.join(missing)}")
+
+        frame = frame.reset_index(drop=True)
+        row_numbers = np.arange(rows_before + 1, rows_before + len(frame) + 1)
+        items = frame[self.item_columns].apply(pd.to_numeric, errors="coerce").to_numpy(dtype=np.float64)
+        names = frame["name"].astype("string").str.strip()
+        user_ids = (frame["user_id"].astype("string").str.strip() if "user_id" in frame.columns
+                    else pd.Series(self.user_id, index=frame.index, dtype="string"))
+        birthdays, bad_birthdays = self._dates(frame, "birthday")
+        completed, bad_completed = self._dates(frame, "completed_at")
+
+        with np.errstate(invalid="ignore"):
+            reasons = np.select([
+                np.isnan(items).any(axis=1),
+                (items != np.rint(items)).any(axis=1),
+                ((items < 1) | (items > 7)).any(axis=1),
+                (names.isna() | (names == "")).to_numpy(dtype=bool),
+                ~user_ids.str.fullmatch(UUID_PATTERN).fillna(False).to_numpy(dtype=bool),
+                bad_birthdays,
+                bad_completed,
+            ], REJECTION_REASONS, default="")
+        valid = reasons == ""
+        rejects = [(int(row_numbers[i]), str(reasons[i]), frame.iloc[i].tolist()) for i in np.flatnonzero(~valid)]
+
+        ratings = items[valid].astype(np.uint8)
+        if not len(ratings):
+            return [], [], rejects
+        _, factor_scores, bias_scores = self.dpq.score_many(ratings)
+
+        # Quality metrics of DPQResponseFormatter._calculate_quality_metrics, for the whole chunk
+        ordered = np.sort(ratings, axis=1)
+        distinct = 1 + np.count_nonzero(np.diff(ordered, axis=1), axis=1)
+        extreme_bias = (distinct <= 2).tolist()
+        consistency = np.where(distinct >= 4, "high", "low").tolist()
+
+        formatter = self.formatter
+        factor_names = self.dpq.factor_names
+        bias_names = self.dpq.bias_names
+        breeds = self._text(frame, "breed")
+        source_dog_ids = self._text(frame, "dog_id")
+        names, user_ids = names.tolist(), user_ids.tolist()
+
+        dogs, assessments = [], []
+        for k, (i, ratings_row, factor_row, bias_row) in enumerate(zip(
+                np.flatnonzero(valid).tolist(), ratings.tolist(), factor_scores.tolist(), bias_scores.tolist())):
+            row = int(row_numbers[i])
+            if not source_dog_ids[i]:
+                dog_key = f"{self.source}:dog:{row}"
+            elif self.merge_dogs:
+                dog_key = f"dog:{source_dog_ids[i]}"
+            else:
+                dog_key = f"{self.source}:dog:{source_dog_ids[i]}"
+            dog_id = str(uuid.uuid5(IMPORT_NAMESPACE, dog_key))
+            assessment_id = str(uuid.uuid5(IMPORT_NAMESPACE, f"{self.source}:{row}"))
+            user_id = user_ids[i]
+
+            personality_factors = formatter._format_personality_factors(dict(zip(factor_names, factor_row)))
+            ai_bias_indicators = formatter._format_ai_bias_indicators(dict(zip(bias_names, bias_row)))
+            dogs.append((dog_id, user_id, names[i], breeds[i] or None, birthdays[i]))
+            assessments.append((
+                assessment_id, dog_id, user_id, completed[i], "import",
+                dict(zip(self.response_keys, ratings_row)),
+                personality_factors,
+                ai_bias_indicators,
+                formatter._generate_personality_summary(personality_factors),
+                formatter._generate_ai_translator_config(ai_bias_indicators),
+                formatter._generate_recommendations(personality_factors, ai_bias_indicators, {}),
+                consistency[k], extreme_bias[k], True,
+                "DPQ_Short_Form_v1.0", "Jones_2009_validated",
+            ))
+        return dogs, assessments, rejects
+
+    @staticmethod
+    def _text(frame: pd.DataFrame, column: str) -> List[str]:
+        """Stripped values of an optional text column ("" where empty)"""
+        if column not in frame.columns:
+            return [""] * len(frame)
+        return frame[column].astype("string").str.strip().fillna("").tolist()
+
+    @staticmethod
+    def _dates(frame: pd.DataFrame, column: str) -> Tuple[List[Any], np.ndarray]:
+        """Parsed values of an optional date column (None where empty) and a mask of unparseable ones"""
+        if column not in frame.columns:
+            return [None] * len(frame), np.zeros(len(frame), dtype=bool)
+        raw = frame[column]
+        parsed = pd.to_datetime(raw, errors="coerce")
+        invalid = (parsed.isna() & raw.notna()).to_numpy(dtype=bool)
+        if column == "birthday":
+            values = [value.date() if not pd.isna(value) else None for value in parsed]
+        else:
+            values = [value.to_pydatetime() if not pd.isna(value) else None for value in parsed]
+        return values, invalid
+
+    def _write_rejects(self, columns, rejects: List[Tuple]) -> None:
+        if not rejects:
+            return
+        directory = os.path.dirname(self.rejects_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        new_file = not os.path.exists(self.rejects_path) or os.path.getsize(self.rejects_path) == 0
+        with open(self.rejects_path, "a", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            if new_file:
+                writer.writerow(["row", "reason", *columns])
+            for row, reason, values in rejects:
+                writer.writerow([row, reason, *values])
+            f.flush()
+            self.checkpoint["rejects_bytes"] = f.tell()
+
+    def _truncate_rejects(self) -> None:
+        """Drop rejects written after the last checkpoint, which a resumed run writes again"""
+        if os.path.exists(self.rejects_path) and os.path.getsize(self.rejects_path) > self.checkpoint["rejects_bytes"]:
+            with open(self.rejects_path, "r+b") as f:
+                f.truncate(self.checkpoint["rejects_bytes"])
+
+    def _load_checkpoint(self) -> Dict[str, Any]:
+        fresh = {
+            "source": self.source, "merge_dogs": self.merge_dogs, **self.fingerprint, "rows_done": 0, "imported": 0,
+            "already_imported": 0, "rejected": 0, "rejects_bytes": 0, "started_at": time.time(),
+        }
+        if not os.path.exists(self.checkpoint_path):
+            return fresh
+        with open(self.checkpoint_path, encoding="utf-8") as f:
+            checkpoint = json.load(f)
+        identity = (("source", self.source), ("merge_dogs", self.merge_dogs), *self.fingerprint.items())
+        if any(checkpoint.get(key) != value for key, value in identity):
+            print(f"Checkpoint {self.checkpoint_path} is for another input; starting over")
+            return fresh
+        print(f"Resuming import of {self.source} after row {checkpoint['rows_done']}")
+        return {**fresh, **checkpoint}
+
+    def _save_checkpoint(self) -> None:
+        directory = os.path.dirname(self.checkpoint_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.checkpoint_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.checkpoint, f, indent=2)
+        os.replace(tmp_path, self.checkpoint_path)
+
+
+async def import_file(args) -> Dict[str, Any]:
+    """Run the job, returning the checkpoint with the job's resource usage"""
+    source = args.source or os.path.basename(args.path)
+    fingerprint = {"path": os.path.abspath(args.path), "size": os.path.getsize(args.path)}
+    with track("job:import_assessments") as usage:
+        target = DryRunTarget() if args.dry_run else await PostgresImportTarget.connect()
+        try:
+            job = AssessmentImport(target, source, args.checkpoint or f"{args.path}.import.json",
+                                   args.rejects or f"{args.path}.rejected.csv",
+                                   user_id=args.user_id, item_prefix=args.item_prefix, fingerprint=fingerprint,
+                                   merge_dogs=args.merge_dogs)
+            chunks = read_chunks(args.path, args.chunk_size, skip_rows=job.checkpoint["rows_done"])
+            checkpoint = await job.run(chunks, max_chunks=args.max_chunks)
+        finally:
+            await target.close()
+    return {**checkpoint, "resource_usage": usage.summary()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import completed DPQ questionnaires from a CSV or Parquet file.")
+    parser.add_argument("path", help="CSV or Parquet (.parquet) file")
+    parser.add_argument("--user-id", default=None, help="Owner of every imported dog (default: user_id column)")
+    parser.add_argument("--source", default=None,
+                        help="Dataset name that assessment IDs are derived from (default: file name)")
+    parser.add_argument("--merge-dogs", action="store_true",
+                        help="Share dogs with other sources that use the same dog_id values")
+    parser.add_argument("--item-prefix", default="q", help="Prefix of the 45 item columns (default q)")
+    parser.add_argument("--chunk-size", type=int, default=10000, help="Rows per chunk and transaction (default 10000)")
+    parser.add_argument("--checkpoint", default=None,
+                        help="Progress file; rerun with the same file to resume (default: <path>.import.json)")
+    parser.add_argument("--rejects", default=None, help="CSV of rejected rows (default: <path>.rejected.csv)")
+    parser.add_argument("--max-chunks", type=int, default=None, help="Stop after this many chunks")
+    parser.add_argument("--dry-run", action="store_true", help="Validate, score and format without writing")
+    args = parser.parse_args()
+
+    if args.user_id is not None:
+        try:
+            args.user_id = str(uuid.UUID(args.user_id))
+        except ValueError:
+            print(f"Error: --user-id must be a UUID, got {args.user_id}", file=sys.stderr)
+            sys.exit(1)
+
+    checkpoint = asyncio.run(import_file(args))
+    print(json.dumps(checkpoint, indent=2))
+
+
+if __name__ == "__main__":
+    main()
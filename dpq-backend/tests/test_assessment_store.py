@@ -0,0 +1,121 @@
+import unittest
+import os
+import sys
+import shutil
+import tempfile
+import numpy as np
+
+# Add the parent directory to sys.path to find the dpq package
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from dpq.dpq import DogPersonalityQuestionnaire, DPQAnalyzer
+from dpq.assessment_store import AssessmentStore
+
+
+class TestAssessmentStore(unittest.TestCase):
+    """Test cases for the columnar assessment store"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(prefix="dpq_store_")
+        self.dpq = DogPersonalityQuestionnaire()
+        rng = np.random.default_rng(7)
+        self.matrix = rng.integers(1, 8, size=(50, 45), dtype=np.uint8)
+        self.facets, self.factors, _ = self.dpq.score_many(self.matrix)
+        self.dog_ids = [f"dog_{i % 5}" for i in range(50)]
+        self.dates = ["2024-01-01"] * 25 + ["2024-02-01"] * 25
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_append_and_read(self):
+        """Test that appended columns read back through memory maps"""
+        print("\n🧪 Testing columnar append/read...")
+        store = AssessmentStore(self.directory)
+        self.assertEqual(store.append(self.matrix, self.facets, self.factors, self.dog_ids, self.dates), 0)
+        batch = store.read(10, 20)
+
+        self.assertEqual(len(batch), 10)
+        self.assertIsInstance(batch.responses, np.memmap)
+        np.testing.assert_array_equal(batch.responses, self.matrix[10:20])
+        np.testing.assert_array_equal(batch.factor_scores, self.factors[10:20].astype(np.float32))
+        self.assertEqual([store.dog_ids[c] for c in batch.dog_id_codes], self.dog_ids[10:20])
+        self.assertEqual(len(store.dog_ids), 5)
+        self.assertEqual(len(store.assessment_dates), 2)
+        print("✅ Columns round-trip with dictionary-encoded dog IDs and dates")
+
+    def test_reopen_and_append(self):
+        """Test that a reopened store continues appending"""
+        print("\n🧪 Testing store reopen...")
+        AssessmentStore(self.directory).append(self.matrix, self.facets, self.factors, self.dog_ids, self.dates)
+        store = AssessmentStore(self.directory)
+        self.assertEqual(len(store), 50)
+        self.assertEqual(store.append(self.matrix[:5], self.facets[:5], self.factors[:5],
+                                      ["dog_new"] * 5, ["2024-03-01"] * 5), 50)
+        self.assertEqual(len(AssessmentStore(self.directory)), 55)
+        np.testing.assert_array_equal(store.rows_for_dog("dog_new"), np.arange(50, 55))
+        print("✅ Reopened store appends after existing rows")
+
+    def test_torn_append_is_truncated(self):
+        """Test that readers skip a partial trailing row and the next append discards it"""
+        print("\n🧪 Testing torn append recovery...")
+        AssessmentStore(self.directory).append(self.matrix, self.facets, self.factors, self.dog_ids, self.dates)
+        responses_path = os.path.join(self.directory, "responses.u8")
+        with open(responses_path, "ab") as f:
+            f.write(b"\x01" * 20)
+
+        # Opening does not touch the columns: the row may still be being written
+        store = AssessmentStore(self.directory)
+        self.assertEqual(len(store), 50)
+        self.assertEqual(os.path.getsize(responses_path), 50 * 45 + 20)
+        self.assertEqual(len(store.read()), 50)
+
+        self.assertEqual(store.append(self.matrix[:1], self.facets[:1], self.factors[:1],
+                                      ["dog_new"], ["2024-03-01"]), 50)
+        self.assertEqual(os.path.getsize(responses_path), 51 * 45)
+        np.testing.assert_array_equal(AssessmentStore(self.directory).read(50).responses, self.matrix[:1])
+        print("✅ Partial rows skipped by readers, truncated by the writer")
+
+    def test_torn_dictionary_append(self):
+        """Test that a partial dictionary line does not stop the store opening and is dropped by the next append"""
+        print("\n🧪 Testing torn dictionary append...")
+        AssessmentStore(self.directory).append(self.matrix, self.facets, self.factors, self.dog_ids, self.dates)
+        dictionary_path = os.path.join(self.directory, "dog_id.dict")
+        size = os.path.getsize(dictionary_path)
+        with open(dictionary_path, "a") as f:
+            f.write('"dog-tor')
+
+        store = AssessmentStore(self.directory)
+        self.assertEqual(store.dog_ids, [f"dog_{i}" for i in range(5)])
+        self.assertEqual(os.path.getsize(dictionary_path), size + 8)
+
+        store.append(self.matrix[:1], self.facets[:1], self.factors[:1], ["dog-torn"], ["2024-03-01"])
+        reopened = AssessmentStore(self.directory)
+        self.assertEqual(reopened.dog_ids[-1], "dog-torn")
+        np.testing.assert_array_equal(reopened.rows_for_dog("dog-torn"), [50])
+        print("✅ Partial dictionary line skipped by readers, truncated by the writer")
+
+    def test_analyzer_export(self):
+        """Test exporting DPQResults through the analyzer"""
+        print("\n🧪 Testing analyzer export...")
+        analyzer = DPQAnalyzer()
+        results = [self.dpq.score_assessment({i + 1: int(v) for i, v in enumerate(row)}, "ExportDog")
+                   for row in self.matrix[:3]]
+        analyzer.export_results_to_store(results, self.directory)
+        store = analyzer.open_results_store(self.directory)
+        self.assertEqual(len(store), 3)
+        np.testing.assert_array_equal(store.read().responses, self.matrix[:3])
+        self.assertEqual(store.dog_ids, ["ExportDog"])
+        print("✅ Analyzer export writes columnar rows")
+
+    def test_shape_validation(self):
+        """Test that mismatched blocks are rejected"""
+        print("\n🧪 Testing append validation...")
+        store = AssessmentStore(self.directory)
+        with self.assertRaises(ValueError):
+            store.append(self.matrix[:, :40], self.facets, self.factors, self.dog_ids, self.dates)
+        self.assertEqual(len(store), 0)
+        print("✅ Mismatched columns rejected")
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,218 @@
+import unittest
+import asyncio
+import json
+import os
+import re
+import sys
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import anthropic
+
+# Add the parent directory to sys.path to find the dpq and jobs packages
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from dpq.claude_recommender import recommendation_profile
+from dpq.recommendation_cache import RecommendationCache
+from jobs.backfill_recommendations import RecommendationBackfill, assessment_profile
+
+
+class FakeBatchAPI(BaseHTTPRequestHandler):
+    """Local stand-in for the Message Batches endpoints"""
+
+    batches = {}
+    polls_until_ended = 2
+    failing = set()
+    failing_once = set()
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        batch_id = f"msgbatch_{len(self.batches):04d}"
+        self.batches[batch_id] = {"requests": body["requests"], "polls": 0}
+        self._send_json(self._batch(batch_id))
+
+    def do_GET(self):
+        match = re.fullmatch(r"/v1/messages/batches/(\w+)(/results)?", self.path)
+        batch_id = match.group(1)
+        if not match.group(2):
+            self.batches[batch_id]["polls"] += 1
+            self._send_json(self._batch(batch_id))
+            return
+        lines = []
+        for request in self.batches[batch_id]["requests"]:
+            custom_id = request["custom_id"]
+            if custom_id in self.failing or custom_id in self.failing_once:
+                self.failing_once.discard(custom_id)
+                result = {"type": "errored", "error": {"type": "error",
+                                                       "error": {"type": "api_error", "message": "boom"}}}
+            else:
+                text = json.dumps({"training_tips": [f"tip {custom_id[:8]}"], "exercise_needs": ["Fetch"],
+                                   "ai_communication": ["Calm tone"]})
+                result = {"type": "succeeded", "message": {
+                    "id": "msg_1", "type": "message", "role": "assistant", "model": request["params"]["model"],
+                    "content": [{"type": "text", "text": text}], "stop_reason": "end_turn",
+                    "stop_sequence": None, "usage": {"input_tokens": 10, "output_tokens": 10}}}
+            lines.append(json.dumps({"custom_id": custom_id, "result": result}))
+        self._send(("\n".join(lines) + "\n").encode(), "application/binary")
+
+    def _batch(self, batch_id):
+        ended = self.batches[batch_id]["polls"] >= self.polls_until_ended
+        host, port = self.server.server_address
+        return {
+            "id": batch_id, "type": "message_batch",
+            "processing_status": "ended" if ended else "in_progress",
+            "request_counts": {"processing": 0, "succeeded": 0, "errored": 0, "canceled": 0, "expired": 0},
+            "created_at": "2025-01-01T00:00:00Z", "expires_at": "2025-01-02T00:00:00Z",
+            "ended_at": "2025-01-01T01:00:00Z" if ended else None, "archived_at": None,
+            "cancel_initiated_at": None,
+            "results_url": f"http://{host}:{port}/v1/messages/batches/{batch_id}/results" if ended else None,
+        }
+
+    def _send_json(self, data):
+        self._send(json.dumps(data).encode(), "application/json")
+
+    def _send(self, body, content_type):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class MemoryAssessments:
+    """In-memory dpq_assessments with the PostgresAssessments interface"""
+
+    def __init__(self, rows, fail_writes=0):
+        self.rows = sorted(rows)
+        self.recommendations = {}
+        self.fail_writes = fail_writes
+
+    async def fetch_chunk(self, after_id, limit, until_id=None):
+        rows = [row for row in self.rows
+                if (after_id is None or row[0] > after_id) and (until_id is None or row[0] <= until_id)]
+        return rows[:limit]
+
+    async def write_recommendations(self, updates):
+        if self.fail_writes:
+            self.fail_writes -= 1
+            raise ConnectionError("connection lost")
+        self.recommendations.update(updates)
+        return len(updates)
+
+
+def stored_assessment(n, breed, fearfulness, excitability):
+    factors = {'Factor 1 - Fearfulness': {'score': fearfulness, 'level': 'Low'},
+               'Factor 3 - Activity/Excitability': {'score': excitability, 'level': 'High'}}
+    indicators = {'fearfulness_bias': fearfulness / 7, 'excitability_bias': excitability / 7}
+    return (f"{n:08d}-0000-0000-0000-000000000000", breed, factors, indicators)
+
+
+class TestRecommendationBackfill(unittest.TestCase):
+    """Test cases for the batch recommendation backfill job"""
+
+    def setUp(self):
+        FakeBatchAPI.batches = {}
+        FakeBatchAPI.failing = set()
+        FakeBatchAPI.failing_once = set()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), FakeBatchAPI)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.directory = tempfile.TemporaryDirectory()
+        self.checkpoint = os.path.join(self.directory.name, "backfill.json")
+        self.cache = RecommendationCache()
+        # 30 dogs, 3 distinct profiles
+        profiles = [("Border Collie", 3.0, 6.5), ("border collie ", 6.0, 2.0), ("Beagle", 3.0, 6.5)]
+        self.rows = [stored_assessment(n, *profiles[n % 3]) for n in range(30)]
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.directory.cleanup()
+
+    def backfill(self, store, chunk_size=100, max_attempts=3):
+        client = anthropic.AsyncAnthropic(api_key="test_key", base_url=self.base_url, max_retries=0)
+        return RecommendationBackfill(store, client, self.checkpoint, cache=self.cache,
+                                      chunk_size=chunk_size, poll_interval=0, max_attempts=max_attempts)
+
+    def test_dedupes_and_writes_back(self):
+        """Test that each distinct profile is requested once and every assessment is updated"""
+        print("\n🧪 Testing deduplicated backfill...")
+        cached = assessment_profile(*self.rows[2][1:])
+        self.assertEqual(cached, recommendation_profile({'dog_info': {'breed': 'Beagle'},
+                                                         'factor_scores': {'Factor 1 - Fearfulness': 3.0,
+                                                                           'Factor 3 - Activity/Excitability': 6.5},
+                                                         'bias_indicators': self.rows[2][3]}))
+        self.cache.put(self.cache.key(cached), {"training_tips": ["Cached"], "ai_communication": ["Cached"]})
+
+        store = MemoryAssessments(self.rows)
+        checkpoint = asyncio.run(self.backfill(store).run())
+
+        self.assertEqual(len(FakeBatchAPI.batches), 1)
+        requests = FakeBatchAPI.batches["msgbatch_0000"]["requests"]
+        self.assertEqual(len(requests), 2)
+        self.assertNotIn("Beagle", json.dumps(requests))
+        self.assertEqual(requests[0]["params"]["model"], "claude-sonnet-4-20250514")
+        self.assertEqual(len(store.recommendations), 30)
+        first = store.recommendations[self.rows[0][0]]
+        self.assertEqual(first["training_tips"], [f"tip {requests[0]['custom_id'][:8]}"])
+        self.assertEqual(first["ai_translator_tips"], ["Calm tone"])
+        self.assertEqual(store.recommendations[self.rows[2][0]]["training_tips"], ["Cached"])
+        self.assertEqual((checkpoint["assessments_updated"], checkpoint["profiles_generated"],
+                          checkpoint["profiles_cached"]), (30, 2, 1))
+        self.assertEqual(checkpoint["after_id"], self.rows[-1][0])
+        self.assertIsNone(checkpoint["pending"])
+        print("✅ 30 assessments backfilled with 2 generated profiles")
+
+    def test_failed_requests_resubmitted(self):
+        """Test that requests failing in a chunk's batch are resubmitted before the chunk completes"""
+        print("\n🧪 Testing resubmission of failed requests...")
+        failed_key = self.cache.key(assessment_profile(*self.rows[1][1:]))
+        FakeBatchAPI.failing_once = {failed_key}
+        store = MemoryAssessments(self.rows)
+        checkpoint = asyncio.run(self.backfill(store).run())
+
+        self.assertEqual([len(b["requests"]) for b in FakeBatchAPI.batches.values()], [3, 1])
+        self.assertEqual(FakeBatchAPI.batches["msgbatch_0001"]["requests"][0]["custom_id"], failed_key)
+        self.assertEqual(len(store.recommendations), 30)
+        self.assertEqual((checkpoint["assessments_updated"], checkpoint["assessments_skipped"]), (30, 0))
+        self.assertEqual((checkpoint["profiles_generated"], checkpoint["profiles_failed"]), (3, 1))
+        self.assertEqual(checkpoint["failed_assessments"], [])
+        print("✅ The failed profile was generated by a second batch")
+
+    def test_resume_and_failures(self):
+        """Test resuming from the checkpoint without resubmitting in-flight batches"""
+        print("\n🧪 Testing backfill resume...")
+        FakeBatchAPI.failing = {self.cache.key(assessment_profile(*self.rows[2][1:]))}
+        store = MemoryAssessments(self.rows, fail_writes=1)
+
+        with self.assertRaises(ConnectionError):
+            asyncio.run(self.backfill(store, chunk_size=12, max_attempts=2).run())
+        with open(self.checkpoint) as f:
+            interrupted = json.load(f)
+        self.assertEqual(interrupted["pending"]["batch_ids"], ["msgbatch_0000", "msgbatch_0001"])
+        self.assertIsNone(interrupted["after_id"])
+
+        # A fresh process (empty memory cache) collects the same batches instead of resubmitting;
+        # the chunk has used its attempts, so the failing profile's assessments are skipped
+        self.cache = RecommendationCache()
+        checkpoint = asyncio.run(self.backfill(store, chunk_size=12, max_attempts=2).run())
+        self.assertEqual(checkpoint["batches"], [f"msgbatch_{i:04d}" for i in range(6)])
+        self.assertEqual([len(b["requests"]) for b in FakeBatchAPI.batches.values()], [3, 1, 1, 1, 1, 1])
+        self.assertEqual(FakeBatchAPI.batches["msgbatch_0001"]["requests"][0]["custom_id"],
+                         next(iter(FakeBatchAPI.failing)))
+        self.assertEqual(len(store.recommendations), 20)
+        self.assertEqual((checkpoint["assessments_updated"], checkpoint["assessments_skipped"]), (20, 10))
+        self.assertEqual(checkpoint["failed_assessments"], [row[0] for row in self.rows[2::3]])
+        self.assertEqual(checkpoint["after_id"], self.rows[-1][0])
+
+        # Completed checkpoint: nothing left to do
+        again = asyncio.run(self.backfill(store, chunk_size=12, max_attempts=2).run())
+        self.assertEqual(len(again["batches"]), 6)
+        print("✅ Backfill resumed from checkpoint")
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,155 @@
+import unittest
+import os
+import sys
+import shutil
+import asyncio
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+# Add the parent directory to sys.path to find the dpq package
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from dpq.dpq import DogPersonalityQuestionnaire
+from dpq.visualization import (
+    RESULT_CHARTS, ChartCache, chart_key, render_chart, results_chart_spec, trend_chart_spec_from_results
+)
+from app.services.chart_service import ChartService
+
+
+class TestCharts(unittest.TestCase):
+    """Test cases for chart rendering and the render cache"""
+
+    def setUp(self):
+        self.dpq = DogPersonalityQuestionnaire()
+        self.results = self.dpq.score_assessment({i: (i % 7) + 1 for i in range(1, 46)}, dog_id="rex")
+        self.directory = tempfile.mkdtemp(prefix="dpq_charts_")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_render_all_charts(self):
+        """Test that every chart renders deterministically in both formats"""
+        print("\n🧪 Testing chart rendering...")
+        for chart in RESULT_CHARTS:
+            spec = results_chart_spec(self.results, chart)
+            png = render_chart(spec, "png")
+            self.assertTrue(png.startswith(b"\x89PNG"))
+            svg = render_chart(spec, "svg")
+            self.assertIn(b"<svg", svg)
+            self.assertEqual(svg, render_chart(spec, "svg"))
+
+        history = []
+        for month, value in enumerate((2, 4, 6)):
+            results = self.dpq.score_assessment({i: value for i in range(1, 46)}, dog_id="rex")
+            results.assessment_date = f"2024-0{month + 1}-01"
+            history.append(results)
+        spec = trend_chart_spec_from_results(list(reversed(history)))
+        self.assertEqual(spec["dates"], ["2024-01-01", "2024-02-01", "2024-03-01"])
+        self.assertTrue(render_chart(spec, "png").startswith(b"\x89PNG"))
+        with self.assertRaises(ValueError):
+            render_chart(spec, "gif")
+        print("✅ Radar, bar and trend charts render")
+
+    def test_content_hash_keys(self):
+        """Test that keys depend only on the scores and format"""
+        print("\n🧪 Testing content-hash keys...")
+        spec = results_chart_spec(self.results)
+        same = results_chart_spec({"factor_scores": dict(self.results.factor_scores)})
+        self.assertEqual(chart_key(spec, "png"), chart_key(same, "png"))
+        self.assertNotEqual(chart_key(spec, "png"), chart_key(spec, "svg"))
+        changed = dict(self.results.factor_scores)
+        changed[self.dpq.factor_names[0]] += 0.5
+        self.assertNotEqual(chart_key(spec, "png"), chart_key(results_chart_spec({"factor_scores": changed}), "png"))
+        print("✅ Keys identify chart content")
+
+    def test_service_cache_and_coalescing(self):
+        """Test that repeat and concurrent requests render once"""
+        print("\n🧪 Testing render cache and request coalescing...")
+        executor = ThreadPoolExecutor(max_workers=2)
+        service = ChartService(cache_dir=self.directory, executor=executor)
+
+        async def scenario():
+            first = await asyncio.gather(*[service.results_chart(self.results, "facet_bars") for _ in range(5)])
+            again = await service.results_chart(self.results, "facet_bars")
+            return first, again
+
+        first, again = asyncio.run(scenario())
+        self.assertEqual(service.renders, 1)
+        self.assertEqual(len({data for data, _ in first}), 1)
+        self.assertEqual(again, first[0])
+
+        # A fresh service reuses the rendered file on disk
+        restarted = ChartService(cache_dir=self.directory, executor=executor)
+        asyncio.run(restarted.results_chart(self.results, "facet_bars"))
+        self.assertEqual(restarted.renders, 0)
+        executor.shutdown()
+        print("✅ Charts render once and are served from cache")
+
+    def test_cancelled_request_still_caches(self):
+        """Test that a render whose requester went away is still cached"""
+        print("\n🧪 Testing cancelled chart requests...")
+        executor = ThreadPoolExecutor(max_workers=1)
+        service = ChartService(cache_dir=self.directory, executor=executor)
+
+        async def scenario():
+            request = asyncio.create_task(service.results_chart(self.results, "bias_bars"))
+            while not service._inflight:
+                await asyncio.sleep(0.001)
+            request.cancel()
+            while service._inflight:
+                await asyncio.sleep(0.01)
+            return request.cancelled()
+
+        self.assertTrue(asyncio.run(scenario()))
+        self.assertEqual(service.renders, 1)
+        restarted = ChartService(cache_dir=self.directory, executor=executor)
+        asyncio.run(restarted.results_chart(self.results, "bias_bars"))
+        self.assertEqual(restarted.renders, 0)
+        executor.shutdown()
+        print("✅ Render cached after its request was cancelled")
+
+    def test_process_pool_render(self):
+        """Test rendering in the bounded process pool"""
+        print("\n🧪 Testing process pool rendering...")
+        service = ChartService(max_workers=1, cache_dir=self.directory)
+        try:
+            data, key = asyncio.run(service.results_chart(self.results, "factor_radar", "svg"))
+        finally:
+            service.shutdown()
+        self.assertEqual(data, render_chart(results_chart_spec(self.results, "factor_radar"), "svg"))
+        self.assertTrue(os.path.exists(os.path.join(self.directory, f"{key}.svg")))
+        print("✅ Process pool renders match in-process renders")
+
+    def test_memory_cache_is_bounded(self):
+        """Test LRU eviction by size"""
+        print("\n🧪 Testing cache bounds...")
+        cache = ChartCache(max_memory_bytes=100)
+        cache.put("a", "png", b"x" * 60)
+        cache.put("b", "png", b"y" * 60)
+        self.assertIsNone(cache.get("a", "png"))
+        self.assertEqual(cache.get("b", "png"), b"y" * 60)
+        self.assertLessEqual(cache.stats()["memory_bytes"], 100)
+        print("✅ Memory cache stays within its byte budget")
+
+    def test_disk_cache_is_bounded(self):
+        """Test that the chart directory is trimmed to its byte budget, least recently used first"""
+        print("\n🧪 Testing disk cache bounds...")
+        cache = ChartCache(self.directory, max_memory_bytes=0, max_disk_bytes=1000)
+        for i in range(10):
+            cache.put(f"k{i}", "png", bytes(100))
+            os.utime(os.path.join(self.directory, f"k{i}.png"), (1000 + i, 1000 + i))
+        self.assertEqual(cache.stats()["disk_bytes"], 1000)
+
+        # A restarted process counts the existing files; reading k0 makes it the most recent
+        cache = ChartCache(self.directory, max_memory_bytes=0, max_disk_bytes=1000)
+        self.assertEqual(cache.get("k0", "png"), bytes(100))
+        cache.put("k10", "png", bytes(100))
+        self.assertEqual(sorted(os.listdir(self.directory)),
+                         sorted(f"k{i}.png" for i in (0, 3, 4, 5, 6, 7, 8, 9, 10)))
+        self.assertEqual((cache.stats()["disk_bytes"], cache.stats()["disk_evictions"]), (900, 2))
+        self.assertIsNone(cache.get("k1", "png"))
+        print("✅ Disk cache stays within its byte budget")
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,215 @@
+import unittest
+import asyncio
+import itertools
+import os
+import sys
+from unittest import mock
+
+# Add the parent directory to sys.path to find the dpq package
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from dpq.db_pool import DatabasePool, connection_settings, decode_jsonb, encode_jsonb
+from dpq.resource_accounting import ResourceLedger, track
+from dpq.response_formatter import JSONFragment
+
+_pids = itertools.count(1000)
+
+
+class FakeConnection:
+    def __init__(self, broken=False):
+        self.pid = next(_pids)
+        self.broken = broken
+        self.terminated = False
+        self.queries = []
+        self.args = []
+
+    def get_server_pid(self):
+        return self.pid
+
+    async def execute(self, query, *args):
+        self.queries.append(query)
+        await asyncio.sleep(0.02)
+        return "INSERT 0 1"
+
+    async def fetchval(self, query, *args, timeout=None):
+        if self.broken:
+            raise ConnectionResetError("server closed the connection")
+        self.queries.append(query)
+        self.args.append(args)
+        return args[0] if args else 1
+
+    def terminate(self):
+        self.terminated = True
+
+
+class FakePool:
+    """Stands in for asyncpg.create_pool: a queue of connections, replacing terminated ones"""
+
+    def __init__(self, min_size, max_size, max_inactive_connection_lifetime, **settings):
+        self.settings = settings
+        self.size = max_size
+        self.idle = asyncio.Queue()
+        for _ in range(max_size):
+            self.idle.put_nowait(FakeConnection())
+
+    async def acquire(self, timeout=None):
+        return await asyncio.wait_for(self.idle.get(), timeout)
+
+    async def release(self, connection):
+        self.idle.put_nowait(FakeConnection() if connection.terminated else connection)
+
+    def get_size(self):
+        return self.size
+
+    def get_idle_size(self):
+        return self.idle.qsize()
+
+    async def close(self):
+        pass
+
+
+async def create_fake_pool(**kwargs):
+    return FakePool(**kwargs)
+
+
+class TestDatabasePool(unittest.TestCase):
+    """Test cases for the shared connection pool"""
+
+    def test_acquire_waits_are_accounted(self):
+        """Test that saves beyond max_size wait for a connection and the waits are recorded"""
+        print("\n🧪 Testing pool acquire waits...")
+
+        async def run():
+            pool = await DatabasePool(min_size=2, max_size=2, settings={"statement_cache_size": 0},
+                                      create_pool=create_fake_pool).start()
+
+            async def save():
+                async with pool.acquire() as conn:
+                    await conn.execute("INSERT INTO dpq_assessments VALUES ($1)", 1)
+
+            with track("POST /api/assessments", ledger=ResourceLedger()) as usage:
+                await asyncio.gather(*(save() for _ in range(6)))
+            await pool.close()
+            return pool, usage
+
+        pool, usage = asyncio.run(run())
+        stats = pool.stats()
+        self.assertTrue(stats["pgbouncer"])
+        self.assertFalse(stats["started"])
+        self.assertEqual(stats["acquires"], 6)
+        self.assertEqual(sum(stats["wait_histogram"].values()), 6)
+        self.assertGreaterEqual(stats["max_wait_seconds"], 0.03)
+        self.assertEqual(usage.totals["db_round_trips"], 6)
+        self.assertGreaterEqual(usage.totals["db_acquire_seconds"], 0.03)
+        print(f"✅ Max acquire wait {stats['max_wait_seconds'] * 1000:.1f} ms with 6 saves on 2 connections")
+
+    def test_health_check_replaces_dead_connection(self):
+        """Test that a connection idle past health_check_after is checked and replaced when dead"""
+        print("\n🧪 Testing connection health checks...")
+        now = [0.0]
+
+        async def run():
+            pool = await DatabasePool(min_size=1, max_size=1, health_check_after=30, settings={},
+                                      create_pool=create_fake_pool, clock=lambda: now[0]).start()
+            async with pool.acquire() as conn:
+                first = conn._connection
+            now[0] = 10.0
+            async with pool.acquire() as conn:
+                self.assertIs(conn._connection, first)
+            self.assertEqual(first.queries, [])
+
+            first.broken = True
+            now[0] = 100.0
+            async with pool.acquire() as conn:
+                replacement = conn._connection
+            return pool, first, replacement
+
+        pool, first, replacement = asyncio.run(run())
+        self.assertTrue(first.terminated)
+        self.assertIsNot(replacement, first)
+        self.assertEqual(replacement.queries, ["SELECT 1"])
+        stats = pool.stats()
+        self.assertEqual((stats["health_checks"], stats["unhealthy_connections"]), (2, 1))
+        print("✅ Dead connection terminated and replaced")
+
+    def test_acquire_timeout(self):
+        """Test that acquiring from an exhausted pool times out"""
+        print("\n🧪 Testing acquire timeout...")
+
+        async def run():
+            pool = await DatabasePool(min_size=1, max_size=1, acquire_timeout=0.05, settings={},
+                                      create_pool=create_fake_pool).start()
+            async with pool.acquire():
+                with self.assertRaises(asyncio.TimeoutError):
+                    async with pool.acquire():
+                        pass
+            return pool
+
+        pool = asyncio.run(run())
+        self.assertEqual(pool.stats()["acquire_timeouts"], 1)
+        with self.assertRaises(ValueError):
+            DatabasePool(min_size=3, max_size=2, settings={})
+        print("✅ Exhausted pool timed out")
+
+    def test_pgbouncer_mode(self):
+        """Test that the statement cache is disabled for pgbouncer"""
+        print("\n🧪 Testing pgbouncer mode...")
+        with mock.patch.dict(os.environ, {"DB_PORT": "6543", "DPQ_DB_PGBOUNCER": "auto"}):
+            self.assertEqual(connection_settings()["statement_cache_size"], 0)
+        with mock.patch.dict(os.environ, {"DB_PORT": "5432", "DPQ_DB_PGBOUNCER": "auto"}):
+            self.assertNotIn("statement_cache_size", connection_settings())
+        with mock.patch.dict(os.environ, {"DB_PORT": "5432", "DPQ_DB_PGBOUNCER": "true"}):
+            self.assertEqual(connection_settings()["port"], 5432)
+            self.assertEqual(connection_settings()["statement_cache_size"], 0)
+        print("✅ pgbouncer mode follows DPQ_DB_PGBOUNCER")
+
+
+class TestAssessmentPersistence(unittest.TestCase):
+    """Test cases for the jsonb codec and the single-statement assessment save"""
+
+    def test_jsonb_codec(self):
+        """Test that jsonb values round-trip and fragments reuse their text"""
+        print("\n🧪 Testing jsonb codec...")
+        value = {"training_tips": ["Short sessions"], "version": 2, "scores": {"1": 4.5}}
+        self.assertEqual(decode_jsonb(encode_jsonb(value)), value)
+        self.assertEqual(decode_jsonb(encode_jsonb({1: True})), {"1": True})
+        fragment = JSONFragment({"primary_type": "Calm Companion"})
+        fragment.json = '{"precomputed":true}'
+        self.assertEqual(encode_jsonb(fragment), b'\x01{"precomputed":true}')
+        self.assertEqual(encode_jsonb('{"already":"text"}'), b'\x01{"already":"text"}')
+        print("✅ jsonb encoded in binary format")
+
+    def test_save_is_one_round_trip(self):
+        """Test that an assessment save is a single statement on one pooled connection"""
+        print("\n🧪 Testing assessment save...")
+        from dpq.api_handler import DPQAPIHandler
+
+        handler = DPQAPIHandler.__new__(DPQAPIHandler)
+        summary = JSONFragment({"primary_type": "Calm Companion"})
+        assessment = {
+            "assessment_id": "a-1", "dog_id": "d-1", "user_id": "00000000-0000-0000-0000-000000000001",
+            "dog_info": {"name": "Rex", "breed": "Beagle"}, "responses": {"1": 4},
+            "personality_factors": {}, "ai_bias_indicators": {}, "personality_summary": summary,
+            "ai_translator_config": {}, "recommendations": {"version": 1},
+            "quality_metrics": {"reliability_score": 0.9},
+            "metadata": {"assessment_version": "DPQ_Short_Form_v1.0", "scoring_algorithm": "Jones_2009_validated"},
+        }
+
+        async def run():
+            pool = await DatabasePool(min_size=1, max_size=1, settings={}, create_pool=create_fake_pool).start()
+            with mock.patch("dpq.api_handler.get_db_pool", return_value=pool), \
+                    track("POST /api/assessments", ledger=ResourceLedger()) as usage:
+                saved = await handler.save_assessment_to_db(assessment)
+            return saved, usage, pool._pool.idle.get_nowait()
+
+        saved, usage, conn = asyncio.run(run())
+        self.assertTrue(saved)
+        self.assertEqual(usage.totals["db_round_trips"], 1)
+        self.assertEqual(len(conn.queries), 1)
+        self.assertIn("WITH dog AS", conn.queries[0])
+        self.assertIs(conn.args[0][11], summary)
+        print("✅ Dog, assessment and current assessment written in one statement")
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
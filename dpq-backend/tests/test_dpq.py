@@ -382,6 +382,89 @@ class TestIntegration(unittest.TestCase):
         print("✅ Edge cases handled appropriately")
 
 
+class TestBatchScoring(unittest.TestCase):
+    """Test cases for vectorized batch scoring"""
+
+    def setUp(self):
+        self.dpq = DogPersonalityQuestionnaire()
+        rng = np.random.default_rng(2009)
+        self.matrix = rng.integers(1, 8, size=(200, 45), dtype=np.uint8)
+
+    def test_score_many_shapes(self):
+        """Test that batch scoring returns facet, factor and bias matrices"""
+        print("\n🧪 Testing batch scoring shapes...")
+        facets, factors, biases = self.dpq.score_many(self.matrix)
+        self.assertEqual(facets.shape, (200, 15))
+        self.assertEqual(factors.shape, (200, 5))
+        self.assertEqual(biases.shape, (200, 14))
+        print("✅ Batch scoring returns N x 15, N x 5 and N x 14 arrays")
+
+    def test_score_many_matches_score_assessment(self):
+        """Test that batch scores are identical to the per-item path"""
+        print("\n🧪 Testing batch scoring against score_assessment...")
+        facets, factors, biases = self.dpq.score_many(self.matrix)
+        for row in range(self.matrix.shape[0]):
+            responses = {i + 1: int(v) for i, v in enumerate(self.matrix[row])}
+            results = self.dpq.score_assessment(responses, "BatchDog")
+            self.assertEqual(list(facets[row]), [results.facet_scores[n] for n in self.dpq.facet_names])
+            self.assertEqual(list(factors[row]), [results.factor_scores[n] for n in self.dpq.factor_names])
+            self.assertEqual(list(biases[row]), [results.bias_indicators[n] for n in self.dpq.bias_names])
+        print("✅ Batch scores match score_assessment exactly")
+
+    def test_score_many_unanswered_items(self):
+        """Test that unanswered items are handled like missing responses"""
+        print("\n🧪 Testing batch scoring with unanswered items...")
+        minimal_responses = {1: 4, 2: 4, 3: 4}
+        matrix = self.dpq.responses_to_matrix([minimal_responses])
+        facets, factors, _ = self.dpq.score_many(matrix)
+        results = self.dpq.score_assessment(minimal_responses, "MinimalTest")
+        self.assertEqual(list(facets[0]), [results.facet_scores[n] for n in self.dpq.facet_names])
+        self.assertEqual(list(factors[0]), [results.factor_scores[n] for n in self.dpq.factor_names])
+        print("✅ Unanswered items fall back to the same neutral scores")
+
+    def test_score_many_rejects_bad_input(self):
+        """Test that malformed matrices are rejected"""
+        print("\n🧪 Testing batch scoring validation...")
+        with self.assertRaises(ValueError):
+            self.dpq.score_many(np.ones((3, 44), dtype=np.uint8))
+        with self.assertRaises(ValueError):
+            self.dpq.score_many(np.full((3, 45), 8, dtype=np.uint8))
+        print("✅ Malformed response matrices rejected")
+
+
+class TestScoringPlan(unittest.TestCase):
+    """Test cases for the compiled scoring plan"""
+
+    def setUp(self):
+        self.dpq = DogPersonalityQuestionnaire()
+
+    def test_plan_shared_across_instances(self):
+        """Test that the plan is compiled once per process"""
+        print("\n🧪 Testing scoring plan sharing...")
+        self.assertIs(self.dpq.plan, DogPersonalityQuestionnaire().plan)
+        self.assertEqual(len(self.dpq.plan.facet_items), 15)
+        self.assertEqual(len(self.dpq.plan.factor_facets), 5)
+        print("✅ Scoring plan shared process-wide")
+
+    def test_plan_matches_reference_scoring(self):
+        """Test that plan scores match a straightforward np.mean reference"""
+        print("\n🧪 Testing scoring plan against reference...")
+        rng = np.random.default_rng(45)
+        for _ in range(200):
+            responses = {i: int(rng.integers(1, 8)) for i in range(1, 46) if rng.random() > 0.1}
+            results = self.dpq.score_assessment(responses, "PlanDog")
+            for factor_name, facets in self.dpq.scoring_structure.items():
+                facet_means = []
+                for facet_name, facet_info in facets.items():
+                    values = [8 - responses[i] if i in facet_info["reverse"] else responses[i]
+                              for i in facet_info["items"] if i in responses]
+                    expected = np.mean(values) if values else 4.0
+                    self.assertEqual(results.facet_scores[facet_name], expected)
+                    facet_means.append(expected)
+                self.assertEqual(results.factor_scores[factor_name], np.mean(facet_means))
+        print("✅ Scoring plan matches reference scoring exactly")
+
+
 class TestDisplayMethods(unittest.TestCase):
     """Test display and interactive methods"""
     
@@ -415,6 +498,8 @@ if __name__ == '__main__':
     test_suite.addTest(unittest.makeSuite(TestDPQAnalyzer))
     test_suite.addTest(unittest.makeSuite(TestDPQResults))
     test_suite.addTest(unittest.makeSuite(TestIntegration))
+    test_suite.addTest(unittest.makeSuite(TestBatchScoring))
+    test_suite.addTest(unittest.makeSuite(TestScoringPlan))
     test_suite.addTest(unittest.makeSuite(TestDisplayMethods))
     
     # Run the tests with detailed output
@@ -1,11 +1,15 @@
 import asyncio
 import json
 import os
+import sys
 import uuid
 from datetime import datetime, date
 from dotenv import load_dotenv
 import asyncpg
 
+# Add the parent directory to sys.path to find the dpq package
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
 # Load environment variables
 load_dotenv()
 
@@ -17,6 +21,7 @@ class TestDPQDatabase:
         self.test_user_id = str(uuid.uuid4())
         self.test_dog_id = str(uuid.uuid4())
         self.test_assessment_id = str(uuid.uuid4())
+        self.replayed_assessment_ids = []
         
     async def get_db_connection(self):
         """Get database connection"""
@@ -316,6 +321,51 @@ class TestDPQDatabase:
             self.log_test("Update dog current assessment", False, str(e))
             return False
     
+    async def test_replay_older_assessment(self):
+        """Test that replaying an older batch of assessments leaves the dog's current assessment alone"""
+        from datetime import timedelta
+        from dpq.api_handler import SAVE_ASSESSMENT_SQL, assessment_args
+        from dpq.db_pool import register_jsonb_codec
+
+        try:
+            conn = await self.get_db_connection()
+            await register_jsonb_codec(conn)
+            query = SAVE_ASSESSMENT_SQL.format(on_conflict="ON CONFLICT (assessment_id) DO NOTHING")
+
+            def assessment(completed_at):
+                data = {**self.create_test_assessment_data(), 'assessment_id': str(uuid.uuid4()),
+                        'started_at': completed_at, 'completed_at': completed_at}
+                self.replayed_assessment_ids.append(data['assessment_id'])
+                return data
+
+            newer = assessment(datetime.now() + timedelta(days=1))
+            await conn.executemany(query, [assessment_args(newer)])
+            older = [assessment(datetime(2021, 1, 1)), assessment(datetime(2022, 1, 1))]
+            await conn.executemany(query, [assessment_args(data) for data in older])
+
+            current = await conn.fetchval("SELECT current_dpq_assessment_id FROM dogs WHERE dog_id = $1",
+                                          self.test_dog_id)
+            stored = await conn.fetchval(
+                "SELECT COUNT(*) FROM dpq_assessments WHERE assessment_id::text = ANY($1::text[])",
+                [data['assessment_id'] for data in older])
+
+            # The profile test below expects the original assessment to be current again
+            await conn.execute("UPDATE dogs SET current_dpq_assessment_id = $1 WHERE dog_id = $2",
+                               self.test_assessment_id, self.test_dog_id)
+            await conn.close()
+
+            if str(current) == newer['assessment_id'] and stored == 2:
+                self.log_test("Replay older assessments", True)
+                return True
+            else:
+                self.log_test("Replay older assessments", False,
+                              f"Current assessment {current}, {stored} of 2 older assessments stored")
+                return False
+
+        except Exception as e:
+            self.log_test("Replay older assessments", False, str(e))
+            return False
+
     async def test_retrieve_full_profile(self):
         """Test retrieving complete dog profile with assessment"""
         try:
@@ -351,8 +401,9 @@ class TestDPQDatabase:
             # 1. First clear the foreign key reference
             await conn.execute("UPDATE dogs SET current_dpq_assessment_id = NULL WHERE dog_id = $1", self.test_dog_id)
             
-            # 2. Then delete the assessment
-            await conn.execute("DELETE FROM dpq_assessments WHERE assessment_id = $1", self.test_assessment_id)
+            # 2. Then delete the assessments
+            await conn.execute("DELETE FROM dpq_assessments WHERE assessment_id::text = ANY($1::text[])",
+                               [self.test_assessment_id, *self.replayed_assessment_ids])
             
             # 3. Then delete the dog
             await conn.execute("DELETE FROM dogs WHERE dog_id = $1", self.test_dog_id)
@@ -391,6 +442,7 @@ class TestDPQDatabase:
             self.test_insert_dog,
             self.test_insert_assessment,
             self.test_update_dog_current_assessment,
+            self.test_replay_older_assessment,
             self.test_retrieve_full_profile
         ]
         
@@ -3,6 +3,7 @@
 import json
 import sys
 import os
+import tempfile
 from datetime import datetime
 
 # Add the dpq directory directly to the path
@@ -31,7 +32,7 @@ def make_json_serializable(obj):
     """Convert object to JSON-serializable format"""
     if isinstance(obj, dict):
         return {key: make_json_serializable(value) for key, value in obj.items()}
-    elif isinstance(obj, list):
+    elif isinstance(obj, (list, tuple)):
         return [make_json_serializable(item) for item in obj]
     elif isinstance(obj, bool):
         return obj  # booleans are actually JSON serializable in Python
@@ -163,7 +164,8 @@ def test_complete_dpq_workflow():
         print(f"  All Questions Answered: {complete_response['quality_metrics']['all_questions_answered']}")
         
         # Step 7: Save complete JSON output with proper serialization
-        output_filename = f"dpq_complete_output_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+        output_filename = os.path.join(tempfile.gettempdir(),
+                                       f"dpq_complete_output_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
         
         # Make the response JSON serializable
         json_safe_response = make_json_serializable(complete_response)
@@ -180,7 +182,7 @@ def test_complete_dpq_workflow():
             def convert_to_strings(obj):
                 if isinstance(obj, dict):
                     return {key: convert_to_strings(value) for key, value in obj.items()}
-                elif isinstance(obj, list):
+                elif isinstance(obj, (list, tuple)):
                     return [convert_to_strings(item) for item in obj]
                 elif isinstance(obj, bool):
                     return str(obj).lower()  # Convert boolean to string
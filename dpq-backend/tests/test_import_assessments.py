@@ -0,0 +1,174 @@
+import unittest
+import asyncio
+import csv
+import os
+import sys
+import tempfile
+from dataclasses import asdict
+
+import numpy as np
+import pandas as pd
+
+# Add the parent directory to sys.path to find the dpq and jobs packages
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from dpq.dpq import DogPersonalityQuestionnaire
+from dpq.recommendation_rules import get_recommendation_rules
+from dpq.response_formatter import DPQResponseFormatter
+from jobs.import_assessments import ASSESSMENT_COLUMNS, AssessmentImport, read_chunks
+
+USER_ID = "6f1c2a7e-8a43-4d5e-9c1b-2f3e4d5c6b7a"
+
+
+class RecordingTarget:
+    """In-memory stand-in for PostgresImportTarget, keyed like the tables"""
+
+    def __init__(self):
+        self.dogs = {}
+        self.assessments = {}
+
+    async def write(self, dogs, assessments):
+        for dog in dogs:
+            self.dogs[dog[0]] = dog
+        inserted = 0
+        for assessment in assessments:
+            if assessment[0] not in self.assessments:
+                self.assessments[assessment[0]] = dict(zip(ASSESSMENT_COLUMNS, assessment))
+                inserted += 1
+        return inserted
+
+
+class TestAssessmentImport(unittest.TestCase):
+    """Test cases for the bulk questionnaire import"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "study.csv")
+        rng = np.random.default_rng(3)
+        self.ratings = rng.integers(1, 8, size=(12, 45))
+        with open(self.path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["dog_id", "name", "breed", "birthday", *(f"q{i}" for i in range(1, 46))])
+            for row, ratings in enumerate(self.ratings, start=1):
+                values = [str(value) for value in ratings]
+                name = f"Dog {row}"
+                if row == 3:
+                    values[4] = "8"
+                elif row == 5:
+                    values[10] = "n/a"
+                elif row == 7:
+                    name = ""
+                elif row == 9:
+                    values[0] = "2.5"
+                writer.writerow([f"study-{row % 10}", name, "Beagle", "2020-05-01", *values])
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def job(self, target):
+        return AssessmentImport(target, "study", os.path.join(self.tmp.name, "study.import.json"),
+                                os.path.join(self.tmp.name, "rejected.csv"), user_id=USER_ID)
+
+    def test_import_matches_api_formatting(self):
+        """Test that imported rows are scored and formatted like API assessments"""
+        print("\n🧪 Testing bulk import scoring...")
+        target = RecordingTarget()
+        job = self.job(target)
+        checkpoint = asyncio.run(job.run(read_chunks(self.path, 5)))
+        self.assertEqual((checkpoint["rows_done"], checkpoint["imported"], checkpoint["rejected"]), (12, 8, 4))
+
+        with open(os.path.join(self.tmp.name, "rejected.csv"), newline="") as f:
+            rejected = {int(row["row"]): row["reason"] for row in csv.DictReader(f)}
+        self.assertEqual(rejected, {3: "item outside 1-7", 5: "missing or non-numeric item",
+                                    7: "missing dog name", 9: "non-integer item"})
+
+        dpq = DogPersonalityQuestionnaire()
+        formatter = DPQResponseFormatter(recommendation_rules=get_recommendation_rules())
+        responses = {item: int(value) for item, value in enumerate(self.ratings[0], start=1)}
+        expected = formatter.format_assessment_response(asdict(dpq.score_assessment(responses)),
+                                                        {}, USER_ID, {}, responses)
+        imported = next(a for a in target.assessments.values() if a["responses"] == expected["responses"])
+        for column in ("personality_factors", "ai_bias_indicators", "personality_summary",
+                       "ai_translator_config", "recommendations"):
+            self.assertEqual(imported[column], expected[column], column)
+        self.assertEqual(imported["extreme_response_bias"], expected["quality_metrics"]["extreme_response_bias"])
+        # Rows 1 and 11, and 2 and 12, are assessments of the same dataset dogs
+        self.assertEqual(len(target.dogs), 6)
+        print(f"✅ {checkpoint['imported']} assessments imported, {checkpoint['rejected']} rejected")
+
+    def test_resume(self):
+        """Test that an interrupted import resumes after its last chunk without duplicates"""
+        print("\n🧪 Testing import resume...")
+        target = RecordingTarget()
+        first = self.job(target)
+        asyncio.run(first.run(read_chunks(self.path, 4), max_chunks=1))
+        self.assertEqual(first.checkpoint["rows_done"], 4)
+
+        # A crash after writing rejects but before the checkpoint leaves extra lines behind
+        rejects_path = os.path.join(self.tmp.name, "rejected.csv")
+        with open(rejects_path, "a") as f:
+            f.write("5,partial,\n")
+
+        resumed = self.job(target)
+        self.assertEqual(resumed.checkpoint["rows_done"], 4)
+        checkpoint = asyncio.run(resumed.run(read_chunks(self.path, 4, skip_rows=4)))
+        self.assertEqual((checkpoint["rows_done"], checkpoint["imported"], checkpoint["rejected"]), (12, 8, 4))
+        self.assertEqual(len(target.assessments), 8)
+        with open(rejects_path, newline="") as f:
+            self.assertEqual([row["row"] for row in csv.DictReader(f)], ["3", "5", "7", "9"])
+
+        # Re-importing the same rows inserts nothing new
+        again = AssessmentImport(target, "study", os.path.join(self.tmp.name, "again.json"),
+                                 os.path.join(self.tmp.name, "again.csv"), user_id=USER_ID)
+        self.assertEqual(asyncio.run(again.run(read_chunks(self.path, 100)))["already_imported"], 8)
+        print("✅ Resumed after row 4 with no duplicate assessments or rejects")
+
+    def test_parquet_resume(self):
+        """Test that Parquet input reads like the CSV and resumes mid row group"""
+        print("\n🧪 Testing Parquet import resume...")
+        parquet_path = os.path.join(self.tmp.name, "study.parquet")
+        frame = pd.concat(read_chunks(self.path, 100), ignore_index=True)
+        frame.to_parquet(parquet_path, engine="pyarrow", row_group_size=5, index=False)
+
+        csv_rows = pd.concat(read_chunks(self.path, 4, skip_rows=7), ignore_index=True)
+        parquet_rows = pd.concat(read_chunks(parquet_path, 4, skip_rows=7), ignore_index=True)
+        pd.testing.assert_frame_equal(parquet_rows, csv_rows, check_dtype=False)
+
+        target = RecordingTarget()
+        first = self.job(target)
+        asyncio.run(first.run(read_chunks(parquet_path, 4), max_chunks=1))
+        rows_done = first.checkpoint["rows_done"]
+        self.assertEqual(rows_done, 4)
+        resumed = self.job(target)
+        checkpoint = asyncio.run(resumed.run(read_chunks(parquet_path, 4, skip_rows=rows_done)))
+        self.assertEqual((checkpoint["rows_done"], checkpoint["imported"], checkpoint["rejected"]), (12, 8, 4))
+        self.assertEqual(len(target.assessments), 8)
+        with open(os.path.join(self.tmp.name, "rejected.csv"), newline="") as f:
+            self.assertEqual([row["row"] for row in csv.DictReader(f)], ["3", "5", "7", "9"])
+        print(f"✅ Resumed the Parquet import after row {rows_done}")
+
+    def test_dogs_scoped_by_source(self):
+        """Test that dataset dog_id values only name the same dog across sources with --merge-dogs"""
+        print("\n🧪 Testing dog IDs across sources...")
+        dog_ids = {}
+        for source, merge_dogs in (("study", False), ("followup", False), ("followup-merged", True),
+                                   ("other-merged", True)):
+            target = RecordingTarget()
+            job = AssessmentImport(target, source, os.path.join(self.tmp.name, f"{source}.json"),
+                                   os.path.join(self.tmp.name, f"{source}.rejected.csv"), user_id=USER_ID,
+                                   merge_dogs=merge_dogs)
+            asyncio.run(job.run(read_chunks(self.path, 100)))
+            dog_ids[source] = set(target.dogs)
+        self.assertEqual(len(dog_ids["study"]), 6)
+        self.assertFalse(dog_ids["study"] & dog_ids["followup"])
+        self.assertEqual(dog_ids["followup-merged"], dog_ids["other-merged"])
+
+        # A checkpoint written without --merge-dogs is not resumed with it
+        merged = AssessmentImport(RecordingTarget(), "study", os.path.join(self.tmp.name, "study.json"),
+                                  os.path.join(self.tmp.name, "study.rejected.csv"), user_id=USER_ID, merge_dogs=True)
+        self.assertEqual(merged.checkpoint["rows_done"], 0)
+        print("✅ Dogs shared between sources only when merging")
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,171 @@
+import unittest
+import asyncio
+import os
+import sys
+import shutil
+import tempfile
+from types import SimpleNamespace
+from unittest.mock import patch
+
+# Add the parent directory to sys.path to find the app and dpq packages
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.services.llm_gateway import LLMGateway, LLMGatewayError
+from dpq.claude_recommender import ClaudeRecommendationGenerator
+from dpq.resilience import CircuitBreaker, Resilience, RetryBudget
+
+
+class FakeMessages:
+    """Stands in for AsyncAnthropic().messages, recording concurrency"""
+
+    def __init__(self, text, delay=0.0, error=None):
+        self.text = text
+        self.delay = delay
+        self.error = error
+        self.requests = []
+        self.active = 0
+        self.max_active = 0
+
+    async def create(self, **request):
+        self.requests.append(request)
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+            if self.error:
+                raise self.error
+            return SimpleNamespace(content=[SimpleNamespace(text=self.text)])
+        finally:
+            self.active -= 1
+
+
+def fake_client(messages):
+    async def close():
+        pass
+    return SimpleNamespace(messages=messages, close=close)
+
+
+RECOMMENDATIONS = '{"training_tips": ["Short sessions"], "exercise_needs": ["Fetch"]}'
+
+
+class TestLLMGateway(unittest.TestCase):
+    """Test cases for the shared async Claude gateway"""
+
+    def test_recommend_concurrency_limit(self):
+        """Test that recommend() parses responses and respects the concurrency limit"""
+        print("\n🧪 Testing gateway concurrency...")
+        messages = FakeMessages(RECOMMENDATIONS, delay=0.02)
+        gateway = LLMGateway(client=fake_client(messages), recommend_concurrency=3)
+
+        async def run():
+            return await asyncio.gather(*(gateway.recommend(f"prompt {i}") for i in range(12)))
+
+        results = asyncio.run(run())
+        self.assertEqual(len(results), 12)
+        self.assertEqual(results[0]["training_tips"], ["Short sessions"])
+        self.assertEqual(results[0]["daily_care"], [])
+        self.assertEqual(messages.max_active, 3)
+        self.assertEqual(messages.requests[0]["messages"][0]["content"], "prompt 0")
+        stats = gateway.get_stats()["operations"]["recommend"]
+        self.assertEqual((stats["calls"], stats["errors"], stats["in_flight"]), (12, 0, 0))
+        print("✅ Concurrency limited to 3 in-flight calls")
+
+    def test_timeouts_and_errors(self):
+        """Test that slow, failing and unparseable calls raise LLMGatewayError"""
+        print("\n🧪 Testing gateway failures...")
+        slow = LLMGateway(client=fake_client(FakeMessages(RECOMMENDATIONS, delay=1.0)), recommend_timeout=0.05)
+        with self.assertRaises(LLMGatewayError):
+            asyncio.run(slow.recommend("prompt"))
+        self.assertEqual(slow.get_stats()["operations"]["recommend"]["timeouts"], 1)
+
+        failing = LLMGateway(client=fake_client(FakeMessages("", error=RuntimeError("overloaded"))))
+        with self.assertRaises(LLMGatewayError):
+            asyncio.run(failing.recommend("prompt"))
+
+        garbled = LLMGateway(client=fake_client(FakeMessages("no json here")))
+        with self.assertRaises(LLMGatewayError):
+            asyncio.run(garbled.recommend("prompt"))
+
+        with patch.dict(os.environ, {"ANTHROPIC_API_KEY": ""}):
+            unconfigured = LLMGateway()
+        self.assertFalse(unconfigured.available)
+        with self.assertRaises(LLMGatewayError):
+            asyncio.run(unconfigured.recommend("prompt"))
+        print("✅ Failures surfaced as LLMGatewayError")
+
+    def test_queueing_does_not_open_circuit(self):
+        """Test that calls timing out in the local queue leave a healthy upstream's breaker closed"""
+        print("\n🧪 Testing queue timeouts...")
+        messages = FakeMessages(RECOMMENDATIONS, delay=0.2)
+        budget = RetryBudget()
+        resilience = {operation: Resilience(operation, CircuitBreaker(operation, failure_threshold=3), budget)
+                      for operation in ("recommend", "analyze_frames")}
+        gateway = LLMGateway(client=fake_client(messages), recommend_concurrency=1, recommend_timeout=0.5,
+                             resilience=resilience)
+
+        async def run():
+            results = await asyncio.gather(*(gateway.recommend(f"prompt {i}") for i in range(10)),
+                                           return_exceptions=True)
+            # A stream that cannot get a slot is not held against Claude either
+            async with gateway._limits["recommend"]:
+                with self.assertRaises(LLMGatewayError):
+                    async for _ in gateway.stream_recommend("prompt", timeout=0.05):
+                        pass
+            return results, await gateway.recommend("after the burst")
+
+        results, after = asyncio.run(run())
+        answered = [result for result in results if not isinstance(result, Exception)]
+        self.assertTrue(0 < len(answered) < 10)
+        stats = gateway.get_stats()["operations"]["recommend"]
+        # A call that got its slot with little time left may still time out against Claude
+        self.assertLessEqual(stats["timeouts"], 1)
+        self.assertEqual(stats["queue_timeouts"] + stats["timeouts"], 10 - len(answered) + 1)
+        self.assertEqual(stats["rejected"], 0)
+        self.assertEqual(stats["circuit"]["state"], CircuitBreaker.CLOSED)
+        self.assertEqual(stats["circuit"]["opened"], 0)
+        self.assertEqual(after["training_tips"], ["Short sessions"])
+        print(f"✅ {10 - len(answered)} queue timeouts left the circuit closed")
+
+    def test_analyze_frames(self):
+        """Test frame analysis through the gateway"""
+        print("\n🧪 Testing gateway frame analysis...")
+        frames_dir = tempfile.mkdtemp(prefix="dpq_frames_")
+        try:
+            for timestamp in ("2.5", "0.0", "10.0"):
+                with open(os.path.join(frames_dir, f"frame_{timestamp}.jpg"), "wb") as f:
+                    f.write(b"\xff\xd8" + timestamp.encode())
+            response = ('```json\n{"translation_results": {}, "video_emotion_classification": '
+                        '{"primary_emotion": "Joy", "secondary_emotion": null}, "frame_data": []}\n```')
+            messages = FakeMessages(response)
+            gateway = LLMGateway(client=fake_client(messages))
+            result = asyncio.run(gateway.analyze_frames(frames_dir))
+            self.assertEqual(result["video_emotion_classification"]["primary_emotion"], "Joy")
+            self.assertEqual(len(messages.requests[0]["messages"][0]["content"]), 3)
+
+            with self.assertRaises(LLMGatewayError):
+                asyncio.run(gateway.analyze_frames(tempfile.mkdtemp(dir=frames_dir)))
+        finally:
+            shutil.rmtree(frames_dir, ignore_errors=True)
+        print("✅ Frames analyzed through the gateway")
+
+    def test_generator_uses_gateway(self):
+        """Test that ClaudeRecommendationGenerator's async path goes through the gateway"""
+        print("\n🧪 Testing generator with gateway...")
+        messages = FakeMessages(RECOMMENDATIONS)
+        generator = ClaudeRecommendationGenerator(api_key="test_key",
+                                                  gateway=LLMGateway(client=fake_client(messages)))
+        data = {'dog_info': {'name': 'Bella', 'breed': 'Border Collie'},
+                'factor_scores': {'Factor 1 - Fearfulness': 3.2}, 'bias_indicators': {}}
+        recommendations = asyncio.run(generator.agenerate_recommendations(data))
+        self.assertEqual(recommendations["exercise_needs"], ["Fetch"])
+        self.assertIn("Bella", messages.requests[0]["messages"][0]["content"])
+        self.assertIsNone(generator._client)
+
+        messages.error = RuntimeError("overloaded")
+        fallback = asyncio.run(generator.agenerate_recommendations(data))
+        self.assertIn('API temporarily unavailable', str(fallback['training_tips']))
+        print("✅ Generator calls Claude through the gateway")
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,249 @@
+import unittest
+import asyncio
+import os
+import sys
+import threading
+import time
+from types import SimpleNamespace
+
+# Add the parent directory to sys.path to find the app and dpq packages
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from dpq.pipeline import Stage, StageGraph
+from dpq.resource_accounting import ResourceLedger, track
+
+
+class TestStageGraph(unittest.TestCase):
+    """Test cases for the stage-graph executor"""
+
+    def test_runs_each_stage_once(self):
+        """Test that a shared dependency runs once and independent stages overlap"""
+        print("\n🧪 Testing stage graph execution...")
+        calls = []
+
+        async def slow(name, value):
+            calls.append(name)
+            await asyncio.sleep(0.05)
+            return value
+
+        graph = StageGraph([
+            Stage("scores", lambda request: calls.append("scores") or request * 2, after=("request",)),
+            Stage("saved", lambda scores: slow("saved", scores + 1), after=("scores",)),
+            Stage("recommendations", lambda scores: slow("recommendations", scores + 2), after=("scores",)),
+            Stage("response", lambda saved, recommendations: (saved, recommendations),
+                  after=("saved", "recommendations")),
+        ], inputs=("request",))
+
+        async def run():
+            with track("test", ledger=ResourceLedger()) as usage:
+                start = time.perf_counter()
+                outputs = await graph.run(request=10)
+                return outputs, time.perf_counter() - start, usage
+
+        outputs, elapsed, usage = asyncio.run(run())
+        self.assertEqual(outputs["response"], (21, 22))
+        self.assertEqual(sorted(calls), ["recommendations", "saved", "scores"])
+        self.assertLess(elapsed, 0.09)
+        self.assertEqual(set(usage.stages), {"scores", "saved", "recommendations", "response"})
+
+        partial = asyncio.run(graph.run(["saved"], request=1))
+        self.assertEqual(set(partial), {"request", "scores", "saved"})
+        print(f"✅ Stages ran once, concurrently ({elapsed:.3f}s)")
+
+    def test_sync_stages_run_in_threads(self):
+        """Test that a blocking sync stage does not hold up the event loop"""
+        print("\n🧪 Testing sync stages in threads...")
+        threads = {}
+
+        def blocking():
+            threads["blocking"] = threading.get_ident()
+            time.sleep(0.05)
+            return "scored"
+
+        async def ticking():
+            threads["ticking"] = threading.get_ident()
+            ticks = 0
+            while ticks < 5:
+                await asyncio.sleep(0.005)
+                ticks += 1
+            return ticks
+
+        graph = StageGraph([Stage("scores", blocking), Stage("ticks", ticking)])
+
+        async def run():
+            start = time.perf_counter()
+            outputs = await graph.run()
+            return outputs, time.perf_counter() - start
+
+        outputs, elapsed = asyncio.run(run())
+        self.assertEqual((outputs["scores"], outputs["ticks"]), ("scored", 5))
+        self.assertNotEqual(threads["blocking"], threads["ticking"])
+        self.assertLess(elapsed, 0.09)
+        print("✅ Sync stage ran beside the event loop")
+
+    def test_failures_and_validation(self):
+        """Test that a failing stage cancels the rest and bad graphs are rejected"""
+        print("\n🧪 Testing stage graph failures...")
+        cancelled = []
+
+        async def hang():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+
+        def fail():
+            raise ValueError("invalid responses")
+
+        graph = StageGraph([Stage("slow", hang), Stage("scores", fail),
+                            Stage("response", lambda scores: scores, after=("scores",))])
+        with self.assertRaises(ValueError):
+            asyncio.run(graph.run())
+        self.assertEqual(cancelled, [True])
+
+        with self.assertRaises(ValueError):
+            StageGraph([Stage("response", lambda scores: scores, after=("scores",))])
+        with self.assertRaises(ValueError):
+            StageGraph([Stage("scores", fail), Stage("scores", fail)])
+        with self.assertRaises(ValueError):
+            asyncio.run(StageGraph(inputs=("request",)).run())
+        print("✅ Failure cancelled the running stages")
+
+    def test_service_manager_calls_claude_once(self):
+        """Test that a complete assessment scores once and makes one Claude call"""
+        print("\n🧪 Testing complete assessment pipeline...")
+        from app.services.service_manager import ServiceManager
+
+        calls = []
+        scores = SimpleNamespace(factor_scores={"Factor 1 - Fearfulness": 3.0}, facet_scores={},
+                                 personality_profile={}, bias_indicators={"fearfulness_bias": 0.4})
+
+        class FakeDPQService:
+            async def score_assessment(self, assessment_data):
+                calls.append("score")
+                return scores
+
+            async def format_results(self, results, dog_info):
+                calls.append("format")
+                return {"personality_factors": results.factor_scores, "dog_info": dog_info}
+
+        class FakeClaudeService:
+            async def generate_recommendations(self, personality_data):
+                calls.append("claude")
+                await asyncio.sleep(0.01)
+                return {"training_tips": ["Short sessions"], "dog": personality_data["dog_info"]["name"]}
+
+        manager = ServiceManager.__new__(ServiceManager)
+        manager.services = {"dpq": FakeDPQService(), "claude": FakeClaudeService()}
+        manager.initialized = True
+        manager.assessment_pipeline = manager._assessment_pipeline()
+
+        results = asyncio.run(manager.process_complete_assessment({"dog_info": {"name": "Rex"}, "responses": {}}))
+        self.assertEqual(sorted(calls), ["claude", "format", "score"])
+        self.assertEqual(results["ai_recommendations"]["dog"], "Rex")
+        self.assertEqual(results["dpq_results"]["personality_factors"], scores.factor_scores)
+        print("✅ One score and one Claude call per assessment")
+
+
+
+class RecordingIndex:
+    """Stands in for the norms, reliability, trend and similarity indexes, recording calls and their threads"""
+
+    def __init__(self):
+        self.calls = []
+
+    def __getattr__(self, name):
+        def call(*args, **kwargs):
+            self.calls.append((name, threading.get_ident()))
+            return {"dog_id": "d-1"} if name == "update" else False
+        return call
+
+
+class TestAssessmentPipeline(unittest.TestCase):
+    """Test cases for the index stages of DPQAPIHandler's pipeline"""
+
+    def setUp(self):
+        from dpq.api_handler import DPQAPIHandler
+        self.index = RecordingIndex()
+        self.handler = DPQAPIHandler.__new__(DPQAPIHandler)
+        self.handler.population_norms = self.handler.reliability = self.handler.trends = self.index
+        self.handler.similarity = {"facets": self.index, "biases": self.index}
+        self.handler.norms_path = self.handler.reliability_path = self.handler.trends_path = "unused"
+        self.handler.similarity_dir = "unused"
+        self.handler._index_save = None
+        self.handler._upgrades = set()
+        self.dpq_results = {"factor_scores": {}, "facet_scores": {}, "bias_indicators": {}}
+
+    def test_indexes_saved_in_background(self):
+        """Test that index rebuilds and saves run in one background thread, not in the request"""
+        print("\n🧪 Testing background index saves...")
+
+        async def run():
+            trend = self.handler._update_indexes(True, self.dpq_results, {"breed": "Beagle"}, {}, {"1": 4},
+                                                 {"dog_id": "d-1"})
+            in_request = list(self.index.calls)
+            self.handler._schedule_index_save()
+            self.handler._schedule_index_save()
+            await self.handler._index_save
+            return trend, in_request
+
+        trend, in_request = asyncio.run(run())
+        loop_thread = threading.get_ident()
+        self.assertEqual(trend, {"dog_id": "d-1"})
+        self.assertEqual({name for name, _ in in_request}, {"update", "add"})
+        background = self.index.calls[len(in_request):]
+        self.assertEqual(sorted(name for name, _ in background), ["maybe_rebuild"] * 2 + ["maybe_save"] * 5)
+        self.assertTrue(all(thread != loop_thread for _, thread in background))
+        print("✅ Rebuilds and saves ran once, off the event loop")
+
+    def test_close_finishes_background_work(self):
+        """Test that closing the handler waits for upgrades and the index save, cancelling slow upgrades"""
+        print("\n🧪 Testing handler shutdown...")
+        upgraded = []
+
+        async def upgrade(assessment_id, personality_data):
+            await asyncio.sleep(0.01 if assessment_id == "a-1" else 10)
+            upgraded.append(assessment_id)
+
+        self.handler.upgrade_recommendations = upgrade
+
+        async def run():
+            self.handler._schedule_upgrade("a-1", "u-1", {})
+            self.handler._schedule_upgrade("a-2", "u-1", {})
+            self.handler._schedule_index_save()
+            await self.handler.close(timeout=0.2)
+
+        asyncio.run(run())
+        self.assertEqual(upgraded, ["a-1"])
+        self.assertEqual(self.handler._upgrades, set())
+        self.assertIsNone(self.handler._index_save)
+        # The scheduled save and the final one
+        self.assertEqual([name for name, _ in self.index.calls].count("maybe_save"), 10)
+        print("✅ Finished upgrade saved, slow one cancelled, indexes saved")
+
+    def test_index_failure_is_not_fatal(self):
+        """Test that a failing index update leaves the assessment without a trend instead of failing it"""
+        print("\n🧪 Testing index update failures...")
+
+        def add(dog_id, values):
+            raise ValueError("vector has 14 dimensions, expected 15")
+
+        self.index.add = add
+        trend = self.handler._update_indexes(True, self.dpq_results, {}, {}, {"1": 4}, {"dog_id": "d-1"})
+        self.assertIsNone(trend)
+        print("✅ Failed index update gave no trend")
+
+    def test_unsaved_assessment_not_in_norms(self):
+        """Test that an assessment that was not saved is left out of the population norms and indexes"""
+        print("\n🧪 Testing norms for unsaved assessments...")
+        self.assertFalse(self.handler._update_norms(False, self.dpq_results, {}))
+        self.assertIsNone(self.handler._update_indexes(False, self.dpq_results, {}, {}, {"1": 4}, {"dog_id": "d-1"}))
+        self.assertEqual(self.index.calls, [])
+        self.assertTrue(self.handler._update_norms(True, self.dpq_results, {}))
+        self.assertEqual([name for name, _ in self.index.calls], ["update"])
+        print("✅ Only saved assessments counted")
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,137 @@
+import unittest
+import os
+import sys
+import shutil
+import tempfile
+import numpy as np
+
+# Add the parent directory to sys.path to find the dpq package
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from dpq.dpq import DogPersonalityQuestionnaire
+from dpq.population_norms import PopulationNorms, normalize_breed
+from dpq.response_formatter import DPQResponseFormatter
+
+
+class TestPopulationNorms(unittest.TestCase):
+    """Test cases for streaming population percentiles"""
+
+    def setUp(self):
+        self.dpq = DogPersonalityQuestionnaire()
+        rng = np.random.default_rng(11)
+        self.matrix = rng.integers(1, 8, size=(400, 45), dtype=np.uint8)
+        self.facets, self.factors, _ = self.dpq.score_many(self.matrix)
+        self.breeds = ["Border Collie" if i % 2 else "beagle" for i in range(400)]
+        self.directory = tempfile.mkdtemp(prefix="dpq_norms_")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_percentiles_are_exact(self):
+        """Test that percentiles equal the mid-rank over the raw scores"""
+        print("\n🧪 Testing exact percentile ranks...")
+        norms = PopulationNorms()
+        norms.update_many(self.factors, self.facets, self.breeds)
+        for column, name in enumerate(self.dpq.factor_names):
+            values = self.factors[:, column]
+            score = values[0]
+            expected = (np.sum(values < score - 1e-9) + 0.5 * np.sum(np.abs(values - score) < 1e-9)) / len(values) * 100
+            self.assertAlmostEqual(norms.percentile(name, score), expected)
+        print("✅ Histogram percentiles match mid-rank over raw scores")
+
+    def test_single_updates_match_batch(self):
+        """Test that per-assessment updates and batch updates agree"""
+        print("\n🧪 Testing streaming vs batch updates...")
+        streaming = PopulationNorms()
+        for row in range(50):
+            streaming.update(dict(zip(self.dpq.factor_names, self.factors[row])),
+                             dict(zip(self.dpq.facet_names, self.facets[row])),
+                             self.breeds[row])
+        batch = PopulationNorms()
+        batch.update_many(self.factors[:50], self.facets[:50], self.breeds[:50])
+        self.assertEqual(streaming.count(), batch.count())
+        self.assertEqual(streaming.count("border collie"), 25)
+        name = self.dpq.facet_names[3]
+        self.assertEqual(streaming.percentile(name, 4.0), batch.percentile(name, 4.0))
+        print("✅ Streaming and batch updates agree")
+
+    def test_merge_and_persist(self):
+        """Test merging worker sketches and round-tripping to disk"""
+        print("\n🧪 Testing merge and persistence...")
+        first, second, combined = PopulationNorms(), PopulationNorms(), PopulationNorms()
+        first.update_many(self.factors[:200], self.facets[:200], self.breeds[:200])
+        second.update_many(self.factors[200:], self.facets[200:], self.breeds[200:])
+        combined.update_many(self.factors, self.facets, self.breeds)
+        first.merge(second)
+
+        path = os.path.join(self.directory, "norms.npz")
+        first.save(path)
+        loaded = PopulationNorms.load(path)
+        name = self.dpq.factor_names[2]
+        self.assertEqual(loaded.count(), 400)
+        self.assertEqual(loaded.breeds(), ["beagle", "border collie"])
+        self.assertEqual(loaded.percentile(name, 4.5, "Beagle"), combined.percentile(name, 4.5, "beagle"))
+        print("✅ Merged norms persist and reload")
+
+    def test_workers_share_a_file(self):
+        """Test that workers saving to one file add up instead of overwriting each other"""
+        print("\n🧪 Testing norms shared by workers...")
+        path = os.path.join(self.directory, "norms.npz")
+        first, second = PopulationNorms.load_or_create(path), PopulationNorms.load_or_create(path)
+        first.update_many(self.factors[:100], self.facets[:100], self.breeds[:100])
+        second.update_many(self.factors[100:250], self.facets[100:250], self.breeds[100:250])
+        first.save(path)
+        second.save(path)
+        first.update_many(self.factors[250:], self.facets[250:], self.breeds[250:])
+        first.save(path)
+
+        combined = PopulationNorms()
+        combined.update_many(self.factors, self.facets, self.breeds)
+        loaded = PopulationNorms.load(path)
+        name = self.dpq.facet_names[5]
+        self.assertEqual(loaded.count(), 400)
+        self.assertEqual(first.count(), 400)
+        self.assertEqual(loaded.percentile(name, 3.5, "beagle"), combined.percentile(name, 3.5, "beagle"))
+        print("✅ Each worker's counts saved once")
+
+    def test_unreadable_file_is_kept(self):
+        """Test that a save moves an unreadable shared file aside instead of overwriting it"""
+        print("\n🧪 Testing save over an unreadable norms file...")
+        path = os.path.join(self.directory, "norms.npz")
+        with open(path, "wb") as f:
+            f.write(b"truncated")
+        norms = PopulationNorms()
+        norms.update_many(self.factors[:10], self.facets[:10], self.breeds[:10])
+        norms.save(path)
+        with open(path + ".corrupt", "rb") as f:
+            self.assertEqual(f.read(), b"truncated")
+        self.assertEqual(PopulationNorms.load(path).count(), 10)
+        print("✅ Unreadable norms moved to .corrupt")
+
+    def test_breed_minimum_samples(self):
+        """Test that sparse breeds report no breed percentile"""
+        print("\n🧪 Testing sparse breed handling...")
+        norms = PopulationNorms(min_breed_samples=30)
+        norms.update_many(self.factors[:10], self.facets[:10], ["Vizsla"] * 10)
+        self.assertIsNone(norms.percentile(self.dpq.factor_names[0], 4.0, "Vizsla"))
+        self.assertIsNotNone(norms.percentile(self.dpq.factor_names[0], 4.0))
+        self.assertIsNone(normalize_breed("Unknown breed"))
+        print("✅ Sparse and unknown breeds fall back to population only")
+
+    def test_formatter_adds_percentiles(self):
+        """Test that the formatter attaches percentile ranks"""
+        print("\n🧪 Testing formatter percentile output...")
+        norms = PopulationNorms()
+        norms.update_many(self.factors, self.facets, self.breeds)
+        formatter = DPQResponseFormatter(population_norms=norms)
+        results = self.dpq.score_assessment({i: 4 for i in range(1, 46)}, "NormDog")
+        factors = formatter._format_personality_factors(results.factor_scores)
+        percentiles = norms.percentiles(results.factor_scores, results.facet_scores, "beagle")
+        self.assertEqual(len(percentiles), 20)
+        self.assertIn("breed_percentile", percentiles[self.dpq.factor_names[0]])
+        self.assertEqual(len(factors), 5)
+        print("✅ Percentiles available for every factor and facet")
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,239 @@
+import unittest
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+import time
+from datetime import date, datetime
+from unittest import mock
+
+# Add the parent directory to sys.path to find the dpq package
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from dpq.profile_cache import DogProfileCache, dog_profile
+
+TRANSLATOR_CONFIG = {"communication_style": "gentle", "tone_adjustments": {"base_energy_level": "calm"}}
+
+
+def profile(dog_id, padding=""):
+    return dog_profile({"dog_id": dog_id, "user_id": "u-1", "name": "Rex" + padding, "breed": "Beagle"}, {
+        "assessment_id": f"a-{dog_id}", "completed_at": datetime(2026, 3, 1, 12, 0),
+        "personality_factors": {}, "ai_bias_indicators": {}, "personality_summary": {},
+        "ai_translator_config": TRANSLATOR_CONFIG, "quality_metrics": {}, "assessment_version": "v1",
+    })
+
+
+class CountingLoader:
+    """Database stand-in: known dogs load after a delay, others are unknown"""
+
+    def __init__(self, known=(), delay=0.0):
+        self.known = set(known)
+        self.delay = delay
+        self.calls = []
+
+    async def __call__(self, dog_id):
+        self.calls.append(dog_id)
+        await asyncio.sleep(self.delay)
+        return profile(dog_id) if dog_id in self.known else None
+
+
+class TestDogProfileCache(unittest.TestCase):
+    """Test cases for the read-through dog profile cache"""
+
+    def test_read_through_and_negative_caching(self):
+        """Test that profiles and unknown dogs are loaded once and served from memory"""
+        print("\n🧪 Testing read-through profile cache...")
+        now = [0.0]
+        cache = DogProfileCache(ttl_seconds=300, negative_ttl_seconds=30, clock=lambda: now[0])
+        loader = CountingLoader(known={"d-1"})
+
+        async def run():
+            first = await cache.get("d-1", loader)
+            self.assertIs(await cache.get("d-1", loader), first)
+            self.assertIsNone(await cache.get("unknown", loader))
+            self.assertIsNone(await cache.get("unknown", loader))
+            return first
+
+        first = asyncio.run(run())
+        self.assertEqual(first["current_assessment"]["ai_translator_config"], TRANSLATOR_CONFIG)
+        self.assertEqual(first["current_assessment"]["completed_at"], "2026-03-01T12:00:00")
+        self.assertEqual(loader.calls, ["d-1", "unknown"])
+
+        start = time.perf_counter()
+        for _ in range(10000):
+            cache.lookup("d-1")
+        per_lookup = (time.perf_counter() - start) / 10000
+        self.assertLess(per_lookup, 50e-6)
+
+        # The unknown-dog entry expires sooner; a new assessment replaces it at once
+        now[0] = 31.0
+        asyncio.run(cache.get("unknown", loader))
+        self.assertEqual(loader.calls, ["d-1", "unknown", "unknown"])
+        cache.put("unknown", profile("unknown"))
+        self.assertEqual(cache.lookup("unknown")[1]["dog_id"], "unknown")
+
+        stats = cache.stats()
+        self.assertEqual((stats["negative_hits"], stats["loads"]), (1, 3))
+        print(f"✅ Cached lookup in {per_lookup * 1e6:.2f} µs, unknown dogs cached negatively")
+
+    def test_invalidation_during_load(self):
+        """Test that concurrent misses share a load and a load overtaken by a write is not cached"""
+        print("\n🧪 Testing invalidation of in-flight loads...")
+        cache = DogProfileCache()
+        loader = CountingLoader(known={"d-1"}, delay=0.05)
+
+        async def run():
+            readers = [asyncio.create_task(cache.get("d-1", loader)) for _ in range(5)]
+            await asyncio.sleep(0.01)
+            cache.invalidate("d-1")
+            results = await asyncio.gather(*readers)
+            return results
+
+        results = asyncio.run(run())
+        self.assertEqual(len(loader.calls), 1)
+        self.assertTrue(all(result is results[0] for result in results))
+        self.assertEqual(cache.lookup("d-1"), (False, None))
+        self.assertEqual(cache.stats()["coalesced_loads"], 4)
+        print("✅ Five readers shared one load, which the write kept out of the cache")
+
+    def test_miss_after_invalidation_starts_new_load(self):
+        """Test that a miss after a write does not join the load the write overtook"""
+        print("\n🧪 Testing loads started after an invalidation...")
+        cache = DogProfileCache()
+        loader = CountingLoader(known={"d-1"}, delay=0.05)
+
+        async def run():
+            stale = asyncio.create_task(cache.get("d-1", loader))
+            await asyncio.sleep(0.01)
+            cache.invalidate("d-1")
+            fresh = asyncio.create_task(cache.get("d-1", loader))
+            await asyncio.gather(stale, fresh)
+
+        asyncio.run(run())
+        self.assertEqual(loader.calls, ["d-1", "d-1"])
+        self.assertEqual(cache.lookup("d-1")[1]["dog_id"], "d-1")
+        self.assertEqual((cache._loading, cache._generations), ({}, {}))
+        print("✅ Load after the write kept, the overtaken one dropped")
+
+    def test_size_bounds(self):
+        """Test that the LRU evicts past the entry count and byte bounds"""
+        print("\n🧪 Testing profile cache bounds...")
+        cache = DogProfileCache(max_entries=3)
+        for n in range(5):
+            cache.put(f"d-{n}", profile(f"d-{n}"))
+        cache.lookup("d-2")
+        cache.put("d-5", profile("d-5"))
+        self.assertEqual(list(cache._entries), ["d-4", "d-2", "d-5"])
+
+        size = cache.stats()["bytes"] // 3
+        cache = DogProfileCache(max_bytes=4 * size)
+        cache.put("big", profile("big", padding="x" * 3 * size))
+        for n in range(3):
+            cache.put(f"d-{n}", profile(f"d-{n}"))
+        self.assertEqual(cache.lookup("big"), (False, None))
+        self.assertLessEqual(cache.stats()["bytes"], 4 * size)
+        self.assertEqual(cache.stats()["evictions"], 1)
+        print("✅ Least recently used profiles evicted")
+
+
+class TestDogProfileEndpoints(unittest.TestCase):
+    """Test cases for DPQAPIHandler.get_dog_profile and get_ai_translator_config"""
+
+    def setUp(self):
+        from dpq import api_handler
+        self.api_handler = api_handler
+        self.handler = api_handler.DPQAPIHandler.__new__(api_handler.DPQAPIHandler)
+        self.cache = DogProfileCache()
+        patcher = mock.patch("dpq.api_handler.get_dog_profile_cache", return_value=self.cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_database_row_to_translator_config(self):
+        """Test that a dog is read in one query and its translator config served from the cache"""
+        print("\n🧪 Testing translator config lookup...")
+        queries = []
+        row = {
+            "dog_id": "d-1", "user_id": "u-1", "name": "Rex", "breed": "Beagle", "birthday": date(2020, 5, 1),
+            "current_dpq_assessment_id": "a-1", "completed_at": None, "personality_factors": {},
+            "ai_bias_indicators": {}, "personality_summary": {}, "ai_translator_config": TRANSLATOR_CONFIG,
+            "reliability_score": 0.91, "response_consistency": "high", "extreme_response_bias": False,
+            "assessment_version": "DPQ_Short_Form_v1.0",
+        }
+
+        class Connection:
+            async def fetchrow(self, query, dog_id):
+                queries.append(query)
+                return row if dog_id == "d-1" else None
+
+        class Pool:
+            def acquire(self):
+                return mock.AsyncMock(__aenter__=mock.AsyncMock(return_value=Connection()))
+
+        async def run():
+            with mock.patch("dpq.api_handler.get_db_pool", return_value=Pool()):
+                return (await self.handler.get_ai_translator_config("d-1"),
+                        await self.handler.get_dog_profile("d-1"),
+                        await self.handler.get_ai_translator_config("d-404"))
+
+        config, dog, missing = asyncio.run(run())
+        self.assertEqual(config, {"status": "success", "dog_id": "d-1", "assessment_id": "a-1",
+                                  "ai_translator_config": TRANSLATOR_CONFIG})
+        self.assertEqual(dog["birthday"], "2020-05-01")
+        self.assertEqual(dog["current_assessment"]["quality_metrics"]["reliability_score"], 0.91)
+        self.assertEqual(missing["status"], "error")
+        self.assertEqual(len(queries), 2)
+        print("✅ Translator config read once and served from memory")
+
+    def test_write_path_refreshes_profile(self):
+        """Test that a buffered assessment becomes the cached profile until its flush invalidates it"""
+        print("\n🧪 Testing profile refresh on the write path...")
+        from dpq.write_behind import WriteBehindBuffer
+
+        directory = tempfile.mkdtemp(prefix="dpq_profile_cache_")
+        self.addCleanup(shutil.rmtree, directory, True)
+        self.cache.put("d-1", profile("d-1"))
+        assessment = {
+            "assessment_id": "a-2", "dog_id": "d-1", "user_id": "u-1", "dog_info": {"name": "Rex"},
+            "completed_at": "2026-04-01T09:00:00", "personality_factors": {}, "ai_bias_indicators": {},
+            "personality_summary": {}, "ai_translator_config": {"communication_style": "playful"},
+            "quality_metrics": {"reliability_score": 0.8},
+            "metadata": {"assessment_version": "v1", "scoring_algorithm": "Jones_2009_validated"},
+        }
+
+        async def run():
+            buffer = WriteBehindBuffer(os.path.join(directory, "buffer.sqlite3"), mock.AsyncMock())
+            with mock.patch("dpq.api_handler.get_write_buffer", return_value=buffer):
+                self.assertTrue(await self.handler.persist_assessment(assessment))
+                config = await self.handler.get_ai_translator_config("d-1")
+            await buffer.close()
+            return config
+
+        config = asyncio.run(run())
+        self.assertEqual((config["assessment_id"], config["ai_translator_config"]),
+                         ("a-2", {"communication_style": "playful"}))
+
+        class Connection:
+            async def executemany(self, query, args):
+                pass
+
+        class Pool:
+            def acquire(self):
+                return mock.AsyncMock(__aenter__=mock.AsyncMock(return_value=Connection()))
+
+        with mock.patch("dpq.api_handler.get_db_pool", return_value=Pool()):
+            asyncio.run(self.api_handler.save_assessments([{**assessment, "dog_info": {"name": "Rex"},
+                                                             "responses": {}, "recommendations": {}}]))
+        self.assertEqual(self.cache.lookup("d-1"), (False, None))
+
+        # Flushing an older assessment keeps a newer buffered one cached
+        self.cache.put("d-1", profile("d-1"))
+        with mock.patch("dpq.api_handler.get_db_pool", return_value=Pool()):
+            asyncio.run(self.api_handler.save_assessments([{**assessment, "dog_info": {"name": "Rex"},
+                                                             "responses": {}, "recommendations": {}}]))
+        self.assertEqual(self.cache.lookup("d-1")[1]["current_assessment"]["assessment_id"], "a-d-1")
+        print("✅ New translator config served before the flush, reloaded after it")
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
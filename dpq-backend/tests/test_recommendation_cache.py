@@ -0,0 +1,147 @@
+import unittest
+import asyncio
+import os
+import sys
+import shutil
+import tempfile
+import threading
+import time
+from unittest.mock import patch, MagicMock
+
+# Add the parent directory to sys.path to find the dpq package
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from dpq.claude_recommender import recommendation_profile, replace_hardcoded_recommendations
+from dpq.recommendation_cache import RecommendationCache
+
+
+def mock_claude(mock_anthropic, text):
+    """Point anthropic.Anthropic at a client whose messages.create returns text"""
+    client = MagicMock()
+    message = MagicMock()
+    message.content = [MagicMock()]
+    message.content[0].text = text
+    client.messages.create.return_value = message
+    mock_anthropic.return_value = client
+    return client
+
+
+class TestRecommendationCache(unittest.TestCase):
+    """Test cases for the two-tier recommendation cache"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(prefix="dpq_recommendations_")
+        self.path = os.path.join(self.directory, "recommendations.sqlite3")
+        self.results = {
+            'factor_scores': {'Factor 1 - Fearfulness': 3.2, 'Factor 3 - Activity/Excitability': 6.4},
+            'bias_indicators': {'fearfulness_bias': 0.31, 'excitability_bias': 0.85},
+        }
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_profile_normalization(self):
+        """Test that dogs with the same breed, levels and bands share a key"""
+        print("\n🧪 Testing profile normalization...")
+        cache = RecommendationCache()
+        bella = recommendation_profile({'dog_info': {'name': 'Bella', 'breed': 'Border Collie'}, **self.results})
+        similar = recommendation_profile({
+            'dog_info': {'name': 'Rex', 'breed': '  border   COLLIE '},
+            'factor_scores': {'Factor 1 - Fearfulness': 2.9, 'Factor 3 - Activity/Excitability': 5.6},
+            'bias_indicators': {'fearfulness_bias': 0.05, 'excitability_bias': 0.99, 'prey_drive': 0.1},
+        })
+        different = recommendation_profile({'dog_info': {'breed': 'Border Collie'},
+                                            **dict(self.results, bias_indicators={'fearfulness_bias': 0.5})})
+        self.assertEqual(bella, similar)
+        self.assertEqual(cache.key(bella), cache.key(similar))
+        self.assertNotEqual(cache.key(bella), cache.key(different))
+        self.assertNotEqual(cache.key(bella), RecommendationCache(prompt_version=2).key(bella))
+        print("✅ Profiles normalized correctly")
+
+    def test_tiers_ttl_and_versions(self):
+        """Test LRU eviction, persistence, expiry and prompt-version invalidation"""
+        print("\n🧪 Testing cache tiers...")
+        cache = RecommendationCache(self.path, max_entries=2)
+        for i in range(3):
+            cache.put(f"key{i}", {"training_tips": [f"tip {i}"]})
+        self.assertEqual(cache.stats()["memory_entries"], 2)
+        self.assertEqual(cache.get("key0"), {"training_tips": ["tip 0"]})
+        self.assertIsNone(cache.get("missing"))
+        stats = cache.stats()
+        self.assertEqual((stats["persistent_hits"], stats["misses"], stats["persistent_entries"]), (1, 1, 3))
+        cache.close()
+
+        # A new process sees the persistent tier; another prompt version does not
+        reopened = RecommendationCache(self.path, max_entries=2)
+        self.assertEqual(reopened.get("key2"), {"training_tips": ["tip 2"]})
+        self.assertEqual(reopened.get("key2"), {"training_tips": ["tip 2"]})
+        self.assertEqual(reopened.stats()["memory_hits"], 1)
+        reopened.close()
+        upgraded = RecommendationCache(self.path, prompt_version=2)
+        self.assertIsNone(upgraded.get("key2"))
+        self.assertEqual(upgraded.stats()["persistent_entries"], 0)
+
+        expiring = RecommendationCache(self.path, ttl_seconds=60)
+        expiring.put("key", {"training_tips": []})
+        with patch("dpq.recommendation_cache.time.time", return_value=time.time() + 120):
+            self.assertIsNone(expiring.get("key"))
+        print("✅ Cache tiers behave correctly")
+
+    def test_async_access_leaves_loop_for_sqlite_only(self):
+        """Test that aget/aput serve memory hits on the loop and touch SQLite in a thread"""
+        print("\n🧪 Testing async cache access...")
+        cache = RecommendationCache(self.path, max_entries=1)
+        threads = []
+        persistent_get, persistent_put = cache._persistent_get, cache._persistent_put
+
+        def recording(method):
+            def call(*args):
+                threads.append((method.__name__, threading.get_ident()))
+                return method(*args)
+            return call
+
+        cache._persistent_get, cache._persistent_put = recording(persistent_get), recording(persistent_put)
+
+        async def run():
+            await cache.aput("key0", {"training_tips": ["tip 0"]})
+            await cache.aput("key1", {"training_tips": ["tip 1"]})
+            return await cache.aget("key1"), await cache.aget("key0"), await cache.aget("missing")
+
+        self.assertEqual(asyncio.run(run()), ({"training_tips": ["tip 1"]}, {"training_tips": ["tip 0"]}, None))
+        loop_thread = threading.get_ident()
+        self.assertEqual([name for name, _ in threads],
+                         ["_persistent_put", "_persistent_put", "_persistent_get", "_persistent_get"])
+        self.assertTrue(all(thread != loop_thread for _, thread in threads))
+        stats = cache.stats()
+        self.assertEqual((stats["memory_hits"], stats["persistent_hits"], stats["misses"]), (1, 1, 1))
+        cache.close()
+        print("✅ SQLite reads and writes ran off the event loop")
+
+    @patch('anthropic.Anthropic')
+    def test_replace_hardcoded_recommendations_cached(self, mock_anthropic):
+        """Test that only the first dog with a profile calls Claude, and failures are not cached"""
+        print("\n🧪 Testing cached recommendations...")
+        cache = RecommendationCache(self.path)
+        client = mock_claude(mock_anthropic, '{"training_tips": ["Cached tip"], "exercise_needs": ["Run"]}')
+
+        first = replace_hardcoded_recommendations(self.results, {'name': 'Bella', 'breed': 'Border Collie'},
+                                                  api_key="test_key", cache=cache)
+        second = replace_hardcoded_recommendations(self.results, {'name': 'Rex', 'breed': 'border collie'},
+                                                   api_key="test_key", cache=cache)
+        self.assertEqual(first, second)
+        self.assertEqual(first['training_tips'], ["Cached tip"])
+        self.assertEqual(client.messages.create.call_count, 1)
+        prompt = client.messages.create.call_args[1]['messages'][0]['content']
+        self.assertNotIn('Bella', prompt)
+        self.assertIn('Factor 3 - Activity/Excitability: High', prompt)
+
+        client.messages.create.side_effect = Exception("API rate limit exceeded")
+        fallback = replace_hardcoded_recommendations(self.results, {'breed': 'Beagle'},
+                                                     api_key="test_key", cache=cache)
+        self.assertIn('API temporarily unavailable', str(fallback['training_tips']))
+        self.assertEqual(cache.stats()["writes"], 1)
+        print("✅ Recommendations cached per profile")
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
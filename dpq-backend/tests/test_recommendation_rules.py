@@ -0,0 +1,130 @@
+import unittest
+import asyncio
+import os
+import sys
+import random
+from unittest.mock import patch
+
+# Add the parent directory to sys.path to find the dpq package
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from dpq.dpq import BIAS_INDICATOR_NAMES, DogPersonalityQuestionnaire
+from dpq.recommendation_cache import RecommendationCache
+from dpq.recommendation_rules import (
+    BASELINE_VERSION, RULES, UPGRADED_VERSION, RecommendationRules
+)
+from dpq.recommendation_stream import RECOMMENDATION_CATEGORIES
+from dpq.response_formatter import DPQResponseFormatter
+
+
+def naive_tips(rules, values):
+    """Rule-by-rule evaluation the compiled tables must agree with"""
+    tips = {category: [] for category in RECOMMENDATION_CATEGORIES}
+    for name, low, high, category, tip in rules:
+        value = values.get(name)
+        if value is None or (low is not None and value < low) or (high is not None and value >= high):
+            continue
+        if tip not in tips[category]:
+            tips[category].append(tip)
+    return tips
+
+
+class FakeRecommender:
+    """Stands in for ClaudeRecommendationGenerator, counting profile calls"""
+
+    def __init__(self, error=None):
+        self.error = error
+        self.calls = 0
+
+    async def agenerate_profile_recommendations(self, profile):
+        self.calls += 1
+        if self.error:
+            raise self.error
+        return {"training_tips": ["From Claude"], "exercise_needs": ["Fetch"], "ai_communication": ["Calm tone"]}
+
+
+class TestRecommendationRules(unittest.TestCase):
+    """Test cases for the compiled rule-based recommendation tier"""
+
+    def test_compiled_matches_rules(self):
+        """Test that band lookups give the same tips as evaluating every rule"""
+        print("\n🧪 Testing compiled rule tables...")
+        rules = RecommendationRules(general_tips={}, min_tips=0, max_tips=100)
+        generator = random.Random(7)
+        thresholds = sorted({bound for rule in RULES for bound in rule[1:3] if bound is not None})
+        for _ in range(500):
+            bias = {name: generator.choice(thresholds + [generator.random()]) for name in BIAS_INDICATOR_NAMES}
+            factors = {rule[0]: generator.uniform(1, 7) for rule in RULES if rule[0].startswith("Factor")}
+            expected = naive_tips(RULES, {**factors, **bias})
+            self.assertEqual({k: sorted(v) for k, v in rules.recommend(factors, bias).items()},
+                             {k: sorted(v) for k, v in expected.items()})
+        print("✅ Compiled tables agree with the rules, including at thresholds")
+
+    def test_filling_and_limits(self):
+        """Test that sparse categories are filled and long ones truncated"""
+        print("\n🧪 Testing tip limits...")
+        rules = RecommendationRules(max_tips=3)
+        recommendations = rules.recommend({}, {})
+        for category in RECOMMENDATION_CATEGORIES:
+            self.assertGreaterEqual(len(recommendations[category]), 2)
+        anxious = rules.recommend({}, {"fearfulness_bias": 0.9, "trainability_bias": 0.2, "activity_level": 0.2})
+        self.assertIn("Use calm, reassuring tones and avoid sudden or loud vocalizations",
+                      anxious["ai_communication"])
+        self.assertEqual(len(anxious["ai_communication"]), 3)
+        with self.assertRaises(ValueError):
+            RecommendationRules([("fearfulness_bias", 0.5, None, "grooming", "Brush daily")])
+        print("✅ Categories filled to 2 and capped at 3 tips")
+
+    def test_formatter_baseline(self):
+        """Test that the formatter returns versioned baseline recommendations without calling Claude"""
+        print("\n🧪 Testing formatter baseline...")
+        results = DogPersonalityQuestionnaire().score_assessment({i: 6 for i in range(1, 46)})
+        formatter = DPQResponseFormatter(recommendation_rules=RecommendationRules())
+        with patch("dpq.response_formatter.replace_hardcoded_recommendations") as claude:
+            recommendations = formatter._generate_recommendations(
+                formatter._format_personality_factors(results.factor_scores),
+                formatter._format_ai_bias_indicators(results.bias_indicators),
+                {"name": "Rex"}
+            )
+        claude.assert_not_called()
+        self.assertEqual(recommendations["version"], BASELINE_VERSION)
+        self.assertEqual(recommendations["source"], "rules")
+        self.assertEqual(set(recommendations) - {"version", "source"},
+                         {"training_tips", "exercise_needs", "ai_translator_tips"})
+        print("✅ Baseline recommendations returned inline")
+
+    def test_upgrade(self):
+        """Test that the background upgrade saves a higher version and keeps the baseline on failure"""
+        print("\n🧪 Testing recommendation upgrade...")
+        from dpq.api_handler import DPQAPIHandler
+
+        saved = []
+
+        async def save(assessment_id, recommendations):
+            saved.append((assessment_id, recommendations))
+            return True
+
+        data = {"dog_info": {"breed": "Beagle"}, "factor_scores": {"Factor 1 - Fearfulness": 3.0},
+                "bias_indicators": {"fearfulness_bias": 0.4}}
+        recommender = FakeRecommender()
+        handler = DPQAPIHandler.__new__(DPQAPIHandler)
+        handler.recommender = recommender
+        handler.save_recommendations_to_db = save
+        with patch("dpq.claude_recommender.get_recommendation_cache", return_value=RecommendationCache()):
+            self.assertTrue(asyncio.run(handler.upgrade_recommendations("a1", data)))
+            self.assertEqual(saved[0][1]["version"], UPGRADED_VERSION)
+            self.assertEqual(saved[0][1]["training_tips"], ["From Claude"])
+            self.assertEqual(saved[0][1]["ai_translator_tips"], ["Calm tone"])
+
+            asyncio.run(handler.upgrade_recommendations("a2", data))
+            self.assertEqual(recommender.calls, 1)
+
+            handler.recommender = FakeRecommender(error=RuntimeError("overloaded"))
+            data["dog_info"]["breed"] = "Poodle"
+            self.assertFalse(asyncio.run(handler.upgrade_recommendations("a3", data)))
+            self.assertEqual(len(saved), 2)
+        print("✅ Upgrade saved once per profile and skipped on failure")
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,175 @@
+import unittest
+import asyncio
+import os
+import sys
+import shutil
+import tempfile
+from types import SimpleNamespace
+
+# Add the parent directory to sys.path to find the app and dpq packages
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from dpq.recommendation_stream import RecommendationStreamParser, recommendation_events
+
+RECOMMENDATIONS = ('Here are the recommendations:\n{"training_tips": ["Use \\"sit\\" cues", "Short sessions"], '
+                   '"notes": {"level": [1, 2]}, "score": 3, "exercise_needs": ["Fetch", 5, "Long walks"]}')
+
+
+def feed_in_chunks(parser, text, size):
+    events = []
+    for i in range(0, len(text), size):
+        events.extend(parser.feed(text[i:i + size]))
+    return events
+
+
+class FakeStream:
+    """Stands in for the context manager returned by AsyncAnthropic().messages.stream"""
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    @property
+    async def text_stream(self):
+        for chunk in self.chunks:
+            await asyncio.sleep(0)
+            yield chunk
+
+    async def get_final_message(self):
+        return SimpleNamespace(usage=SimpleNamespace(input_tokens=10, output_tokens=len(self.chunks)))
+
+
+class FakeDB:
+    def __init__(self, assessments=None):
+        self.assessments = assessments or {}
+        self.saved = []
+
+    async def get_assessment_personality(self, assessment_id):
+        return self.assessments.get(assessment_id)
+
+    async def save_recommendations_to_db(self, assessment_id, recommendations):
+        self.saved.append((assessment_id, recommendations))
+        return True
+
+
+class TestRecommendationStreamParser(unittest.TestCase):
+    """Test cases for incremental parsing of streamed recommendations"""
+
+    def test_events_for_any_chunking(self):
+        """Test that tips are emitted in order however the text is split"""
+        print("\n🧪 Testing stream parser chunking...")
+        for size in (1, 2, 3, 7, len(RECOMMENDATIONS)):
+            parser = RecommendationStreamParser()
+            events = feed_in_chunks(parser, RECOMMENDATIONS, size)
+            self.assertTrue(parser.complete)
+            self.assertEqual(parser.recommendations, {
+                "training_tips": ['Use "sit" cues', "Short sessions"],
+                "exercise_needs": ["Fetch", "Long walks"],
+            })
+            self.assertEqual(events, recommendation_events(parser.recommendations))
+        print("✅ Same events for every chunk size")
+
+    def test_tip_emitted_when_complete(self):
+        """Test that a tip is emitted as soon as its closing quote arrives"""
+        print("\n🧪 Testing early tip emission...")
+        parser = RecommendationStreamParser()
+        self.assertEqual(parser.feed('{"training_tips": ["Short ses'), [{"event": "category", "category": "training_tips"}])
+        self.assertEqual(parser.feed('sions", "Rew'),
+                         [{"event": "tip", "category": "training_tips", "index": 0, "text": "Short sessions"}])
+        self.assertFalse(parser.complete)
+        result = parser.result()
+        self.assertEqual(result["training_tips"], ["Short sessions"])
+        self.assertEqual(result["daily_care"], [])
+        print("✅ Tips emitted before the response ends")
+
+
+class TestStreamRecommendations(unittest.TestCase):
+    """Test cases for ClaudeService.stream_recommendations"""
+
+    def setUp(self):
+        from app.services.llm_gateway import LLMGateway
+        from dpq.recommendation_cache import RecommendationCache
+        from app.services.claude_service import ClaudeService
+
+        self.directory = tempfile.mkdtemp(prefix="dpq_stream_")
+        self.cache = RecommendationCache(os.path.join(self.directory, "recommendations.sqlite3"))
+        self.requests = []
+        self.chunks = [RECOMMENDATIONS[i:i + 5] for i in range(0, len(RECOMMENDATIONS), 5)]
+
+        def stream(**request):
+            self.requests.append(request)
+            return FakeStream(self.chunks)
+
+        async def close():
+            pass
+
+        client = SimpleNamespace(messages=SimpleNamespace(stream=stream), close=close)
+        self.data = {'dog_info': {'breed': 'Border Collie'},
+                     'factor_scores': {'Factor 1 - Fearfulness': 3.2}, 'bias_indicators': {}}
+        self.db = FakeDB({"assessment-1": self.data})
+        self.service = ClaudeService(api_key="test_key", gateway=LLMGateway(client=client),
+                                     cache=self.cache, db_handler=self.db)
+
+    def tearDown(self):
+        self.cache.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def collect(self, assessment_id=None, data=None):
+        async def run():
+            return [event async for event in self.service.stream_recommendations(data or self.data, assessment_id)]
+        return asyncio.run(run())
+
+    def test_stream_then_cache_and_save(self):
+        """Test that a streamed response is cached and saved once it ends"""
+        print("\n🧪 Testing streamed recommendations...")
+        events = self.collect("assessment-1")
+        self.assertEqual(events[0], {"event": "category", "category": "training_tips"})
+        done = events[-1]
+        self.assertEqual(done["event"], "done")
+        self.assertFalse(done["cached"])
+        self.assertTrue(done["saved"])
+        self.assertEqual(self.db.saved[0][1]["exercise_needs"], ["Fetch", "Long walks"])
+        self.assertEqual(len(self.requests), 1)
+
+        replay = self.collect()
+        self.assertTrue(replay[-1]["cached"])
+        self.assertIsNone(replay[-1]["saved"])
+        self.assertEqual(replay[:-1], recommendation_events(done["recommendations"]))
+        self.assertEqual(len(self.requests), 1)
+        print("✅ Stream cached and saved after the last tip")
+
+    def test_saved_recommendations_use_stored_scores(self):
+        """Test that recommendations saved to an assessment come from its stored scores, not the request's"""
+        print("\n🧪 Testing streams saved to an assessment...")
+        from dpq.claude_recommender import recommendation_profile
+        other = {'dog_info': {'breed': 'Pug'}, 'factor_scores': {'Factor 1 - Fearfulness': 6.5},
+                 'bias_indicators': {}}
+        self.collect("assessment-1", data=other)
+        self.assertIsNotNone(self.cache.get(self.cache.key(recommendation_profile(self.data))))
+        self.assertIsNone(self.cache.get(self.cache.key(recommendation_profile(other))))
+
+        events = self.collect("assessment-404", data=other)
+        self.assertEqual(events, [{"event": "error", "message": "Assessment assessment-404 not found"}])
+        self.assertEqual([assessment_id for assessment_id, _ in self.db.saved], ["assessment-1"])
+        self.assertEqual(len(self.requests), 1)
+        print("✅ Stored scores used, unknown assessments refused")
+
+    def test_incomplete_stream(self):
+        """Test that a truncated response yields an error and is not cached"""
+        print("\n🧪 Testing truncated stream...")
+        self.chunks = [RECOMMENDATIONS[:60]]
+        events = self.collect("assessment-1")
+        self.assertEqual(events[-1]["event"], "error")
+        self.assertEqual(self.db.saved, [])
+        self.collect()
+        self.assertEqual(len(self.requests), 2)
+        print("✅ Truncated stream reported as an error")
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,132 @@
+import unittest
+import os
+import sys
+import shutil
+import tempfile
+import numpy as np
+
+# Add the parent directory to sys.path to find the dpq package
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from dpq.dpq import DogPersonalityQuestionnaire
+from dpq.reliability import ReliabilityTracker
+from dpq.response_formatter import DPQResponseFormatter
+
+
+def reference_alpha(coded: np.ndarray) -> float:
+    """Textbook Cronbach's alpha over an N x k matrix"""
+    k = coded.shape[1]
+    item_variances = coded.var(axis=0, ddof=1).sum()
+    total_variance = coded.sum(axis=1).var(ddof=1)
+    return k / (k - 1) * (1 - item_variances / total_variance)
+
+
+class TestReliabilityTracker(unittest.TestCase):
+    """Test cases for incremental Cronbach's alpha"""
+
+    def setUp(self):
+        self.dpq = DogPersonalityQuestionnaire()
+        rng = np.random.default_rng(3)
+        # Correlated items: a latent trait per row plus noise
+        latent = rng.normal(4, 1.2, size=(300, 1))
+        self.matrix = np.clip(np.rint(latent + rng.normal(0, 1, size=(300, 45))), 1, 7).astype(np.uint8)
+        self.coded = np.where(self.dpq.reverse_vector, 8 - self.matrix.astype(float), self.matrix.astype(float))
+        self.directory = tempfile.mkdtemp(prefix="dpq_reliability_")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_alpha_matches_reference(self):
+        """Test that streamed alphas match the textbook formula"""
+        print("\n🧪 Testing Cronbach's alpha...")
+        tracker = ReliabilityTracker()
+        for row in self.matrix:
+            tracker.update({i + 1: int(v) for i, v in enumerate(row)})
+        alphas = tracker.alphas()
+        self.assertEqual(alphas["sample_size"], 300)
+        for name, items in tracker.facet_items.items():
+            self.assertAlmostEqual(alphas["facets"][name], reference_alpha(self.coded[:, items]), places=3)
+        for name, items in tracker.factor_items.items():
+            self.assertAlmostEqual(alphas["factors"][name], reference_alpha(self.coded[:, items]), places=3)
+        print("✅ Incremental alphas match the reference computation")
+
+    def test_batch_and_merge_match_streaming(self):
+        """Test that batch updates and merged snapshots equal streaming updates"""
+        print("\n🧪 Testing batch updates and merges...")
+        streaming = ReliabilityTracker()
+        for row in self.matrix:
+            streaming.update({i + 1: int(v) for i, v in enumerate(row)})
+        first, second = ReliabilityTracker(), ReliabilityTracker()
+        first.update_many(self.matrix[:120])
+        second.update_many(self.matrix[120:])
+        first.merge(second)
+        self.assertEqual(first.n, streaming.n)
+        np.testing.assert_allclose(first.mean, streaming.mean)
+        np.testing.assert_allclose(first.m2, streaming.m2)
+        print("✅ Merged statistics equal streaming statistics")
+
+    def test_incomplete_assessments_skipped(self):
+        """Test that incomplete assessments do not enter the statistics"""
+        print("\n🧪 Testing incomplete assessment handling...")
+        tracker = ReliabilityTracker()
+        self.assertFalse(tracker.update({1: 4, 2: 4}))
+        self.assertEqual(tracker.n, 0)
+        self.assertIsNone(tracker.overall_reliability())
+        print("✅ Incomplete assessments skipped")
+
+    def test_persistence_and_formatter(self):
+        """Test snapshot persistence and formatter quality metrics"""
+        print("\n🧪 Testing persistence and quality metrics...")
+        tracker = ReliabilityTracker()
+        tracker.update_many(self.matrix)
+        path = os.path.join(self.directory, "reliability.npz")
+        tracker.save(path)
+        loaded = ReliabilityTracker.load_or_create(path)
+        self.assertEqual(loaded.alphas(), tracker.alphas())
+
+        formatter = DPQResponseFormatter(reliability=loaded)
+        metrics = formatter._calculate_quality_metrics({str(i): 4 for i in range(1, 46)}, {})
+        self.assertEqual(metrics["reliability_score"], loaded.overall_reliability())
+        self.assertEqual(len(metrics["reliability"]["facets"]), 15)
+        print("✅ Alphas persist and appear in quality metrics")
+
+    def test_workers_share_a_file(self):
+        """Test that workers saving to one file merge their statistics instead of overwriting them"""
+        print("\n🧪 Testing reliability shared by workers...")
+        path = os.path.join(self.directory, "reliability.npz")
+        first, second = ReliabilityTracker.load_or_create(path), ReliabilityTracker.load_or_create(path)
+        half = len(self.matrix) // 2
+        first.update_many(self.matrix[:half])
+        for row in self.matrix[half:]:
+            second.update({item + 1: int(value) for item, value in enumerate(row)})
+        first.save(path)
+        second.save(path)
+        # Saved statistics are not merged again
+        second.save(path)
+
+        reference = ReliabilityTracker()
+        reference.update_many(self.matrix)
+        loaded = ReliabilityTracker.load_or_create(path)
+        self.assertEqual(loaded.n, len(self.matrix))
+        self.assertEqual(second.n, len(self.matrix))
+        np.testing.assert_allclose(loaded.m2, reference.m2)
+        self.assertEqual(loaded.alphas(), reference.alphas())
+        print("✅ Each worker's statistics saved once")
+
+    def test_unreadable_file_is_kept(self):
+        """Test that a save moves an unreadable shared file aside instead of overwriting it"""
+        print("\n🧪 Testing save over an unreadable reliability file...")
+        path = os.path.join(self.directory, "reliability.npz")
+        with open(path, "wb") as f:
+            f.write(b"truncated")
+        tracker = ReliabilityTracker()
+        tracker.update_many(self.matrix[:10])
+        tracker.save(path)
+        with open(path + ".corrupt", "rb") as f:
+            self.assertEqual(f.read(), b"truncated")
+        self.assertEqual(ReliabilityTracker.load_or_create(path).n, 10)
+        print("✅ Unreadable statistics moved to .corrupt")
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
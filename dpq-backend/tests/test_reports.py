@@ -0,0 +1,108 @@
+import unittest
+import json
+import os
+import sys
+import tempfile
+import zipfile
+import numpy as np
+
+# Add the parent directory to sys.path to find the dpq package
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from dpq.dpq import DogPersonalityQuestionnaire, DPQAnalyzer
+from dpq.reports import ReportEngine
+
+
+class TestReportEngine(unittest.TestCase):
+    """Test cases for compiled report rendering and bulk export"""
+
+    def setUp(self):
+        self.dpq = DogPersonalityQuestionnaire()
+        self.analyzer = DPQAnalyzer()
+        self.engine = ReportEngine(self.analyzer)
+        rng = np.random.default_rng(10)
+        self.results = [
+            self.dpq.score_assessment({i: int(v) for i, v in enumerate(rng.integers(1, 8, size=45), start=1)},
+                                      dog_id=f"Dog <{n}> & Co")
+            for n in range(20)
+        ]
+
+    def test_text_report(self):
+        """Test the text report content and that generate_report uses the engine"""
+        print("\n🧪 Testing text report...")
+        results = self.results[0]
+        report = self.engine.render_text(results)
+        self.assertEqual(report, self.analyzer.generate_report(results))
+        self.assertIn("Dog ID: Dog <0> & Co", report)
+        self.assertIn("Total Questions Completed: 45", report)
+        for factor, score in results.factor_scores.items():
+            self.assertIn(f"{factor}:\n  Score: {score:.2f}/7.00", report)
+        self.assertIn("Social Interaction Biases:\n-------------------------\n", report)
+        fearfulness = results.bias_indicators["fearfulness_bias"]
+        self.assertIn(f"  Fearfulness Bias: {fearfulness:.3f}", report)
+        for rec in self.analyzer._generate_recommendations(results):
+            self.assertIn(f"• {rec}\n", report)
+        self.assertTrue(report.endswith("=" * 80 + "\n"))
+        print("✅ Text report rendered correctly")
+
+    def test_html_report_escapes(self):
+        """Test that the HTML report is a complete, escaped document"""
+        print("\n🧪 Testing HTML report...")
+        report = self.engine.render(self.results[1], "html")
+        self.assertTrue(report.startswith("<!DOCTYPE html>"))
+        self.assertIn("Dog &lt;1&gt; &amp; Co", report)
+        self.assertNotIn("Dog <1>", report)
+        self.assertEqual(report.count("<th>Score</th>"), 1)
+        self.assertEqual(report.count('class="level-'), 5 + 14)
+        print("✅ HTML report escaped correctly")
+
+    def test_json_report(self):
+        """Test the JSON report structure"""
+        print("\n🧪 Testing JSON report...")
+        results = self.results[2]
+        data = json.loads(self.engine.render_json(results))
+        self.assertEqual(data["dog_id"], results.dog_id)
+        self.assertEqual([f["name"] for f in data["factors"]], list(results.factor_scores))
+        indicators = [i for c in data["bias_categories"] for i in c["indicators"]]
+        self.assertEqual(len(indicators), 14)
+        self.assertEqual({i["name"] for i in indicators}, set(results.bias_indicators))
+        self.assertEqual(data["recommendations"], self.analyzer._generate_recommendations(results))
+        with self.assertRaises(ValueError):
+            self.engine.render(results, "pdf")
+        print("✅ JSON report structured correctly")
+
+    def test_write_batch(self):
+        """Test streaming bulk export to single files and zip archives"""
+        print("\n🧪 Testing batch export...")
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "reports.txt")
+            self.assertEqual(self.engine.write_batch(iter(self.results), path), 20)
+            with open(path, encoding="utf-8") as f:
+                self.assertEqual(f.read(), "".join(self.engine.render_text(r) for r in self.results))
+
+            path = os.path.join(directory, "reports.jsonl")
+            self.engine.write_batch((r for r in self.results), path, fmt="json")
+            with open(path, encoding="utf-8") as f:
+                lines = [json.loads(line) for line in f]
+            self.assertEqual([line["dog_id"] for line in lines], [r.dog_id for r in self.results])
+
+            path = os.path.join(directory, "reports.html")
+            self.engine.write_batch(self.results, path, fmt="html")
+            with open(path, encoding="utf-8") as f:
+                document = f.read()
+            self.assertEqual(document.count("<article"), 20)
+            self.assertEqual(document.count("<!DOCTYPE html>"), 1)
+
+            path = os.path.join(directory, "export", "reports.zip")
+            self.assertEqual(self.engine.write_batch(self.results, path, fmt="html"), 20)
+            with zipfile.ZipFile(path) as archive:
+                names = archive.namelist()
+                self.assertEqual(len(set(names)), 20)
+                self.assertEqual(names[0], "000000_Dog_0_Co.html")
+                self.assertEqual(archive.read(names[3]).decode("utf-8"), self.engine.render_html(self.results[3]))
+            self.assertEqual(sorted(os.listdir(os.path.join(directory, "export"))), ["reports.zip"])
+        print("✅ Batch export streamed correctly")
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
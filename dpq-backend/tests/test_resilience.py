@@ -0,0 +1,252 @@
+import unittest
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import anthropic
+
+# Add the parent directory to sys.path to find the app and dpq packages
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.services.llm_gateway import OPERATIONS, LLMGateway, LLMGatewayError
+from dpq.claude_recommender import ClaudeRecommendationGenerator
+from dpq.resilience import CircuitBreaker, CircuitOpenError, Resilience, RetryBudget
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class StatusError(Exception):
+    """Stands in for an anthropic.APIStatusError"""
+
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+RECOMMENDATIONS = {"training_tips": ["Short sessions"], "exercise_needs": ["Fetch"]}
+
+
+class FaultyMessagesAPI(BaseHTTPRequestHandler):
+    """
+    Local stand-in for POST /v1/messages that injects faults
+
+    Each request takes the next step of `script` (the last one repeats):
+    an HTTP status to fail with, or "ok" / ("slow", seconds) to answer.
+    """
+
+    script = ["ok"]
+    requests = 0
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        cls = type(self)
+        with cls.lock:
+            step = cls.script[min(cls.requests, len(cls.script) - 1)]
+            cls.requests += 1
+        try:
+            if isinstance(step, int):
+                self._send(step, {"type": "error", "error": {"type": "api_error", "message": f"injected {step}"}})
+                return
+            if isinstance(step, tuple):
+                time.sleep(step[1])
+            self._send(200, {
+                "id": "msg_1", "type": "message", "role": "assistant", "model": body["model"],
+                "content": [{"type": "text", "text": json.dumps(RECOMMENDATIONS)}],
+                "stop_reason": "end_turn", "stop_sequence": None,
+                "usage": {"input_tokens": 10, "output_tokens": 10},
+            })
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # The client gave up on this request (e.g. a losing hedge)
+
+    def _send(self, status, data):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestResilience(unittest.TestCase):
+    """Test cases for the circuit breaker, retry budget and hedging"""
+
+    def test_circuit_breaker(self):
+        """Test opening after consecutive failures, a single half-open probe and closing"""
+        print("\n🧪 Testing circuit breaker...")
+        clock = FakeClock()
+        breaker = CircuitBreaker("recommend", failure_threshold=3, reset_timeout=10, clock=clock)
+        for _ in range(2):
+            breaker.allow()
+            breaker.record_failure()
+        breaker.allow()
+        breaker.record_success()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+        for _ in range(3):
+            breaker.allow()
+            breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        with self.assertRaises(CircuitOpenError):
+            breaker.allow()
+
+        clock.now = 10
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        breaker.allow()
+        with self.assertRaises(CircuitOpenError):
+            breaker.allow()
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+
+        clock.now = 20
+        breaker.allow()
+        breaker.record_success()
+        breaker.allow()
+        self.assertEqual(breaker.stats()["opened"], 2)
+        print("✅ Breaker opens, probes once and closes")
+
+    def test_retry_budget(self):
+        """Test that retries are bounded by the budget and errors are classified"""
+        print("\n🧪 Testing retry budget...")
+        clock = FakeClock()
+        budget = RetryBudget(ratio=0.5, min_per_second=0, capacity=1, clock=clock)
+        resilience = Resilience("recommend", CircuitBreaker("recommend", failure_threshold=100),
+                                budget, max_retries=3, base_delay=0)
+        calls = []
+
+        def overloaded():
+            calls.append(1)
+            raise StatusError(529)
+
+        with self.assertRaises(StatusError):
+            resilience.call(overloaded)
+        # One token to start, plus half a token deposited by the call
+        self.assertEqual((len(calls), resilience.retries, budget.denied), (2, 1, 1))
+
+        def bad_request():
+            calls.append(1)
+            raise StatusError(400)
+
+        calls.clear()
+        with self.assertRaises(StatusError):
+            resilience.call(bad_request)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(resilience.breaker.stats()["consecutive_failures"], 0)
+        print("✅ Retries stop when the budget is spent; 4xx not retried")
+
+    def test_hedging(self):
+        """Test that a slow call is hedged and the faster attempt wins"""
+        print("\n🧪 Testing hedged calls...")
+        resilience = Resilience("recommend", budget=RetryBudget())
+        delays = [1.0, 0.01]
+        cancelled = []
+
+        async def attempt():
+            delay = delays.pop(0)
+            try:
+                await asyncio.sleep(delay)
+            except asyncio.CancelledError:
+                cancelled.append(delay)
+                raise
+            return delay
+
+        async def run():
+            start = time.perf_counter()
+            result = await resilience.acall(attempt, timeout=5, hedge_delay=0.05)
+            return result, time.perf_counter() - start
+
+        result, elapsed = asyncio.run(run())
+        self.assertEqual(result, 0.01)
+        self.assertLess(elapsed, 0.5)
+        self.assertEqual(cancelled, [1.0])
+        self.assertEqual((resilience.hedges, resilience.hedge_wins), (1, 1))
+        self.assertEqual(resilience.breaker.state, CircuitBreaker.CLOSED)
+        print(f"✅ Hedge won after {elapsed:.2f}s")
+
+
+class TestGatewayResilience(unittest.TestCase):
+    """Test cases for the gateway against a fault-injecting Messages API"""
+
+    def setUp(self):
+        FaultyMessagesAPI.script = ["ok"]
+        FaultyMessagesAPI.requests = 0
+        FaultyMessagesAPI.lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), FaultyMessagesAPI)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.budget = RetryBudget()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def gateway(self, **kwargs):
+        client = anthropic.AsyncAnthropic(api_key="test_key", max_retries=0,
+                                          base_url=f"http://127.0.0.1:{self.server.server_address[1]}")
+        resilience = {
+            operation: Resilience(operation, CircuitBreaker(operation, failure_threshold=3, reset_timeout=60),
+                                  self.budget, max_retries=2, base_delay=0.01)
+            for operation in OPERATIONS
+        }
+        return LLMGateway(client=client, resilience=resilience, **kwargs)
+
+    def test_transient_errors_retried(self):
+        """Test that 529 and 500 responses are retried with backoff"""
+        print("\n🧪 Testing retries against the stub server...")
+        FaultyMessagesAPI.script = [529, 500, "ok"]
+        gateway = self.gateway()
+        recommendations = asyncio.run(gateway.recommend("prompt"))
+        self.assertEqual(recommendations["training_tips"], ["Short sessions"])
+        self.assertEqual(FaultyMessagesAPI.requests, 3)
+        circuit = gateway.get_stats()["operations"]["recommend"]["circuit"]
+        self.assertEqual((circuit["retries"], circuit["state"]), (2, CircuitBreaker.CLOSED))
+        print("✅ Recovered after two retries")
+
+    def test_circuit_fails_fast_to_fallback(self):
+        """Test that an unhealthy upstream opens the circuit and callers fall back without waiting"""
+        print("\n🧪 Testing fail-fast fallback...")
+        FaultyMessagesAPI.script = [503]
+        gateway = self.gateway()
+        with self.assertRaises(LLMGatewayError):
+            asyncio.run(gateway.recommend("prompt"))
+        self.assertEqual(FaultyMessagesAPI.requests, 3)
+
+        generator = ClaudeRecommendationGenerator(api_key="test_key", gateway=gateway)
+        data = {'dog_info': {'name': 'Bella'}, 'factor_scores': {'Factor 1 - Fearfulness': 3.2},
+                'bias_indicators': {}}
+        start = time.perf_counter()
+        fallback = asyncio.run(generator.agenerate_recommendations(data))
+        self.assertLess(time.perf_counter() - start, 0.1)
+        self.assertIn('API temporarily unavailable', str(fallback['training_tips']))
+        self.assertEqual(FaultyMessagesAPI.requests, 3)
+        stats = gateway.get_stats()["operations"]["recommend"]
+        self.assertEqual((stats["rejected"], stats["circuit"]["state"]), (1, CircuitBreaker.OPEN))
+        print("✅ Open circuit skipped Claude and returned the fallback")
+
+    def test_hedged_recommend(self):
+        """Test that a slow recommend() is hedged with a second request"""
+        print("\n🧪 Testing hedged recommend...")
+        FaultyMessagesAPI.script = [("slow", 1.0), "ok"]
+        gateway = self.gateway(hedge_after=0.1)
+        start = time.perf_counter()
+        recommendations = asyncio.run(gateway.recommend("prompt"))
+        self.assertLess(time.perf_counter() - start, 0.8)
+        self.assertEqual(recommendations["exercise_needs"], ["Fetch"])
+        self.assertEqual(FaultyMessagesAPI.requests, 2)
+        self.assertEqual(gateway.get_stats()["operations"]["recommend"]["circuit"]["hedge_wins"], 1)
+        print("✅ Hedged request answered first")
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
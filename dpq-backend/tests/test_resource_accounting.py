@@ -0,0 +1,106 @@
+import unittest
+import asyncio
+import os
+import sys
+from types import SimpleNamespace
+
+# Add the parent directory to sys.path to find the app and dpq packages
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from dpq.resource_accounting import (
+    AccountedConnection, ResourceLedger, current_usage, record_llm_usage, run_process, set_user, stage, track
+)
+
+
+class FakeConnection:
+    """Stands in for an asyncpg connection"""
+
+    def __init__(self):
+        self.closed = False
+
+    async def execute(self, query, *args):
+        await asyncio.sleep(0.01)
+        return "UPDATE 1"
+
+    async def close(self):
+        self.closed = True
+
+
+class TestResourceAccounting(unittest.TestCase):
+    """Test cases for per-request resource accounting"""
+
+    def setUp(self):
+        self.ledger = ResourceLedger()
+
+    def test_tokens_and_stages(self):
+        """Test token totals, cache hit ratio and stage timings"""
+        print("\n🧪 Testing token accounting...")
+        with track("POST /api/assessments", "user-1", ledger=self.ledger) as usage:
+            with stage("analyze"):
+                record_llm_usage(SimpleNamespace(input_tokens=200, output_tokens=80,
+                                                 cache_read_input_tokens=600, cache_creation_input_tokens=None))
+                record_llm_usage(SimpleNamespace(input_tokens=100, output_tokens=20,
+                                                 cache_read_input_tokens=0, cache_creation_input_tokens=100))
+        record_llm_usage(SimpleNamespace(input_tokens=5, output_tokens=5))
+        self.assertIsNone(current_usage())
+
+        summary = usage.summary()
+        self.assertEqual((summary["input_tokens"], summary["output_tokens"], summary["llm_calls"]), (300, 100, 2))
+        self.assertEqual(summary["cache_hit_ratio"], 0.6)
+        self.assertIn("analyze", summary["stages"])
+        self.assertGreaterEqual(summary["wall_seconds"], summary["stages"]["analyze"])
+        print("✅ Tokens and cache hit ratio accounted")
+
+    def test_child_cpu(self):
+        """Test that a child process's CPU seconds come from its rusage"""
+        print("\n🧪 Testing child-process CPU accounting...")
+        with track("job:video", ledger=self.ledger) as usage:
+            result = run_process([sys.executable, "-c", "print(sum(range(3_000_000)))"],
+                                 capture_output=True, text=True, timeout=30)
+        self.assertEqual(result.returncode, 0)
+        self.assertEqual(result.stdout.strip(), str(sum(range(3_000_000))))
+        self.assertEqual(usage.totals["child_processes"], 1)
+        self.assertGreater(usage.totals["child_cpu_seconds"], 0)
+        print(f"✅ Child used {usage.totals['child_cpu_seconds']:.3f}s CPU")
+
+    def test_db_round_trips_across_tasks(self):
+        """Test that queries from tasks and threads count toward the request"""
+        print("\n🧪 Testing database accounting...")
+
+        async def request():
+            with track("GET /api/recommendations/{assessment_id}", ledger=self.ledger) as usage:
+                conn = AccountedConnection(FakeConnection())
+                await asyncio.gather(*(conn.execute("SELECT 1") for _ in range(3)))
+                await asyncio.to_thread(set_user, "user-2")
+                await conn.close()
+                self.assertTrue(conn._connection.closed)
+            return usage
+
+        usage = asyncio.run(request())
+        self.assertEqual(usage.totals["db_round_trips"], 3)
+        self.assertGreater(usage.totals["db_seconds"], 0)
+        self.assertEqual(usage.user_id, "user-2")
+        print("✅ Round trips accounted across tasks")
+
+    def test_ledger(self):
+        """Test aggregation per endpoint and user and the bounded user table"""
+        print("\n🧪 Testing ledger aggregation...")
+        ledger = ResourceLedger(max_users=2)
+        for user, tokens in (("a", 100), ("b", 300), ("a", 100), ("c", 50)):
+            with track("POST /api/assessments", user, ledger=ledger):
+                record_llm_usage(SimpleNamespace(input_tokens=tokens, output_tokens=0))
+        with track("GET /health", ledger=ledger):
+            pass
+
+        endpoints = ledger.top("endpoint")
+        self.assertEqual(endpoints[0]["endpoint"], "POST /api/assessments")
+        self.assertEqual((endpoints[0]["requests"], endpoints[0]["input_tokens"]), (4, 550))
+        users = ledger.top("user")
+        self.assertEqual([row["user"] for row in users], ["a", "c"])
+        with self.assertRaises(ValueError):
+            ledger.top("endpoint", sort="dollars")
+        print("✅ Ledger aggregates and evicts old users")
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,104 @@
+import unittest
+import copy
+import json
+import os
+import sys
+
+# Add the parent directory to sys.path to find the dpq package
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from dpq.response_formatter import (
+    DPQResponseFormatter, JSONFragment, ai_translator_config, primary_type
+)
+
+FACTORS = ("Factor 1 - Fearfulness", "Factor 2 - Aggression towards People", "Factor 3 - Activity/Excitability",
+           "Factor 4 - Responsiveness to Training", "Factor 5 - Aggression towards Animals")
+
+
+def levels(fearfulness="Moderate", aggression_people="Moderate", activity="Moderate",
+           training="Moderate", aggression_animals="Moderate"):
+    return tuple(zip(FACTORS, (fearfulness, aggression_people, activity, training, aggression_animals)))
+
+
+class TestFormatterFragments(unittest.TestCase):
+    """Test cases for the table-driven personality summary and translator config"""
+
+    def test_primary_type(self):
+        """Test the personality type classifier on the DPQ factor names"""
+        print("\n🧪 Testing personality type classifier...")
+        cases = [
+            (levels(activity="High", training="High"), "High-Energy Companion"),
+            (levels(activity="High", training="Low"), "Independent Adventurer"),
+            (levels(activity="High", aggression_animals="High"), "Assertive Guardian"),
+            (levels(activity="Low", training="High"), "Calm Companion"),
+            (levels(activity="Moderate-Low", training="Low"), "Laid-Back Independent"),
+            (levels(fearfulness="High", training="High"), "Sensitive Learner"),
+            (levels(fearfulness="High", training="Moderate-Low"), "Anxious Independent"),
+            (levels(fearfulness="High"), "Sensitive Soul"),
+            (levels(training="High"), "Eager Learner"),
+            (levels(), "Balanced Companion"),
+            (levels(aggression_people="High"), "Unique Personality"),
+        ]
+        for factor_levels, expected in cases:
+            self.assertEqual(primary_type(factor_levels), expected, factor_levels)
+        print(f"✅ {len(cases)} level combinations classified")
+
+    def test_summary_fragments(self):
+        """Test that summaries are memoized per level combination and carry their JSON"""
+        print("\n🧪 Testing summary fragments...")
+        formatter = DPQResponseFormatter()
+        factors = formatter._format_personality_factors(dict(zip(FACTORS, (6.0, 1.5, 6.2, 5.8, 3.0))))
+        self.assertEqual(factors["Factor 1 - Fearfulness"]["description"],
+                         "Shows high levels of anxiety and fear responses")
+
+        summary = formatter._generate_personality_summary(factors)
+        self.assertIsInstance(summary, JSONFragment)
+        self.assertEqual(summary["primary_type"], "High-Energy Companion")
+        self.assertEqual(summary["dominant_traits"], ("Sensitive/Cautious", "Energetic/Excitable"))
+        self.assertIn("Generally friendly with people", summary["key_characteristics"])
+
+        other = formatter._format_personality_factors(dict(zip(FACTORS, (5.9, 2.0, 6.9, 5.5, 2.6))))
+        self.assertIs(formatter._generate_personality_summary(other), summary)
+        self.assertEqual(json.loads(summary.json), json.loads(json.dumps(summary)))
+
+        # Shared between responses, so no caller can change it
+        with self.assertRaises(TypeError):
+            summary["primary_type"] = "Changed"
+        with self.assertRaises(TypeError):
+            summary.update(primary_type="Changed")
+        with self.assertRaises(AttributeError):
+            summary["key_characteristics"].append("Changed")
+        self.assertEqual(copy.deepcopy(summary), summary)
+        changed = {**summary, "primary_type": "Changed"}
+        self.assertEqual(formatter._generate_personality_summary(other)["primary_type"], "High-Energy Companion")
+        self.assertEqual(changed["primary_type"], "Changed")
+        print("✅ Equal level combinations share one serialized summary")
+
+    def test_translator_config(self):
+        """Test translator configs over the rounded indicator grid"""
+        print("\n🧪 Testing translator config fragments...")
+        formatter = DPQResponseFormatter()
+        for excitability in (0.0, 0.6, 0.61, 0.7, 0.71, 1.0):
+            for fearfulness in (0.3, 0.61, 0.75):
+                indicators = formatter._format_ai_bias_indicators(
+                    {"excitability_bias": excitability, "fearfulness_bias": fearfulness, "trainability_bias": 0.72})
+                config = formatter._generate_ai_translator_config(indicators)
+                self.assertIs(config, ai_translator_config(excitability, fearfulness, 0.72))
+                self.assertEqual(json.loads(config.json), config)
+                style = config["communication_style"]
+                if excitability > 0.7:
+                    self.assertEqual(style, "energetic_friendly")
+                elif fearfulness > 0.7:
+                    self.assertEqual(style, "calm_reassuring")
+                else:
+                    self.assertEqual(style, "structured_positive")
+                self.assertEqual(config["tone_adjustments"]["calming_needed"], fearfulness > 0.6)
+                self.assertEqual(config["response_modifications"]["reduce_fear_language"],
+                                 round(1.0 - fearfulness, 2))
+        defaults = formatter._generate_ai_translator_config({})
+        self.assertEqual(defaults["communication_style"], "balanced_adaptive")
+        print("✅ Translator configs memoized per indicator triple")
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
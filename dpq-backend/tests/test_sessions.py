@@ -0,0 +1,128 @@
+import unittest
+import os
+import sys
+import time
+import numpy as np
+
+# Add the parent directory to sys.path to find the dpq package
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from dpq.dpq import DogPersonalityQuestionnaire
+from dpq.sessions import SessionStore
+
+
+class TestSessionStore(unittest.TestCase):
+    """Test cases for incremental provisional scoring sessions"""
+
+    def setUp(self):
+        self.dpq = DogPersonalityQuestionnaire()
+        self.rng = np.random.default_rng(21)
+
+    def random_responses(self):
+        return {i: int(v) for i, v in enumerate(self.rng.integers(1, 8, size=45), start=1)}
+
+    def test_complete_session_matches_scoring(self):
+        """Test that a finished session equals score_assessment, in any answer order"""
+        print("\n🧪 Testing session scoring...")
+        store = SessionStore(initial_capacity=2)
+        for _ in range(50):
+            responses = self.random_responses()
+            session_id = store.create()
+            order = self.rng.permutation(45) + 1
+            # Answer some items twice to exercise changed answers
+            for item in order[:15]:
+                store.answer(session_id, int(item), int(self.rng.integers(1, 8)))
+            for item in order:
+                scores = store.answer(session_id, int(item), responses[int(item)])
+            expected = self.dpq.score_assessment(responses)
+            self.assertTrue(scores["complete"])
+            self.assertEqual(scores["facet_scores"], expected.facet_scores)
+            self.assertEqual(scores["factor_scores"], expected.factor_scores)
+            self.assertEqual(store.responses(session_id), responses)
+        self.assertEqual(len(store), 50)
+        print("✅ Completed sessions match score_assessment exactly")
+
+    def test_provisional_scores(self):
+        """Test provisional scores and progress on a partial session"""
+        print("\n🧪 Testing provisional scores...")
+        store = SessionStore()
+        session_id = store.create()
+        scores = store.scores(session_id)
+        self.assertEqual(scores["answered"], 0)
+        self.assertIsNone(scores["factor_scores"]["Factor 1 - Fearfulness"])
+
+        # Item 1 is reverse coded (Fear of People)
+        scores = store.answer(session_id, 1, 2)
+        self.assertEqual(scores["facet_scores"]["Fear of People"], 6.0)
+        self.assertEqual(scores["factor_scores"]["Factor 1 - Fearfulness"], 6.0)
+        scores = store.answer(session_id, 6, 4)
+        self.assertEqual(scores["facet_scores"]["Fear of People"], 5.0)
+        self.assertAlmostEqual(scores["fraction_answered"], 2 / 45, places=4)
+
+        # Clearing an answer removes it from the sums
+        scores = store.answer(session_id, 1, 0)
+        self.assertEqual(scores["facet_scores"]["Fear of People"], 4.0)
+        self.assertEqual(scores["answered"], 1)
+
+        with self.assertRaises(ValueError):
+            store.answer(session_id, 46, 3)
+        with self.assertRaises(ValueError):
+            store.answer(session_id, 3, 8)
+        with self.assertRaises(KeyError):
+            store.answer("missing", 3, 3)
+        print("✅ Provisional scores follow each answer")
+
+    def test_pack_and_expire(self):
+        """Test the compact key-value form and idle-session expiry"""
+        print("\n🧪 Testing packing and expiry...")
+        store = SessionStore()
+        responses = self.random_responses()
+        del responses[17]
+        session_id = store.create()
+        store.answer_many(session_id, responses)
+        state = store.pack(session_id)
+        self.assertEqual(len(state), 23)
+
+        restored = SessionStore()
+        scores = restored.unpack("restored", state)
+        self.assertEqual(scores, {**store.scores(session_id), "session_id": "restored"})
+        self.assertEqual(restored.responses("restored"), responses)
+
+        stale = store.create()
+        store.expire(now=time.time() + store.ttl_seconds + 10)
+        self.assertNotIn(stale, store)
+        self.assertEqual(len(store), 0)
+        self.assertFalse(store.discard(stale))
+        # Freed rows are reused
+        store.create("again")
+        self.assertEqual(store.scores("again")["answered"], 0)
+        print("✅ Sessions pack to 23 bytes and expire when idle")
+
+    def test_unpack_over_live_session(self):
+        """Test that replacing a live session keeps its row to itself"""
+        print("\n🧪 Testing unpack over a live session...")
+        store = SessionStore()
+        responses = self.random_responses()
+        source = store.create()
+        store.answer_many(source, responses)
+        state = store.pack(source)
+
+        live = store.create("live")
+        store.answer(live, 1, 3)
+        row = store._rows[live]
+        store.unpack(live, state)
+        self.assertEqual(store._rows[live], row)
+        self.assertNotIn(row, store._free)
+        self.assertEqual(store.responses(live), responses)
+
+        # A new session must not be handed the replaced session's row
+        other = store.create()
+        self.assertNotEqual(store._rows[other], row)
+        store.answer(other, 1, 7)
+        self.assertEqual(store.responses(live), responses)
+        self.assertEqual(store.scores(other)["answered"], 1)
+        print("✅ Unpacked session keeps its row")
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
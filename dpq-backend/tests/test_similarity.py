@@ -0,0 +1,151 @@
+import unittest
+import os
+import sys
+import shutil
+import tempfile
+import numpy as np
+
+# Add the parent directory to sys.path to find the dpq package
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from dpq.dpq import DogPersonalityQuestionnaire
+from dpq.assessment_store import AssessmentStore
+from dpq.similarity import SimilarityIndex
+
+
+class TestSimilarityIndex(unittest.TestCase):
+    """Test cases for the nearest-neighbour personality index"""
+
+    def setUp(self):
+        self.dpq = DogPersonalityQuestionnaire()
+        rng = np.random.default_rng(9)
+        latent = rng.normal(4, 1.3, size=(3000, 5))
+        matrix = latent[:, rng.integers(0, 5, 45)] + rng.normal(0, 1, size=(3000, 45))
+        self.matrix = np.clip(np.rint(matrix), 1, 7).astype(np.uint8)
+        self.facets, self.factors, self.biases = self.dpq.score_many(self.matrix)
+        self.dog_ids = [f"dog-{i}" for i in range(3000)]
+        self.directory = tempfile.mkdtemp(prefix="dpq_similarity_")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def brute_force(self, vectors, query, k):
+        distances = np.sqrt(np.square(vectors - query).sum(axis=1))
+        return np.sort(distances)[:k]
+
+    def test_flat_index_is_exact(self):
+        """Test that a small (untrained) index returns exact neighbours"""
+        print("\n🧪 Testing flat k-NN...")
+        index = SimilarityIndex("facets")
+        index.add_many(self.dog_ids, self.facets)
+        for row in (0, 17, 2500):
+            result = index.query(self.facets[row], k=5)
+            self.assertEqual(result[0]["distance"], 0.0)
+            np.testing.assert_allclose([r["distance"] for r in result],
+                                       self.brute_force(self.facets, self.facets[row], 5), atol=1e-4)
+        print("✅ Flat index matches brute force")
+
+    def test_ivf_index_recall(self):
+        """Test inverted-list queries against exhaustive search"""
+        print("\n🧪 Testing IVF recall...")
+        index = SimilarityIndex("biases", min_train_size=1000)
+        vectors = index.vectors_from_scores(self.facets, self.factors)
+        np.testing.assert_allclose(vectors, self.biases)
+        index.add_many(self.dog_ids, vectors)
+        index.rebuild()
+        self.assertEqual(index.pending, 0)
+
+        hits = []
+        for row in range(0, 3000, 150):
+            approximate = [r["distance"] for r in index.query(vectors[row], k=10)]
+            exact = [r["distance"] for r in index.query(vectors[row], k=10, exact=True)]
+            hits.append(np.mean(np.isclose(approximate, exact)))
+            # Exhaustive search over codes stays within quantization error of float search
+            np.testing.assert_allclose(exact, self.brute_force(vectors, vectors[row], 10), atol=0.02)
+        self.assertGreater(np.mean(hits), 0.8)
+        print("✅ IVF queries find most exact neighbours")
+
+    def test_inserts_replace_and_exclude(self):
+        """Test incremental inserts, replacement and self-exclusion"""
+        print("\n🧪 Testing incremental inserts...")
+        index = SimilarityIndex("facets", min_train_size=1000)
+        index.add_many(self.dog_ids[:2000], self.facets[:2000])
+        index.rebuild()
+        index.add_many(self.dog_ids[2000:], self.facets[2000:])
+        self.assertEqual(index.pending, 1000)
+        self.assertEqual(len(index), 3000)
+
+        # Re-assess dog-5 as a copy of dog-2999: the old vector must disappear
+        index.add("dog-5", dict(zip(self.dpq.facet_names, self.facets[2999])))
+        self.assertEqual(len(index), 3000)
+        neighbours = index.query(self.facets[2999], k=2, exact=True)
+        self.assertEqual({n["dog_id"] for n in neighbours}, {"dog-5", "dog-2999"})
+
+        similar = index.query_dog("dog-2999", k=3)
+        self.assertNotIn("dog-2999", [n["dog_id"] for n in similar])
+        self.assertEqual(similar[0]["dog_id"], "dog-5")
+        self.assertIsNone(index.query_dog("unknown-dog"))
+
+        index.rebuild()
+        self.assertEqual(index.pending, 0)
+        self.assertEqual(len(index), 3000)
+        self.assertEqual(index.query_dog("dog-2999", k=1, exact=True)[0]["dog_id"], "dog-5")
+        print("✅ Inserts, replacements and exclusions behave")
+
+    def test_persistence_and_store(self):
+        """Test building from an AssessmentStore and round-tripping to disk"""
+        print("\n🧪 Testing store build and persistence...")
+        store = AssessmentStore(os.path.join(self.directory, "store"))
+        dog_ids = [f"dog-{i % 1000}" for i in range(3000)]
+        dates = [f"2024-0{1 + i // 1000}-01" for i in range(3000)]
+        store.append(self.matrix, self.facets, self.factors, dog_ids, dates)
+
+        index = SimilarityIndex("facets", min_train_size=500)
+        self.assertEqual(index.build_from_store(store), 1000)
+        # The latest (March) assessment represents each dog
+        self.assertEqual(index.query(self.facets[2000 + 42], k=1, exact=True)[0]["distance"], 0.0)
+
+        index.add("new-dog", self.facets[7])
+        path = os.path.join(self.directory, "similarity_facets.npz")
+        index.save(path)
+        loaded = SimilarityIndex.load_or_create(path, "facets")
+        self.assertEqual(len(loaded), 1001)
+        self.assertEqual(loaded.pending, 1)
+        self.assertEqual(loaded.query_dog("dog-42", k=5), index.query_dog("dog-42", k=5))
+        self.assertEqual(len(SimilarityIndex.load_or_create(path, "biases")), 0)
+        print("✅ Index builds from the store and persists")
+
+    def test_saves_merge(self):
+        """Test that indexes sharing a file merge their inserts instead of overwriting"""
+        print("\n🧪 Testing merged saves from two workers...")
+        path = os.path.join(self.directory, "similarity_facets.npz")
+        first = SimilarityIndex("facets", min_train_size=500)
+        second = SimilarityIndex("facets", min_train_size=500)
+        first.add_many(self.dog_ids[:1500], self.facets[:1500])
+        first.rebuild()
+        first.save(path)
+        second.add_many(self.dog_ids[1500:], self.facets[1500:])
+        second.add("dog-7", self.facets[2999])
+        second.save(path)
+        first.add("dog-2999", self.facets[0])
+        first.save(path)
+
+        loaded = SimilarityIndex.load_or_create(path, "facets")
+        self.assertEqual(len(loaded), 3000)
+        self.assertEqual(loaded.query_dog("dog-10", k=3, exact=True), first.query_dog("dog-10", k=3, exact=True))
+        # Each worker's later save carries its own vector for a dog
+        self.assertEqual(loaded.query(self.facets[2999], k=1, exact=True)[0]["dog_id"], "dog-7")
+        self.assertEqual(loaded.query(self.facets[0], k=2, exact=True)[1]["distance"], 0.0)
+        self.assertEqual(first.updates_since_save, 0)
+
+        with open(path, "wb") as f:
+            f.write(b"not an index")
+        second.add("dog-new", self.facets[3])
+        second.save(path)
+        self.assertTrue(os.path.exists(path + ".corrupt"))
+        self.assertEqual(len(SimilarityIndex.load_or_create(path, "facets")), 3001)
+        print("✅ Both workers' inserts are in the shared file")
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,126 @@
+import unittest
+import asyncio
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+# Add the parent directory to sys.path to find the app and dpq packages
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.services.llm_gateway import LLMGateway, LLMGatewayError
+from dpq.claude_recommender import ClaudeRecommendationGenerator
+from dpq.single_flight import SingleFlight, get_single_flight
+
+RECOMMENDATIONS = '{"training_tips": ["Short sessions"], "exercise_needs": ["Fetch"]}'
+
+
+class SlowMessages:
+    """Stands in for Anthropic().messages and AsyncAnthropic().messages, counting calls"""
+
+    def __init__(self, delay=0.1, error=None):
+        self.delay = delay
+        self.error = error
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def create(self, **request):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.delay)
+        return self._message()
+
+    async def acreate(self, **request):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return self._message()
+
+    def _message(self):
+        return SimpleNamespace(content=[SimpleNamespace(text=RECOMMENDATIONS)])
+
+
+class TestSingleFlight(unittest.TestCase):
+    """Test cases for coalescing identical in-flight calls"""
+
+    def test_threads_share_one_call(self):
+        """Test that concurrent threads with one key run the call once"""
+        print("\n🧪 Testing threaded coalescing...")
+        flight = SingleFlight("test")
+        calls = []
+
+        def work():
+            calls.append(1)
+            time.sleep(0.1)
+            return {"value": 42}
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(lambda i: flight.do("same", work), range(8)))
+        self.assertEqual(len(calls), 1)
+        self.assertTrue(all(result is results[0] for result in results))
+
+        def fail():
+            raise RuntimeError("overloaded")
+        with self.assertRaises(RuntimeError):
+            flight.do("same", fail)
+        # Completed calls are not cached
+        self.assertEqual(flight.do("same", lambda: "fresh"), "fresh")
+        stats = flight.stats()
+        self.assertEqual((stats["executions"], stats["coalesced"], stats["in_flight"]), (3, 7, 0))
+        self.assertEqual(stats["coalescing_rate"], 0.7)
+        print("✅ 8 threads shared one call")
+
+    def test_generator_coalesces_identical_prompts(self):
+        """Test that identical recommendation prompts from many threads reach Claude once"""
+        print("\n🧪 Testing generator coalescing...")
+        messages = SlowMessages()
+        generator = ClaudeRecommendationGenerator(api_key="test_key")
+        generator.client = SimpleNamespace(messages=messages)
+        profile = {'breed': 'beagle', 'factors': {'Factor 1 - Fearfulness': 'Low'}, 'indicators': {}}
+        other = dict(profile, breed='border collie')
+
+        with ThreadPoolExecutor(max_workers=10) as pool:
+            results = list(pool.map(generator.generate_profile_recommendations, [profile] * 9 + [other]))
+        self.assertEqual(messages.calls, 2)
+        self.assertEqual(results[0]["exercise_needs"], ["Fetch"])
+        self.assertIsNot(results[0], results[1])
+        self.assertGreaterEqual(get_single_flight("recommend").stats()["coalesced"], 8)
+        print("✅ 10 requests made 2 Claude calls")
+
+    def test_gateway_coalescing(self):
+        """Test that gateway callers share calls, errors and survive a cancelled leader"""
+        print("\n🧪 Testing gateway coalescing...")
+        messages = SlowMessages()
+        client = SimpleNamespace(messages=SimpleNamespace(create=messages.acreate))
+        gateway = LLMGateway(client=client)
+
+        async def run():
+            leader = asyncio.ensure_future(gateway.recommend("popular profile"))
+            await asyncio.sleep(0)
+            followers = [gateway.recommend("popular profile") for _ in range(5)]
+            leader.cancel()
+            return await asyncio.gather(*followers, gateway.recommend("rare profile"))
+
+        results = asyncio.run(run())
+        self.assertEqual(messages.calls, 2)
+        self.assertEqual(results[0]["training_tips"], ["Short sessions"])
+        stats = gateway.get_stats()["operations"]["recommend"]
+        self.assertEqual(stats["calls"], 2)
+        self.assertGreater(stats["coalescing_rate"], 0)
+
+        messages.error = RuntimeError("overloaded")
+
+        async def failing():
+            return await asyncio.gather(*(gateway.recommend("failing profile") for _ in range(3)),
+                                        return_exceptions=True)
+        errors = asyncio.run(failing())
+        self.assertTrue(all(isinstance(e, LLMGatewayError) for e in errors))
+        self.assertEqual(messages.calls, 3)
+        print("✅ Gateway callers shared in-flight calls")
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
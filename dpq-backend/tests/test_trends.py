@@ -0,0 +1,169 @@
+import unittest
+import os
+import sys
+import shutil
+import tempfile
+import numpy as np
+
+# Add the parent directory to sys.path to find the dpq package
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from dpq.dpq import DogPersonalityQuestionnaire, DPQAnalyzer
+from dpq.assessment_store import AssessmentStore
+from dpq.trends import (
+    TrendEngine, TrendIndex, compute_trends, dates_to_days, pad_histories, t_test_p_values
+)
+
+
+class TestTrends(unittest.TestCase):
+    """Test cases for the longitudinal trend engine"""
+
+    def setUp(self):
+        self.dpq = DogPersonalityQuestionnaire()
+        self.rng = np.random.default_rng(5)
+        self.directory = tempfile.mkdtemp(prefix="dpq_trends_")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def _populate_store(self, n_rows=240, n_dogs=9):
+        store = AssessmentStore(self.directory)
+        matrix = self.rng.integers(1, 8, size=(n_rows, 45), dtype=np.uint8)
+        facets, factors, _ = self.dpq.score_many(matrix)
+        dog_ids = [f"dog-{i % n_dogs}" for i in range(n_rows)]
+        offsets = self.rng.choice(2000, size=n_rows, replace=False)
+        dates = [str(np.datetime64("2022-01-01") + int(offset)) for offset in offsets]
+        store.append(matrix, facets, factors, dog_ids, dates)
+        return store
+
+    def test_p_values(self):
+        """Test Student t p-values against reference values"""
+        print("\n🧪 Testing t-test p-values...")
+        p = t_test_p_values(np.array([2.228, 2.0, 0.0, 1.0]), np.array([10, 10, 4, 1]))
+        np.testing.assert_allclose(p, [0.05, 0.0734, 1.0, 0.5], atol=1e-3)
+        print("✅ p-values match reference tables")
+
+    def test_vectorized_matches_reference(self):
+        """Test slopes and rolling means against per-dog polyfit and loops"""
+        print("\n🧪 Testing vectorized trends...")
+        histories = []
+        for length in (2, 5, 9):
+            days = np.sort(self.rng.choice(1000, size=length, replace=False)).astype(float)
+            histories.append((days, self.rng.uniform(1, 7, size=(length, 5))))
+        days, scores, counts = pad_histories(histories)
+        result = compute_trends(days, scores, counts, self.dpq.factor_names, window=3, change_threshold=0.5)
+
+        for d, (dog_days, dog_scores) in enumerate(histories):
+            years = (dog_days - dog_days[0]) / 365.25
+            for f in range(5):
+                self.assertAlmostEqual(result.slopes[d, f], np.polyfit(years, dog_scores[:, f], 1)[0], places=8)
+                for t in range(len(dog_days)):
+                    self.assertAlmostEqual(result.rolling_means[d, t, f], dog_scores[max(0, t - 2):t + 1, f].mean())
+                    expected = t >= 3 and abs(dog_scores[t, f] - dog_scores[t - 3:t, f].mean()) >= 0.5
+                    self.assertEqual(bool(result.change_points[d, t, f]), expected)
+        self.assertTrue(np.isnan(result.p_values[0]).all())
+        self.assertTrue(np.isnan(result.rolling_means[0, 2:]).all())
+        print("✅ Vectorized trends match per-dog reference computations")
+
+    def test_significant_trend(self):
+        """Test that a steady rise is detected and flat noise is not"""
+        print("\n🧪 Testing significance...")
+        days = np.arange(8) * 60.0
+        rising = np.column_stack([2 + days / 200, np.full(8, 4.0), 4 + 0.01 * (-1) ** np.arange(8),
+                                  np.full(8, 3.0), np.full(8, 5.0)])
+        result = compute_trends(days, rising, factor_names=self.dpq.factor_names)
+        summary = result.for_dog(0)["factors"]
+        self.assertEqual(summary[self.dpq.factor_names[0]]["direction"], "increasing")
+        self.assertEqual(summary[self.dpq.factor_names[1]]["direction"], "stable")
+        self.assertFalse(summary[self.dpq.factor_names[2]]["significant"])
+        print("✅ Significant trends detected")
+
+    def test_cohort_and_incremental_index_agree(self):
+        """Test store-wide trends against the incrementally updated index"""
+        print("\n🧪 Testing cohort trends and incremental summaries...")
+        store = self._populate_store()
+        result = TrendEngine().cohort_trends(store)
+        self.assertEqual(len(result), 9)
+        self.assertEqual(int(result.counts.sum()), len(store))
+
+        index = TrendIndex()
+        index.rebuild_from_store(store)
+        summaries = index.summaries(result.dog_ids)
+        for d, dog_id in enumerate(result.dog_ids):
+            full = result.for_dog(d)
+            self.assertEqual(full["assessments"], summaries[d]["assessments"])
+            for name in self.dpq.factor_names:
+                expected, actual = full["factors"][name], summaries[d]["factors"][name]
+                self.assertAlmostEqual(expected["slope_per_year"], actual["slope_per_year"], places=3)
+                self.assertAlmostEqual(expected["p_value"], actual["p_value"], places=3)
+                self.assertEqual(expected["rolling_mean"], actual["rolling_mean"])
+                self.assertEqual(expected["change_point"], actual["change_point"])
+        self.assertEqual(TrendEngine().dog_trend(store, "dog-3")["assessments"], len(store.rows_for_dog("dog-3")))
+        self.assertIsNone(index.summary("unknown-dog"))
+        print("✅ Cohort trends match incremental summaries")
+
+    def test_index_persistence_and_results(self):
+        """Test saving the index and trends over DPQResults lists"""
+        print("\n🧪 Testing persistence and DPQResults trends...")
+        results = []
+        for month in range(6):
+            responses = {i: int(v) for i, v in enumerate(self.rng.integers(1, 8, size=45), start=1)}
+            result = self.dpq.score_assessment(responses, dog_id="rex")
+            result.assessment_date = str(np.datetime64("2024-01-15") + 30 * month)
+            results.append(result)
+
+        index = TrendIndex()
+        for result in results:
+            index.update("rex", result.assessment_date, result.factor_scores)
+        path = os.path.join(self.directory, "trends.npz")
+        index.save(path)
+        loaded = TrendIndex.load_or_create(path)
+        self.assertEqual(loaded.summary("rex"), index.summary("rex"))
+
+        trend = DPQAnalyzer().analyze_trends(list(reversed(results)))
+        self.assertEqual(trend["assessments"], 6)
+        self.assertEqual(trend["first_date"], "2024-01-15")
+        name = self.dpq.factor_names[0]
+        self.assertAlmostEqual(trend["factors"][name]["slope_per_year"],
+                               index.summary("rex")["factors"][name]["slope_per_year"], places=6)
+        self.assertEqual(dates_to_days(["1970-01-02T10:00:00"])[0], 1.0)
+        print("✅ Trend summaries persist and match DPQResults trends")
+
+    def test_index_saves_merge(self):
+        """Test that indexes sharing a file merge their updates instead of overwriting"""
+        print("\n🧪 Testing merged saves from two workers...")
+        names = self.dpq.factor_names
+        updates = [(dog, str(np.datetime64("2024-01-15") + 30 * month),
+                    dict(zip(names, self.rng.uniform(1, 7, size=len(names)))))
+                   for month in range(8) for dog in ("rex", "fido", "bella")]
+        path = os.path.join(self.directory, "shared_trends.npz")
+        first, second, single = TrendIndex(), TrendIndex(), TrendIndex()
+        for k, update in enumerate(updates):
+            # Worker 2 starts rex's history later, so its sums are anchored to another day
+            (first if k % 2 == 0 or update[0] == "fido" else second).update(*update)
+            single.update(*update)
+            if k % 5 == 4:
+                first.save(path)
+                second.save(path)
+        first.save(path)
+        second.save(path)
+        first.save(path)
+
+        merged = TrendIndex.load_or_create(path)
+        self.assertEqual(sorted(merged.dog_ids), ["bella", "fido", "rex"])
+        self.assertEqual(first.summary("bella")["assessments"], 8)
+        for dog in ("rex", "fido", "bella"):
+            expected, actual = single.summary(dog), merged.summary(dog)
+            for key in ("assessments", "first_date", "last_date"):
+                self.assertEqual(expected[key], actual[key])
+            for name in names:
+                self.assertAlmostEqual(expected["factors"][name]["slope_per_year"],
+                                       actual["factors"][name]["slope_per_year"], places=3)
+                self.assertAlmostEqual(expected["factors"][name]["p_value"],
+                                       actual["factors"][name]["p_value"], places=3)
+        self.assertEqual(sorted(os.listdir(self.directory)), ["shared_trends.npz", "shared_trends.npz.lock"])
+        print("✅ Both workers' updates are in the shared file")
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
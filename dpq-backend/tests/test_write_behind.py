@@ -0,0 +1,204 @@
+import unittest
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+import time
+from unittest import mock
+
+# Add the parent directory to sys.path to find the dpq package
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from dpq.profile_cache import DogProfileCache
+from dpq.write_behind import WriteBehindBuffer
+
+
+def assessment(n):
+    return {"assessment_id": f"a-{n}", "dog_id": f"d-{n % 3}", "responses": {"1": n % 7 + 1}}
+
+
+class FlakyDatabase:
+    """flush stand-in recording written assessments; refuses connections while down, rejects poisoned IDs"""
+
+    def __init__(self, down=False, poisoned=()):
+        self.down = down
+        self.poisoned = set(poisoned)
+        self.rows = {}
+        self.batches = []
+        self.written = []
+
+    async def flush(self, assessments):
+        if self.down:
+            raise ConnectionRefusedError("connection refused")
+        if any(a["assessment_id"] in self.poisoned for a in assessments):
+            raise ValueError("invalid input syntax for type uuid")
+        self.batches.append(len(assessments))
+        await asyncio.sleep(0)
+        self.written.extend(a["assessment_id"] for a in assessments)
+        for a in assessments:
+            self.rows.setdefault(a["assessment_id"], a)
+
+
+class TestWriteBehindBuffer(unittest.TestCase):
+    """Test cases for the durable assessment write buffer"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(prefix="dpq_write_buffer_")
+        self.path = os.path.join(self.directory, "write_buffer.sqlite3")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_outage_and_replay(self):
+        """Test that assessments logged during an outage are kept across a restart and written once it ends"""
+        print("\n🧪 Testing write buffer during an outage...")
+        database = FlakyDatabase(down=True)
+
+        async def outage():
+            buffer = await WriteBehindBuffer(self.path, database.flush, batch_size=4, flush_interval=0.01,
+                                             max_backoff=0.02).start()
+            await asyncio.gather(*(buffer.append(assessment(n)) for n in range(10)))
+            await asyncio.sleep(0.1)
+            stats = buffer.stats()
+            await buffer.close(timeout=0.5)
+            return stats
+
+        stats = asyncio.run(outage())
+        self.assertEqual((stats["pending"], stats["written"]), (10, 0))
+        self.assertGreater(stats["failures"], 1)
+        self.assertIn("ConnectionRefusedError", stats["last_error"])
+
+        async def recovery():
+            database.down = False
+            buffer = WriteBehindBuffer(self.path, database.flush, batch_size=4, flush_interval=0.01)
+            self.assertEqual(len(buffer), 10)
+            await buffer.start()
+            self.assertTrue(await buffer.wait_flushed("a-9", timeout=1))
+            await buffer.close()
+            return buffer
+
+        buffer = asyncio.run(recovery())
+        self.assertEqual(sorted(database.rows), sorted(f"a-{n}" for n in range(10)))
+        self.assertEqual(database.batches, [4, 4, 2])
+        self.assertEqual(len(buffer), 0)
+        print(f"✅ {len(database.rows)} assessments written in batches {database.batches} after the outage")
+
+    def test_poisoned_assessment_is_isolated(self):
+        """Test that an assessment the database rejects does not hold back the others"""
+        print("\n🧪 Testing poisoned assessments...")
+        database = FlakyDatabase(poisoned={"a-2"})
+
+        async def run():
+            buffer = await WriteBehindBuffer(self.path, database.flush, batch_size=10, flush_interval=0.01,
+                                             max_attempts=3).start()
+            for n in range(5):
+                await buffer.append(assessment(n))
+            self.assertTrue(await buffer.wait_flushed("a-4", timeout=1))
+            self.assertFalse(await buffer.wait_flushed("a-2", timeout=1))
+            stats = buffer.stats()
+            await buffer.close()
+            return stats
+
+        stats = asyncio.run(run())
+        self.assertEqual(sorted(database.rows), ["a-0", "a-1", "a-3", "a-4"])
+        self.assertEqual((stats["pending"], stats["dead"]), (0, 1))
+        self.assertIn("ValueError", stats["last_error"])
+        # Dead assessments stay in the log for inspection and are not replayed
+        self.assertEqual(len(WriteBehindBuffer(self.path, database.flush)), 0)
+        print("✅ Poisoned assessment kept as dead, the others written")
+
+    def test_workers_share_the_log(self):
+        """Test that workers sharing a log file write each assessment once and see each other's writes"""
+        print("\n🧪 Testing a log shared by two workers...")
+        database = FlakyDatabase()
+
+        async def run():
+            first = await WriteBehindBuffer(self.path, database.flush, batch_size=3, flush_interval=0.01).start()
+            second = await WriteBehindBuffer(self.path, database.flush, batch_size=3, flush_interval=0.01).start()
+            await asyncio.gather(*(first.append(assessment(n)) for n in range(20)))
+            # Written by whichever worker claimed them
+            flushed = await asyncio.gather(*(first.wait_flushed(f"a-{n}", timeout=2) for n in range(20)))
+            await asyncio.sleep(0.05)
+            sizes = (len(first), len(second))
+            await first.close()
+            await second.close()
+            return flushed, sizes, first.written, second.written
+
+        flushed, sizes, first_written, second_written = asyncio.run(run())
+        self.assertTrue(all(flushed))
+        self.assertEqual(sizes, (0, 0))
+        self.assertEqual(sorted(database.written), sorted(f"a-{n}" for n in range(20)))
+        self.assertEqual(first_written + second_written, 20)
+        print(f"✅ 20 assessments written once ({first_written} + {second_written}) by two workers")
+
+    def test_backlog_reads_do_not_scan_the_log(self):
+        """Test that reading a batch from a large backlog costs the same as from a small one"""
+        print("\n🧪 Testing batch reads over a large backlog...")
+        buffer = WriteBehindBuffer(self.path, FlakyDatabase().flush)
+        with buffer._db:
+            buffer._db.executemany("INSERT INTO assessments (assessment_id, payload, enqueued_at) VALUES (?, ?, 0)",
+                                   [(f"a-{n}", b'{}') for n in range(100000)])
+        buffer._db.close()
+
+        buffer = WriteBehindBuffer(self.path, FlakyDatabase().flush)
+        self.assertEqual(len(buffer), 100000)
+        start = time.perf_counter()
+        for _ in range(20):
+            rows = buffer._read_batch()
+            buffer._delete([row[0] for row in rows])
+        per_read = (time.perf_counter() - start) / 20
+        self.assertEqual(rows[-1][1], "a-1999")
+        # Rows this buffer did not write itself are settled once the log moves past them
+        buffer._read_batch()
+        self.assertEqual(len(buffer), 98000)
+        self.assertLess(per_read, 0.02)
+        buffer._db.close()
+        print(f"✅ {per_read * 1000:.2f} ms per batch read with 100000 assessments pending")
+
+    def test_handler_appends_instead_of_saving(self):
+        """Test that the assessment pipeline logs to the running buffer and batches are idempotent inserts"""
+        print("\n🧪 Testing buffered assessment saves...")
+        from dpq import api_handler
+
+        handler = api_handler.DPQAPIHandler.__new__(api_handler.DPQAPIHandler)
+        database = FlakyDatabase()
+        executed = []
+
+        class Connection:
+            async def executemany(self, query, args):
+                executed.append((query, args))
+
+        class Pool:
+            def acquire(self):
+                return mock.AsyncMock(__aenter__=mock.AsyncMock(return_value=Connection()))
+
+        def formatted(n):
+            return {**assessment(n), "user_id": "u", "dog_info": {"name": "Rex"},
+                    "personality_factors": {}, "ai_bias_indicators": {}, "personality_summary": {},
+                    "ai_translator_config": {}, "recommendations": {}, "quality_metrics": {},
+                    "metadata": {"assessment_version": "v1", "scoring_algorithm": "s"}}
+
+        async def run():
+            buffer = await WriteBehindBuffer(self.path, database.flush, flush_interval=0.01).start()
+            with mock.patch("dpq.api_handler.get_write_buffer", return_value=buffer), \
+                    mock.patch("dpq.api_handler.get_dog_profile_cache", return_value=DogProfileCache()), \
+                    mock.patch.object(handler, "save_assessment_to_db") as save:
+                self.assertTrue(await handler.persist_assessment(formatted(1)))
+                save.assert_not_called()
+                await buffer.close()
+
+                with mock.patch("dpq.api_handler.get_db_pool", return_value=Pool()):
+                    await api_handler.save_assessments([formatted(2), formatted(2)])
+
+        asyncio.run(run())
+        self.assertIn("a-1", database.rows)
+        query, args = executed[0]
+        self.assertIn("ON CONFLICT (assessment_id) DO NOTHING", query)
+        self.assertEqual([row[0] for row in args], ["a-2", "a-2"])
+        self.assertEqual(args[0][20], "Rex")
+        print("✅ Assessment logged instead of saved during the request")
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)